@@ -104,6 +104,20 @@ class Settings:
     archive_dir: str
     redis_url: str | None
 
+    # Authenticated principal cache
+    principal_cache_enabled: bool
+    principal_cache_ttl_seconds: int
+    principal_cache_max_entries: int
+
+    # Audit/security event writer
+    audit_log_batch_size: int
+    audit_log_flush_ms: int
+    audit_log_queue_max: int
+    audit_log_overflow_policy: str
+
+    # Rate limiting
+    rate_limit_local_max_keys: int
+
     # Performance & Reasoning
     max_reasoning_time_seconds: int
     max_synthesis_time_seconds: int
@@ -149,6 +163,8 @@ class Settings:
     web_cache_ttl_seconds: int
     web_cache_enabled: bool
     web_cache_max_rows: int
+    web_cache_memory_ttl_seconds: int
+    web_cache_memory_max_entries: int
     enable_feedback: bool
 
     # Timeouts
@@ -227,6 +243,20 @@ def get_settings() -> Settings:
     s.archive_dir = os.getenv("ARCHIVE_DIR", str(PROJECT_ROOT / "archive"))
     s.redis_url = os.getenv("REDIS_URL")
 
+    # Resolved bearer-token principals cached briefly; invalidated across workers via Redis pub/sub
+    s.principal_cache_enabled = _get_bool("PRINCIPAL_CACHE_ENABLED", True)
+    s.principal_cache_ttl_seconds = _get_int("PRINCIPAL_CACHE_TTL_SECONDS", 30)
+    s.principal_cache_max_entries = _get_int("PRINCIPAL_CACHE_MAX_ENTRIES", 10000)
+
+    # Audit/security events are queued and written in multi-row batches by a background thread
+    s.audit_log_batch_size = _get_int("AUDIT_LOG_BATCH_SIZE", 500)
+    s.audit_log_flush_ms = _get_int("AUDIT_LOG_FLUSH_MS", 1000)
+    s.audit_log_queue_max = _get_int("AUDIT_LOG_QUEUE_MAX", 10000)
+    s.audit_log_overflow_policy = os.getenv("AUDIT_LOG_OVERFLOW_POLICY", "drop_oldest")
+
+    # GCRA limits live in Redis; this bounds the per-process fallback used when Redis is unreachable
+    s.rate_limit_local_max_keys = _get_int("RATE_LIMIT_LOCAL_MAX_KEYS", 10000)
+
     # Performance & Reasoning
     s.max_reasoning_time_seconds = _get_int("MAX_REASONING_TIME_SECONDS", 15)
     s.max_synthesis_time_seconds = _get_int("MAX_SYNTHESIS_TIME_SECONDS", 12)
@@ -288,6 +318,9 @@ def get_settings() -> Settings:
     s.web_cache_ttl_seconds = _get_int("WEB_CACHE_TTL_SECONDS", 900)  # 15 minutes default
     s.web_cache_enabled = _get_bool("WEB_CACHE_ENABLED", True)
     s.web_cache_max_rows = _get_int("WEB_CACHE_MAX_ROWS", 5000)
+    # Short-lived in-process tier in front of the web_search_cache table
+    s.web_cache_memory_ttl_seconds = _get_int("WEB_CACHE_MEMORY_TTL_SECONDS", 60)
+    s.web_cache_memory_max_entries = _get_int("WEB_CACHE_MEMORY_MAX_ENTRIES", 256)
     s.enable_feedback = _get_bool("ENABLE_FEEDBACK", True)
 
     # Phase 2B Query Expansion Controls (feature-flagged)
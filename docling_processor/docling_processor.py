@@ -340,6 +340,7 @@ def process_pending_files():
                 insert_document_chunks_with_categorization,
                 insert_document_with_categorization,
                 insert_ingestion_metrics,
+                record_document_archive_path,
                 remove_existing_document,
             )
 
@@ -523,8 +524,10 @@ def process_pending_files():
             duration = time.time() - doc_start
             PROCESS_DURATION.observe(duration)
             logger.info(f"Successfully processed and inserted {filename} in {duration:.2f}s")
+            archive_target = os.path.join(ARCHIVE_DIR, filename)
             try:
-                _archive_file(file_path, os.path.join(ARCHIVE_DIR, filename))
+                _archive_file(file_path, archive_target)
+                record_document_archive_path(conn, document_id, archive_target, ARCHIVE_DIR)
             except Exception as arch_move_err:
                 logger.error(f"Archiving move failed for {filename}: {arch_move_err}")
         except Exception as e:
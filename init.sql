@@ -19,12 +19,33 @@ CREATE TABLE IF NOT EXISTS documents (
   processing_status text DEFAULT 'pending',
   processed_at timestamptz,
   metadata jsonb DEFAULT '{}'::jsonb,
+  -- Archived file, relative to ARCHIVE_DIR (recorded at ingestion; NULL means file_name)
+  archive_path text,
+  -- Maintained by the document_chunks count triggers below
+  chunk_count integer NOT NULL DEFAULT 0,
   created_at timestamptz DEFAULT now(),
   updated_at timestamptz DEFAULT now()
 );
 CREATE UNIQUE INDEX IF NOT EXISTS documents_file_hash_idx ON documents(file_hash);
 CREATE INDEX IF NOT EXISTS documents_privacy_level_idx ON documents(privacy_level);
 
+-- Document browser (/api/documents/list): trigram search plus one index per sort
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_documents_file_name_trgm ON documents USING gin (file_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_documents_title_trgm ON documents USING gin (title gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_documents_list_created
+  ON documents(created_at, id) WHERE processing_status = 'processed';
+CREATE INDEX IF NOT EXISTS idx_documents_list_processed
+  ON documents((COALESCE(processed_at, created_at)), id) WHERE processing_status = 'processed';
+CREATE INDEX IF NOT EXISTS idx_documents_list_file_name
+  ON documents(file_name, id) WHERE processing_status = 'processed';
+CREATE INDEX IF NOT EXISTS idx_documents_list_chunk_count
+  ON documents(chunk_count, id) WHERE processing_status = 'processed';
+CREATE INDEX IF NOT EXISTS idx_documents_list_type_processed
+  ON documents(document_type, (COALESCE(processed_at, created_at)), id) WHERE processing_status = 'processed';
+CREATE INDEX IF NOT EXISTS idx_documents_list_product_processed
+  ON documents(product_name, (COALESCE(processed_at, created_at)), id) WHERE processing_status = 'processed';
+
 -- Document chunks with hybrid search fields
 CREATE TABLE IF NOT EXISTS document_chunks (
   id bigserial PRIMARY KEY,
@@ -135,10 +156,14 @@ CREATE TABLE IF NOT EXISTS conversations (
   user_id bigint,
   created_at timestamptz DEFAULT now() NOT NULL,
   updated_at timestamptz DEFAULT now(),
-  last_reviewed_at timestamptz
+  last_reviewed_at timestamptz,
+  -- Latest message time, maintained by the chat writer; sort key of the conversation list
+  last_activity timestamptz DEFAULT now() NOT NULL
 );
 
 CREATE INDEX IF NOT EXISTS conversations_user_id_idx ON conversations(user_id);
+CREATE INDEX IF NOT EXISTS idx_conversations_user_activity
+  ON conversations(user_id, last_activity DESC, id DESC) INCLUDE (title, created_at, updated_at);
 
 CREATE TABLE IF NOT EXISTS messages (
   id bigserial PRIMARY KEY,
@@ -180,6 +205,31 @@ DROP TRIGGER IF EXISTS update_chunk_tsvector ON document_chunks;
 CREATE TRIGGER update_chunk_tsvector BEFORE INSERT OR UPDATE OF content ON document_chunks
   FOR EACH ROW EXECUTE FUNCTION update_content_tsvector();
 
+-- documents.chunk_count: one UPDATE per statement and document, not per chunk row
+CREATE OR REPLACE FUNCTION add_document_chunk_counts() RETURNS trigger AS $$
+BEGIN
+  UPDATE documents d SET chunk_count = d.chunk_count + c.n
+  FROM (SELECT document_id, COUNT(*) AS n FROM new_chunks GROUP BY document_id) c
+  WHERE d.id = c.document_id;
+  RETURN NULL;
+END;$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION subtract_document_chunk_counts() RETURNS trigger AS $$
+BEGIN
+  UPDATE documents d SET chunk_count = GREATEST(d.chunk_count - c.n, 0)
+  FROM (SELECT document_id, COUNT(*) AS n FROM old_chunks GROUP BY document_id) c
+  WHERE d.id = c.document_id;
+  RETURN NULL;
+END;$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS count_inserted_chunks ON document_chunks;
+CREATE TRIGGER count_inserted_chunks AFTER INSERT ON document_chunks
+  REFERENCING NEW TABLE AS new_chunks FOR EACH STATEMENT EXECUTE FUNCTION add_document_chunk_counts();
+
+DROP TRIGGER IF EXISTS count_deleted_chunks ON document_chunks;
+CREATE TRIGGER count_deleted_chunks AFTER DELETE ON document_chunks
+  REFERENCING OLD TABLE AS old_chunks FOR EACH STATEMENT EXECUTE FUNCTION subtract_document_chunk_counts();
+
 -- Document ingestion metrics (added Oct 7 2025)
 -- Stores per-document processing performance and quality metrics for monitoring & optimization
 CREATE TABLE IF NOT EXISTS document_ingestion_metrics (
@@ -317,8 +367,9 @@ CREATE TABLE IF NOT EXISTS question_patterns (
     created_at timestamptz DEFAULT now()
 );
 
+-- Raw usage, range-partitioned by month (partitions kept by reranker/question_stats.py)
 CREATE TABLE IF NOT EXISTS question_usage (
-    id bigserial PRIMARY KEY,
+    id bigserial,
     question_pattern_id bigint REFERENCES question_patterns(id),
     user_id bigint,
     conversation_id bigint REFERENCES conversations(id) ON DELETE CASCADE,
@@ -329,30 +380,159 @@ CREATE TABLE IF NOT EXISTS question_usage (
     context_length integer,
     search_method text,
     citations_count integer,
-    created_at timestamptz DEFAULT now()
-);
+    created_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE IF NOT EXISTS question_usage_default PARTITION OF question_usage DEFAULT;
+
+-- Monthly partitions named question_usage_yYYYYmMM with UTC month bounds
+CREATE OR REPLACE FUNCTION ensure_question_usage_partitions(from_month date, months_ahead int)
+RETURNS int AS $$
+DECLARE
+    month_start date := date_trunc('month', from_month)::date;
+    partition_name text;
+    created int := 0;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        partition_name := format('question_usage_y%sm%s', to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF question_usage FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                month_start::timestamp AT TIME ZONE 'UTC',
+                (month_start + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC'
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Drop monthly partitions that ended before the last keep_months months (the rollups keep their totals)
+CREATE OR REPLACE FUNCTION drop_question_usage_partitions(keep_months int)
+RETURNS int AS $$
+DECLARE
+    cutoff date := (date_trunc('month', now() AT TIME ZONE 'UTC') - make_interval(months => keep_months))::date;
+    part record;
+    dropped int := 0;
+BEGIN
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'question_usage'::regclass
+          AND c.relname ~ '^question_usage_y[0-9]{4}m[0-9]{2}$'
+          AND to_date(substring(c.relname FROM 17), 'YYYY"m"MM') < cutoff
+    LOOP
+        EXECUTE format('DROP TABLE %I', part.relname);
+        dropped := dropped + 1;
+    END LOOP;
+    RETURN dropped;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_question_usage_partitions(CURRENT_DATE, 3);
 
 -- Indexes for question tracking
 CREATE INDEX IF NOT EXISTS idx_question_patterns_hash ON question_patterns(question_hash);
-CREATE INDEX IF NOT EXISTS idx_question_usage_pattern_id ON question_usage(question_pattern_id);
+CREATE INDEX IF NOT EXISTS idx_question_usage_pattern_id ON question_usage(question_pattern_id, created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_question_usage_user_id ON question_usage(user_id);
 CREATE INDEX IF NOT EXISTS idx_question_usage_created_at ON question_usage(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_question_usage_conversation_id ON question_usage(conversation_id);
+
+-- Incremental rollups read by the admin question statistics
+CREATE TABLE IF NOT EXISTS question_usage_hourly (
+    bucket timestamptz NOT NULL,
+    category text NOT NULL DEFAULT '',
+    usage_count bigint NOT NULL DEFAULT 0,
+    response_time_sum bigint NOT NULL DEFAULT 0,
+    response_time_count bigint NOT NULL DEFAULT 0,
+    quality_sum float8 NOT NULL DEFAULT 0,
+    quality_count bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, category)
+);
+
+CREATE TABLE IF NOT EXISTS question_usage_daily (
+    bucket timestamptz NOT NULL,
+    category text NOT NULL DEFAULT '',
+    usage_count bigint NOT NULL DEFAULT 0,
+    response_time_sum bigint NOT NULL DEFAULT 0,
+    response_time_count bigint NOT NULL DEFAULT 0,
+    quality_sum float8 NOT NULL DEFAULT 0,
+    quality_count bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, category)
+);
+
+CREATE TABLE IF NOT EXISTS question_pattern_stats (
+    question_pattern_id bigint PRIMARY KEY REFERENCES question_patterns(id) ON DELETE CASCADE,
+    usage_count bigint NOT NULL DEFAULT 0,
+    response_time_sum bigint NOT NULL DEFAULT 0,
+    response_time_count bigint NOT NULL DEFAULT 0,
+    quality_sum float8 NOT NULL DEFAULT 0,
+    quality_count bigint NOT NULL DEFAULT 0,
+    positive_feedback bigint NOT NULL DEFAULT 0,
+    negative_feedback bigint NOT NULL DEFAULT 0,
+    unique_users bigint NOT NULL DEFAULT 0,
+    first_used timestamptz,
+    last_used timestamptz
+);
 
--- Aggregated statistics view
+CREATE TABLE IF NOT EXISTS question_pattern_users (
+    question_pattern_id bigint NOT NULL REFERENCES question_patterns(id) ON DELETE CASCADE,
+    user_id bigint NOT NULL,
+    PRIMARY KEY (question_pattern_id, user_id)
+);
+
+-- Aggregated statistics view (reads the incremental rollups)
 CREATE OR REPLACE VIEW question_statistics AS
 SELECT
     qp.question_hash,
     qp.canonical_question,
     qp.category,
-    COUNT(qu.id) as usage_count,
-    AVG(qu.response_time_ms) as avg_response_time,
-    AVG(qu.response_quality_score) as avg_quality_score,
-    COUNT(CASE WHEN qu.user_feedback = 'positive' THEN 1 END) as positive_feedback,
-    COUNT(CASE WHEN qu.user_feedback = 'negative' THEN 1 END) as negative_feedback,
-    MAX(qu.created_at) as last_used,
-    COUNT(DISTINCT qu.user_id) as unique_users
+    s.usage_count,
+    s.response_time_sum::float8 / NULLIF(s.response_time_count, 0) as avg_response_time,
+    s.quality_sum / NULLIF(s.quality_count, 0) as avg_quality_score,
+    s.positive_feedback,
+    s.negative_feedback,
+    s.last_used,
+    s.unique_users
 FROM question_patterns qp
-JOIN question_usage qu ON qp.id = qu.question_pattern_id
-GROUP BY qp.id, qp.question_hash, qp.canonical_question, qp.category;
+JOIN question_pattern_stats s ON qp.id = s.question_pattern_id;
+
+-- Asynchronous bulk Q&A jobs (see reranker/batch_jobs.py)
+CREATE TABLE IF NOT EXISTS batch_jobs (
+  id text PRIMARY KEY,
+  user_id bigint NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+  status text NOT NULL DEFAULT 'queued',
+  params jsonb NOT NULL DEFAULT '{}'::jsonb,
+  total_items integer NOT NULL DEFAULT 0,
+  completed_items integer NOT NULL DEFAULT 0,
+  failed_items integer NOT NULL DEFAULT 0,
+  error text,
+  lease_owner text,
+  lease_expires_at timestamptz,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  started_at timestamptz,
+  finished_at timestamptz,
+  updated_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_batch_jobs_user_id ON batch_jobs(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_batch_jobs_resumable ON batch_jobs(status) WHERE status IN ('queued', 'running');
+
+CREATE TABLE IF NOT EXISTS batch_job_items (
+  job_id text NOT NULL REFERENCES batch_jobs(id) ON DELETE CASCADE,
+  item_index integer NOT NULL,
+  query text NOT NULL,
+  status text NOT NULL DEFAULT 'pending',
+  result jsonb,
+  error text,
+  completed_at timestamptz,
+  PRIMARY KEY (job_id, item_index)
+);
+CREATE INDEX IF NOT EXISTS idx_batch_job_items_pending ON batch_job_items(job_id, item_index) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_batch_job_items_completed ON batch_job_items(job_id, completed_at) WHERE status <> 'pending';
 
 -- End canonical schema
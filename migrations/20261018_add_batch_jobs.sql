@@ -0,0 +1,38 @@
+-- Migration: Add batch_jobs and batch_job_items tables
+-- Date: 2026-10-18
+-- Purpose: Persist asynchronous bulk Q&A jobs and their per-item results so
+--          jobs survive worker restarts and resume from the last completed item
+
+CREATE TABLE IF NOT EXISTS batch_jobs (
+    id TEXT PRIMARY KEY,
+    user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    status TEXT NOT NULL DEFAULT 'queued',  -- queued | running | completed | failed | cancelled
+    params JSONB NOT NULL DEFAULT '{}'::jsonb,
+    total_items INTEGER NOT NULL DEFAULT 0,
+    completed_items INTEGER NOT NULL DEFAULT 0,
+    failed_items INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    lease_owner TEXT,
+    lease_expires_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_batch_jobs_user_id ON batch_jobs(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_batch_jobs_resumable ON batch_jobs(status) WHERE status IN ('queued', 'running');
+
+CREATE TABLE IF NOT EXISTS batch_job_items (
+    job_id TEXT NOT NULL REFERENCES batch_jobs(id) ON DELETE CASCADE,
+    item_index INTEGER NOT NULL,
+    query TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',  -- pending | completed | failed
+    result JSONB,
+    error TEXT,
+    completed_at TIMESTAMPTZ,
+    PRIMARY KEY (job_id, item_index)
+);
+
+CREATE INDEX IF NOT EXISTS idx_batch_job_items_pending ON batch_job_items(job_id, item_index) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_batch_job_items_completed ON batch_job_items(job_id, completed_at) WHERE status <> 'pending';
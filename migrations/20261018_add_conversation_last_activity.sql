@@ -0,0 +1,22 @@
+-- Migration: Add conversations.last_activity and a covering index for listing
+-- Date: 2026-10-18
+-- Purpose: The conversation list used to aggregate MAX(messages.created_at) over
+--          every message of the user on each request. The latest activity is now
+--          stored on the conversation at write time and pages are read by keyset
+--          from (user_id, last_activity DESC, id DESC).
+
+ALTER TABLE conversations ADD COLUMN IF NOT EXISTS last_activity TIMESTAMPTZ;
+
+UPDATE conversations c
+SET last_activity = COALESCE(
+    (SELECT MAX(m.created_at) FROM messages m WHERE m.conversation_id = c.id),
+    c.updated_at,
+    c.created_at
+)
+WHERE c.last_activity IS NULL;
+
+ALTER TABLE conversations ALTER COLUMN last_activity SET DEFAULT NOW();
+ALTER TABLE conversations ALTER COLUMN last_activity SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_conversations_user_activity
+    ON conversations(user_id, last_activity DESC, id DESC) INCLUDE (title, created_at, updated_at);
@@ -0,0 +1,9 @@
+-- Migration: Record each document's archive location at ingestion
+-- Date: 2026-10-18
+-- Purpose: /api/documents/download probed the configured and fallback archive
+--          directories on every request (and listed the whole archive on a
+--          miss). Ingestion now stores the archived file's path, relative to
+--          the archive directory, so a download is a single stat. Rows without
+--          it fall back to file_name.
+
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS archive_path TEXT;
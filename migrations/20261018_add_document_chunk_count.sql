@@ -0,0 +1,58 @@
+-- Migration: Materialize documents.chunk_count and index the document browser
+-- Date: 2026-10-18
+-- Purpose: /api/documents/list aggregated COUNT(*) over all of document_chunks on
+--          every call and filtered with unindexable ILIKE '%term%'. chunk_count
+--          is now kept on documents by statement-level triggers (one UPDATE per
+--          statement and document), search uses trigram GIN indexes and every
+--          sort of the endpoint has a matching partial index for keyset paging.
+
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS chunk_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION add_document_chunk_counts() RETURNS trigger AS $$
+BEGIN
+    UPDATE documents d SET chunk_count = d.chunk_count + c.n
+    FROM (SELECT document_id, COUNT(*) AS n FROM new_chunks GROUP BY document_id) c
+    WHERE d.id = c.document_id;
+    RETURN NULL;
+END;$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION subtract_document_chunk_counts() RETURNS trigger AS $$
+BEGIN
+    UPDATE documents d SET chunk_count = GREATEST(d.chunk_count - c.n, 0)
+    FROM (SELECT document_id, COUNT(*) AS n FROM old_chunks GROUP BY document_id) c
+    WHERE d.id = c.document_id;
+    RETURN NULL;
+END;$$ LANGUAGE plpgsql;
+
+-- Install the triggers and backfill in one transaction so no insert is counted twice or missed
+BEGIN;
+LOCK TABLE document_chunks IN SHARE MODE;
+
+DROP TRIGGER IF EXISTS count_inserted_chunks ON document_chunks;
+CREATE TRIGGER count_inserted_chunks AFTER INSERT ON document_chunks
+    REFERENCING NEW TABLE AS new_chunks FOR EACH STATEMENT EXECUTE FUNCTION add_document_chunk_counts();
+
+DROP TRIGGER IF EXISTS count_deleted_chunks ON document_chunks;
+CREATE TRIGGER count_deleted_chunks AFTER DELETE ON document_chunks
+    REFERENCING OLD TABLE AS old_chunks FOR EACH STATEMENT EXECUTE FUNCTION subtract_document_chunk_counts();
+
+UPDATE documents d
+SET chunk_count = (SELECT COUNT(*) FROM document_chunks c WHERE c.document_id = d.id);
+COMMIT;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_documents_file_name_trgm ON documents USING gin (file_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_documents_title_trgm ON documents USING gin (title gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_documents_list_created
+    ON documents(created_at, id) WHERE processing_status = 'processed';
+CREATE INDEX IF NOT EXISTS idx_documents_list_processed
+    ON documents((COALESCE(processed_at, created_at)), id) WHERE processing_status = 'processed';
+CREATE INDEX IF NOT EXISTS idx_documents_list_file_name
+    ON documents(file_name, id) WHERE processing_status = 'processed';
+CREATE INDEX IF NOT EXISTS idx_documents_list_chunk_count
+    ON documents(chunk_count, id) WHERE processing_status = 'processed';
+CREATE INDEX IF NOT EXISTS idx_documents_list_type_processed
+    ON documents(document_type, (COALESCE(processed_at, created_at)), id) WHERE processing_status = 'processed';
+CREATE INDEX IF NOT EXISTS idx_documents_list_product_processed
+    ON documents(product_name, (COALESCE(processed_at, created_at)), id) WHERE processing_status = 'processed';
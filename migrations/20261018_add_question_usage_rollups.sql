@@ -0,0 +1,226 @@
+-- Migration: Incremental question usage rollups and monthly question_usage partitions
+-- Date: 2026-10-18
+-- Purpose: /api/admin/question-stats aggregated all of question_usage (COUNT,
+--          AVG, COUNT DISTINCT) on every dashboard refresh. Usage is now rolled
+--          up per UTC hour/day and category and per question pattern by the
+--          chat write-behind batch (reranker/question_stats.py), and the raw
+--          table is range-partitioned by month so old months can be dropped
+--          whole (QUESTION_USAGE_RETENTION_MONTHS).
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS question_usage_hourly (
+    bucket timestamptz NOT NULL,
+    category text NOT NULL DEFAULT '',
+    usage_count bigint NOT NULL DEFAULT 0,
+    response_time_sum bigint NOT NULL DEFAULT 0,
+    response_time_count bigint NOT NULL DEFAULT 0,
+    quality_sum float8 NOT NULL DEFAULT 0,
+    quality_count bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, category)
+);
+
+CREATE TABLE IF NOT EXISTS question_usage_daily (
+    bucket timestamptz NOT NULL,
+    category text NOT NULL DEFAULT '',
+    usage_count bigint NOT NULL DEFAULT 0,
+    response_time_sum bigint NOT NULL DEFAULT 0,
+    response_time_count bigint NOT NULL DEFAULT 0,
+    quality_sum float8 NOT NULL DEFAULT 0,
+    quality_count bigint NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, category)
+);
+
+CREATE TABLE IF NOT EXISTS question_pattern_stats (
+    question_pattern_id bigint PRIMARY KEY REFERENCES question_patterns(id) ON DELETE CASCADE,
+    usage_count bigint NOT NULL DEFAULT 0,
+    response_time_sum bigint NOT NULL DEFAULT 0,
+    response_time_count bigint NOT NULL DEFAULT 0,
+    quality_sum float8 NOT NULL DEFAULT 0,
+    quality_count bigint NOT NULL DEFAULT 0,
+    positive_feedback bigint NOT NULL DEFAULT 0,
+    negative_feedback bigint NOT NULL DEFAULT 0,
+    unique_users bigint NOT NULL DEFAULT 0,
+    first_used timestamptz,
+    last_used timestamptz
+);
+
+CREATE TABLE IF NOT EXISTS question_pattern_users (
+    question_pattern_id bigint NOT NULL REFERENCES question_patterns(id) ON DELETE CASCADE,
+    user_id bigint NOT NULL,
+    PRIMARY KEY (question_pattern_id, user_id)
+);
+
+-- Block usage writes before the backfill so no row lands after it is counted
+LOCK TABLE question_usage IN ACCESS EXCLUSIVE MODE;
+
+-- Backfill the rollups from the raw rows
+INSERT INTO question_usage_hourly (bucket, category, usage_count, response_time_sum, response_time_count,
+                                   quality_sum, quality_count)
+SELECT date_trunc('hour', qu.created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+       COALESCE(qp.category, ''),
+       COUNT(*),
+       COALESCE(SUM(qu.response_time_ms), 0),
+       COUNT(qu.response_time_ms),
+       COALESCE(SUM(qu.response_quality_score), 0),
+       COUNT(qu.response_quality_score)
+FROM question_usage qu
+LEFT JOIN question_patterns qp ON qp.id = qu.question_pattern_id
+WHERE qu.created_at IS NOT NULL
+GROUP BY 1, 2
+ON CONFLICT (bucket, category) DO NOTHING;
+
+INSERT INTO question_usage_daily (bucket, category, usage_count, response_time_sum, response_time_count,
+                                  quality_sum, quality_count)
+SELECT date_trunc('day', bucket AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+       category,
+       SUM(usage_count),
+       SUM(response_time_sum),
+       SUM(response_time_count),
+       SUM(quality_sum),
+       SUM(quality_count)
+FROM question_usage_hourly
+GROUP BY 1, 2
+ON CONFLICT (bucket, category) DO NOTHING;
+
+INSERT INTO question_pattern_users (question_pattern_id, user_id)
+SELECT DISTINCT question_pattern_id, user_id
+FROM question_usage
+WHERE question_pattern_id IS NOT NULL AND user_id IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+INSERT INTO question_pattern_stats (question_pattern_id, usage_count, response_time_sum, response_time_count,
+                                    quality_sum, quality_count, positive_feedback, negative_feedback,
+                                    unique_users, first_used, last_used)
+SELECT question_pattern_id,
+       COUNT(*),
+       COALESCE(SUM(response_time_ms), 0),
+       COUNT(response_time_ms),
+       COALESCE(SUM(response_quality_score), 0),
+       COUNT(response_quality_score),
+       COUNT(*) FILTER (WHERE user_feedback = 'positive'),
+       COUNT(*) FILTER (WHERE user_feedback = 'negative'),
+       COUNT(DISTINCT user_id),
+       MIN(created_at),
+       MAX(created_at)
+FROM question_usage
+WHERE question_pattern_id IS NOT NULL
+GROUP BY question_pattern_id
+ON CONFLICT (question_pattern_id) DO NOTHING;
+
+-- The view read question_usage; it is recreated on the rollups below
+DROP VIEW IF EXISTS question_statistics;
+
+-- Rebuild question_usage as a table partitioned by month of created_at
+ALTER TABLE question_usage RENAME TO question_usage_unpartitioned;
+ALTER INDEX question_usage_pkey RENAME TO question_usage_unpartitioned_pkey;
+ALTER SEQUENCE question_usage_id_seq OWNED BY NONE;
+
+CREATE TABLE question_usage (
+    id bigint NOT NULL DEFAULT nextval('question_usage_id_seq'),
+    question_pattern_id bigint REFERENCES question_patterns(id),
+    user_id bigint,
+    conversation_id bigint REFERENCES conversations(id) ON DELETE CASCADE,
+    question_text text NOT NULL,
+    response_time_ms integer,
+    response_quality_score float,
+    user_feedback text,
+    context_length integer,
+    search_method text,
+    citations_count integer,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE question_usage_default PARTITION OF question_usage DEFAULT;
+
+-- Monthly partitions named question_usage_yYYYYmMM with UTC month bounds
+CREATE OR REPLACE FUNCTION ensure_question_usage_partitions(from_month date, months_ahead int)
+RETURNS int AS $$
+DECLARE
+    month_start date := date_trunc('month', from_month)::date;
+    partition_name text;
+    created int := 0;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        partition_name := format('question_usage_y%sm%s', to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF question_usage FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                month_start::timestamp AT TIME ZONE 'UTC',
+                (month_start + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC'
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Drop monthly partitions that ended before the last keep_months months (the rollups keep their totals)
+CREATE OR REPLACE FUNCTION drop_question_usage_partitions(keep_months int)
+RETURNS int AS $$
+DECLARE
+    cutoff date := (date_trunc('month', now() AT TIME ZONE 'UTC') - make_interval(months => keep_months))::date;
+    part record;
+    dropped int := 0;
+BEGIN
+    FOR part IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'question_usage'::regclass
+          AND c.relname ~ '^question_usage_y[0-9]{4}m[0-9]{2}$'
+          AND to_date(substring(c.relname FROM 17), 'YYYY"m"MM') < cutoff
+    LOOP
+        EXECUTE format('DROP TABLE %I', part.relname);
+        dropped := dropped + 1;
+    END LOOP;
+    RETURN dropped;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One partition per month that already has rows, plus the months ahead
+SELECT ensure_question_usage_partitions(
+    first_month,
+    ((EXTRACT(YEAR FROM now()) - EXTRACT(YEAR FROM first_month)) * 12
+     + EXTRACT(MONTH FROM now()) - EXTRACT(MONTH FROM first_month))::int + 3
+)
+FROM (
+    SELECT (COALESCE(MIN(created_at), now()) AT TIME ZONE 'UTC')::date AS first_month
+    FROM question_usage_unpartitioned
+) m;
+
+INSERT INTO question_usage
+SELECT id, question_pattern_id, user_id, conversation_id, question_text, response_time_ms,
+       response_quality_score, user_feedback, context_length, search_method, citations_count,
+       COALESCE(created_at, now())
+FROM question_usage_unpartitioned;
+
+DROP TABLE question_usage_unpartitioned;
+ALTER SEQUENCE question_usage_id_seq OWNED BY question_usage.id;
+
+CREATE INDEX IF NOT EXISTS idx_question_usage_pattern_id ON question_usage(question_pattern_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_question_usage_user_id ON question_usage(user_id);
+CREATE INDEX IF NOT EXISTS idx_question_usage_created_at ON question_usage(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_question_usage_conversation_id ON question_usage(conversation_id);
+
+-- Aggregated statistics view (reads the incremental rollups)
+CREATE OR REPLACE VIEW question_statistics AS
+SELECT
+    qp.question_hash,
+    qp.canonical_question,
+    qp.category,
+    s.usage_count,
+    s.response_time_sum::float8 / NULLIF(s.response_time_count, 0) as avg_response_time,
+    s.quality_sum / NULLIF(s.quality_count, 0) as avg_quality_score,
+    s.positive_feedback,
+    s.negative_feedback,
+    s.last_used,
+    s.unique_users
+FROM question_patterns qp
+JOIN question_pattern_stats s ON qp.id = s.question_pattern_id;
+
+COMMIT;
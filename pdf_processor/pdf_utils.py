@@ -1231,6 +1231,29 @@ def insert_ingestion_metrics(
             pass
 
 
+def record_document_archive_path(conn, document_id: int, archive_path: str, archive_dir: str) -> None:
+    """
+    Store where a document's file was archived so downloads need no directory probing.
+
+    Args:
+        conn: Database connection
+        document_id: ID of the archived document
+        archive_path: Path the file was moved to
+        archive_dir: Archive root; the path is stored relative to it
+    """
+    relative_path = os.path.relpath(archive_path, archive_dir)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("UPDATE documents SET archive_path = %s WHERE id = %s;", (relative_path, document_id))
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Failed to record archive path for document {document_id}: {e}")
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+
+
 def insert_document_chunks_with_privacy(conn, document_name: str, privacy_level: str) -> int:
     """
     Insert or update document record with privacy classification.
@@ -5,10 +5,12 @@ Implements multi-step reasoning with query decomposition, evidence gathering,
 and step-by-step analysis for the Technical Service Assistant.
 """
 
+import asyncio
+import hashlib
 import logging
 import re
 import time
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Set
 
 from reasoning_types import (
     ChainOfThoughtRequest,
@@ -53,11 +55,10 @@ class ChainOfThoughtReasoner:
         else:
             sub_queries = [request.query]
 
-        # Step 3: Gather evidence for each sub-query
+        # Step 3: Gather evidence for all sub-queries at once
         evidence_steps = []
-        for i, sub_query in enumerate(sub_queries):
-            evidence = await self._gather_evidence(sub_query, min_sources=request.min_evidence_sources)
-
+        all_evidence = await self._gather_evidence_batch(sub_queries, min_sources=request.min_evidence_sources)
+        for i, (sub_query, evidence) in enumerate(zip(sub_queries, all_evidence)):
             step = ReasoningStep(
                 step_number=i + 1,
                 description=f"Evidence for: {sub_query}",
@@ -152,36 +153,67 @@ class ChainOfThoughtReasoner:
 
     async def _gather_evidence(self, query: str, min_sources: int = 3) -> Dict[str, Any]:
         """Gather relevant evidence from the knowledge base."""
+        return (await self._gather_evidence_batch([query], min_sources=min_sources))[0]
+
+    async def _gather_evidence_batch(self, queries: List[str], min_sources: int = 3) -> List[Dict[str, Any]]:
+        """Gather evidence for several sub-queries with one concurrent search round.
 
+        One ``search`` per sub-query runs concurrently. A chunk used by an earlier
+        sub-query is not repeated for a later one, which takes its next-best
+        results instead.
+        """
+        top_k = min_sources * 2  # Get more than needed for filtering
         try:
-            # Use the search client to get relevant chunks
-            search_results = await self.search_client.search(
-                query=query, top_k=min_sources * 2  # Get more than needed for filtering
+            all_results = await asyncio.gather(
+                *(self.search_client.search(query=query, top_k=top_k) for query in queries),
+                return_exceptions=True,
             )
-
-            if not search_results:
-                return {"chunks": ["No relevant information found in knowledge base"], "sources": [], "confidence": 0.1}
-
-            # Filter and rank evidence
-            evidence_chunks = []
-            sources = []
-            confidence_scores = []
-
-            for result in search_results[:min_sources]:
-                if hasattr(result, "text") and hasattr(result, "metadata"):
-                    evidence_chunks.append(result.text)
-                    source = result.metadata.get("document_name", "Unknown source")
-                    sources.append(source)
-                    confidence_scores.append(getattr(result, "similarity", 0.5))
-
-            avg_confidence = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0.5
-
-            return {"chunks": evidence_chunks, "sources": sources, "confidence": avg_confidence}
-
         except Exception as e:
             logger.error(f"Evidence gathering failed: {e}")
+            all_results = [e] * len(queries)
+
+        seen: Set[str] = set()
+        return [self._select_evidence(results, min_sources, seen) for results in all_results]
+
+    def _select_evidence(self, search_results: Any, min_sources: int, seen: Set[str]) -> Dict[str, Any]:
+        """Keep the top ``min_sources`` results not already in ``seen`` (updated in place)."""
+        if isinstance(search_results, BaseException):
+            logger.error(f"Evidence gathering failed: {search_results}")
             return {"chunks": ["Evidence gathering failed due to search error"], "sources": [], "confidence": 0.1}
 
+        if not search_results:
+            return {"chunks": ["No relevant information found in knowledge base"], "sources": [], "confidence": 0.1}
+
+        # Filter and rank evidence
+        evidence_chunks = []
+        sources = []
+        confidence_scores = []
+
+        for result in search_results:
+            if len(evidence_chunks) >= min_sources:
+                break
+            if hasattr(result, "text") and hasattr(result, "metadata"):
+                key = self._chunk_key(result)
+                if key in seen:
+                    continue
+                seen.add(key)
+                evidence_chunks.append(result.text)
+                source = result.metadata.get("document_name", "Unknown source")
+                sources.append(source)
+                confidence_scores.append(getattr(result, "similarity", 0.5))
+
+        avg_confidence = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0.5
+
+        return {"chunks": evidence_chunks, "sources": sources, "confidence": avg_confidence}
+
+    @staticmethod
+    def _chunk_key(result: Any) -> str:
+        """Identity of a retrieved chunk: its id when the search result has one, else its text."""
+        chunk_id: Optional[Any] = result.metadata.get("chunk_id", getattr(result, "id", None))
+        if chunk_id is not None:
+            return f"id:{chunk_id}"
+        return "text:" + hashlib.sha1(result.text.encode("utf-8")).hexdigest()
+
     async def _perform_reasoning_steps(
         self,
         original_query: str,
@@ -0,0 +1,45 @@
+"""
+Ollama Client Calls
+
+The reasoning engine is handed either a blocking ``ollama.Client`` or an
+``ollama.AsyncClient``. Blocking calls have to run in a worker thread, and a
+thread cannot be cancelled: cancelling the awaiting task leaves the HTTP request
+open and Ollama keeps generating. ``async_client`` therefore pairs a blocking
+``ollama.Client`` with an ``ollama.AsyncClient`` for the same host, whose
+requests are closed when the task awaiting them is cancelled.
+"""
+
+import asyncio
+import inspect
+from typing import Any
+
+try:
+    import ollama
+except ImportError:  # pragma: no cover - optional dependency guard
+    ollama = None  # type: ignore
+
+
+def async_client(client: Any) -> Any:
+    """An Ollama client whose calls are coroutines, for the same host as ``client``.
+
+    Returns ``client`` unchanged when it is already asynchronous, or when it is not
+    an ``ollama.Client`` (its calls then run in a thread via ``call_client``).
+    """
+    if client is None or inspect.iscoroutinefunction(getattr(client, "generate", None)):
+        return client
+    if ollama is None or not isinstance(client, ollama.Client):
+        return client
+    http = getattr(client, "_client", None)
+    base_url = getattr(http, "base_url", None)
+    if not base_url:
+        return client
+    return ollama.AsyncClient(host=str(base_url), timeout=http.timeout, headers=dict(http.headers))
+
+
+async def call_client(client: Any, method: str, **kwargs) -> Any:
+    """Call ``client.<method>`` without blocking the event loop (sync clients run in a thread)."""
+    func = getattr(client, method)
+    if inspect.iscoroutinefunction(func):
+        return await func(**kwargs)
+    result = await asyncio.to_thread(func, **kwargs)
+    return await result if inspect.isawaitable(result) else result
@@ -24,6 +24,7 @@ from pydantic import BaseModel, Field
 
 from config import get_settings
 from utils.auth_system import AuthManager, get_auth_manager, get_current_user
+from utils.principal_cache import invalidate_principal
 from utils.rbac_models import User
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
@@ -187,6 +188,8 @@ async def update_user(
         if not cur.fetchone():
             raise HTTPException(status_code=404, detail="User not found")
         conn.commit()
+        # Status/role changes must apply to the user's next request on every worker
+        await invalidate_principal(user_id)
         # Return updated user
         cur.execute(
             """
@@ -267,6 +270,7 @@ async def delete_user(
         # Perform deletion
         cur.execute("DELETE FROM users WHERE id=%s", (user_id,))
         conn.commit()
+        await invalidate_principal(user_id)
         # Audit log (non-blocking best-effort)
         try:  # pragma: no cover - defensive
             await auth.log_audit_event(
@@ -31,6 +31,7 @@ import json
 from typing import Any, Dict, List, Optional
 
 from reranker.reranker_config import get_settings
+from utils.redis_cache import CounterBatch, get_async_redis_client, mark_async_redis_unavailable
 
 try:
     import redis
@@ -128,6 +129,18 @@ class AdvancedCache:
             logger.warning(f"Embedding cache retrieval error: {e}")
             return None
 
+    def has_embedding(self, query: str) -> bool:
+        """Check whether an embedding is cached without recording a hit or miss."""
+        if not self.enabled or not self.redis_client:
+            return False
+
+        try:
+            cache_key = f"{self.PREFIX_EMBEDDING}{self._hash_text(query)}"
+            return bool(self.redis_client.exists(cache_key))
+        except Exception as e:
+            logger.debug(f"Embedding cache lookup error: {e}")
+            return False
+
     def cache_embedding(self, query: str, embedding: List[float]) -> bool:
         """
         Cache embedding vector for query.
@@ -161,6 +174,45 @@ class AdvancedCache:
             logger.warning(f"Embedding cache storage error: {e}")
             return False
 
+    async def aget_embedding(self, query: str) -> Optional[List[float]]:
+        """Async variant of get_embedding() using the shared redis.asyncio pool."""
+        if not self.enabled:
+            return None
+
+        client = get_async_redis_client(self.redis_url)
+        if client is None:
+            return None
+
+        try:
+            cached_data = await client.get(f"{self.PREFIX_EMBEDDING}{self._hash_text(query)}")
+        except Exception as e:
+            logger.warning(f"Embedding cache retrieval error: {e}")
+            mark_async_redis_unavailable(self.redis_url)
+            return None
+
+        self._record_stat_in_background("embedding_hit" if cached_data else "embedding_miss")
+        return json.loads(cached_data) if cached_data else None
+
+    async def acache_embedding(self, query: str, embedding: List[float]) -> bool:
+        """Async variant of cache_embedding(); SETEX and the stat update share one pipeline."""
+        if not self.enabled:
+            return False
+
+        client = get_async_redis_client(self.redis_url)
+        if client is None:
+            return False
+
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.setex(f"{self.PREFIX_EMBEDDING}{self._hash_text(query)}", self.EMBEDDING_TTL, json.dumps(embedding))
+            pipe.hincrby(self.PREFIX_STATS, "embedding_cached", 1)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"Embedding cache storage error: {e}")
+            mark_async_redis_unavailable(self.redis_url)
+            return False
+
     # ========== INFERENCE CACHE ==========
 
     def get_inference(self, model: str, system_prompt: str, user_prompt: str) -> Optional[str]:
@@ -310,6 +362,12 @@ class AdvancedCache:
         except Exception as e:
             logger.debug(f"Stat recording error: {e}")
 
+    def _record_stat_in_background(self, stat_name: str) -> None:
+        """Record a statistic off the request path."""
+        counters = CounterBatch(self.redis_url)
+        counters.hincr(self.PREFIX_STATS, stat_name)
+        counters.flush_in_background()
+
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
         if not self.enabled or not self.redis_client:
@@ -3,6 +3,7 @@ Minimal Technical Service Assistant API
 Just the basic chat endpoints to get the frontend working.
 """
 
+import base64
 import hashlib
 import os
 import re
@@ -10,7 +11,8 @@ import sys
 import time
 from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Any, AsyncIterator, Dict, List, Optional, cast
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, cast
 
 import uvicorn
 
@@ -20,7 +22,8 @@ import asyncio
 import json
 import logging
 
-from fastapi import FastAPI, Header, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse, Response, StreamingResponse
 from prometheus_client.exposition import CONTENT_TYPE_LATEST, generate_latest
 from psycopg2.extras import RealDictCursor
@@ -35,9 +38,19 @@ logger = logging.getLogger(__name__)
 
 logger.info("Starting app.py execution")
 
+from reranker.batch_jobs import get_batch_job_manager
 from reranker.cache import get_db_connection
+from reranker.cache_warmer import get_cache_warmer
+from reranker.chat_persistence import QuestionUsageRecord, get_chat_persistence
+from reranker.context_packer import get_context_packer
+from reranker.conversation_affinity import get_conversation_affinity, stable_history_window
+from reranker.db_pool import close_db_pool
+from reranker.decomposition_runner import run_sub_requests
+from reranker.instance_health import get_health_monitor
 from reranker.jwt_auth import JWTAuthenticator
+from reranker.ollama_scheduler import Priority, get_ollama_scheduler, ollama_priority
 from reranker.question_decomposer import QuestionDecomposer
+from reranker.question_stats import load_question_detail, load_question_stats, partition_maintenance_loop
 from reranker.rag_chat import (
     BatchRAGChatRequest,
     BatchRAGChatResponse,
@@ -49,12 +62,11 @@ from reranker.rag_chat import (
 
 # Import auth endpoints
 from reranker.reranker_config import get_settings
-from reranker.rethink_reranker import rethink_pipeline
+from reranker.rethink_reranker import persist_in_background, rethink_in_memory
+from utils.principal_cache import get_principal_cache, listen_for_invalidations, token_key
 from utils.redis_cache import (
-    cache_decomposed_response,
-    cache_sub_request_result,
+    close_async_redis_pools,
     get_decomposed_response,
-    get_sub_request_result,
 )
 
 try:
@@ -122,17 +134,59 @@ if ENABLE_A2A_AGENT:
             a2a_service = None
 
 
+cache_warmer = get_cache_warmer(rag_service)
+batch_job_manager = get_batch_job_manager(rag_service)
+chat_persistence = get_chat_persistence()
+
+
+async def _load_tokenizers() -> None:
+    try:
+        methods = await asyncio.to_thread(get_context_packer().counter.load)
+        logger.info(f"Context packing token counters loaded: {methods}")
+    except Exception as exc:
+        logger.warning(f"Tokenizer preload failed; counting falls back per request: {exc}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     if _HAS_PYDANTIC_AGENT:
         initialize_pydantic_agent(rag_service)
     if a2a_service is not None:
         await a2a_service.startup()
+    warmup_task = None
+    if app_settings.cache_warmup_enabled:
+        warmup_task = asyncio.create_task(cache_warmer.run_background())
+    # Single owner of Ollama probing (health, circuit breakers, model inventory/residency)
+    health_task = asyncio.create_task(get_health_monitor().run())
+    # Resume batch jobs interrupted by a restart (and later, those orphaned by other workers)
+    batch_task = None
+    if app_settings.batch_jobs_enabled:
+        batch_task = asyncio.create_task(batch_job_manager.run_background())
+    # Write-behind for chat messages and question analytics
+    chat_persistence.start()
+    # Drop cached principals when another worker publishes a user change
+    principal_task = asyncio.create_task(listen_for_invalidations())
+    # Monthly question_usage partitions: create ahead, drop past the retention window
+    partition_task = asyncio.create_task(partition_maintenance_loop(app_settings))
+    # Tokenizers and the tiktoken encoding are file reads (or a download); keep them off the event loop
+    tokenizer_task = asyncio.create_task(_load_tokenizers())
     try:
         yield
     finally:
+        if warmup_task is not None:
+            warmup_task.cancel()
+        health_task.cancel()
+        if batch_task is not None:
+            batch_task.cancel()
+        principal_task.cancel()
+        partition_task.cancel()
+        tokenizer_task.cancel()
         if a2a_service is not None:
             await a2a_service.shutdown()
+        # Flush queued chat records while the DB pool is still open
+        await chat_persistence.close(timeout=app_settings.chat_write_behind_shutdown_timeout_seconds)
+        await close_async_redis_pools()
+        await close_db_pool()
 
 
 app = FastAPI(
@@ -161,6 +215,50 @@ async def _token_stream_chunks(text: str) -> AsyncIterator[str]:
             await asyncio.sleep(0)
 
 
+def _rag_citations(context_metadata: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Citation entries stored with an assistant message for the top retrieved chunks."""
+    citations = []
+    for index, metadata in enumerate(context_metadata[:3]):
+        content = metadata.get("content", "") or ""
+        citations.append(
+            {
+                "title": metadata.get("file_name", f"RAG Context {index + 1}"),
+                "content": content[:200] + "..." if len(content) > 200 else content,
+                "source": metadata.get("document_type", "unknown"),
+                "score": 1.0 - metadata.get("distance", 0.0),  # Convert distance to score
+            }
+        )
+    return citations
+
+
+class _StreamedAnswer:
+    """Accumulates the answer text and sources from proxied SSE events."""
+
+    def __init__(self) -> None:
+        self._tokens: List[str] = []
+        self.sources: Optional[List[Dict[str, Any]]] = None
+
+    def feed(self, chunk: Any) -> None:
+        text = chunk.decode("utf-8", errors="replace") if isinstance(chunk, (bytes, bytearray)) else str(chunk)
+        for line in text.splitlines():
+            if not line.startswith("data: "):
+                continue
+            try:
+                event = json.loads(line[len("data: ") :])
+            except ValueError:
+                continue
+            if not isinstance(event, dict):
+                continue
+            if event.get("type") == "token":
+                self._tokens.append(str(event.get("token", "")))
+            elif event.get("type") == "sources" and isinstance(event.get("sources"), list):
+                self.sources = _rag_citations(event["sources"])
+
+    @property
+    def text(self) -> str:
+        return "".join(self._tokens)
+
+
 # Test question endpoint
 @app.get("/api/admin/question-stats-test")
 def test_question_stats():
@@ -218,8 +316,10 @@ class ConversationDetail(BaseModel):
 
 class ConversationListResponse(BaseModel):
     conversations: List[ConversationSummary]
-    total: int
+    total: Optional[int] = None
+    totalIsApproximate: bool = False
     hasMore: bool
+    nextCursor: Optional[str] = None
 
 
 class UserResponse(BaseModel):
@@ -292,57 +392,22 @@ def _track_question_usage(
     citations_count: int,
     context_length: int,
 ):
-    """Track question usage in database."""
+    """Queue question usage analytics for the write-behind flush."""
     try:
-        question_hash = _hash_question(question_text)
-        category = _categorize_question(question_text)
-
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Insert or get question pattern
-        cursor.execute(
-            """
-            INSERT INTO question_patterns (question_hash, canonical_question, category)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (question_hash) DO UPDATE SET
-                canonical_question = EXCLUDED.canonical_question,
-                category = EXCLUDED.category
-            RETURNING id
-        """,
-            [question_hash, question_text[:500], category],
-        )
-
-        pattern_result = cursor.fetchone()
-        pattern_id = pattern_result[0] if pattern_result else None
-
-        if pattern_id:
-            # Insert usage record
-            cursor.execute(
-                """
-                INSERT INTO question_usage (
-                    question_pattern_id, user_id, conversation_id, question_text,
-                    response_time_ms, response_quality_score, context_length,
-                    search_method, citations_count
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-                [
-                    pattern_id,
-                    user_id,
-                    conversation_id,
-                    question_text,
-                    response_time_ms,
-                    quality_score,
-                    context_length,
-                    search_method,
-                    citations_count,
-                ],
+        chat_persistence.enqueue(
+            QuestionUsageRecord(
+                question_hash=_hash_question(question_text),
+                category=_categorize_question(question_text),
+                question_text=question_text,
+                user_id=user_id,
+                conversation_id=conversation_id,
+                response_time_ms=response_time_ms,
+                quality_score=quality_score,
+                search_method=search_method,
+                citations_count=citations_count,
+                context_length=context_length,
             )
-
-        conn.commit()
-        cursor.close()
-        conn.close()
-
+        )
     except Exception as e:
         logger.error(f"Failed to track question usage: {e}")
 
@@ -377,6 +442,12 @@ def _user_from_authorization(authorization: Optional[str]) -> UserResponse:
     if not user_id or not email:
         raise HTTPException(status_code=401, detail="Invalid token payload")
 
+    principal_cache = get_principal_cache()
+    cache_key = token_key(token, payload)
+    cached_user = principal_cache.get(user_id, cache_key, "user_response")
+    if cached_user is not None and cached_user.email == email:
+        return cached_user
+
     try:
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
@@ -393,7 +464,7 @@ def _user_from_authorization(authorization: Optional[str]) -> UserResponse:
 
     created_at_value = user_row.get("created_at")
     updated_at_value = user_row.get("updated_at")
-    return UserResponse(
+    user = UserResponse(
         id=user_row["id"],
         email=user_row["email"],
         first_name=user_row.get("first_name"),
@@ -412,6 +483,8 @@ def _user_from_authorization(authorization: Optional[str]) -> UserResponse:
         created_at=_serialize_timestamp(created_at_value, "2024-01-01T00:00:00Z") or "2024-01-01T00:00:00Z",
         updated_at=_serialize_timestamp(updated_at_value, "2024-01-01T00:00:00Z") or "2024-01-01T00:00:00Z",
     )
+    principal_cache.set(user_id, cache_key, "user_response", user)
+    return user
 
 
 @app.post("/api/chat")
@@ -424,6 +497,9 @@ async def chat_endpoint(request: ChatRequest, authorization: Optional[str] = Hea
     user = _user_from_authorization(authorization)
     logger.info(f"User ID: {user.id}, email: {user.email}, type: {type(user.id)}")
 
+    # Reject up front (429) rather than mid-stream when interactive capacity is exhausted
+    get_ollama_scheduler().check_admission(Priority.INTERACTIVE)
+
     conversation_id = request.conversationId
     is_new_conversation = False
 
@@ -431,6 +507,7 @@ async def chat_endpoint(request: ChatRequest, authorization: Optional[str] = Hea
     if not title_source:
         title_source = "New conversation"
     conversation_title = title_source if len(title_source) <= 50 else f"{title_source[:50]}..."
+    history: List[Dict[str, str]] = []
 
     if conversation_id is None:
         conn = get_db_connection()
@@ -450,33 +527,49 @@ async def chat_endpoint(request: ChatRequest, authorization: Optional[str] = Hea
             cursor.close()
             conn.close()
     else:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        try:
-            cursor.execute(
-                "SELECT id FROM conversations WHERE id = %s AND user_id = %s",
-                [conversation_id, user.id],
-            )
-            existing = cursor.fetchone()
-        finally:
-            cursor.close()
-            conn.close()
-        if not existing:
+
+        history_limit = 2 * max(0, getattr(app_settings, "conversation_history_turns", 4))
+
+        def load_conversation() -> List[Any]:
+            # Ownership check and the most recent turns in one round trip (no rows: not found / not owned);
+            # the window count is the conversation's full length, taken before the LIMIT
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    """
+                    SELECT m.role, m.content, m.created_at, count(m.id) OVER () AS total
+                    FROM conversations c
+                    LEFT JOIN messages m ON m.conversation_id = c.id AND m.role IN ('user', 'assistant')
+                    WHERE c.id = %s AND c.user_id = %s
+                    ORDER BY m.created_at DESC NULLS LAST, m.id DESC
+                    LIMIT %s
+                    """,
+                    [conversation_id, user.id, max(1, history_limit)],
+                )
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+                conn.close()
+
+        pending = chat_persistence.pending_messages(conversation_id)
+        rows = await asyncio.to_thread(load_conversation)
+        if not rows:
             raise HTTPException(status_code=404, detail="Conversation not found")
+        rows = [row for row in reversed(rows) if row[0] is not None]
+        persisted = {(row[0], row[2]) for row in rows}
+        history = [{"role": row[0], "content": row[1]} for row in rows]
+        # Turns still in the write-behind queue (skipping any that landed while we read)
+        queued = [{"role": m.role, "content": m.content} for m in pending if (m.role, m.created_at) not in persisted]
+        history.extend(queued)
+        total_messages = (rows[0][3] if rows else 0) + len(queued)
+        history = stable_history_window(history, history_limit // 2, total_messages=total_messages)
 
     if conversation_id is None:
         raise HTTPException(status_code=500, detail="Conversation setup failed")
 
-    # Get conversation context length for tracking
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT COUNT(*) as message_count FROM messages WHERE conversation_id = %s", [conversation_id])
-        context_result = cursor.fetchone()
-        context_length = context_result[0] if context_result else 0
-    finally:
-        cursor.close()
-        conn.close()
+    # Conversation context length for tracking
+    context_length = len(history)
 
     async def generate():
         try:
@@ -485,21 +578,7 @@ async def chat_endpoint(request: ChatRequest, authorization: Optional[str] = Hea
             if is_new_conversation:
                 yield f"data: {json.dumps({'type': 'conversation_id', 'conversationId': conversation_id})}\n\n"
 
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            try:
-                cursor.execute(
-                    "INSERT INTO messages (conversation_id, role, content) VALUES (%s, %s, %s)",
-                    [conversation_id, "user", request.message],
-                )
-                cursor.execute(
-                    "UPDATE conversations SET updated_at = NOW() WHERE id = %s",
-                    [conversation_id],
-                )
-                conn.commit()
-            finally:
-                cursor.close()
-                conn.close()
+            chat_persistence.add_message(conversation_id, "user", request.message)
 
             # Ensure rag_response is always defined to avoid "possibly unbound" warnings
             rag_response = RAGChatResponse(
@@ -540,14 +619,8 @@ async def chat_endpoint(request: ChatRequest, authorization: Optional[str] = Hea
                     decomposer = QuestionDecomposer()
                     decomposition = decomposer.decompose_question(request.message, user.id)
 
-                    # Cache decomposition metadata so rethink pipeline can read it
-                    try:
-                        cache_decomposed_response(decomposition.query_hash, user.id, decomposition.to_dict())
-                    except Exception:
-                        logger.debug("Failed to cache decomposition metadata (continuing)")
-
                     # If a synthesized final response already exists in cache, return it
-                    cached_final = get_decomposed_response(decomposition.query_hash, user.id)
+                    cached_final = await asyncio.to_thread(get_decomposed_response, decomposition.query_hash, user.id)
                     if cached_final and isinstance(cached_final, dict) and cached_final.get("synthesized"):
                         # Use cached synthesized text as the response
                         resp_text = cached_final.get("synthesized", {}).get("synthesized_text") or cached_final.get(
@@ -564,64 +637,31 @@ async def chat_endpoint(request: ChatRequest, authorization: Optional[str] = Hea
                             context_retrieved=False,
                         )
                     else:
-                        # Process each sub-request (use cache when available)
-                        sub_results = []
-                        for sr in decomposition.sub_requests:
-                            # Try to reuse cached sub-response
-                            cached_sub = get_sub_request_result(sr.id)
-                            if cached_sub:
-                                sub_results.append(cached_sub)
-                                continue
-
-                            # Not cached: generate via rag_service using selected model
-                            model_to_use = decomposer.select_model_for_complexity(sr.complexity)
-                            rag_req = RAGChatRequest(
-                                query=sr.sub_query,
-                                use_context=True,
-                                max_context_chunks=5,
-                                model=model_to_use,
-                                temperature=0.2,
-                                max_tokens=300,
-                                stream=False,
-                            )
-                            try:
-                                sub_resp = cast(RAGChatResponse, await rag_service.chat(rag_req))
-                                sub_data = {
-                                    "id": sr.id,
-                                    "sub_query": sr.sub_query,
-                                    "response": sub_resp.response,
-                                    "model": sub_resp.model,
-                                    "time_ms": 0,
-                                    "confidence": 1.0,
-                                }
-                                cache_sub_request_result(sr.id, sub_data)
-                                sub_results.append(sub_data)
-                            except Exception as exc:  # pragma: no cover - tolerate generation errors per-sub
-                                logger.exception("Sub-request generation failed: %s", exc)
-                                sub_results.append(
-                                    {
-                                        "id": sr.id,
-                                        "sub_query": sr.sub_query,
-                                        "response": "",
-                                        "model": model_to_use,
-                                        "time_ms": 0,
-                                        "confidence": 0.0,
-                                    }
-                                )
-
-                        # At this point, ensure sub-results are cached; aggregate and rerank
-                        final_result = rethink_pipeline(decomposition.query_hash, user.id, request.message)
-
-                        # Cache final synthesized result (ttl default)
-                        try:
-                            cache_decomposed_response(decomposition.query_hash, user.id, final_result)
-                        except Exception:
-                            logger.debug("Failed to cache final synthesized result (continuing)")
+                        # Answer sub-requests concurrently, streaming each sub-answer as it completes
+                        total_parts = len(decomposition.sub_requests)
+                        ordered_results: List[Optional[Dict[str, Any]]] = [None] * total_parts
+                        async for index, sub_data in run_sub_requests(
+                            rag_service, decomposer, decomposition.sub_requests
+                        ):
+                            ordered_results[index] = sub_data
+                            sub_event = {
+                                "type": "sub_answer",
+                                "index": index,
+                                "total": total_parts,
+                                "sub_query": sub_data.get("sub_query", ""),
+                                "response": sub_data.get("response", ""),
+                                "model": sub_data.get("model"),
+                            }
+                            yield f"data: {json.dumps(sub_event)}\n\n"
+                        sub_results = [result for result in ordered_results if result is not None]
+
+                        # Rerank and synthesize from the in-memory results (no Redis I/O)
+                        final_result = rethink_in_memory(request.message, decomposition.to_dict(), sub_results)
 
                         synthesized = final_result.get("synthesized", {})
                         resp_text = synthesized.get("synthesized_text") if isinstance(synthesized, dict) else ""
 
-                        # Fallback: if rethink_pipeline returned an error or no synthesized text,
+                        # Fallback: if the rethink synthesis produced no text,
                         # synthesize directly from sub_results we just computed.
                         if (not resp_text) and sub_results:
                             try:
@@ -639,13 +679,15 @@ async def chat_endpoint(request: ChatRequest, authorization: Optional[str] = Hea
                                     "synthesized": {"synthesized_text": resp_text, "components": sub_results},
                                     "final_relevance": 0.0,
                                 }
-                                try:
-                                    cache_decomposed_response(decomposition.query_hash, user.id, final_result)
-                                except Exception:
-                                    pass
                             except Exception:
                                 resp_text = resp_text or ""
 
+                        # Cache the final synthesized result off the response path (ttl default)
+                        try:
+                            persist_in_background(decomposition.query_hash, user.id, final_result)
+                        except Exception:
+                            logger.debug("Failed to schedule caching of final synthesized result (continuing)")
+
                         rag_response = RAGChatResponse(
                             response=resp_text or "",
                             context_used=[],
@@ -668,15 +710,24 @@ async def chat_endpoint(request: ChatRequest, authorization: Optional[str] = Hea
                         temperature=0.2,
                         max_tokens=500,
                         stream=True,  # Enable streaming for token-by-token generation
+                        conversation_id=str(conversation_id),
+                        history=history,
                     )
                     # For streaming requests, rag_service.chat returns a StreamingResponse
                     rag_response_result = await rag_service.chat(rag_request)
                     
                     # If it's a StreamingResponse, extract its body_iterator and stream it
                     if isinstance(rag_response_result, StreamingResponse):
-                        # Proxy the streaming response directly through our generator
+                        # Proxy the streaming response directly through our generator, keeping the
+                        # answer so the assistant turn is persisted once the stream finishes
+                        streamed = _StreamedAnswer()
                         async for line in rag_response_result.body_iterator:
+                            streamed.feed(line)
                             yield line
+                        if streamed.text:
+                            chat_persistence.add_message(
+                                conversation_id, "assistant", streamed.text, citations=streamed.sources
+                            )
                         return
                     
                     # Otherwise, handle as regular RAGChatResponse (shouldn't reach here with stream=True)
@@ -706,20 +757,7 @@ async def chat_endpoint(request: ChatRequest, authorization: Optional[str] = Hea
                 citations_count = len(rag_response.web_sources)
             elif rag_response.context_metadata:
                 search_method = "rag"
-                for index, metadata in enumerate(rag_response.context_metadata[:3]):
-                    content = (
-                        metadata.get("content", "")[:200] + "..."
-                        if len(metadata.get("content", "")) > 200
-                        else metadata.get("content", "")
-                    )
-                    sources_data.append(
-                        {
-                            "title": metadata.get("file_name", f"RAG Context {index + 1}"),
-                            "content": content,
-                            "source": metadata.get("document_type", "unknown"),
-                            "score": 1.0 - metadata.get("distance", 0.0),  # Convert distance to score
-                        }
-                    )
+                sources_data = _rag_citations(rag_response.context_metadata)
                 citations_count = len(rag_response.context_metadata)
 
             # Calculate quality score based on citations and response length
@@ -737,21 +775,7 @@ async def chat_endpoint(request: ChatRequest, authorization: Optional[str] = Hea
                 context_length=context_length,
             )
 
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            try:
-                cursor.execute(
-                    "INSERT INTO messages (conversation_id, role, content, citations) VALUES (%s, %s, %s, %s)",
-                    [conversation_id, "assistant", rag_response.response, json.dumps(sources_data)],
-                )
-                cursor.execute(
-                    "UPDATE conversations SET updated_at = NOW() WHERE id = %s",
-                    [conversation_id],
-                )
-                conn.commit()
-            finally:
-                cursor.close()
-                conn.close()
+            chat_persistence.add_message(conversation_id, "assistant", rag_response.response, citations=sources_data)
 
             response_text = rag_response.response
             async for chunk in _token_stream_chunks(response_text):
@@ -779,6 +803,7 @@ async def batch_chat(request: BatchRAGChatRequest, authorization: Optional[str]
         raise HTTPException(status_code=401, detail="Authentication required")
 
     logger.info(f"Batch chat request: {len(request.queries)} queries, max_concurrent={request.max_concurrent}")
+    get_ollama_scheduler().check_admission(Priority.BATCH)
 
     try:
         result = await rag_service.batch_chat(request)
@@ -791,16 +816,123 @@ async def batch_chat(request: BatchRAGChatRequest, authorization: Optional[str]
         raise HTTPException(status_code=500, detail=f"Batch processing failed: {str(e)}")
 
 
+@app.post("/api/batch-jobs", status_code=202)
+async def submit_batch_job(request: BatchRAGChatRequest, authorization: Optional[str] = Header(None)):
+    """Submit a batch as a background job; results are persisted per item and polled or streamed."""
+    user = _user_from_authorization(authorization)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    if not app_settings.batch_jobs_enabled:
+        raise HTTPException(status_code=503, detail="Batch jobs are disabled")
+
+    get_ollama_scheduler().check_admission(Priority.BATCH)
+    try:
+        job_id = await batch_job_manager.submit(user.id, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"job_id": job_id, "status": "queued", "total_items": len(request.queries)}
+
+
+@app.get("/api/batch-jobs/{job_id}")
+async def get_batch_job(job_id: str, authorization: Optional[str] = Header(None)):
+    """Job status and progress counters."""
+    user = _user_from_authorization(authorization)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    job = await batch_job_manager.store.get_job(job_id, user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
+
+
+@app.get("/api/batch-jobs/{job_id}/results")
+async def get_batch_job_results(
+    job_id: str, offset: int = 0, limit: int = 100, authorization: Optional[str] = Header(None)
+):
+    """Finished items of a job in completion order (paged)."""
+    user = _user_from_authorization(authorization)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    if await batch_job_manager.store.get_job(job_id, user.id) is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    items = await batch_job_manager.store.get_items(job_id, max(0, offset), max(1, min(limit, 1000)))
+    return {"job_id": job_id, "offset": offset, "items": items}
+
+
+@app.get("/api/batch-jobs/{job_id}/events")
+async def stream_batch_job(job_id: str, authorization: Optional[str] = Header(None)):
+    """Server-sent events: each finished item, then a progress snapshot, until the job ends."""
+    user = _user_from_authorization(authorization)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    if await batch_job_manager.store.get_job(job_id, user.id) is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+
+    async def events():
+        async for event in batch_job_manager.progress_events(job_id, user.id):
+            yield f"data: {json.dumps(event, default=str)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/api/batch-jobs/{job_id}/cancel")
+async def cancel_batch_job(job_id: str, authorization: Optional[str] = Header(None)):
+    """Cancel a queued or running job; items already finished keep their results."""
+    user = _user_from_authorization(authorization)
+    if not user:
+        raise HTTPException(status_code=401, detail="Authentication required")
+    if not await batch_job_manager.store.cancel(job_id, user.id):
+        raise HTTPException(status_code=404, detail="No queued or running batch job with that id")
+    return {"job_id": job_id, "status": "cancelled"}
+
+
 # Conversation management endpoints
 MAX_CONVERSATIONS_PER_USER = 30
 RECENT_CONVERSATION_INTERVAL = "30 days"
+# include_total counts at most this many conversations; beyond it the total is reported as approximate
+CONVERSATION_TOTAL_CAP = 1000
+
+
+def _encode_page_cursor(*values: Any) -> str:
+    """Opaque keyset cursor holding the sort values of the row a page ended on."""
+    raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else v for v in values]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_page_cursor(cursor: str) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _decode_conversation_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        value, conversation_id = _decode_page_cursor(cursor)
+        return datetime.fromisoformat(value), int(conversation_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @app.get("/api/conversations", response_model=ConversationListResponse)
 def list_conversations(
-    limit: int = MAX_CONVERSATIONS_PER_USER, offset: int = 0, authorization: Optional[str] = Header(None)
+    limit: int = MAX_CONVERSATIONS_PER_USER,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    authorization: Optional[str] = Header(None),
 ):
-    """List conversations for the authenticated user."""
+    """List conversations for the authenticated user, most recently active first.
+
+    Pages are read from the ``(user_id, last_activity DESC, id DESC)`` index, so
+    the cost does not depend on how many messages the conversations hold. Pass
+    the returned ``nextCursor`` back as ``cursor`` for the next page; ``offset``
+    still works but scans the skipped rows. ``include_total`` adds a total
+    capped at ``CONVERSATION_TOTAL_CAP``.
+    """
     # Basic auth check
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Unauthorized")
@@ -817,63 +949,55 @@ def list_conversations(
 
     effective_limit = max(1, min(requested_limit, MAX_CONVERSATIONS_PER_USER))
     effective_offset = max(0, requested_offset)
+    after = _decode_conversation_cursor(cursor) if cursor else None
 
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        db_cursor = conn.cursor(cursor_factory=RealDictCursor)
 
         try:
-            count_query = """
-                WITH conversation_activity AS (
-                    SELECT
-                        c.id,
-                        COALESCE(MAX(m.created_at), c.updated_at, c.created_at) AS last_activity
-                    FROM conversations c
-                    LEFT JOIN messages m ON c.id = m.conversation_id
-                    WHERE c.user_id = %s
-                    GROUP BY c.id, c.updated_at, c.created_at
-                )
-                SELECT COUNT(*) AS total
-                FROM conversation_activity
-                WHERE last_activity >= NOW() - INTERVAL %s
-            """
-            cursor.execute(count_query, [user.id, RECENT_CONVERSATION_INTERVAL])
-            count_result = cursor.fetchone()
-            total = int(count_result["total"]) if count_result and count_result.get("total") is not None else 0
-
-            conversations_query = """
-                WITH conversation_activity AS (
-                    SELECT
-                        c.id,
-                        c.title,
-                        c.created_at,
-                        c.updated_at,
-                        COALESCE(MAX(m.created_at), c.updated_at, c.created_at) AS last_activity
-                    FROM conversations c
-                    LEFT JOIN messages m ON c.id = m.conversation_id
-                    WHERE c.user_id = %s
-                    GROUP BY c.id, c.title, c.created_at, c.updated_at
-                )
-                SELECT
-                    id,
-                    title,
-                    created_at,
-                    updated_at,
-                    last_activity
-                FROM conversation_activity
-                WHERE last_activity >= NOW() - INTERVAL %s
-                ORDER BY last_activity DESC
+            params: List[Any] = [user.id, RECENT_CONVERSATION_INTERVAL]
+            keyset_clause = ""
+            if after is not None:
+                keyset_clause = "AND (last_activity, id) < (%s, %s)"
+                params.extend(after)
+            # One extra row tells whether another page exists
+            params.extend([effective_limit + 1, effective_offset])
+            db_cursor.execute(
+                f"""
+                SELECT id, title, created_at, updated_at, last_activity
+                FROM conversations
+                WHERE user_id = %s
+                  AND last_activity >= NOW() - INTERVAL %s
+                  {keyset_clause}
+                ORDER BY last_activity DESC, id DESC
                 LIMIT %s OFFSET %s
-            """
-            cursor.execute(
-                conversations_query,
-                [user.id, RECENT_CONVERSATION_INTERVAL, effective_limit, effective_offset],
+                """,
+                params,
             )
-            conversations_data = cursor.fetchall()
+            conversations_data = db_cursor.fetchall()
+
+            total = None
+            if include_total:
+                db_cursor.execute(
+                    """
+                    SELECT COUNT(*) AS total FROM (
+                        SELECT 1 FROM conversations
+                        WHERE user_id = %s AND last_activity >= NOW() - INTERVAL %s
+                        LIMIT %s
+                    ) capped
+                    """,
+                    [user.id, RECENT_CONVERSATION_INTERVAL, CONVERSATION_TOTAL_CAP],
+                )
+                count_result = db_cursor.fetchone()
+                total = int(count_result["total"]) if count_result and count_result.get("total") is not None else 0
         finally:
-            cursor.close()
+            db_cursor.close()
             conn.close()
 
+        has_more = len(conversations_data) > effective_limit
+        conversations_data = conversations_data[:effective_limit]
+
         conversations = []
         for conv in conversations_data:
             created_at_value = conv.get("created_at")
@@ -893,9 +1017,18 @@ def list_conversations(
                 )
             )
 
-        has_more = (effective_offset + len(conversations)) < total
-
-        return ConversationListResponse(conversations=conversations, total=total, hasMore=has_more)
+        next_cursor = None
+        if has_more and conversations_data:
+            last = conversations_data[-1]
+            next_cursor = _encode_page_cursor(last.get("last_activity"), last["id"])
+
+        return ConversationListResponse(
+            conversations=conversations,
+            total=total,
+            totalIsApproximate=total is not None and total >= CONVERSATION_TOTAL_CAP,
+            hasMore=has_more,
+            nextCursor=next_cursor,
+        )
 
     except Exception as e:
         logger.error(f"Error listing conversations: {e}")
@@ -1140,6 +1273,9 @@ async def load_balancer_stats(authorization: Optional[str] = Header(None)):
                 "healthy_instances": healthy_count,
                 "total_instances": len(metrics),
             },
+            "scheduler": get_ollama_scheduler().get_status(),
+            "affinity": get_conversation_affinity().get_status(),
+            "chat_write_behind": chat_persistence.get_status(),
             "timestamp": datetime.utcnow().isoformat(),
         }
     except Exception as e:
@@ -1172,6 +1308,42 @@ async def advanced_cache_stats(authorization: Optional[str] = Header(None)):
         }
 
 
+@app.get("/api/admin/cache-warmup")
+async def cache_warmup_status(authorization: Optional[str] = Header(None)):
+    """Get progress of the current/last cache warm-up run and the observed hit-rate uplift."""
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    user = _user_from_authorization(authorization)
+    if user.role_name != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return {
+        "success": True,
+        "warmup": cache_warmer.get_status(),
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
+@app.post("/api/admin/cache-warmup")
+async def trigger_cache_warmup(authorization: Optional[str] = Header(None)):
+    """Start a cache warm-up run over the most frequent questions."""
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    user = _user_from_authorization(authorization)
+    if user.role_name != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    started = cache_warmer.trigger("manual")
+    return {
+        "success": True,
+        "started": started,
+        "message": "Cache warm-up started" if started else "Cache warm-up already running",
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+
 async def optimization_stats(authorization: Optional[str] = Header(None)):
     """Get query optimization cache statistics for monitoring."""
     from reranker.query_optimizer import get_optimization_stats
@@ -1498,15 +1670,18 @@ class DocumentInfo(BaseModel):
 
 class DocumentListResponse(BaseModel):
     documents: List[DocumentInfo]
-    total_count: int
+    total_count: Optional[int] = None
     offset: int
     limit: int
     has_more: bool
+    next_cursor: Optional[str] = None
 
 
 class DocumentListRequest(BaseModel):
     limit: int = Field(20, ge=1, le=100)
     offset: int = Field(0, ge=0)
+    cursor: Optional[str] = Field(None, description="next_cursor of the previous page (same sort); replaces offset")
+    include_total: bool = Field(True, description="Also count all matching documents")
     search_term: Optional[str] = None
     document_type: Optional[str] = None
     product_name: Optional[str] = None
@@ -1515,53 +1690,86 @@ class DocumentListRequest(BaseModel):
     sort_order: str = Field("desc", description="Sort order: asc or desc")
 
 
+# Sort expressions of /api/documents/list; each has a matching partial index (see init.sql).
+# Unprocessed timestamps fall back to created_at so keyset comparisons never meet NULL.
+DOCUMENT_SORT_KEYS = {
+    "created_at": "d.created_at",
+    "processed_at": "COALESCE(d.processed_at, d.created_at)",
+    "file_name": "d.file_name",
+    "chunk_count": "d.chunk_count",
+}
+
+
+def _document_cursor_value(sort_field: str, value: Any) -> Any:
+    if sort_field in ("created_at", "processed_at"):
+        return datetime.fromisoformat(value)
+    if sort_field == "chunk_count":
+        return int(value)
+    return str(value)
+
+
 @app.post("/api/documents/list", response_model=DocumentListResponse)
-def list_documents(request: DocumentListRequest):
-    """List documents in the knowledge base."""
+async def list_documents(request: DocumentListRequest):
+    """List documents in the knowledge base.
+
+    ``chunk_count`` is stored on ``documents`` (kept current by triggers on
+    ``document_chunks``), the search filter uses trigram indexes and every sort
+    has a matching index, so a page never touches the chunks table. Pass
+    ``next_cursor`` back as ``cursor`` for keyset paging.
+    """
+    sort_field = request.sort_by if request.sort_by in DOCUMENT_SORT_KEYS else "created_at"
+    sort_order = "ASC" if request.sort_order.lower() == "asc" else "DESC"
+    sort_key = DOCUMENT_SORT_KEYS[sort_field]
+
+    after = None
+    if request.cursor:
+        values = _decode_page_cursor(request.cursor)
+        try:
+            cursor_field, cursor_order, value, document_id = values
+            if (cursor_field, cursor_order) != (sort_field, sort_order):
+                raise ValueError("cursor belongs to a different sort")
+            after = (_document_cursor_value(sort_field, value), int(document_id))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        from reranker.db_pool import fetch, fetchval
 
-        # Build query with filters
+        # Build query with filters (asyncpg placeholders)
         where_conditions = ["d.processing_status = 'processed'"]
-        params = []
+        params: List[Any] = []
+
+        def param(value: Any) -> str:
+            params.append(value)
+            return f"${len(params)}"
 
         if request.document_type:
-            where_conditions.append("d.document_type = %s")
-            params.append(request.document_type)
+            where_conditions.append(f"d.document_type = {param(request.document_type)}")
 
         if request.product_name:
-            where_conditions.append("d.product_name = %s")
-            params.append(request.product_name)
+            where_conditions.append(f"d.product_name = {param(request.product_name)}")
 
         if request.privacy_level:
-            where_conditions.append("d.privacy_level = %s")
-            params.append(request.privacy_level)
+            where_conditions.append(f"d.privacy_level = {param(request.privacy_level)}")
 
         if request.search_term:
-            where_conditions.append("(d.file_name ILIKE %s OR d.title ILIKE %s)")
-            search_pattern = f"%{request.search_term}%"
-            params.extend([search_pattern, search_pattern])
+            search_pattern = param(f"%{request.search_term}%")
+            where_conditions.append(f"(d.file_name ILIKE {search_pattern} OR d.title ILIKE {search_pattern})")
 
         where_clause = " AND ".join(where_conditions)
 
-        # Get total count
-        count_query = f"""
-            SELECT COUNT(*) as total
-            FROM documents d
-            WHERE {where_clause}
-        """
-        cursor.execute(count_query, params)
-        count_result = cursor.fetchone()
-        total_count = count_result["total"] if count_result else 0
+        total_count = None
+        if request.include_total:
+            total_count = await fetchval(f"SELECT COUNT(*) FROM documents d WHERE {where_clause}", *params)
 
-        # Validate sort parameters
-        valid_sort_fields = {"created_at", "file_name", "chunk_count", "processed_at"}
-        sort_field = request.sort_by if request.sort_by in valid_sort_fields else "created_at"
-        sort_order = "ASC" if request.sort_order.lower() == "asc" else "DESC"
+        if after is not None:
+            comparison = ">" if sort_order == "ASC" else "<"
+            where_clause += f" AND ({sort_key}, d.id) {comparison} ({param(after[0])}, {param(after[1])})"
+        offset = 0 if after is not None else request.offset
 
-        # Get documents with chunk counts
-        documents_query = f"""
+        # One extra row tells whether another page exists
+        rows = await fetch(
+            f"""
             SELECT
                 d.id,
                 d.file_name,
@@ -1573,23 +1781,20 @@ def list_documents(request: DocumentListRequest):
                 d.file_size,
                 d.processed_at,
                 d.created_at,
-                COALESCE(chunk_counts.chunk_count, 0) as chunk_count
+                d.chunk_count,
+                {sort_key} AS sort_value
             FROM documents d
-            LEFT JOIN (
-                SELECT document_id, COUNT(*) as chunk_count
-                FROM document_chunks
-                GROUP BY document_id
-            ) chunk_counts ON d.id = chunk_counts.document_id
             WHERE {where_clause}
-            ORDER BY d.{sort_field} {sort_order}
-            LIMIT %s OFFSET %s
-        """
-
-        query_params = params + [request.limit, request.offset]
-        cursor.execute(documents_query, query_params)
+            ORDER BY {sort_key} {sort_order}, d.id {sort_order}
+            LIMIT {param(request.limit + 1)} OFFSET {param(offset)}
+            """,
+            *params,
+        )
+        has_more = len(rows) > request.limit
+        rows = rows[: request.limit]
 
         documents = []
-        for row in cursor.fetchall():
+        for row in rows:
             documents.append(
                 DocumentInfo(
                     id=row["id"],
@@ -1600,19 +1805,24 @@ def list_documents(request: DocumentListRequest):
                     product_version=row["product_version"],
                     privacy_level=row["privacy_level"] or "public",
                     file_size=row["file_size"],
-                    chunk_count=row["chunk_count"],
+                    chunk_count=row["chunk_count"] or 0,
                     processed_at=row["processed_at"].isoformat() if row["processed_at"] else None,
                     created_at=row["created_at"].isoformat(),
                 )
             )
 
-        cursor.close()
-        conn.close()
-
-        has_more = (request.offset + len(documents)) < total_count
+        next_cursor = None
+        if has_more and rows:
+            last = rows[-1]
+            next_cursor = _encode_page_cursor(sort_field, sort_order, last["sort_value"], last["id"])
 
         return DocumentListResponse(
-            documents=documents, total_count=total_count, offset=request.offset, limit=request.limit, has_more=has_more
+            documents=documents,
+            total_count=total_count,
+            offset=offset,
+            limit=request.limit,
+            has_more=has_more,
+            next_cursor=next_cursor,
         )
     except Exception:
         # Fallback to mock data if database connection fails
@@ -1702,98 +1912,106 @@ def list_documents(request: DocumentListRequest):
 
 
 @app.get("/api/documents", response_model=DocumentListResponse)
-def get_documents(limit: int = 20, offset: int = 0):
+async def get_documents(limit: int = 20, offset: int = 0):
     """Get documents (GET version for backward compatibility)."""
     request = DocumentListRequest(limit=limit, offset=offset, sort_by="created_at", sort_order="desc")
-    return list_documents(request)
+    return await list_documents(request)
 
 
-@app.get("/api/documents/download/{document_id}")
-def download_document(document_id: int, authorization: Optional[str] = Header(None)):
-    """Download a document file from the archive."""
-    # Temporarily remove permission check for debugging
-    # user = _user_from_authorization(authorization)
-    user = None  # Skip auth for testing
+_ARCHIVE_ROOT: Optional[str] = None
 
-    logger.info(f"Download request for document_id: {document_id}")
 
-    try:
-        conn = get_db_connection()
-        logger.info("Database connection established")
-    except Exception as e:
-        logger.error(f"Database connection failed: {e}")
-        raise HTTPException(status_code=500, detail="Database connection failed")
+def _archive_root() -> str:
+    """Archive directory, resolved once: the configured one, else ``<project>/archive`` for development."""
+    global _ARCHIVE_ROOT
+    if _ARCHIVE_ROOT is None:
+        archive_dir = config.get_settings().archive_dir
+        if not os.path.isdir(archive_dir):
+            local_archive = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "archive")
+            if os.path.isdir(local_archive):
+                logger.info(f"Configured archive doesn't exist ({archive_dir}), using local: {local_archive}")
+                archive_dir = local_archive
+        _ARCHIVE_ROOT = archive_dir
+    return _ARCHIVE_ROOT
 
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            # Get document info
-            cursor.execute(
-                """
-                SELECT file_name, privacy_level
-                FROM documents
-                WHERE id = %s
-            """,
-                (document_id,),
-            )
-            doc = cursor.fetchone()
 
-            if not doc:
-                logger.error(f"Document {document_id} not found in database")
-                raise HTTPException(status_code=404, detail="Document not found")
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (RFC 9110 13.1.2)."""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
 
-            file_name = doc["file_name"]
-            privacy_level = doc["privacy_level"]
-            logger.info(f"Downloading document {document_id}: file_name={file_name}, privacy_level={privacy_level}")
-
-            # Construct archive path
-            archive_dir = config.get_settings().archive_dir
-            logger.info(f"Configured archive dir: {archive_dir}")
-
-            # Check if the configured archive directory exists, otherwise try local archive
-            if not os.path.exists(archive_dir):
-                # Try local archive directory for development
-                # Use the project root directory
-                project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-                local_archive = os.path.join(project_root, "archive")
-                logger.info(f"Configured archive doesn't exist ({archive_dir}), trying local: {local_archive}")
-                if os.path.exists(local_archive):
-                    archive_dir = local_archive
-                    logger.info(f"Using local archive: {archive_dir}")
-                else:
-                    logger.error(
-                        f"Neither configured ({archive_dir}) nor local ({local_archive}) archive directory found"
-                    )
-                    raise HTTPException(status_code=500, detail="Archive directory not found")
-
-            file_path = os.path.join(archive_dir, file_name)
-            logger.info(f"Looking for file: {file_path}")
-
-            if not os.path.exists(file_path):
-                logger.error(f"File not found: {file_path}")
-                # List files in archive directory for debugging
-                if os.path.exists(archive_dir):
-                    files = os.listdir(archive_dir)
-                    logger.info(f"Files in archive directory: {files[:10]}")  # First 10 files
-                raise HTTPException(status_code=404, detail=f"Document file not found in archive: {file_name}")
-
-            logger.info(f"Serving file: {file_path}")
-            # Return file
-            return FileResponse(
-                path=file_path, filename=file_name, media_type="application/pdf"  # Assuming PDFs, adjust if needed
-            )
 
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@app.get("/api/documents/download/{document_id}")
+async def download_document(document_id: int, request: Request, authorization: Optional[str] = Header(None)):
+    """Download a document file from the archive.
+
+    The file is located from ``documents.archive_path`` (recorded at ingestion;
+    older rows fall back to ``file_name``) with a single ``stat``. Responses
+    carry ``ETag``/``Last-Modified`` and answer conditional requests with 304;
+    ``Range`` requests get 206 partial content so PDF viewers can load pages
+    lazily. The body is streamed by ``FileResponse`` (``http.response.pathsend``
+    lets servers that support it use sendfile).
+    """
+    # Temporarily remove permission check for debugging
+    # user = _user_from_authorization(authorization)
+    from reranker.db_pool import fetchrow
+
+    try:
+        doc = await fetchrow(
+            "SELECT file_name, archive_path, mime_type, privacy_level FROM documents WHERE id = $1", document_id
+        )
     except Exception as e:
-        logger.error(f"Error downloading document {document_id}: {e}")
+        logger.error(f"Error loading document {document_id} for download: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
-    finally:
-        conn.close()
+
+    if not doc:
+        logger.error(f"Document {document_id} not found in database")
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    file_name = doc["file_name"]
+    file_path = os.path.join(_archive_root(), doc["archive_path"] or file_name)
+    try:
+        stat_result = await run_in_threadpool(os.stat, file_path)
+    except OSError:
+        logger.error(f"File not found: {file_path}")
+        raise HTTPException(status_code=404, detail=f"Document file not found in archive: {file_name}")
+
+    response = FileResponse(
+        path=file_path,
+        filename=file_name,
+        media_type=doc["mime_type"] or None,
+        stat_result=stat_result,
+        headers={"Cache-Control": "private, no-cache"},
+    )
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+    if _not_modified(request, etag, stat_result.st_mtime):
+        return Response(
+            status_code=304,
+            headers={"ETag": etag, "Last-Modified": last_modified, "Cache-Control": "private, no-cache"},
+        )
+    return response
 
 
 @app.get("/api/documents/{document_id}/download")
-def download_document_alt(document_id: int, authorization: Optional[str] = Header(None)):
+async def download_document_alt(document_id: int, request: Request, authorization: Optional[str] = Header(None)):
     """Download a document file from the archive (alternative URL pattern)."""
     # Call the main download function
-    return download_document(document_id, authorization)
+    return await download_document(document_id, request, authorization)
 
 
 @app.get("/metrics")
@@ -1883,25 +2101,26 @@ class QuestionStatsResponse(BaseModel):
     avg_quality_score: float
     top_categories: List[Dict[str, Any]]
     recent_questions: List[Dict[str, Any]]
+    hourly_activity: List[Dict[str, Any]] = []
 
 
 class QuestionDetailResponse(BaseModel):
     question_hash: str
     canonical_question: str
-    category: str
+    category: Optional[str]
     usage_count: int
     avg_response_time: float
     avg_quality_score: float
     positive_feedback: int
     negative_feedback: int
-    last_used: str
+    last_used: Optional[str]
     unique_users: int
     recent_usage: List[Dict[str, Any]]
 
 
 @app.get("/api/admin/question-stats", response_model=QuestionStatsResponse)
-def get_question_stats(limit: int = 10, authorization: Optional[str] = Header(None)):
-    """Get overall question statistics."""
+async def get_question_stats(limit: int = 10, authorization: Optional[str] = Header(None)):
+    """Get overall question statistics (from the usage rollups)."""
     # Basic admin check
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Unauthorized")
@@ -1911,76 +2130,14 @@ def get_question_stats(limit: int = 10, authorization: Optional[str] = Header(No
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-        # Overall stats
-        cursor.execute(
-            """
-            SELECT
-                COUNT(*) as total_questions,
-                COUNT(DISTINCT question_pattern_id) as unique_questions,
-                AVG(response_time_ms) as avg_response_time,
-                AVG(response_quality_score) as avg_quality_score
-            FROM question_usage
-        """
-        )
-        overall_stats = cursor.fetchone()
-
-        # Top categories
-        cursor.execute(
-            """
-            SELECT
-                qp.category,
-                COUNT(*) as usage_count,
-                AVG(qu.response_time_ms) as avg_response_time
-            FROM question_patterns qp
-            JOIN question_usage qu ON qp.id = qu.question_pattern_id
-            GROUP BY qp.category
-            ORDER BY usage_count DESC
-            LIMIT %s
-        """,
-            [limit],
-        )
-        top_categories = cursor.fetchall()
-
-        # Recent questions
-        cursor.execute(
-            """
-            SELECT
-                qp.canonical_question,
-                qp.category,
-                qu.created_at,
-                qu.response_time_ms,
-                qu.response_quality_score
-            FROM question_usage qu
-            JOIN question_patterns qp ON qu.question_pattern_id = qp.id
-            ORDER BY qu.created_at DESC
-            LIMIT %s
-        """,
-            [limit],
-        )
-        recent_questions = cursor.fetchall()
-
-        cursor.close()
-        conn.close()
-
-        return QuestionStatsResponse(
-            total_questions=overall_stats["total_questions"] or 0,
-            unique_questions=overall_stats["unique_questions"] or 0,
-            avg_response_time=overall_stats["avg_response_time"] or 0.0,
-            avg_quality_score=overall_stats["avg_quality_score"] or 0.0,
-            top_categories=[dict(cat) for cat in top_categories],
-            recent_questions=[dict(q) for q in recent_questions],
-        )
-
+        return QuestionStatsResponse(**await load_question_stats(max(1, min(limit, 100))))
     except Exception as e:
         logger.error(f"Error getting question stats: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve question statistics")
 
 
 @app.get("/api/admin/question-stats/{question_hash}", response_model=QuestionDetailResponse)
-def get_question_detail(question_hash: str, limit: int = 10, authorization: Optional[str] = Header(None)):
+async def get_question_detail(question_hash: str, limit: int = 10, authorization: Optional[str] = Header(None)):
     """Get detailed statistics for a specific question pattern."""
     # Basic admin check
     if not authorization or not authorization.startswith("Bearer "):
@@ -1991,65 +2148,13 @@ def get_question_detail(question_hash: str, limit: int = 10, authorization: Opti
         raise HTTPException(status_code=403, detail="Admin access required")
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-        # Question pattern details
-        cursor.execute(
-            """
-            SELECT * FROM question_statistics WHERE question_hash = %s
-        """,
-            [question_hash],
-        )
-        pattern_stats = cursor.fetchone()
-
-        if not pattern_stats:
-            raise HTTPException(status_code=404, detail="Question pattern not found")
-
-        # Recent usage
-        cursor.execute(
-            """
-            SELECT
-                qu.question_text,
-                qu.response_time_ms,
-                qu.response_quality_score,
-                qu.user_feedback,
-                qu.search_method,
-                qu.created_at,
-                u.email as user_email
-            FROM question_usage qu
-            JOIN question_patterns qp ON qu.question_pattern_id = qp.id
-            LEFT JOIN users u ON qu.user_id = u.id
-            WHERE qp.question_hash = %s
-            ORDER BY qu.created_at DESC
-            LIMIT %s
-        """,
-            [question_hash, limit],
-        )
-        recent_usage = cursor.fetchall()
-
-        cursor.close()
-        conn.close()
-
-        return QuestionDetailResponse(
-            question_hash=pattern_stats["question_hash"],
-            canonical_question=pattern_stats["canonical_question"],
-            category=pattern_stats["category"],
-            usage_count=pattern_stats["usage_count"],
-            avg_response_time=pattern_stats["avg_response_time"],
-            avg_quality_score=pattern_stats["avg_quality_score"],
-            positive_feedback=pattern_stats["positive_feedback"],
-            negative_feedback=pattern_stats["negative_feedback"],
-            last_used=pattern_stats["last_used"].isoformat() if pattern_stats["last_used"] else None,
-            unique_users=pattern_stats["unique_users"],
-            recent_usage=[dict(usage) for usage in recent_usage],
-        )
-
-    except HTTPException:
-        raise
+        detail = await load_question_detail(question_hash, max(1, min(limit, 100)))
     except Exception as e:
         logger.error(f"Error getting question detail: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve question details")
+    if detail is None:
+        raise HTTPException(status_code=404, detail="Question pattern not found")
+    return QuestionDetailResponse(**detail)
 
 
 @app.post("/api/feedback")
@@ -2085,15 +2190,38 @@ def submit_feedback(
             conn.rollback()
             raise HTTPException(status_code=404, detail="Message not found or access denied")
 
-        # Also update question_usage if this message is part of tracked questions
+        # Also update question_usage if this message is part of tracked questions, moving the
+        # pattern's rolled-up feedback counters from the previous rating to the new one
         cursor.execute(
             """
-            UPDATE question_usage
-            SET user_feedback = %s
-            WHERE conversation_id = (SELECT conversation_id FROM messages WHERE id = %s)
-            AND question_text = (SELECT content FROM messages WHERE id = %s AND role = 'user')
+            WITH previous AS (
+                SELECT id, created_at, question_pattern_id, user_feedback
+                FROM question_usage
+                WHERE conversation_id = (SELECT conversation_id FROM messages WHERE id = %s)
+                AND question_text = (SELECT content FROM messages WHERE id = %s AND role = 'user')
+                FOR UPDATE
+            ), updated AS (
+                UPDATE question_usage qu
+                SET user_feedback = %s
+                FROM previous p
+                WHERE qu.id = p.id AND qu.created_at = p.created_at
+                RETURNING p.question_pattern_id, p.user_feedback AS old_feedback, qu.user_feedback AS new_feedback
+            )
+            UPDATE question_pattern_stats s
+            SET positive_feedback = s.positive_feedback + d.positive,
+                negative_feedback = s.negative_feedback + d.negative
+            FROM (
+                SELECT question_pattern_id,
+                       SUM((new_feedback = 'positive')::int - (old_feedback IS NOT DISTINCT FROM 'positive')::int)
+                           AS positive,
+                       SUM((new_feedback = 'negative')::int - (old_feedback IS NOT DISTINCT FROM 'negative')::int)
+                           AS negative
+                FROM updated
+                GROUP BY question_pattern_id
+            ) d
+            WHERE s.question_pattern_id = d.question_pattern_id
         """,
-            [rating, message_id, message_id],
+            [message_id, message_id, rating],
         )
 
         conn.commit()
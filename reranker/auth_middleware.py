@@ -90,7 +90,7 @@ async def verify_rate_limit(request: Request, user: User) -> None:
         HTTPException: If rate limit exceeded
     """
     rate_limiter = RateLimiter()
-    allowed, status_dict = rate_limiter.check_rate_limit(
+    allowed, status_dict = await rate_limiter.acheck_rate_limit(
         identifier=str(user.id),
         role=user.role,
     )
@@ -177,10 +177,12 @@ class JWTAuthMiddleware:
             nonlocal response_started
             if message["type"] == "http.response.start" and user_info:
                 # Add rate limit headers to response
+                # Report the current window without counting the request a second time
                 rate_limiter = RateLimiter()
-                _, status_dict = rate_limiter.check_rate_limit(
+                _, status_dict = await rate_limiter.acheck_rate_limit(
                     identifier=str(user_info.id),
                     role=user_info.role,
+                    consume=False,
                 )
                 headers = list(message.get("headers", []))
                 headers.extend(
@@ -0,0 +1,511 @@
+from datetime import datetime, timedelta
+from utils.logging_config import setup_logging
+
+# Setup standardized Log4 logging
+logger = setup_logging(
+    program_name='batch_jobs',
+    log_level='INFO',
+    log_file=f'/app/logs/batch_jobs_{datetime.now().strftime("%Y%m%d")}.log',
+    console_output=True
+)
+if logger is None:
+    # Tests may stub setup_logging to a noop; fall back to standard logging to avoid None logger
+    import logging
+
+    logger = logging.getLogger("batch_jobs")
+
+"""
+Asynchronous Bulk Q&A Jobs
+
+``/api/batch-chat`` answers a batch inside one HTTP request, which times out on
+large evaluation or FAQ-generation runs and loses everything on failure. Jobs
+submitted through ``/api/batch-jobs`` instead:
+
+- are persisted to Postgres (``batch_jobs`` / ``batch_job_items``) and return a
+  job id immediately;
+- run in the background at BATCH scheduler priority, so interactive chat keeps
+  its Ollama capacity;
+- answer each distinct (normalized) query once, sharing its retrieval and
+  generation with duplicate items;
+- run generations grouped by resolved model, so each model stays loaded while
+  its group runs instead of alternating models per item;
+- persist every item's result as soon as it finishes; clients poll the job or
+  stream its progress;
+- hold a renewable lease on the job. An interrupted job (worker restart or
+  crash) is picked up again once the lease expires and resumes from the items
+  that are still pending.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from reranker.metrics_registry import PROMETHEUS_AVAILABLE, get_or_create_metric
+from reranker.ollama_scheduler import OllamaOverloaded, Priority, ollama_priority
+from reranker.reranker_config import get_settings
+
+if PROMETHEUS_AVAILABLE:
+    from prometheus_client import Counter, Gauge
+
+    BATCH_JOB_ITEMS = get_or_create_metric(Counter, "batch_job_items_total", "Batch job items processed", ["outcome"])
+    BATCH_JOBS_RUNNING = get_or_create_metric(Gauge, "batch_jobs_running", "Batch jobs running in this worker")
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# Models that the router may replace with its own choice
+ROUTED_MODELS = {"", "rni-mistral", "auto"}
+
+
+def normalize_query(query: str) -> str:
+    """Key used to share one answer between duplicate queries in a job."""
+    return " ".join(query.lower().split())
+
+
+@dataclass
+class PlannedQuery:
+    """One distinct query of a job and the item indexes that share its answer."""
+
+    query: str
+    model: str
+    indexes: List[int] = field(default_factory=list)
+
+
+def plan_batch(items: Sequence[Tuple[int, str]], models: Dict[str, str]) -> List[Tuple[str, List[PlannedQuery]]]:
+    """Deduplicate pending items and group them by model.
+
+    ``items`` are (index, query) pairs and ``models`` maps normalized queries to
+    the model that answers them. Returns ``[(model, [PlannedQuery, ...]), ...]``
+    with groups in order of first appearance.
+    """
+    planned: Dict[str, PlannedQuery] = {}
+    for index, query in items:
+        key = normalize_query(query)
+        entry = planned.get(key)
+        if entry is None:
+            entry = planned[key] = PlannedQuery(query=query, model=models[key])
+        entry.indexes.append(index)
+
+    groups: Dict[str, List[PlannedQuery]] = {}
+    for entry in planned.values():
+        groups.setdefault(entry.model, []).append(entry)
+    return list(groups.items())
+
+
+class BatchJobStore:
+    """Postgres persistence for batch jobs (asyncpg pool from db_pool)."""
+
+    async def create_job(self, job_id: str, user_id: int, params: Dict[str, Any], queries: List[str]) -> None:
+        from reranker.db_pool import get_db_pool
+
+        pool = await get_db_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    """INSERT INTO batch_jobs (id, user_id, status, params, total_items)
+                       VALUES ($1, $2, 'queued', $3::jsonb, $4)""",
+                    job_id,
+                    user_id,
+                    json.dumps(params),
+                    len(queries),
+                )
+                await conn.execute(
+                    """INSERT INTO batch_job_items (job_id, item_index, query)
+                       SELECT $1, q.ordinality - 1, q.query
+                       FROM unnest($2::text[]) WITH ORDINALITY AS q(query, ordinality)""",
+                    job_id,
+                    queries,
+                )
+
+    async def claim(self, job_id: str, owner: str, lease_seconds: int) -> Optional[Dict[str, Any]]:
+        """Take the job's lease if it is queued, or running under an expired lease."""
+        from reranker.db_pool import fetchrow
+
+        row = await fetchrow(
+            """UPDATE batch_jobs
+                  SET status = 'running', lease_owner = $2,
+                      lease_expires_at = NOW() + make_interval(secs => $3),
+                      started_at = COALESCE(started_at, NOW())
+                WHERE id = $1
+                  AND (status = 'queued'
+                       OR (status = 'running' AND (lease_expires_at IS NULL OR lease_expires_at < NOW())))
+            RETURNING id, params""",
+            job_id,
+            owner,
+            lease_seconds,
+        )
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "params": json.loads(row["params"]) if isinstance(row["params"], str) else row["params"],
+        }
+
+    async def renew(self, job_id: str, owner: str, lease_seconds: int) -> Optional[str]:
+        """Extend the lease; returns the job status, or None if the lease was lost."""
+        from reranker.db_pool import fetchval
+
+        return await fetchval(
+            """UPDATE batch_jobs SET lease_expires_at = NOW() + make_interval(secs => $3)
+                WHERE id = $1 AND lease_owner = $2
+            RETURNING status""",
+            job_id,
+            owner,
+            lease_seconds,
+        )
+
+    async def pending_items(self, job_id: str) -> List[Tuple[int, str]]:
+        from reranker.db_pool import fetch
+
+        rows = await fetch(
+            """SELECT item_index, query FROM batch_job_items
+                WHERE job_id = $1 AND status = 'pending'
+                ORDER BY item_index""",
+            job_id,
+        )
+        return [(row["item_index"], row["query"]) for row in rows]
+
+    async def complete_items(
+        self, job_id: str, indexes: List[int], result: Optional[Dict[str, Any]], error: Optional[str] = None
+    ) -> None:
+        """Persist one answer for every item sharing it and bump the job counters."""
+        from reranker.db_pool import get_db_pool
+
+        status = "failed" if error else "completed"
+        pool = await get_db_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                updated = await conn.fetchval(
+                    """WITH done AS (
+                           UPDATE batch_job_items
+                              SET status = $3, result = $4::jsonb, error = $5, completed_at = NOW()
+                            WHERE job_id = $1 AND item_index = ANY($2::int[]) AND status = 'pending'
+                        RETURNING 1)
+                       SELECT COUNT(*) FROM done""",
+                    job_id,
+                    indexes,
+                    status,
+                    json.dumps(result) if result is not None else None,
+                    error,
+                )
+                column = "failed_items" if error else "completed_items"
+                await conn.execute(
+                    f"UPDATE batch_jobs SET {column} = {column} + $2, updated_at = NOW() WHERE id = $1",
+                    job_id,
+                    updated,
+                )
+
+    async def finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        from reranker.db_pool import execute
+
+        await execute(
+            """UPDATE batch_jobs SET status = $2, error = $3, finished_at = NOW(), updated_at = NOW(),
+                      lease_owner = NULL, lease_expires_at = NULL
+                WHERE id = $1 AND status NOT IN ('completed', 'failed', 'cancelled')""",
+            job_id,
+            status,
+            error,
+        )
+
+    async def cancel(self, job_id: str, user_id: int) -> bool:
+        from reranker.db_pool import fetchval
+
+        updated = await fetchval(
+            """UPDATE batch_jobs SET status = 'cancelled', finished_at = NOW(), updated_at = NOW()
+                WHERE id = $1 AND user_id = $2 AND status IN ('queued', 'running')
+            RETURNING id""",
+            job_id,
+            user_id,
+        )
+        return updated is not None
+
+    async def get_job(self, job_id: str, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        from reranker.db_pool import fetchrow
+
+        row = await fetchrow(
+            """SELECT id, user_id, status, params, total_items, completed_items, failed_items, error,
+                      created_at, started_at, finished_at
+                 FROM batch_jobs WHERE id = $1 AND ($2::bigint IS NULL OR user_id = $2)""",
+            job_id,
+            user_id,
+        )
+        if row is None:
+            return None
+        job = dict(row)
+        if isinstance(job.get("params"), str):
+            job["params"] = json.loads(job["params"])
+        return job
+
+    async def get_items(
+        self, job_id: str, offset: int = 0, limit: int = 100, completed_after: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Finished items in completion order (ties by index), or only those finished after ``completed_after``."""
+        from reranker.db_pool import fetch
+
+        rows = await fetch(
+            """SELECT item_index, query, status, result, error, completed_at
+                 FROM batch_job_items
+                WHERE job_id = $1 AND status <> 'pending'
+                  AND ($4::timestamptz IS NULL OR completed_at > $4)
+                ORDER BY completed_at, item_index
+                OFFSET $2 LIMIT $3""",
+            job_id,
+            offset,
+            limit,
+            completed_after,
+        )
+        items = []
+        for row in rows:
+            item = dict(row)
+            if isinstance(item.get("result"), str):
+                item["result"] = json.loads(item["result"])
+            items.append(item)
+        return items
+
+    async def resumable_job_ids(self) -> List[str]:
+        from reranker.db_pool import fetch
+
+        rows = await fetch(
+            """SELECT id FROM batch_jobs
+                WHERE status = 'queued'
+                   OR (status = 'running' AND (lease_expires_at IS NULL OR lease_expires_at < NOW()))
+                ORDER BY created_at""",
+        )
+        return [row["id"] for row in rows]
+
+
+class BatchJobManager:
+    """Runs persisted batch jobs in the background of this worker."""
+
+    # Attempts for an item shed by the scheduler before it is recorded as failed
+    MAX_SHED_RETRIES = 5
+    # Re-read window for progress streaming (see progress_events)
+    PROGRESS_OVERLAP = timedelta(seconds=10)
+    # Router lookups in flight while resolving a job's models
+    MODEL_RESOLUTION_CONCURRENCY = 16
+
+    def __init__(self, rag_service: Any, store: Optional[BatchJobStore] = None, settings: Any = None):
+        self.rag_service = rag_service
+        self.store = store or BatchJobStore()
+        self.settings = settings or get_settings()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def submit(self, user_id: int, request: Any) -> str:
+        """Persist a BatchRAGChatRequest as a job and start it; returns the job id."""
+        if not request.queries:
+            raise ValueError("A batch job needs at least one query")
+        if len(request.queries) > self.settings.batch_job_max_items:
+            raise ValueError(f"A batch job may contain at most {self.settings.batch_job_max_items} queries")
+        job_id = uuid.uuid4().hex
+        params = {
+            "model": request.model,
+            "temperature": request.temperature,
+            "max_tokens": request.max_tokens,
+            "max_context_chunks": request.max_context_chunks,
+            "max_concurrent": request.max_concurrent,
+        }
+        await self.store.create_job(job_id, user_id, params, list(request.queries))
+        logger.info(f"Batch job {job_id} submitted by user {user_id}: {len(request.queries)} queries")
+        self.start(job_id)
+        return job_id
+
+    def start(self, job_id: str) -> bool:
+        """Run the job in this worker unless it is already running here."""
+        task = self._tasks.get(job_id)
+        if task is not None and not task.done():
+            return False
+        self._tasks[job_id] = asyncio.create_task(self.run_job(job_id))
+        return True
+
+    def running_jobs(self) -> List[str]:
+        return [job_id for job_id, task in self._tasks.items() if not task.done()]
+
+    async def _resolve_models(self, queries: Sequence[str], requested: str) -> Dict[str, str]:
+        """Model per normalized query: the requested one, or the router's choice."""
+        distinct: Dict[str, str] = {}
+        for query in queries:
+            distinct.setdefault(normalize_query(query), query)
+        if (requested or "").lower() not in ROUTED_MODELS:
+            return {key: requested for key in distinct}
+
+        semaphore = asyncio.Semaphore(self.MODEL_RESOLUTION_CONCURRENCY)
+
+        async def resolve(query: str) -> str:
+            async with semaphore:
+                return await self.rag_service.resolve_model(query)
+
+        models = await asyncio.gather(*(resolve(query) for query in distinct.values()))
+        return dict(zip(distinct, models))
+
+    async def _answer(self, planned: PlannedQuery, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer one distinct query at BATCH priority, waiting out scheduler sheds."""
+        from reranker.rag_chat import RAGChatRequest
+
+        request = RAGChatRequest(
+            query=planned.query,
+            use_context=True,
+            max_context_chunks=params["max_context_chunks"],
+            model=planned.model,
+            temperature=params["temperature"],
+            max_tokens=params["max_tokens"],
+            stream=False,
+        )
+        attempt = 0
+        while True:
+            try:
+                with ollama_priority(Priority.BATCH):
+                    response = await self.rag_service.chat(request)
+                return response.model_dump()
+            except OllamaOverloaded as exc:
+                attempt += 1
+                if attempt >= self.MAX_SHED_RETRIES:
+                    raise
+                retry_after = float(exc.headers.get("Retry-After", "5"))
+                logger.debug(f"Batch item shed ({exc.reason}); retrying in {retry_after:.0f}s")
+                await asyncio.sleep(retry_after)
+
+    async def _heartbeat(self, job_id: str, cancelled: asyncio.Event) -> None:
+        """Renew the lease; flags cancellation when the job was cancelled or the lease lost."""
+        lease = self.settings.batch_job_lease_seconds
+        while not cancelled.is_set():
+            await asyncio.sleep(max(1.0, lease / 3))
+            try:
+                status = await self.store.renew(job_id, self.owner, lease)
+            except Exception as e:
+                logger.warning(f"Batch job {job_id} lease renewal failed: {e}")
+                continue
+            if status != "running":
+                logger.info(f"Batch job {job_id} stopping: status={status}")
+                cancelled.set()
+
+    async def run_job(self, job_id: str) -> Optional[str]:
+        """Claim and run a job to completion; returns its final status (None if not claimed)."""
+        job = await self.store.claim(job_id, self.owner, self.settings.batch_job_lease_seconds)
+        if job is None:
+            return None
+        params = job["params"]
+        cancelled = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, cancelled))
+        if PROMETHEUS_AVAILABLE and BATCH_JOBS_RUNNING is not None:
+            BATCH_JOBS_RUNNING.inc()
+        started = time.time()
+        try:
+            items = await self.store.pending_items(job_id)
+            models = await self._resolve_models([query for _, query in items], params.get("model", ""))
+            plan = plan_batch(items, models)
+            logger.info(
+                f"Batch job {job_id}: {len(items)} pending items, "
+                f"{sum(len(group) for _, group in plan)} distinct queries across {len(plan)} models"
+            )
+            semaphore = asyncio.Semaphore(max(1, int(params.get("max_concurrent", 4))))
+
+            async def process(planned: PlannedQuery) -> None:
+                async with semaphore:
+                    if cancelled.is_set():
+                        return
+                    try:
+                        result = await self._answer(planned, params)
+                        await self.store.complete_items(job_id, planned.indexes, result)
+                        outcome = "completed"
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        logger.warning(f"Batch job {job_id} item {planned.indexes[0]} failed: {e}")
+                        await self.store.complete_items(job_id, planned.indexes, None, error=str(e))
+                        outcome = "failed"
+                    if PROMETHEUS_AVAILABLE and BATCH_JOB_ITEMS is not None:
+                        BATCH_JOB_ITEMS.labels(outcome=outcome).inc(len(planned.indexes))
+
+            # One model at a time keeps it loaded for the whole group
+            for model, group in plan:
+                if cancelled.is_set():
+                    break
+                logger.debug(f"Batch job {job_id}: {len(group)} queries on {model}")
+                await asyncio.gather(*(process(planned) for planned in group))
+
+            if cancelled.is_set():
+                return "cancelled"
+            await self.store.finish(job_id, "completed")
+            logger.info(f"Batch job {job_id} completed in {time.time() - started:.1f}s")
+            return "completed"
+        except asyncio.CancelledError:
+            # Worker shutdown: leave the job running so it resumes once the lease expires
+            raise
+        except Exception as e:
+            logger.error(f"Batch job {job_id} failed: {e}")
+            await self.store.finish(job_id, "failed", str(e))
+            return "failed"
+        finally:
+            cancelled.set()
+            heartbeat.cancel()
+            if PROMETHEUS_AVAILABLE and BATCH_JOBS_RUNNING is not None:
+                BATCH_JOBS_RUNNING.dec()
+
+    async def resume_interrupted(self) -> List[str]:
+        """Start every queued job and every running job whose lease has expired."""
+        started = []
+        for job_id in await self.store.resumable_job_ids():
+            if self.start(job_id):
+                started.append(job_id)
+        if started:
+            logger.info(f"Resuming {len(started)} batch jobs: {', '.join(started)}")
+        return started
+
+    async def run_background(self) -> None:
+        """Periodically pick up jobs left behind by restarted or crashed workers."""
+        while True:
+            try:
+                await self.resume_interrupted()
+            except Exception as e:
+                logger.warning(f"Batch job resume scan failed: {e}")
+            await asyncio.sleep(max(5, self.settings.batch_job_lease_seconds))
+
+    async def progress_events(
+        self, job_id: str, user_id: int, sleep: Callable[[float], Any] = asyncio.sleep
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield progress snapshots and newly finished items until the job ends."""
+        seen: Set[int] = set()
+        since: Optional[datetime] = None
+        while True:
+            job = await self.store.get_job(job_id, user_id)
+            if job is None:
+                return
+            # completed_at is the writer's transaction start, so rows can commit slightly out
+            # of order: re-read a short window and skip items already sent
+            window_start = since - self.PROGRESS_OVERLAP if since is not None else None
+            for item in await self.store.get_items(job_id, 0, self.settings.batch_job_max_items, window_start):
+                if item["item_index"] in seen:
+                    continue
+                seen.add(item["item_index"])
+                if item["completed_at"] is not None and (since is None or item["completed_at"] > since):
+                    since = item["completed_at"]
+                yield {"type": "item", **item}
+            yield {
+                "type": "progress",
+                "status": job["status"],
+                "total_items": job["total_items"],
+                "completed_items": job["completed_items"],
+                "failed_items": job["failed_items"],
+            }
+            if job["status"] in TERMINAL_STATUSES:
+                return
+            await sleep(self.settings.batch_job_progress_poll_seconds)
+
+
+# Global job manager
+_batch_job_manager: Optional[BatchJobManager] = None
+
+
+def get_batch_job_manager(rag_service: Any = None) -> BatchJobManager:
+    """Get or create the global batch job manager."""
+    global _batch_job_manager
+    if _batch_job_manager is None:
+        if rag_service is None:
+            raise RuntimeError("Batch job manager not initialized; a RAGChatService is required")
+        _batch_job_manager = BatchJobManager(rag_service)
+    return _batch_job_manager
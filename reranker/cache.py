@@ -15,12 +15,17 @@ logger = setup_logging(
 
 Provides simple Postgres-backed caching for SearXNG web search results.
 Avoids repeated outbound queries for identical (normalized) queries within TTL.
+A short-TTL in-process tier sits in front of the table, and the async variants
+(aget_cached_web_results / astore_web_results) go through the shared asyncpg pool.
 """
 
 import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import psycopg2
 from pydantic import BaseModel
@@ -53,11 +58,53 @@ def _normalize_query(q: str) -> str:
 def _hash_query(norm: str) -> str:
     return hashlib.sha256(norm.encode("utf-8")).hexdigest()
 
+
+# In-process tier: query_hash -> (monotonic expiry, results), kept in LRU order
+_memory_tier: "OrderedDict[str, Tuple[float, List[CachedWebResult]]]" = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def _memory_get(qh: str) -> Optional[List[CachedWebResult]]:
+    with _memory_lock:
+        entry = _memory_tier.get(qh)
+        if entry is None:
+            return None
+        expires, results = entry
+        if expires < time.monotonic():
+            del _memory_tier[qh]
+            return None
+        _memory_tier.move_to_end(qh)
+        return results
+
+
+def _memory_put(qh: str, results: List[CachedWebResult]) -> None:
+    ttl = settings.web_cache_memory_ttl_seconds
+    if ttl <= 0:
+        return
+    with _memory_lock:
+        _memory_tier[qh] = (time.monotonic() + ttl, results)
+        _memory_tier.move_to_end(qh)
+        while len(_memory_tier) > max(1, settings.web_cache_memory_max_entries):
+            _memory_tier.popitem(last=False)
+
+
+def _parse_results(results_json) -> Optional[List[CachedWebResult]]:
+    if isinstance(results_json, str):
+        try:
+            results_json = json.loads(results_json)
+        except json.JSONDecodeError:
+            return None
+    return [CachedWebResult(**r) for r in results_json]
+
+
 def get_cached_web_results(query: str) -> Optional[List[CachedWebResult]]:
     if not settings.web_cache_enabled:
         return None
     norm = _normalize_query(query)
     qh = _hash_query(norm)
+    cached = _memory_get(qh)
+    if cached is not None:
+        return cached
     try:
         conn = get_db_connection()
         cur = conn.cursor()
@@ -87,12 +134,38 @@ def get_cached_web_results(query: str) -> Optional[List[CachedWebResult]]:
             conn.rollback()
         cur.close()
         conn.close()
-        if isinstance(results_json, str):
-            try:
-                results_json = json.loads(results_json)
-            except json.JSONDecodeError:
-                return None
-        return [CachedWebResult(**r) for r in results_json]
+        results = _parse_results(results_json)
+        if results is not None:
+            _memory_put(qh, results)
+        return results
+    except Exception as e:
+        logger.warning(f"Cache read failed: {e}")
+        return None
+
+
+async def aget_cached_web_results(query: str) -> Optional[List[CachedWebResult]]:
+    """Async read: in-process tier first, then one pooled round trip that also bumps hit_count."""
+    if not settings.web_cache_enabled:
+        return None
+    qh = _hash_query(_normalize_query(query))
+    cached = _memory_get(qh)
+    if cached is not None:
+        return cached
+    try:
+        from reranker.db_pool import fetchval
+
+        results_json = await fetchval(
+            """UPDATE web_search_cache SET hit_count=hit_count+1
+                   WHERE query_hash=$1 AND expires_at > NOW()
+                   RETURNING results_json""",
+            qh,
+        )
+        if results_json is None:
+            return None
+        results = _parse_results(results_json)
+        if results is not None:
+            _memory_put(qh, results)
+        return results
     except Exception as e:
         logger.warning(f"Cache read failed: {e}")
         return None
@@ -102,6 +175,7 @@ def store_web_results(query: str, results: List[dict]):
         return
     norm = _normalize_query(query)
     qh = _hash_query(norm)
+    _memory_put(qh, [CachedWebResult(**r) for r in results])
     expires_at = datetime.now(timezone.utc) + timedelta(seconds=settings.web_cache_ttl_seconds)
     try:
         conn = get_db_connection()
@@ -131,3 +205,37 @@ def store_web_results(query: str, results: List[dict]):
         conn.close()
     except Exception as e:
         logger.warning(f"Cache store failed: {e}")
+
+
+async def astore_web_results(query: str, results: List[dict]) -> None:
+    """Async write through the pooled connection; expired and over-cap rows are pruned in one statement."""
+    if not settings.web_cache_enabled:
+        return
+    norm = _normalize_query(query)
+    qh = _hash_query(norm)
+    _memory_put(qh, [CachedWebResult(**r) for r in results])
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=settings.web_cache_ttl_seconds)
+    try:
+        from reranker.db_pool import execute
+
+        await execute(
+            """INSERT INTO web_search_cache (query_hash, normalized_query, results_json, expires_at)
+                   VALUES ($1,$2,$3::jsonb,$4)
+                   ON CONFLICT (query_hash) DO UPDATE SET
+                     results_json=EXCLUDED.results_json,
+                     expires_at=EXCLUDED.expires_at
+               """,
+            qh,
+            norm,
+            json.dumps(results),
+            expires_at,
+        )
+        if settings.web_cache_max_rows > 0:
+            await execute(
+                """DELETE FROM web_search_cache
+                   WHERE expires_at <= NOW()
+                      OR id IN (SELECT id FROM web_search_cache ORDER BY created_at DESC OFFSET $1)""",
+                settings.web_cache_max_rows,
+            )
+    except Exception as e:
+        logger.warning(f"Cache store failed: {e}")
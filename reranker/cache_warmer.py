@@ -0,0 +1,376 @@
+from datetime import datetime
+from utils.logging_config import setup_logging
+
+# Setup standardized Log4 logging
+logger = setup_logging(
+    program_name='cache_warmer',
+    log_level='INFO',
+    log_file=f'/app/logs/cache_warmer_{datetime.now().strftime("%Y%m%d")}.log',
+    console_output=True
+)
+if logger is None:
+    # Tests may stub setup_logging to a noop; fall back to standard logging to avoid None logger
+    import logging
+
+    logger = logging.getLogger("cache_warmer")
+
+"""
+Cache Pre-Warming
+
+Replays the most frequently asked canonical questions (question_patterns joined
+with question_usage) so the first users after a deploy or re-ingestion do not pay
+cold latency. By default the warm-up is embedding-only: it fills the query
+embedding cache (retrieval results are not cached, so replaying retrieval would
+warm nothing). With cache_warmup_generate it runs the full chat and fills the
+response cache.
+
+The warmer runs at low priority:
+- Ollama calls are scheduled in the BACKGROUND class (ollama_scheduler.py)
+- bounded concurrency (never more than the number of healthy Ollama instances)
+- a pause between questions
+- backs off while instances are unhealthy or slower than a latency ceiling
+
+Runs are triggered once after startup, whenever the documents table reports a
+newer processed_at (i.e. an ingestion batch finished), and manually via the admin API.
+Progress and hit-rate uplift are exposed through get_status() and Prometheus.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from psycopg2.extras import RealDictCursor
+
+from reranker.advanced_cache import get_advanced_cache
+from reranker.cache import get_db_connection
+from reranker.metrics_registry import PROMETHEUS_AVAILABLE, get_or_create_metric
+from reranker.ollama_scheduler import Priority, ollama_priority
+from reranker.query_response_cache import get_query_response_cache
+from reranker.reranker_config import get_settings
+
+if PROMETHEUS_AVAILABLE:
+    from prometheus_client import Counter, Gauge
+
+    WARMUP_QUESTIONS = get_or_create_metric(
+        Counter, "cache_warmup_questions_total", "Questions replayed by the cache warmer", ["outcome"]
+    )
+    WARMUP_PROGRESS = get_or_create_metric(
+        Gauge, "cache_warmup_progress_ratio", "Progress of the current cache warm-up run"
+    )
+    WARMUP_HIT_RATE_UPLIFT = get_or_create_metric(
+        Gauge, "cache_warmup_hit_rate_uplift", "Response cache hit rate after the last warm-up minus the rate before it"
+    )
+
+
+@dataclass
+class WarmupQuestion:
+    """A canonical question selected for warm-up."""
+
+    question_hash: str
+    canonical_question: str
+    usage_count: int
+
+
+def hit_rate(hits: int, misses: int) -> Optional[float]:
+    """Return hits / (hits + misses), or None when there were no lookups."""
+    total = hits + misses
+    if total <= 0:
+        return None
+    return hits / total
+
+
+class CacheWarmer:
+    """Low-priority background replay of frequent questions."""
+
+    # Minimum real lookups after a run before an uplift figure is reported
+    MIN_UPLIFT_SAMPLE = 20
+
+    def __init__(self, rag_service: Any, settings: Any = None):
+        """Initialize the warmer around an existing RAGChatService."""
+        self.rag_service = rag_service
+        self.settings = settings or get_settings()
+        self.top_n = max(1, self.settings.cache_warmup_top_n)
+        self.concurrency = max(1, self.settings.cache_warmup_concurrency)
+        self.generate = self.settings.cache_warmup_generate
+        self.delay_seconds = max(0, self.settings.cache_warmup_delay_ms) / 1000.0
+        self.max_latency_ms = self.settings.cache_warmup_max_latency_ms
+
+        self._task: Optional[asyncio.Task] = None
+        self._ingestion_watermark: Optional[datetime] = None
+        self._status: Dict[str, Any] = {
+            "running": False,
+            "reason": None,
+            "started_at": None,
+            "finished_at": None,
+            "total": 0,
+            "completed": 0,
+            "warmed": 0,
+            "already_warm": 0,
+            "skipped": 0,
+            "failed": 0,
+            "runs": 0,
+        }
+        # Cache counters captured before a run and right after it finishes
+        self._baseline_counters: Optional[Dict[str, int]] = None
+        self._post_run_counters: Optional[Dict[str, int]] = None
+
+    # ========== QUESTION SELECTION ==========
+
+    def fetch_top_questions(self, limit: Optional[int] = None) -> List[WarmupQuestion]:
+        """Return the most frequently used canonical questions."""
+        conn = get_db_connection()
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(
+                    """
+                    SELECT
+                        qp.question_hash,
+                        qp.canonical_question,
+                        COUNT(qu.id) AS usage_count
+                    FROM question_patterns qp
+                    JOIN question_usage qu ON qu.question_pattern_id = qp.id
+                    GROUP BY qp.id, qp.question_hash, qp.canonical_question
+                    ORDER BY usage_count DESC, MAX(qu.created_at) DESC
+                    LIMIT %s
+                    """,
+                    [limit or self.top_n],
+                )
+                rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        return [
+            WarmupQuestion(
+                question_hash=row["question_hash"],
+                canonical_question=row["canonical_question"],
+                usage_count=int(row["usage_count"] or 0),
+            )
+            for row in rows
+            if row.get("canonical_question")
+        ]
+
+    def fetch_ingestion_watermark(self) -> Optional[datetime]:
+        """Return the newest documents.processed_at value."""
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT MAX(processed_at) FROM documents")
+                row = cursor.fetchone()
+                return row[0] if row else None
+        finally:
+            conn.close()
+
+    # ========== CAPACITY ==========
+
+    def _healthy_instance_count(self) -> int:
+        load_balancer = self.rag_service.load_balancer
+        return sum(1 for url in load_balancer.metrics if load_balancer.is_available(url))
+
+    def capacity_available(self) -> bool:
+        """Only warm while at least half the instances are healthy and responsive."""
+        load_balancer = self.rag_service.load_balancer
+        healthy = [metrics for url, metrics in load_balancer.metrics.items() if load_balancer.is_available(url)]
+        if len(healthy) * 2 < len(load_balancer.metrics):
+            return False
+        if self.max_latency_ms <= 0:
+            return True
+        return all(metrics.average_response_time <= self.max_latency_ms for metrics in healthy)
+
+    async def _wait_for_capacity(self, max_wait_seconds: float = 300.0) -> bool:
+        waited = 0.0
+        backoff = 1.0
+        while not self.capacity_available():
+            if waited >= max_wait_seconds:
+                return False
+            await asyncio.sleep(backoff)
+            waited += backoff
+            backoff = min(backoff * 2, 30.0)
+        return True
+
+    # ========== HIT-RATE TRACKING ==========
+
+    def _snapshot_counters(self) -> Dict[str, int]:
+        """Capture cumulative hit/miss counters from the response and embedding caches."""
+        counters = {"response_hits": 0, "response_misses": 0, "embedding_hits": 0, "embedding_misses": 0}
+        try:
+            response_stats = get_query_response_cache().get_stats()
+            counters["response_hits"] = int(response_stats.get("total_hits", 0) or 0)
+            counters["response_misses"] = int(response_stats.get("total_misses", 0) or 0)
+        except Exception as e:
+            logger.debug(f"Response cache stats unavailable: {e}")
+        try:
+            embedding_stats = get_advanced_cache().get_stats().get("embedding", {})
+            counters["embedding_hits"] = int(embedding_stats.get("hits", 0) or 0)
+            counters["embedding_misses"] = int(embedding_stats.get("misses", 0) or 0)
+        except Exception as e:
+            logger.debug(f"Advanced cache stats unavailable: {e}")
+        return counters
+
+    def hit_rate_uplift(self, current: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """Compare cache hit rates of traffic served since the last run against the rate before it.
+
+        The baseline is the cumulative rate when the run started; the post-run window only
+        counts lookups made after the run finished, so the warmer's own lookups are excluded.
+        """
+        if not self._baseline_counters or not self._post_run_counters:
+            return {"response": None, "embedding": None}
+
+        current = current or self._snapshot_counters()
+        result: Dict[str, Any] = {}
+        for layer in ("response", "embedding"):
+            before = hit_rate(self._baseline_counters[f"{layer}_hits"], self._baseline_counters[f"{layer}_misses"])
+            window_hits = current[f"{layer}_hits"] - self._post_run_counters[f"{layer}_hits"]
+            window_misses = current[f"{layer}_misses"] - self._post_run_counters[f"{layer}_misses"]
+            after = hit_rate(window_hits, window_misses)
+            enough = (window_hits + window_misses) >= self.MIN_UPLIFT_SAMPLE
+            result[layer] = {
+                "before": round(before, 4) if before is not None else None,
+                "after": round(after, 4) if after is not None else None,
+                "sample_size": max(window_hits + window_misses, 0),
+                "uplift": round(after - before, 4) if enough and before is not None and after is not None else None,
+            }
+
+        if PROMETHEUS_AVAILABLE and result["response"]["uplift"] is not None:
+            WARMUP_HIT_RATE_UPLIFT.set(result["response"]["uplift"])
+        return result
+
+    # ========== WARM-UP ==========
+
+    def _is_already_warm(self, question: str) -> bool:
+        if self.generate:
+            return get_query_response_cache().contains(question)
+        return get_advanced_cache().has_embedding(question)
+
+    async def _warm_question(self, question: WarmupQuestion) -> str:
+        """Replay one question; returns the outcome label."""
+        query = question.canonical_question
+        if self._is_already_warm(query):
+            return "already_warm"
+
+        if not await self._wait_for_capacity():
+            return "skipped"
+
+        try:
+            with ollama_priority(Priority.BACKGROUND):
+                if self.generate:
+                    from reranker.rag_chat import RAGChatRequest
+
+                    await self.rag_service.chat(RAGChatRequest(query=query, stream=False))
+                else:
+                    await self.rag_service._get_query_embedding(query)
+            return "warmed"
+        except Exception as e:
+            logger.warning(f"Warm-up failed for question {question.question_hash}: {e}")
+            return "failed"
+
+    async def run(self, reason: str = "manual") -> Dict[str, Any]:
+        """Execute one warm-up pass over the top questions."""
+        started = time.time()
+        self._status.update(
+            running=True,
+            reason=reason,
+            started_at=datetime.utcnow().isoformat(),
+            finished_at=None,
+            total=0,
+            completed=0,
+            warmed=0,
+            already_warm=0,
+            skipped=0,
+            failed=0,
+        )
+        self._baseline_counters = self._snapshot_counters()
+        self._post_run_counters = None
+        if PROMETHEUS_AVAILABLE:
+            WARMUP_PROGRESS.set(0)
+
+        try:
+            if reason == "ingestion":
+                await self.rag_service.rebuild_hybrid_index()
+
+            questions = await asyncio.to_thread(self.fetch_top_questions)
+            self._status["total"] = len(questions)
+            logger.info(f"Cache warm-up ({reason}) starting for {len(questions)} questions")
+
+            # Never occupy more than one slot per healthy instance
+            concurrency = max(1, min(self.concurrency, self._healthy_instance_count()))
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def worker(question: WarmupQuestion) -> None:
+                async with semaphore:
+                    outcome = await self._warm_question(question)
+                    if outcome == "warmed" and self.delay_seconds:
+                        await asyncio.sleep(self.delay_seconds)
+                self._status["completed"] += 1
+                self._status[outcome] += 1
+                if PROMETHEUS_AVAILABLE:
+                    WARMUP_QUESTIONS.labels(outcome=outcome).inc()
+                    WARMUP_PROGRESS.set(self._status["completed"] / max(self._status["total"], 1))
+
+            await asyncio.gather(*(worker(q) for q in questions))
+        except Exception as e:
+            logger.error(f"Cache warm-up ({reason}) aborted: {e}")
+        finally:
+            self._post_run_counters = self._snapshot_counters()
+            self._status.update(running=False, finished_at=datetime.utcnow().isoformat())
+            self._status["runs"] += 1
+
+        logger.info(
+            f"Cache warm-up ({reason}) finished in {time.time() - started:.1f}s: "
+            f"warmed={self._status['warmed']} already_warm={self._status['already_warm']} "
+            f"skipped={self._status['skipped']} failed={self._status['failed']}"
+        )
+        return self.get_status()
+
+    def trigger(self, reason: str = "manual") -> bool:
+        """Start a run in the background unless one is already in progress."""
+        if self.is_running():
+            return False
+        self._task = asyncio.create_task(self.run(reason))
+        return True
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def run_background(self) -> None:
+        """Warm once after startup, then re-warm whenever an ingestion batch completes."""
+        try:
+            self._ingestion_watermark = await asyncio.to_thread(self.fetch_ingestion_watermark)
+        except Exception as e:
+            logger.warning(f"Could not read ingestion watermark: {e}")
+
+        await asyncio.sleep(max(0, self.settings.cache_warmup_startup_delay_seconds))
+        self.trigger("deploy")
+
+        poll_seconds = max(10, self.settings.cache_warmup_poll_seconds)
+        while True:
+            await asyncio.sleep(poll_seconds)
+            try:
+                latest = await asyncio.to_thread(self.fetch_ingestion_watermark)
+            except Exception as e:
+                logger.debug(f"Ingestion watermark poll failed: {e}")
+                continue
+            if latest is not None and (self._ingestion_watermark is None or latest > self._ingestion_watermark):
+                if self.trigger("ingestion"):
+                    self._ingestion_watermark = latest
+
+    def get_status(self) -> Dict[str, Any]:
+        """Return progress of the current/last run and the observed hit-rate uplift."""
+        status = dict(self._status)
+        status["progress"] = round(status["completed"] / status["total"], 4) if status["total"] else 0.0
+        status["hit_rate_uplift"] = self.hit_rate_uplift()
+        return status
+
+
+# Global warmer instance
+_cache_warmer: Optional[CacheWarmer] = None
+
+
+def get_cache_warmer(rag_service: Any = None) -> CacheWarmer:
+    """Get or create the global cache warmer instance."""
+    global _cache_warmer
+    if _cache_warmer is None:
+        if rag_service is None:
+            raise RuntimeError("Cache warmer not initialized; a RAGChatService is required")
+        _cache_warmer = CacheWarmer(rag_service)
+    return _cache_warmer
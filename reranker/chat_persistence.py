@@ -0,0 +1,368 @@
+from datetime import datetime, timezone
+from utils.logging_config import setup_logging
+
+# Setup standardized Log4 logging
+logger = setup_logging(
+    program_name='chat_persistence',
+    log_level='INFO',
+    log_file=f'/app/logs/chat_persistence_{datetime.now().strftime("%Y%m%d")}.log',
+    console_output=True
+)
+if logger is None:
+    # Tests may stub setup_logging to a noop; fall back to standard logging to avoid None logger
+    import logging
+
+    logger = logging.getLogger("chat_persistence")
+
+"""
+Write-Behind Chat Persistence
+
+A chat turn produces a user message, an assistant message and a question-usage
+analytics record. Writing each one with its own connect/commit cycle inside the
+streaming generator put several database round trips in front of the first SSE
+byte and between the answer and its tokens.
+
+Instead the chat endpoint enqueues turn records in process and returns
+immediately. A background task drains the queue every
+``chat_write_behind_flush_ms`` (or as soon as ``chat_write_behind_batch_size``
+records are waiting) and writes each batch with multi-row ``unnest`` inserts in
+a single transaction: messages, ``conversations.updated_at`` and
+``last_activity`` (the conversation list's sort key), question patterns,
+question usage and its statistics rollups (``reranker.question_stats``).
+
+- Message timestamps are taken at enqueue time and written explicitly, so
+  history order does not depend on when a batch is flushed.
+- ``pending_messages`` exposes queued messages of a conversation so the next
+  turn can read its history before the flush has landed.
+- A batch rejected for its data (e.g. the conversation was deleted meanwhile) is
+  bisected to drop only the offending records; any other failure keeps the
+  batch queued for the next flush.
+- ``close`` flushes what is left on graceful shutdown (FastAPI lifespan).
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+from reranker.metrics_registry import PROMETHEUS_AVAILABLE, get_or_create_metric
+from reranker.question_stats import apply_usage_rollups
+from reranker.reranker_config import get_settings
+
+try:
+    from asyncpg.exceptions import DataError, IntegrityConstraintViolationError
+
+    RECORD_ERRORS: Tuple[type, ...] = (DataError, IntegrityConstraintViolationError)
+except ImportError:  # pragma: no cover - optional dependency guard
+    RECORD_ERRORS = ()
+
+if PROMETHEUS_AVAILABLE:
+    from prometheus_client import Counter, Gauge, Histogram
+
+    WRITE_BEHIND_PENDING = get_or_create_metric(
+        Gauge, "chat_write_behind_pending", "Chat records waiting to be written to Postgres"
+    )
+    WRITE_BEHIND_RECORDS = get_or_create_metric(
+        Counter,
+        "chat_write_behind_records_total",
+        "Chat records handled by the write-behind queue",
+        ["kind", "outcome"],
+    )
+    WRITE_BEHIND_FLUSH_SECONDS = get_or_create_metric(
+        Histogram,
+        "chat_write_behind_flush_seconds",
+        "Time to write one batch of chat records",
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    )
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class MessageRecord:
+    """One row for the ``messages`` table."""
+
+    conversation_id: int
+    role: str
+    content: str
+    citations: Optional[Any] = None
+    created_at: datetime = field(default_factory=_utcnow)
+
+
+@dataclass
+class QuestionUsageRecord:
+    """One ``question_usage`` row plus the ``question_patterns`` row it points to."""
+
+    question_hash: str
+    category: str
+    question_text: str
+    user_id: int
+    conversation_id: int
+    response_time_ms: int
+    quality_score: float
+    search_method: str
+    citations_count: int
+    context_length: int
+    created_at: datetime = field(default_factory=_utcnow)
+
+
+ChatRecord = Union[MessageRecord, QuestionUsageRecord]
+
+
+def _kind(record: ChatRecord) -> str:
+    return "message" if isinstance(record, MessageRecord) else "question_usage"
+
+
+class ChatPersistenceStore:
+    """Multi-row Postgres writes for chat records (asyncpg pool from db_pool)."""
+
+    record_errors: Tuple[type, ...] = RECORD_ERRORS
+
+    async def write_batch(self, messages: Sequence[MessageRecord], usages: Sequence[QuestionUsageRecord]) -> None:
+        from reranker.db_pool import get_db_pool
+
+        pool = await get_db_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                if messages:
+                    await conn.execute(
+                        """INSERT INTO messages (conversation_id, role, content, citations, created_at)
+                           SELECT m.conversation_id, m.role, m.content, m.citations::jsonb, m.created_at
+                           FROM unnest($1::bigint[], $2::text[], $3::text[], $4::text[], $5::timestamptz[])
+                                AS m(conversation_id, role, content, citations, created_at)""",
+                        [m.conversation_id for m in messages],
+                        [m.role for m in messages],
+                        [m.content for m in messages],
+                        [json.dumps(m.citations) if m.citations is not None else None for m in messages],
+                        [m.created_at for m in messages],
+                    )
+                    latest: Dict[int, datetime] = {}
+                    for m in messages:
+                        latest[m.conversation_id] = max(latest.get(m.conversation_id, m.created_at), m.created_at)
+                    await conn.execute(
+                        """UPDATE conversations c
+                           SET updated_at = GREATEST(c.updated_at, u.updated_at),
+                               last_activity = GREATEST(c.last_activity, u.updated_at)
+                           FROM unnest($1::bigint[], $2::timestamptz[]) AS u(id, updated_at)
+                           WHERE c.id = u.id""",
+                        list(latest),
+                        list(latest.values()),
+                    )
+                if usages:
+                    # One row per hash: ON CONFLICT cannot touch the same row twice in a statement
+                    patterns = {u.question_hash: u for u in usages}
+                    pattern_rows = await conn.fetch(
+                        """INSERT INTO question_patterns (question_hash, canonical_question, category)
+                           SELECT * FROM unnest($1::text[], $2::text[], $3::text[])
+                           ON CONFLICT (question_hash) DO UPDATE SET
+                               canonical_question = EXCLUDED.canonical_question,
+                               category = EXCLUDED.category
+                           RETURNING id, question_hash""",
+                        list(patterns),
+                        [u.question_text[:500] for u in patterns.values()],
+                        [u.category for u in patterns.values()],
+                    )
+                    await conn.execute(
+                        """INSERT INTO question_usage (
+                               question_pattern_id, user_id, conversation_id, question_text,
+                               response_time_ms, response_quality_score, context_length,
+                               search_method, citations_count, created_at)
+                           SELECT p.id, u.user_id, u.conversation_id, u.question_text,
+                                  u.response_time_ms, u.quality_score, u.context_length,
+                                  u.search_method, u.citations_count, u.created_at
+                           FROM unnest($1::text[], $2::bigint[], $3::bigint[], $4::text[], $5::int[],
+                                       $6::float8[], $7::int[], $8::text[], $9::int[], $10::timestamptz[])
+                                AS u(question_hash, user_id, conversation_id, question_text, response_time_ms,
+                                     quality_score, context_length, search_method, citations_count, created_at)
+                           JOIN question_patterns p ON p.question_hash = u.question_hash""",
+                        [u.question_hash for u in usages],
+                        [u.user_id for u in usages],
+                        [u.conversation_id for u in usages],
+                        [u.question_text for u in usages],
+                        [u.response_time_ms for u in usages],
+                        [u.quality_score for u in usages],
+                        [u.context_length for u in usages],
+                        [u.search_method for u in usages],
+                        [u.citations_count for u in usages],
+                        [u.created_at for u in usages],
+                    )
+                    # Admin statistics read these rollups instead of scanning question_usage
+                    await apply_usage_rollups(
+                        conn, list(usages), {row["question_hash"]: row["id"] for row in pattern_rows}
+                    )
+
+
+class ChatPersistence:
+    """In-process write-behind queue for chat turn records."""
+
+    def __init__(self, store: Optional[ChatPersistenceStore] = None, settings=None):
+        self.store = store or ChatPersistenceStore()
+        self.settings = settings or get_settings()
+        self.batch_size = max(1, self.settings.chat_write_behind_batch_size)
+        self.flush_interval = max(0.0, self.settings.chat_write_behind_flush_ms / 1000.0)
+        self.max_pending = max(self.batch_size, self.settings.chat_write_behind_max_pending)
+        self._buffer: Deque[ChatRecord] = deque()
+        self._inflight: List[ChatRecord] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.stats: Dict[str, int] = {"enqueued": 0, "written": 0, "rejected": 0, "dropped": 0}
+
+    def _count(self, record: ChatRecord, outcome: str, amount: int = 1) -> None:
+        self.stats[outcome] += amount
+        if PROMETHEUS_AVAILABLE and WRITE_BEHIND_RECORDS is not None:
+            WRITE_BEHIND_RECORDS.labels(kind=_kind(record), outcome=outcome).inc(amount)
+
+    def _update_gauge(self) -> None:
+        if PROMETHEUS_AVAILABLE and WRITE_BEHIND_PENDING is not None:
+            WRITE_BEHIND_PENDING.set(len(self._buffer) + len(self._inflight))
+
+    def enqueue(self, record: ChatRecord) -> None:
+        """Queue a record for the next flush; never blocks or touches the database."""
+        if len(self._buffer) >= self.max_pending:
+            # Database unreachable for a long time: shed the oldest record rather than grow unbounded
+            dropped = self._buffer.popleft()
+            self._count(dropped, "dropped")
+            logger.error("Chat write-behind queue full; dropped oldest %s record", _kind(dropped))
+        self._buffer.append(record)
+        self._count(record, "enqueued")
+        self._update_gauge()
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def add_message(
+        self, conversation_id: int, role: str, content: str, citations: Optional[Any] = None
+    ) -> MessageRecord:
+        record = MessageRecord(conversation_id=conversation_id, role=role, content=content, citations=citations)
+        self.enqueue(record)
+        return record
+
+    def pending_messages(self, conversation_id: int) -> List[MessageRecord]:
+        """Queued or in-flight messages of a conversation, oldest first."""
+        records = list(self._inflight) + list(self._buffer)
+        return [r for r in records if isinstance(r, MessageRecord) and r.conversation_id == conversation_id]
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer) + len(self._inflight)
+
+    async def _write(self, batch: List[ChatRecord], done: List[ChatRecord]) -> None:
+        """Write a batch; isolate records the database rejects by bisecting.
+
+        Records that are committed (or dropped as rejected) are appended to ``done``,
+        so when a later write fails only the remaining records are retried.
+        """
+        messages = [r for r in batch if isinstance(r, MessageRecord)]
+        usages = [r for r in batch if isinstance(r, QuestionUsageRecord)]
+        try:
+            await self.store.write_batch(messages, usages)
+        except getattr(self.store, "record_errors", ()) as exc:
+            if len(batch) == 1:
+                self._count(batch[0], "rejected")
+                done.append(batch[0])
+                logger.error(f"Dropped chat {_kind(batch[0])} record rejected by the database: {exc}")
+                return
+            middle = len(batch) // 2
+            await self._write(batch[:middle], done)
+            await self._write(batch[middle:], done)
+            return
+        done.extend(batch)
+        for record in batch:
+            self._count(record, "written")
+
+    def _requeue_unwritten(self, batch: List[ChatRecord], done: List[ChatRecord]) -> int:
+        """Put the records of ``batch`` not in ``done`` back at the head of the queue, in order."""
+        handled = {id(record) for record in done}
+        pending = [record for record in batch if id(record) not in handled]
+        self._buffer.extendleft(reversed(pending))
+        return len(pending)
+
+    async def flush(self) -> int:
+        """Write everything queued so far in batches; returns the number of records written."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        written_before = self.stats["written"]
+        async with self._flush_lock:
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                self._inflight = batch
+                done: List[ChatRecord] = []
+                start = time.time()
+                try:
+                    await self._write(batch, done)
+                except asyncio.CancelledError:
+                    self._requeue_unwritten(batch, done)
+                    raise
+                except Exception as exc:
+                    # Database unavailable: keep the records not yet committed, in order, for the next flush
+                    kept = self._requeue_unwritten(batch, done)
+                    logger.warning(f"Chat write-behind flush failed ({kept} records kept): {exc}")
+                    break
+                finally:
+                    self._inflight = []
+                    self._update_gauge()
+                if PROMETHEUS_AVAILABLE and WRITE_BEHIND_FLUSH_SECONDS is not None:
+                    WRITE_BEHIND_FLUSH_SECONDS.observe(time.time() - start)
+        return self.stats["written"] - written_before
+
+    async def run_background(self) -> None:
+        """Flush on a timer, or early when a full batch is waiting, until close()."""
+        wakeup = self._wakeup or asyncio.Event()
+        while not self._closing:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            await self.flush()
+
+    def start(self) -> asyncio.Task:
+        self._closing = False
+        # Fresh primitives per event loop (the app may be started more than once, e.g. in tests)
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self.run_background())
+        return self._task
+
+    async def close(self, timeout: Optional[float] = None) -> None:
+        """Stop the background task and flush what is still queued."""
+        self._closing = True
+        if self._task is not None:
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._task, timeout=timeout)
+            except Exception as exc:
+                logger.error(f"Chat write-behind task did not stop cleanly: {exc}")
+            self._task = None
+        try:
+            await asyncio.wait_for(self.flush(), timeout=timeout)
+        except Exception as exc:
+            logger.error(f"Final chat write-behind flush failed: {exc}")
+        if self._buffer:
+            logger.error(f"{len(self._buffer)} chat records were not persisted at shutdown")
+
+    def get_status(self) -> Dict[str, Any]:
+        return {"pending": self.pending, **self.stats}
+
+
+# Global write-behind queue
+_chat_persistence: Optional[ChatPersistence] = None
+_chat_persistence_lock = Lock()
+
+
+def get_chat_persistence() -> ChatPersistence:
+    """Get or create the global chat write-behind queue."""
+    global _chat_persistence
+
+    if _chat_persistence is None:
+        with _chat_persistence_lock:
+            if _chat_persistence is None:
+                _chat_persistence = ChatPersistence()
+
+    return _chat_persistence
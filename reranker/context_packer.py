@@ -0,0 +1,352 @@
+from datetime import datetime
+from utils.logging_config import setup_logging
+
+# Setup standardized Log4 logging
+logger = setup_logging(
+    program_name='context_packer',
+    log_level='INFO',
+    log_file=f'/app/logs/context_packer_{datetime.now().strftime("%Y%m%d")}.log',
+    console_output=True
+)
+if logger is None:
+    # Tests may stub setup_logging to a noop; fall back to standard logging to avoid None logger
+    import logging
+
+    logger = logging.getLogger("context_packer")
+
+"""
+Token-Accurate Context Packing
+
+Retrieved chunks are packed into the prompt by counting real tokens instead of
+assuming a fixed size per chunk. Chunks arrive best-ranked first; the packer
+keeps as many as fit the model's context budget (context window minus
+``max_tokens`` for the answer and a safety margin) and drops the lowest-ranked
+remainder.
+
+The request's ``num_ctx`` is then set to the smallest configured bucket that
+holds the packed prompt plus ``max_tokens``, rather than the model's maximum, so
+Ollama allocates a KV cache sized to the request and prefill stays short. The
+buckets are deliberately coarse: Ollama reloads a model runner when a request
+asks for a different ``num_ctx``, so a few sizes keep reloads rare.
+
+Token counting per model family, in order of preference:
+1. The family's own ``tokenizer.json`` under ``CONTEXT_TOKENIZER_DIR`` (exact,
+   needs the ``tokenizers`` package), laid out as
+   ``<CONTEXT_TOKENIZER_DIR>/<family>/tokenizer.json`` with the family names of
+   ``MODEL_FAMILIES`` (``mistral``, ``llama3``, ``qwen``, ...). The files are not
+   shipped; copy them from the models' Hugging Face repositories.
+2. tiktoken ``cl100k_base`` scaled by a per-family correction factor. tiktoken
+   downloads the encoding on first use and caches it in ``TIKTOKEN_CACHE_DIR``;
+   the reranker image fetches it at build time so the service does not need
+   network access for it.
+3. A characters-per-token heuristic.
+
+``TokenCounter.load()`` reads all of these up front. The service runs it in a
+worker thread at startup; requests that arrive before it finishes use the
+heuristic rather than loading (or downloading) on the event loop.
+"""
+
+import math
+import os
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from reranker.reranker_config import get_settings
+
+try:
+    from tokenizers import Tokenizer
+
+    TOKENIZERS_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    Tokenizer = None
+    TOKENIZERS_AVAILABLE = False
+
+try:
+    import tiktoken
+
+    TIKTOKEN_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+    TIKTOKEN_AVAILABLE = False
+
+# Model name prefixes -> tokenizer family (first match wins)
+MODEL_FAMILIES: Tuple[Tuple[str, str], ...] = (
+    ("codellama", "llama2"),
+    ("llama2", "llama2"),
+    ("llama3", "llama3"),
+    ("llama", "llama3"),
+    ("mistral", "mistral"),
+    ("mixtral", "mistral"),
+    ("qwen", "qwen"),
+    ("deepseek", "deepseek"),
+    ("gemma", "gemma"),
+    ("phi", "phi"),
+    ("nomic-embed", "bert"),
+)
+
+# Observed tokens per cl100k token for each family, used when the family's own
+# tokenizer is not available locally (SentencePiece vocabularies split finer)
+CL100K_CORRECTION: Dict[str, float] = {
+    "llama2": 1.25,
+    "mistral": 1.25,
+    "gemma": 1.1,
+    "llama3": 1.0,
+    "qwen": 1.05,
+    "deepseek": 1.1,
+    "phi": 1.05,
+    "bert": 1.15,
+    "default": 1.2,
+}
+
+# Heuristic fallback when no tokenizer library is installed
+CHARS_PER_TOKEN = 3.2
+
+# Chat-template tokens added per message (role markers, BOS/EOS)
+MESSAGE_OVERHEAD_TOKENS = 8
+
+
+def model_family(model: Optional[str]) -> str:
+    """Map an Ollama model name (e.g. ``mistral:7b``) to its tokenizer family."""
+    name = (model or "").lower().split("/")[-1]
+    for prefix, family in MODEL_FAMILIES:
+        if name.startswith(prefix):
+            return family
+    return "default"
+
+
+def parse_buckets(value: str) -> List[int]:
+    """Parse a comma-separated list of num_ctx sizes into a sorted list."""
+    buckets = set()
+    for part in (value or "").split(","):
+        part = part.strip()
+        if part.isdigit() and int(part) > 0:
+            buckets.add(int(part))
+    return sorted(buckets)
+
+
+def choose_num_ctx(required_tokens: int, buckets: Sequence[int], max_ctx: int) -> int:
+    """Smallest bucket holding ``required_tokens``, capped at the model's maximum."""
+    for bucket in buckets:
+        if bucket >= required_tokens and bucket <= max_ctx:
+            return bucket
+    return max_ctx
+
+
+class TokenCounter:
+    """Counts tokens per model family, loading each family's tokenizer once."""
+
+    def __init__(self, tokenizer_dir: Optional[str] = None):
+        self.tokenizer_dir = tokenizer_dir
+        self._tokenizers: Dict[str, Any] = {}
+        self._cl100k = None
+        self._lock = Lock()
+        self._loading = False
+
+    def load(self) -> Dict[str, str]:
+        """Load every family tokenizer and the cl100k encoding; returns the method per family.
+
+        Blocking (file reads and possibly the tiktoken download), so callers on the
+        event loop run it in a worker thread. Lookups made meanwhile do not wait
+        for it; they count with the heuristic until loading finishes.
+        """
+        self._loading = True
+        try:
+            families = sorted({family for _, family in MODEL_FAMILIES} | {"default"})
+            for family in families:
+                self._load_family_tokenizer(family)
+            self._load_cl100k()
+        finally:
+            self._loading = False
+        fallback = "cl100k" if self._cl100k else "heuristic"
+        return {family: "exact" if self._tokenizers.get(family) is not None else fallback for family in families}
+
+    def _family_tokenizer(self, family: str):
+        if family in self._tokenizers:
+            return self._tokenizers[family]
+        if self._loading:
+            return None
+        return self._load_family_tokenizer(family)
+
+    def _load_family_tokenizer(self, family: str):
+        with self._lock:
+            if family in self._tokenizers:
+                return self._tokenizers[family]
+            tokenizer = None
+            if TOKENIZERS_AVAILABLE and self.tokenizer_dir:
+                path = os.path.join(self.tokenizer_dir, family, "tokenizer.json")
+                if os.path.exists(path):
+                    try:
+                        tokenizer = Tokenizer.from_file(path)
+                        logger.info(f"Loaded {family} tokenizer from {path}")
+                    except Exception as e:
+                        logger.warning(f"Failed to load tokenizer {path}: {e}")
+            self._tokenizers[family] = tokenizer
+            return tokenizer
+
+    def _cl100k_encoding(self):
+        if self._cl100k is None and not self._loading:
+            self._load_cl100k()
+        return self._cl100k or None
+
+    def _load_cl100k(self) -> None:
+        if self._cl100k is not None or not TIKTOKEN_AVAILABLE:
+            return
+        try:
+            self._cl100k = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # Not in TIKTOKEN_CACHE_DIR and not downloadable (offline host): fall back to the heuristic
+            logger.warning(f"tiktoken cl100k_base unavailable: {e}")
+            self._cl100k = False
+
+    def method(self, model: Optional[str]) -> str:
+        """Which counting method applies to a model: "exact", "cl100k" or "heuristic"."""
+        if self._family_tokenizer(model_family(model)) is not None:
+            return "exact"
+        if self._cl100k_encoding() is not None:
+            return "cl100k"
+        return "heuristic"
+
+    def count(self, text: str, model: Optional[str] = None) -> int:
+        if not text:
+            return 0
+        family = model_family(model)
+        tokenizer = self._family_tokenizer(family)
+        if tokenizer is not None:
+            return len(tokenizer.encode(text, add_special_tokens=False).ids)
+        encoding = self._cl100k_encoding()
+        correction = CL100K_CORRECTION.get(family, CL100K_CORRECTION["default"])
+        if encoding is not None:
+            return math.ceil(len(encoding.encode(text, disallowed_special=())) * correction)
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+    def count_messages(self, prompt_dict: Dict[str, Any], model: Optional[str] = None) -> int:
+        """Tokens for a system + history + user chat prompt including template overhead."""
+        texts = [prompt_dict.get("system", "")]
+        texts.extend(message.get("content", "") for message in prompt_dict.get("history") or [])
+        texts.append(prompt_dict.get("user", ""))
+        return sum(self.count(text, model) + MESSAGE_OVERHEAD_TOKENS for text in texts if text)
+
+
+@dataclass
+class PackedContext:
+    """Result of packing retrieved chunks into a prompt."""
+
+    chunks: List[str]
+    metadata: List[Dict[str, Any]]
+    prompt: Dict[str, Any]
+    prompt_tokens: int
+    num_ctx: int
+    dropped: int = 0
+    method: str = "heuristic"
+    chunk_tokens: List[int] = field(default_factory=list)
+    history_dropped: int = 0
+
+
+class ContextPacker:
+    """Fits ranked context chunks into a model's token budget and sizes num_ctx."""
+
+    def __init__(self, settings=None, counter: Optional[TokenCounter] = None):
+        self.settings = settings or get_settings()
+        self.enabled = self.settings.context_packing_enabled
+        self.counter = counter or TokenCounter(self.settings.context_tokenizer_dir)
+        self.buckets = parse_buckets(self.settings.context_num_ctx_buckets)
+        self.safety_margin = self.settings.context_safety_margin_tokens
+
+    def pack(
+        self,
+        build_prompt: Callable[..., Dict[str, Any]],
+        chunks: List[str],
+        metadata: List[Dict[str, Any]],
+        model: str,
+        max_tokens: int,
+        max_ctx: int,
+        history: Optional[List[Dict[str, str]]] = None,
+    ) -> PackedContext:
+        """Keep the best-ranked chunks whose prompt fits ``max_ctx - max_tokens``.
+
+        ``build_prompt(chunks)`` renders the system/user prompt for a chunk list;
+        chunks are assumed ordered best first and are dropped from the tail. When
+        ``history`` is given the prompt is rendered as ``build_prompt(chunks, history)``
+        and the oldest turns are dropped, a user/assistant pair at a time, while the
+        history leaves no room for the best-ranked chunk.
+        """
+        if history is None:
+            turns: List[Dict[str, str]] = []
+
+            def render(kept: List[str], _turns: List[Dict[str, str]]) -> Dict[str, Any]:
+                return build_prompt(kept)
+
+        else:
+            turns = list(history)
+            render = build_prompt
+
+        if not self.enabled:
+            prompt = render(chunks, turns)
+            return PackedContext(chunks, metadata, prompt, self.counter.count_messages(prompt, model), max_ctx)
+
+        budget = max(0, max_ctx - max_tokens - self.safety_margin)
+        chunk_tokens = [self.counter.count(chunk, model) for chunk in chunks]
+        first_chunk = chunk_tokens[0] + MESSAGE_OVERHEAD_TOKENS if chunk_tokens else 0
+
+        history_dropped = 0
+        base_tokens = self.counter.count_messages(render([], turns), model)
+        while turns and base_tokens + first_chunk > budget:
+            drop = min(2, len(turns))
+            turns = turns[drop:]
+            history_dropped += drop
+            base_tokens = self.counter.count_messages(render([], turns), model)
+
+        # Greedy by rank using per-chunk counts (plus a few tokens for the "Context n:" label)
+        keep = 0
+        used = base_tokens
+        for tokens in chunk_tokens:
+            if used + tokens + MESSAGE_OVERHEAD_TOKENS > budget:
+                break
+            used += tokens + MESSAGE_OVERHEAD_TOKENS
+            keep += 1
+
+        # Verify against the fully rendered prompt; separators can differ from the estimate
+        prompt = render(chunks[:keep], turns)
+        prompt_tokens = self.counter.count_messages(prompt, model)
+        while keep > 0 and prompt_tokens > budget:
+            keep -= 1
+            prompt = render(chunks[:keep], turns)
+            prompt_tokens = self.counter.count_messages(prompt, model)
+
+        dropped = len(chunks) - keep
+        if dropped or history_dropped:
+            logger.info(
+                f"Context packing for {model}: kept {keep}/{len(chunks)} chunks, dropped {history_dropped} "
+                f"history messages ({prompt_tokens} prompt tokens, budget {budget})"
+            )
+
+        num_ctx = choose_num_ctx(prompt_tokens + max_tokens + self.safety_margin, self.buckets, max_ctx)
+        return PackedContext(
+            chunks=chunks[:keep],
+            metadata=metadata[:keep],
+            prompt=prompt,
+            prompt_tokens=prompt_tokens,
+            num_ctx=num_ctx,
+            dropped=dropped,
+            method=self.counter.method(model),
+            chunk_tokens=chunk_tokens[:keep],
+            history_dropped=history_dropped,
+        )
+
+
+# Global packer
+_context_packer: Optional[ContextPacker] = None
+_context_packer_lock = Lock()
+
+
+def get_context_packer() -> ContextPacker:
+    """Get or create the global context packer."""
+    global _context_packer
+
+    if _context_packer is None:
+        with _context_packer_lock:
+            if _context_packer is None:
+                _context_packer = ContextPacker()
+
+    return _context_packer
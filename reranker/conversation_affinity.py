@@ -0,0 +1,255 @@
+from datetime import datetime
+from utils.logging_config import setup_logging
+
+# Setup standardized Log4 logging
+logger = setup_logging(
+    program_name='conversation_affinity',
+    log_level='INFO',
+    log_file=f'/app/logs/conversation_affinity_{datetime.now().strftime("%Y%m%d")}.log',
+    console_output=True
+)
+if logger is None:
+    # Tests may stub setup_logging to a noop; fall back to standard logging to avoid None logger
+    import logging
+
+    logger = logging.getLogger("conversation_affinity")
+
+"""
+Conversation-Affine Routing and Prompt Prefix Reuse
+
+Ollama keeps the KV cache of the last prompt evaluated in each runner slot and
+only re-evaluates the part of a new prompt after the longest shared prefix. For
+a multi-turn chat that reuse happens only if successive turns reach the same
+instance and the earlier turns form an unchanged prompt prefix.
+
+- ``ConsistentHashRing`` maps a ``conversation_id`` to an instance (md5 over
+  virtual nodes, stable across processes and restarts). Adding or removing an
+  instance only remaps the conversations that hashed to it.
+- ``ConversationAffinity`` walks the ring from the conversation's point and
+  takes the first available instance whose outstanding load is within
+  ``conversation_affinity_load_factor_pct`` of the average, or below its
+  scheduler slot count (bounded-load consistent hashing), so failover and hot spots fall through to the next
+  instance on the ring.
+- ``record_prefill`` turns Ollama's ``prompt_eval_count`` /
+  ``prompt_eval_duration`` into prefix-hit and prefill-time metrics: tokens the
+  instance did not have to evaluate were served from the cached prefix. Only
+  prompts counted with the model's exact tokenizer are recorded.
+"""
+
+import bisect
+import hashlib
+import math
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from reranker.load_balancer import get_load_balancer
+from reranker.metrics_registry import PROMETHEUS_AVAILABLE, get_or_create_metric
+from reranker.reranker_config import get_settings
+
+if PROMETHEUS_AVAILABLE:
+    from prometheus_client import Counter, Histogram
+
+    PREFILL_SECONDS = get_or_create_metric(
+        Histogram,
+        "ollama_prefill_seconds",
+        "Prompt evaluation (prefill) time reported by Ollama",
+        ["model"],
+        buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16),
+    )
+    PROMPT_TOKENS = get_or_create_metric(
+        Counter,
+        "ollama_prompt_tokens_total",
+        "Prompt tokens by source (cached prefix vs evaluated)",
+        ["model", "source"],
+    )
+    PREFIX_REQUESTS = get_or_create_metric(
+        Counter,
+        "ollama_prefix_cache_requests_total",
+        "Generations that reused a cached prompt prefix",
+        ["model", "outcome"],
+    )
+    AFFINITY_ROUTES = get_or_create_metric(
+        Counter, "conversation_affinity_routes_total", "Conversation routing decisions", ["outcome"]
+    )
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+def stable_history_window(
+    messages: Sequence[Dict[str, str]], max_turns: int, total_messages: Optional[int] = None
+) -> List[Dict[str, str]]:
+    """Recent user/assistant turns, trimmed in blocks so the kept prefix rarely changes.
+
+    A sliding window would drop the oldest turn on every request and invalidate the
+    cached prefix each time; instead the start moves forward by half the window at
+    once, so consecutive turns share the same history prefix.
+
+    ``total_messages`` is the length of the whole conversation when ``messages``
+    holds only its most recent entries (at least ``2 * max_turns`` of them), so the
+    blocks stay aligned to the start of the conversation.
+    """
+    turns = [dict(role=m["role"], content=m["content"]) for m in messages if m.get("role") in ("user", "assistant")]
+    if max_turns <= 0:
+        return []
+    total = max(len(turns), total_messages or 0)
+    limit = max_turns * 2  # a turn is a user message plus the assistant reply
+    if total <= limit:
+        return turns
+    step = max(2, (limit // 2) & ~1)
+    start = math.ceil((total - limit) / step) * step
+    return turns[max(0, start - (total - len(turns))) :]
+
+
+class ConsistentHashRing:
+    """Consistent hash ring of instance URLs with virtual nodes."""
+
+    def __init__(self, urls: Sequence[str], vnodes: int = 64):
+        self.urls = list(urls)
+        self.vnodes = max(1, vnodes)
+        points: List[Tuple[int, str]] = []
+        for url in self.urls:
+            for i in range(self.vnodes):
+                points.append((_hash(f"{url}#{i}"), url))
+        points.sort()
+        self._hashes = [point for point, _ in points]
+        self._owners = [url for _, url in points]
+
+    def candidates(self, key: str) -> List[str]:
+        """Instances in ring order starting at the key's position (owner first)."""
+        if not self._hashes:
+            return []
+        start = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        ordered: List[str] = []
+        for i in range(len(self._owners)):
+            url = self._owners[(start + i) % len(self._owners)]
+            if url not in ordered:
+                ordered.append(url)
+                if len(ordered) == len(self.urls):
+                    break
+        return ordered
+
+
+class ConversationAffinity:
+    """Pins each conversation to one instance, with bounded-load failover."""
+
+    def __init__(self, load_balancer, settings=None):
+        self.load_balancer = load_balancer
+        self.settings = settings or get_settings()
+        self.enabled = self.settings.conversation_affinity_enabled
+        self.load_factor = self.settings.conversation_affinity_load_factor_pct / 100.0
+        self.ring = ConsistentHashRing(load_balancer.instance_urls, self.settings.conversation_affinity_vnodes)
+        self.stats: Dict[str, int] = {"owner": 0, "failover": 0, "unrouted": 0}
+        self._lock = Lock()
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.stats[outcome] += 1
+        if PROMETHEUS_AVAILABLE and AFFINITY_ROUTES is not None:
+            AFFINITY_ROUTES.labels(outcome=outcome).inc()
+
+    def _load_limit(self) -> int:
+        """Outstanding requests above which an instance is skipped for this conversation.
+
+        Never below the scheduler's slots per instance: an instance with free slots
+        serves the turn immediately, and keeping the cached prefix is worth more.
+        """
+        metrics = self.load_balancer.metrics
+        total = sum(m.in_flight_total for m in metrics.values())
+        average = (total + 1) / max(1, len(metrics))
+        return max(self.settings.scheduler_slots_per_instance, math.ceil(average * self.load_factor))
+
+    def instance_for(self, conversation_id: Optional[str]) -> Optional[str]:
+        """The conversation's instance, or None to fall back to regular routing.
+
+        Only peeks at availability; the caller admits the instance right before sending to it.
+        """
+        if not self.enabled or not conversation_id:
+            return None
+        limit = self._load_limit()
+        for position, url in enumerate(self.ring.candidates(str(conversation_id))):
+            if not self.load_balancer.is_available(url):
+                continue
+            metrics = self.load_balancer.metrics.get(url)
+            if metrics is not None and metrics.in_flight_total >= limit:
+                continue
+            self._count("owner" if position == 0 else "failover")
+            return url
+        self._count("unrouted")
+        return None
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        return {"enabled": self.enabled, "routes": stats, "prefill": prefill_summary()}
+
+
+# In-process prefill totals for the stats endpoint (Prometheus holds the full series)
+_prefill_totals: Dict[str, float] = {
+    "requests": 0,
+    "hits": 0,
+    "prompt_tokens": 0,
+    "cached_tokens": 0,
+    "prefill_seconds": 0.0,
+}
+_prefill_lock = Lock()
+
+
+def record_prefill(model: str, prompt_tokens: int, data: Dict[str, Any]) -> Optional[int]:
+    """Record prefix reuse from an Ollama final response; returns the cached token count.
+
+    ``prompt_tokens`` is the packed prompt size; Ollama's ``prompt_eval_count``
+    covers only the tokens it evaluated, the rest came from the cached prefix.
+    Pass 0 when the prompt was not counted with the model's own tokenizer: an
+    estimated size would show estimation error as cached tokens, so nothing is recorded.
+    """
+    evaluated = data.get("prompt_eval_count")
+    if evaluated is None or prompt_tokens <= 0:
+        return None
+    cached = max(0, prompt_tokens - int(evaluated))
+    seconds = float(data.get("prompt_eval_duration") or 0) / 1e9
+
+    with _prefill_lock:
+        _prefill_totals["requests"] += 1
+        _prefill_totals["hits"] += 1 if cached > 0 else 0
+        _prefill_totals["prompt_tokens"] += prompt_tokens
+        _prefill_totals["cached_tokens"] += cached
+        _prefill_totals["prefill_seconds"] += seconds
+
+    if PROMETHEUS_AVAILABLE and PREFIX_REQUESTS is not None:
+        PREFIX_REQUESTS.labels(model=model, outcome="hit" if cached > 0 else "miss").inc()
+        PROMPT_TOKENS.labels(model=model, source="cached").inc(cached)
+        PROMPT_TOKENS.labels(model=model, source="evaluated").inc(int(evaluated))
+        if seconds > 0:
+            PREFILL_SECONDS.labels(model=model).observe(seconds)
+    return cached
+
+
+def prefill_summary() -> Dict[str, float]:
+    with _prefill_lock:
+        totals = dict(_prefill_totals)
+    requests = totals["requests"] or 1
+    return {
+        "requests": int(totals["requests"]),
+        "prefix_hit_rate": round(totals["hits"] / requests, 3),
+        "cached_token_ratio": round(totals["cached_tokens"] / (totals["prompt_tokens"] or 1), 3),
+        "avg_prefill_ms": round(totals["prefill_seconds"] * 1000 / requests, 1),
+    }
+
+
+# Global affinity router
+_affinity: Optional[ConversationAffinity] = None
+_affinity_lock = Lock()
+
+
+def get_conversation_affinity() -> ConversationAffinity:
+    """Get or create the global conversation affinity router."""
+    global _affinity
+
+    if _affinity is None:
+        with _affinity_lock:
+            if _affinity is None:
+                _affinity = ConversationAffinity(get_load_balancer())
+
+    return _affinity
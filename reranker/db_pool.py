@@ -0,0 +1,112 @@
+from datetime import datetime
+from utils.logging_config import setup_logging
+
+# Setup standardized Log4 logging
+logger = setup_logging(
+    program_name='db_pool',
+    log_level='INFO',
+    log_file=f'/app/logs/db_pool_{datetime.now().strftime("%Y%m%d")}.log',
+    console_output=True
+)
+if logger is None:
+    # Tests may stub setup_logging to a noop; fall back to standard logging to avoid None logger
+    import logging
+
+    logger = logging.getLogger("db_pool")
+
+"""
+Shared async Postgres connection pool (asyncpg).
+
+Request handlers that run on the event loop should use this pool instead of
+opening a fresh psycopg2 connection per call (reranker.cache.get_db_connection),
+which blocks the loop for the connect + query round trips.
+
+Queries use asyncpg placeholders ($1, $2, ...). The pool is created lazily on first
+use and closed from the FastAPI lifespan via close_db_pool().
+"""
+
+import asyncio
+from typing import Any, List, Optional
+
+from reranker.reranker_config import get_settings
+
+try:
+    import asyncpg
+except ImportError:  # pragma: no cover - optional dependency guard
+    asyncpg = None  # type: ignore
+
+_pool: Optional["asyncpg.Pool"] = None
+_pool_lock: Optional[asyncio.Lock] = None
+
+
+async def get_db_pool() -> "asyncpg.Pool":
+    """Get or create the shared asyncpg pool.
+
+    Raises:
+        RuntimeError: If asyncpg is not installed
+    """
+    global _pool, _pool_lock
+
+    if _pool is not None:
+        return _pool
+    if asyncpg is None:
+        raise RuntimeError("asyncpg is not installed; async DB pool unavailable")
+
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+
+    async with _pool_lock:
+        if _pool is None:
+            settings = get_settings()
+            _pool = await asyncpg.create_pool(
+                host=settings.db_host,
+                port=settings.db_port,
+                database=settings.db_name,
+                user=settings.db_user,
+                password=settings.db_password,
+                min_size=max(0, settings.db_pool_min_size),
+                max_size=max(1, settings.db_pool_max_size),
+                command_timeout=30,
+            )
+            logger.info(
+                f"Async DB pool created ({settings.db_host}:{settings.db_port}/{settings.db_name}, "
+                f"size {settings.db_pool_min_size}-{settings.db_pool_max_size})"
+            )
+    return _pool
+
+
+async def close_db_pool() -> None:
+    """Close the shared pool (called on application shutdown)."""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+        logger.info("Async DB pool closed")
+
+
+async def fetch(query: str, *args: Any) -> List[Any]:
+    """Run a query and return all rows (asyncpg Records)."""
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        return await conn.fetch(query, *args)
+
+
+async def fetchrow(query: str, *args: Any) -> Optional[Any]:
+    """Run a query and return the first row, or None."""
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        return await conn.fetchrow(query, *args)
+
+
+async def fetchval(query: str, *args: Any) -> Any:
+    """Run a query and return the first column of the first row."""
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        return await conn.fetchval(query, *args)
+
+
+async def execute(query: str, *args: Any) -> str:
+    """Run a statement and return its status string."""
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        return await conn.execute(query, *args)
@@ -0,0 +1,109 @@
+from datetime import datetime
+from utils.logging_config import setup_logging
+
+# Setup standardized Log4 logging
+logger = setup_logging(
+    program_name='decomposition_runner',
+    log_level='INFO',
+    log_file=f'/app/logs/decomposition_runner_{datetime.now().strftime("%Y%m%d")}.log',
+    console_output=True
+)
+if logger is None:
+    # Tests may stub setup_logging to a noop; fall back to standard logging to avoid None logger
+    import logging
+
+    logger = logging.getLogger("decomposition_runner")
+
+"""
+Concurrent Sub-Request Execution
+
+Answers the sub-requests of a decomposed question concurrently instead of one
+after another, so an N-part question costs roughly one generation of latency
+rather than N. Parallelism is bounded by ``decomposition_max_parallel``; each
+sub-request uses the model ``select_model_for_complexity`` picks for it and runs
+at DECOMPOSITION scheduler priority, leaving the load balancer to place the
+different models on instances that have them loaded.
+
+Results are yielded as each sub-answer completes, so the chat endpoint can
+stream partial answers and then feed the in-memory results straight into the
+rethink/rerank synthesis.
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from reranker.ollama_scheduler import Priority, ollama_priority
+from reranker.reranker_config import get_settings
+from utils.redis_cache import cache_sub_request_result, get_sub_request_result
+
+
+async def _answer_sub_request(rag_service: Any, decomposer: Any, sub_request: Any) -> Dict[str, Any]:
+    """Answer one sub-request (reusing a cached answer); never raises for generation errors."""
+    from reranker.rag_chat import RAGChatRequest
+
+    cached = await asyncio.to_thread(get_sub_request_result, sub_request.id)
+    if cached:
+        return cached
+
+    model = decomposer.select_model_for_complexity(sub_request.complexity)
+    request = RAGChatRequest(
+        query=sub_request.sub_query,
+        use_context=True,
+        max_context_chunks=5,
+        model=model,
+        temperature=0.2,
+        max_tokens=300,
+        stream=False,
+    )
+    start = time.time()
+    try:
+        with ollama_priority(Priority.DECOMPOSITION):
+            response = await rag_service.chat(request)
+    except Exception as exc:  # tolerate generation errors per sub-request
+        logger.exception("Sub-request generation failed: %s", exc)
+        return {
+            "id": sub_request.id,
+            "sub_query": sub_request.sub_query,
+            "response": "",
+            "model": model,
+            "time_ms": int((time.time() - start) * 1000),
+            "confidence": 0.0,
+        }
+
+    result = {
+        "id": sub_request.id,
+        "sub_query": sub_request.sub_query,
+        "response": response.response,
+        "model": response.model,
+        "time_ms": int((time.time() - start) * 1000),
+        "confidence": 1.0,
+    }
+    try:
+        await asyncio.to_thread(cache_sub_request_result, sub_request.id, result)
+    except Exception:
+        logger.debug("Failed to cache sub-request result (continuing)")
+    return result
+
+
+async def run_sub_requests(
+    rag_service: Any, decomposer: Any, sub_requests: List[Any], max_parallel: Optional[int] = None
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """Answer sub-requests concurrently, yielding ``(index, result)`` in completion order."""
+    if max_parallel is None:
+        max_parallel = get_settings().decomposition_max_parallel
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+
+    async def bounded(index: int, sub_request: Any) -> Tuple[int, Dict[str, Any]]:
+        async with semaphore:
+            return index, await _answer_sub_request(rag_service, decomposer, sub_request)
+
+    tasks = [asyncio.create_task(bounded(i, sr)) for i, sr in enumerate(sub_requests)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client disconnected or the caller stopped early: do not leave generations running
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,162 @@
+from datetime import datetime
+from utils.logging_config import setup_logging
+
+# Setup standardized Log4 logging
+logger = setup_logging(
+    program_name='hedging',
+    log_level='INFO',
+    log_file=f'/app/logs/hedging_{datetime.now().strftime("%Y%m%d")}.log',
+    console_output=True
+)
+if logger is None:
+    # Tests may stub setup_logging to a noop; fall back to standard logging to avoid None logger
+    import logging
+
+    logger = logging.getLogger("hedging")
+
+"""
+Hedged Ollama Requests
+
+A slow or stalled instance turns a ~50 ms query embedding into a multi-second
+wait. For short requests (embeddings, non-streaming generations with a small
+num_predict) the Hedger starts the request on the chosen instance and, if it has
+not completed by that instance's observed p95 latency for the same request kind
+and model (a generation p95 would never hedge an embedding), sends a duplicate to a
+second healthy instance. The first successful result wins and the other attempt
+is cancelled (closing its HTTP connection, which makes Ollama abort the work).
+
+Extra load is capped by a token-bucket budget: every request earns
+``hedge_budget_pct`` / 100 tokens and each hedge spends one, so at most that
+share of requests is duplicated even while an instance is degraded.
+"""
+
+import asyncio
+from threading import Lock
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from reranker.metrics_registry import PROMETHEUS_AVAILABLE, get_or_create_metric
+from reranker.reranker_config import get_settings
+
+if PROMETHEUS_AVAILABLE:
+    from prometheus_client import Counter
+
+    HEDGE_OUTCOMES = get_or_create_metric(
+        Counter,
+        "ollama_hedged_requests_total",
+        "Hedging decisions and winners for Ollama requests",
+        ["kind", "outcome"],
+    )
+
+T = TypeVar("T")
+
+
+class HedgeBudget:
+    """Token bucket limiting hedges to a fraction of requests."""
+
+    def __init__(self, ratio: float, burst: float = 10.0):
+        self.ratio = max(0.0, ratio)
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst if self.ratio > 0 else 0.0
+        self._lock = Lock()
+
+    def earn(self) -> None:
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+    def refund(self) -> None:
+        """Return a token spent on a hedge that was not sent."""
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + 1.0)
+
+
+class Hedger:
+    """Runs an Ollama call with an optional hedge to a backup instance."""
+
+    def __init__(self, load_balancer, settings=None):
+        self.load_balancer = load_balancer
+        self.settings = settings or get_settings()
+        self.enabled = self.settings.hedge_enabled
+        self.budget = HedgeBudget(self.settings.hedge_budget_pct / 100.0)
+
+    def hedge_delay(self, instance_url: str, kind: str = "embedding", model: Optional[str] = None) -> Optional[float]:
+        """Seconds to wait before hedging: the instance's p95 for this kind and model, or None with too few samples."""
+        metrics = self.load_balancer.metrics.get(instance_url)
+        window = metrics.kind_latency(kind, model) if metrics is not None else None
+        if window is None or len(window) < self.settings.hedge_min_samples:
+            return None
+        return max(self.settings.hedge_min_delay_ms, window.percentile(95)) / 1000.0
+
+    def _count(self, kind: str, outcome: str) -> None:
+        if PROMETHEUS_AVAILABLE and HEDGE_OUTCOMES is not None:
+            HEDGE_OUTCOMES.labels(kind=kind, outcome=outcome).inc()
+
+    async def run(
+        self,
+        attempt: Callable[[str], Awaitable[T]],
+        primary_url: str,
+        model: Optional[str] = None,
+        kind: str = "embedding",
+        accept: Callable[[T], bool] = lambda result: result is not None,
+    ) -> T:
+        """Call ``attempt(url)`` on the primary instance, hedging to a backup after its p95 for ``kind``/``model``.
+
+        A result rejected by ``accept`` (or an exception) counts as a failure; if
+        every attempt fails, the primary's result is returned or its error raised.
+        """
+        if not self.enabled:
+            return await attempt(primary_url)
+
+        self.budget.earn()
+        delay = self.hedge_delay(primary_url, kind, model)
+        if delay is None:
+            return await attempt(primary_url)
+
+        primary = asyncio.ensure_future(attempt(primary_url))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        backup_url = self.load_balancer.get_backup_instance(primary_url, model)
+        if backup_url is None:
+            self._count(kind, "no_backup")
+            return await primary
+        if not self.budget.try_spend():
+            self._count(kind, "budget_exhausted")
+            return await primary
+        # Claimed only now, so a half-open backup's single trial is never taken for a hedge that is not sent
+        if not self.load_balancer.admit(backup_url):
+            self.budget.refund()
+            self._count(kind, "no_backup")
+            return await primary
+
+        logger.debug(
+            f"Hedging {kind} request: {primary_url} slower than {delay * 1000:.0f}ms, duplicating to {backup_url}"
+        )
+        backup = asyncio.ensure_future(attempt(backup_url))
+        names = {primary: "primary_won", backup: "hedge_won"}
+        pending = {primary, backup}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled() or task.exception() is not None:
+                        continue
+                    result = task.result()
+                    if accept(result):
+                        self._count(kind, names[task])
+                        return result
+            self._count(kind, "both_failed")
+            return primary.result()
+        finally:
+            for task in (primary, backup):
+                if not task.done():
+                    task.cancel()
+            # Let cancelled attempts release their scheduler slots / in-flight counters
+            await asyncio.gather(primary, backup, return_exceptions=True)
@@ -0,0 +1,309 @@
+from datetime import datetime
+from utils.logging_config import setup_logging
+
+# Setup standardized Log4 logging
+logger = setup_logging(
+    program_name='instance_health',
+    log_level='INFO',
+    log_file=f'/app/logs/instance_health_{datetime.now().strftime("%Y%m%d")}.log',
+    console_output=True
+)
+if logger is None:
+    # Tests may stub setup_logging to a noop; fall back to standard logging to avoid None logger
+    import logging
+
+    logger = logging.getLogger("instance_health")
+
+"""
+Ollama Instance Health Registry and Background Monitor
+
+A single background task (HealthMonitor, started from the FastAPI lifespan) owns
+all probing of the Ollama instances: /api/tags for liveness and model inventory,
+and /api/ps for model residency (model_residency.py). Results go into one shared
+InstanceHealthRegistry that both the IntelligentRouter and the OllamaLoadBalancer
+read, so routing decisions never wait on network I/O and the two components
+always agree on which instances are usable.
+
+Each instance has a circuit breaker:
+- closed: normal traffic
+- open: ``circuit_failure_threshold`` consecutive failures (probe or live request);
+  no traffic until ``circuit_open_seconds`` have passed
+- half-open: after the cool-down, a single request (``admit``) and the next probe
+  are allowed as a trial; one success closes the circuit, one failure re-opens it.
+  Other requests are turned away while the trial is in flight, or until it has
+  gone ``circuit_open_seconds`` without an outcome
+
+Probe intervals are jittered so the eight instances are not hit in lockstep by
+every replica.
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from threading import Lock
+from typing import Dict, List, Optional
+
+import httpx
+
+from reranker.metrics_registry import PROMETHEUS_AVAILABLE, get_or_create_metric
+from reranker.model_residency import get_model_residency
+from reranker.reranker_config import get_ollama_instance_urls, get_settings
+
+if PROMETHEUS_AVAILABLE:
+    from prometheus_client import Counter, Gauge
+
+    CIRCUIT_STATE = get_or_create_metric(
+        Gauge,
+        "ollama_instance_circuit_state",
+        "Circuit breaker state per instance (0=closed, 1=half-open, 2=open)",
+        ["instance"],
+    )
+    CIRCUIT_TRANSITIONS = get_or_create_metric(
+        Counter, "ollama_instance_circuit_transitions_total", "Circuit breaker state transitions", ["instance", "state"]
+    )
+
+
+class CircuitState(str, Enum):
+    """Circuit breaker states."""
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+
+_CIRCUIT_GAUGE_VALUES = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+
+@dataclass
+class InstanceHealth:
+    """Health and inventory of one Ollama instance."""
+
+    url: str
+    state: CircuitState = CircuitState.CLOSED
+    consecutive_failures: int = 0
+    opened_at: float = 0.0
+    trial_started_at: float = 0.0
+    last_probe: float = 0.0
+    last_success: float = 0.0
+    probe_latency_ms: float = 0.0
+    available_models: List[str] = field(default_factory=list)
+    last_error: Optional[str] = None
+
+
+class InstanceHealthRegistry:
+    """Shared, in-memory instance health state with per-instance circuit breakers."""
+
+    def __init__(self, instance_urls: List[str], failure_threshold: int = 3, open_seconds: float = 30.0):
+        self.instances: Dict[str, InstanceHealth] = {
+            url.rstrip("/"): InstanceHealth(url=url.rstrip("/")) for url in instance_urls
+        }
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self._lock = Lock()
+
+    def get(self, instance_url: str) -> Optional[InstanceHealth]:
+        return self.instances.get(instance_url.rstrip("/"))
+
+    def _transition(self, health: InstanceHealth, state: CircuitState) -> None:
+        if health.state == state:
+            return
+        logger.info(f"Circuit for {health.url}: {health.state.value} -> {state.value}")
+        health.state = state
+        health.trial_started_at = 0.0
+        if state == CircuitState.OPEN:
+            health.opened_at = time.time()
+        if PROMETHEUS_AVAILABLE and CIRCUIT_STATE is not None:
+            CIRCUIT_STATE.labels(instance=health.url).set(_CIRCUIT_GAUGE_VALUES[state])
+            CIRCUIT_TRANSITIONS.labels(instance=health.url, state=state.value).inc()
+
+    def state(self, instance_url: str) -> CircuitState:
+        """Current circuit state, moving open circuits to half-open once the cool-down has passed."""
+        health = self.get(instance_url)
+        if health is None:
+            return CircuitState.CLOSED
+        if health.state == CircuitState.OPEN and time.time() - health.opened_at >= self.open_seconds:
+            with self._lock:
+                if health.state == CircuitState.OPEN:
+                    self._transition(health, CircuitState.HALF_OPEN)
+        return health.state
+
+    def _trial_in_flight(self, health: InstanceHealth) -> bool:
+        return bool(health.trial_started_at) and time.time() - health.trial_started_at < self.open_seconds
+
+    def is_available(self, instance_url: str) -> bool:
+        """Whether traffic may be sent to the instance (unknown instances are allowed).
+
+        Does not claim the half-open trial; callers about to send a request use ``admit``.
+        """
+        state = self.state(instance_url)
+        if state == CircuitState.HALF_OPEN:
+            return not self._trial_in_flight(self.get(instance_url))
+        return state != CircuitState.OPEN
+
+    def admit(self, instance_url: str) -> bool:
+        """Admit one request to the instance, claiming the trial when the circuit is half-open."""
+        if self.state(instance_url) != CircuitState.HALF_OPEN:
+            return self.is_available(instance_url)
+        health = self.get(instance_url)
+        with self._lock:
+            if health.state != CircuitState.HALF_OPEN:
+                return health.state == CircuitState.CLOSED
+            if self._trial_in_flight(health):
+                return False
+            health.trial_started_at = time.time()
+            return True
+
+    def available_urls(self) -> List[str]:
+        return [url for url in self.instances if self.is_available(url)]
+
+    def record_success(
+        self, instance_url: str, latency_ms: Optional[float] = None, models: Optional[List[str]] = None
+    ) -> None:
+        """Record a successful probe or request; closes the circuit."""
+        health = self.get(instance_url)
+        if health is None:
+            return
+        with self._lock:
+            health.consecutive_failures = 0
+            health.last_success = time.time()
+            health.last_error = None
+            if latency_ms is not None:
+                health.probe_latency_ms = latency_ms
+            if models is not None:
+                health.available_models = models
+            self._transition(health, CircuitState.CLOSED)
+
+    def record_failure(self, instance_url: str, error: str) -> None:
+        """Record a failed probe or request; opens the circuit at the threshold (or from half-open)."""
+        health = self.get(instance_url)
+        if health is None:
+            return
+        with self._lock:
+            health.consecutive_failures += 1
+            health.last_error = error
+            if health.state == CircuitState.HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+                if health.state == CircuitState.OPEN:
+                    health.opened_at = time.time()  # still failing: restart the cool-down
+                self._transition(health, CircuitState.OPEN)
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """Per-instance state for health endpoints."""
+        return {
+            url: {
+                "state": self.state(url).value,
+                "available": self.is_available(url),
+                "consecutive_failures": health.consecutive_failures,
+                "last_probe": health.last_probe,
+                "last_success": health.last_success,
+                "probe_latency_ms": round(health.probe_latency_ms, 2),
+                "available_models": list(health.available_models),
+                "last_error": health.last_error,
+            }
+            for url, health in self.instances.items()
+        }
+
+
+class HealthMonitor:
+    """Background task that probes every instance and refreshes model residency."""
+
+    def __init__(self, registry: InstanceHealthRegistry, settings=None, residency=None):
+        self.registry = registry
+        self.settings = settings or get_settings()
+        self.residency = residency
+        self.last_residency_refresh = 0.0
+
+    def next_interval(self) -> float:
+        """Probe interval with +/- jitter."""
+        base = max(1, self.settings.health_monitor_interval_seconds)
+        jitter = max(0, min(100, self.settings.health_monitor_jitter_pct)) / 100.0
+        return base * random.uniform(1 - jitter, 1 + jitter)
+
+    async def probe_instance(self, client: httpx.AsyncClient, instance_url: str) -> bool:
+        """Probe /api/tags; skipped while the circuit is open and cooling down."""
+        if self.registry.state(instance_url) == CircuitState.OPEN:
+            return False
+        health = self.registry.get(instance_url)
+        start_time = time.time()
+        try:
+            response = await client.get(
+                f"{instance_url}/api/tags", timeout=float(self.settings.health_probe_timeout_seconds)
+            )
+            latency_ms = (time.time() - start_time) * 1000
+            if response.status_code == 200:
+                models = [m.get("name", "") for m in response.json().get("models", []) if m.get("name")]
+                self.registry.record_success(instance_url, latency_ms, models)
+                return True
+            self.registry.record_failure(instance_url, f"HTTP {response.status_code}")
+            logger.warning(f"Health probe failed: {instance_url} (HTTP {response.status_code})")
+        except Exception as e:
+            self.registry.record_failure(instance_url, str(e))
+            logger.warning(f"Health probe error: {instance_url} ({e})")
+        finally:
+            if health is not None:
+                health.last_probe = time.time()
+        return False
+
+    async def probe_all(self) -> None:
+        """Probe every instance, then refresh residency on the reachable ones when due."""
+        async with httpx.AsyncClient() as client:
+            await asyncio.gather(*(self.probe_instance(client, url) for url in self.registry.instances))
+
+            if self.residency is None:
+                return
+            now = time.time()
+            if now - self.last_residency_refresh < self.settings.model_residency_refresh_seconds:
+                return
+            self.last_residency_refresh = now
+            await self.residency.refresh_all(client, self.registry.available_urls())
+        await self.residency.ensure_min_residency()
+
+    async def run(self) -> None:
+        """Probe loop; runs until cancelled."""
+        logger.info(f"Health monitor started for {len(self.registry.instances)} Ollama instances")
+        while True:
+            try:
+                await self.probe_all()
+                available = len(self.registry.available_urls())
+                logger.debug(f"Health probe complete: {available}/{len(self.registry.instances)} instances available")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Health monitor cycle failed: {e}")
+            await asyncio.sleep(self.next_interval())
+
+
+# Global registry / monitor
+_registry: Optional[InstanceHealthRegistry] = None
+_monitor: Optional[HealthMonitor] = None
+_health_lock = Lock()
+
+
+def get_health_registry(instance_urls: Optional[List[str]] = None) -> InstanceHealthRegistry:
+    """Get or create the shared instance health registry."""
+    global _registry
+
+    if _registry is None:
+        with _health_lock:
+            if _registry is None:
+                settings = get_settings()
+                _registry = InstanceHealthRegistry(
+                    instance_urls or get_ollama_instance_urls(),
+                    failure_threshold=settings.circuit_failure_threshold,
+                    open_seconds=settings.circuit_open_seconds,
+                )
+
+    return _registry
+
+
+def get_health_monitor() -> HealthMonitor:
+    """Get or create the background health monitor."""
+    global _monitor
+
+    if _monitor is None:
+        settings = get_settings()
+        residency = get_model_residency() if settings.model_residency_enabled else None
+        _monitor = HealthMonitor(get_health_registry(), settings=settings, residency=residency)
+
+    return _monitor
@@ -17,22 +17,23 @@ Dynamic Ollama Instance Router
 
 Intelligently selects the best available Ollama instance and model based on:
 - Question type analysis (technical, creative, factual, code, math)
-- Instance health and availability
+- Instance health and availability (read from the shared registry kept current by
+  the background health monitor; routing performs no probes itself)
+- Model residency (prefer instances that already hold the model in memory)
 - Model capabilities and load balancing
 
 Follows Pydantic AI patterns from https://ai.pydantic.dev/
 """
 
-import asyncio
 import re
-import time
 from dataclasses import dataclass
 from enum import Enum
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-import httpx
 from pydantic import BaseModel, Field
 
+from reranker.instance_health import get_health_monitor, get_health_registry
+from reranker.model_residency import get_model_residency
 from reranker.reranker_config import get_settings
 
 
@@ -148,10 +149,6 @@ class IntelligentRouter:
                 OllamaInstance("ollama-server-8", 11434, "additional"),
             ]
 
-        # Health check caching
-        self.last_health_check = 0
-        self.health_check_cache_duration = 30  # seconds
-
         # Model capability definitions - Updated for specialized instances
         chat_model = settings.chat_model
         coding_model = settings.coding_model
@@ -262,8 +259,6 @@ class IntelligentRouter:
             },
         }
 
-        self.health_check_interval = 30  # seconds
-
     def assess_complexity(self, query: str) -> str:
         """Assess question complexity for response style guidance."""
         query_lower = query.lower()
@@ -448,68 +443,34 @@ class IntelligentRouter:
         # Default to factual
         return QuestionType.FACTUAL
 
-    async def check_instance_health(self, instance: OllamaInstance) -> bool:
-        """Check if an Ollama instance is healthy."""
-        try:
-            start_time = time.time()
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{instance.url}/api/tags", timeout=5.0)
-
-            response_time = time.time() - start_time
-            instance.response_time = response_time
-            instance.last_check = time.time()
-
-            if response.status_code == 200:
-                # Update load score based on response time
-                instance.load_score = response_time
-                instance.healthy = True
-                return True
-            else:
-                instance.healthy = False
-                return False
-
-        except Exception as e:
-            logger.warning(f"Health check failed for {instance.name}: {e}")
-            instance.healthy = False
-            instance.last_check = time.time()
-            return False
+    def sync_health_from_registry(self) -> None:
+        """Copy availability and probe latency from the shared health registry (no I/O)."""
+        registry = get_health_registry()
+        for instance in self.instances:
+            instance.healthy = registry.is_available(instance.url)
+            health = registry.get(instance.url)
+            if health is not None:
+                instance.last_check = health.last_probe
+                instance.response_time = health.probe_latency_ms / 1000
+                instance.load_score = instance.response_time
 
     async def get_available_models(self, instance: OllamaInstance) -> List[str]:
-        """Get list of available models on an instance."""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{instance.url}/api/tags", timeout=10.0)
-
-            if response.status_code == 200:
-                data = response.json()
-                models = [model.get("name", "").split(":")[0] for model in data.get("models", [])]
-                return [m for m in models if m]  # Filter out empty names
-            return []
-        except Exception as e:
-            logger.error(f"Failed to get models from {instance.name}: {e}")
+        """Get list of available models on an instance (from the last health probe)."""
+        health = get_health_registry().get(instance.url)
+        if health is None:
             return []
+        return [name.split(":")[0] for name in health.available_models if name]
 
     async def refresh_health_status(self):
-        """Refresh health status for all instances with caching."""
-        current_time = time.time()
-
-        # Check if we need to refresh (cache duration expired)
-        if current_time - self.last_health_check < self.health_check_cache_duration:
-            logger.debug(f"Using cached health status (age: {current_time - self.last_health_check:.1f}s)")
-            return
-
-        # Perform fresh health checks
-        self.last_health_check = current_time
-        tasks = [self.check_instance_health(instance) for instance in self.instances]
-        await asyncio.gather(*tasks, return_exceptions=True)
-
+        """Refresh instance health from the shared registry."""
+        self.sync_health_from_registry()
         healthy_count = sum(1 for i in self.instances if i.healthy)
-        logger.info(f"Health check complete: {healthy_count}/{len(self.instances)} instances healthy")
+        logger.debug(f"Health status: {healthy_count}/{len(self.instances)} instances available")
 
     async def refresh_health_status_force(self):
-        """Force refresh health status for all instances (ignore cache)."""
-        self.last_health_check = 0  # Reset cache
-        await self.refresh_health_status()
+        """Probe all instances now (outside the monitor's schedule), then refresh."""
+        await get_health_monitor().probe_all()
+        self.sync_health_from_registry()
 
     def select_best_model_for_instance(
         self,
@@ -577,8 +538,12 @@ class IntelligentRouter:
         # Use instance 1 (general) as default for backward compatibility
         return self.select_best_model_for_instance(question_type, 1, prefer_speed, require_context, exclude_models)
 
-    def select_specialized_instance(self, question_type: QuestionType) -> OllamaInstance:
-        """Select best specialized instance for question type."""
+    def select_specialized_instance(self, question_type: QuestionType, model: Optional[str] = None) -> OllamaInstance:
+        """Select best specialized instance for question type.
+
+        When ``model`` is given, specialized instances that already hold it in memory
+        are preferred over less loaded ones that would have to cold-load it.
+        """
         # Find instances specialized for this question type
         specialized_instances = []
         for i, instance in enumerate(self.instances, 1):
@@ -590,8 +555,12 @@ class IntelligentRouter:
                 specialized_instances.append((instance, i))
 
         if specialized_instances:
-            # Select the least loaded specialized instance
-            best_instance, instance_num = min(specialized_instances, key=lambda x: x[0].load_score)
+            # Select the least loaded specialized instance, warm ones first
+            residency = get_model_residency()
+            best_instance, instance_num = min(
+                specialized_instances,
+                key=lambda x: (bool(model) and residency.is_warm(x[0].url, model) is False, x[0].load_score),
+            )
             spec_desc = self.instance_specializations[instance_num]["description"]
             logger.info(f"Selected specialized instance {instance_num} ({spec_desc}) for {question_type.value}")
             return best_instance
@@ -599,6 +568,23 @@ class IntelligentRouter:
         # Fallback to general instance selection
         return self.select_best_instance()
 
+    def prefer_warm_instance(self, instance: OllamaInstance, model: str) -> Tuple[OllamaInstance, bool]:
+        """Swap a cold instance for a healthy one that already has the model loaded.
+
+        Returns:
+            (instance, rerouted) - the original instance when it is warm, residency is
+            unknown, or no healthy instance holds the model
+        """
+        residency = get_model_residency()
+        if residency.is_warm(instance.url, model) is not False:
+            return instance, False
+        warm = [i for i in self.instances if i.healthy and residency.is_warm(i.url, model)]
+        if not warm:
+            return instance, False
+        best = min(warm, key=lambda i: i.load_score)
+        logger.info(f"{model} is cold on {instance.name}; routing to {best.name} where it is loaded")
+        return best, True
+
     def select_best_instance(self) -> OllamaInstance:
         """Select best available instance based on health and load."""
         healthy_instances = [i for i in self.instances if i.healthy]
@@ -626,10 +612,8 @@ class IntelligentRouter:
             f"Query analysis: type={question_type.value}, complexity={complexity}, patience={user_patience}, prefer_speed={prefer_speed}"
         )
 
-        # Refresh health if needed
-        current_time = time.time()
-        if any(current_time - i.last_check > self.health_check_interval for i in self.instances):
-            await self.refresh_health_status()
+        # Current health from the background monitor's registry
+        self.sync_health_from_registry()
 
         # Select specialized instance for this question type
         selected_instance = self.select_specialized_instance(question_type)
@@ -642,6 +626,11 @@ class IntelligentRouter:
             question_type, instance_num, prefer_speed, request.require_context, request.exclude_models
         )
 
+        # Avoid a cold model load when another healthy instance already has it in memory
+        selected_instance, rerouted = self.prefer_warm_instance(selected_instance, selected_model)
+        if rerouted:
+            reasoning += f" (model warm on {selected_instance.name})"
+
         # Get context length for the selected model
         model_profile = self.model_profiles.get(selected_model)
         context_length = model_profile.context_length if model_profile else 4096
@@ -683,6 +672,7 @@ def add_intelligent_routing_endpoints(app):
     async def ollama_health():
         """Check health status of all Ollama instances."""
         await intelligent_router.refresh_health_status()
+        registry = get_health_registry()
 
         status_summary = []
         for instance in intelligent_router.instances:
@@ -694,6 +684,8 @@ def add_intelligent_routing_endpoints(app):
                     "response_time": f"{instance.response_time:.2f}s" if instance.response_time > 0 else "unknown",
                     "load_score": f"{instance.load_score:.2f}" if instance.load_score > 0 else "unknown",
                     "last_check": instance.last_check,
+                    "circuit": registry.state(instance.url).value,
+                    "loaded_models": get_model_residency().loaded_models(instance.url),
                 }
             )
 
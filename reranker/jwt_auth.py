@@ -26,9 +26,12 @@ import os
 import time
 from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Dict, Optional, Set, Tuple
 
 from config import get_settings
+from utils.rate_limiter import GcraRateLimiter
+from utils.redis_cache import get_async_redis_client
+
 try:
     import jwt
 except ImportError:
@@ -83,8 +86,15 @@ def get_redis_client() -> Optional["redis.Redis"]:
             _redis_client = None
     return _redis_client
 
-# In-memory rate limiting (fallback)
-_rate_limit_buckets: Dict[str, List[float]] = {}
+
+# Async rate limiting shares the redis.asyncio pool; same Redis DB as the sync client above
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://redis-cache:6379/2")
+RATE_LIMIT_WINDOW_SECONDS = 60
+
+# GCRA limiter shared by every worker through Redis (bounded in-memory fallback)
+_rate_limiter = GcraRateLimiter(prefix="rate_limit:gcra", redis_url=RATE_LIMIT_REDIS_URL)
+_rate_limit_buckets = _rate_limiter.local.entries
+
 
 @dataclass
 class User:
@@ -289,16 +299,19 @@ class APIKeyManager:
         return hmac.compare_digest(key_hash, stored_key_hash)
 
 class RateLimiter:
-    """Rate limiting using Redis or in-memory storage."""
+    """Per-user/API-key limits on the shared GCRA limiter (Redis, or in-memory fallback)."""
 
     @staticmethod
-    def check_rate_limit(identifier: str, role: str, limit: Optional[int] = None) -> Tuple[bool, Dict]:
+    def check_rate_limit(
+        identifier: str, role: str, limit: Optional[int] = None, consume: bool = True
+    ) -> Tuple[bool, Dict]:
         """Check if request is within rate limit.
 
         Args:
             identifier: User ID or API key ID
             role: User role (determines limit)
             limit: Optional custom limit (req/min)
+            consume: Count this request; False only reads the current state
 
         Returns:
             Tuple of (allowed, status_dict)
@@ -306,64 +319,36 @@ class RateLimiter:
               - allowed: bool
               - limit: requests per minute allowed
               - remaining: requests remaining
-              - reset_at: Unix timestamp when limit resets
+              - reset_at: Unix timestamp when the full limit is available again
+              - retry_after: seconds until the next request is allowed (0 if allowed)
         """
         if limit is None:
             limit = RATE_LIMITS.get(role, 50)
 
-        redis_client = get_redis_client()
-        now = time.time()
-        reset_at = int(now + 60)  # Reset in 1 minute
-
-        if redis_client is not None:
-            # Use Redis for distributed rate limiting
-            key = f"rate_limit:{identifier}"
-            current = redis_client.get(key)
-
-            if current is None:
-                redis_client.setex(key, 60, "1")
-                count = 1
-            else:
-                count = int(current) + 1
-                redis_client.incr(key)
-
-            allowed = count <= limit
-            remaining = max(0, limit - count)
-
-            logger.debug(f"Rate limit check: {identifier} - {count}/{limit}")
-
-            return allowed, {
-                "allowed": allowed,
-                "limit": limit,
-                "remaining": remaining,
-                "reset_at": reset_at,
-                "current": count,
-            }
-        else:
-            # Fallback to in-memory rate limiting
-            if identifier not in _rate_limit_buckets:
-                _rate_limit_buckets[identifier] = []
-
-            bucket = _rate_limit_buckets[identifier]
-
-            # Remove expired entries (older than 60 seconds)
-            bucket[:] = [ts for ts in bucket if now - ts < 60]
-
-            if len(bucket) < limit:
-                bucket.append(now)
-                allowed = True
-            else:
-                allowed = False
-
-            remaining = max(0, limit - len(bucket))
-
-            return allowed, {
-                "allowed": allowed,
-                "limit": limit,
-                "remaining": remaining,
-                "reset_at": reset_at,
-                "current": len(bucket),
-            }
+        result = _rate_limiter.check(
+            identifier, limit, RATE_LIMIT_WINDOW_SECONDS, cost=1 if consume else 0, client=get_redis_client()
+        )
+        logger.debug(f"Rate limit check: {identifier} - {result.current}/{limit}")
+        return result.allowed, result.as_dict()
+
+    @staticmethod
+    async def acheck_rate_limit(
+        identifier: str, role: str, limit: Optional[int] = None, consume: bool = True
+    ) -> Tuple[bool, Dict]:
+        """Async variant of check_rate_limit() using the shared redis.asyncio pool."""
+        if limit is None:
+            limit = RATE_LIMITS.get(role, 50)
+
+        result = await _rate_limiter.acheck(
+            identifier,
+            limit,
+            RATE_LIMIT_WINDOW_SECONDS,
+            cost=1 if consume else 0,
+            client=get_async_redis_client(RATE_LIMIT_REDIS_URL),
+        )
+        logger.debug(f"Rate limit check: {identifier} - {result.current}/{limit}")
+        return result.allowed, result.as_dict()
+
 
 class RoleBasedAccessControl:
     """Role-based access control for endpoints."""
@@ -16,22 +16,26 @@ Implements intelligent distribution of requests across 8 Ollama instances
 with health monitoring, response time tracking, and adaptive routing.
 
 Features:
-- Round-robin with health awareness
-- Response time-based routing (prefer faster instances)
-- Load score calculation (CPU + memory usage tracking)
-- Automatic instance health checks
-- Per-instance metrics and fallback chains
+- Least-outstanding-requests routing: instances are scored by in-flight requests
+  (per model) weighted by EWMA latency, picked with power-of-two-choices sampling
+- Model residency: instances that would have to cold-load the model (per /api/ps,
+  see model_residency.py) carry a load-time penalty
+- Round-robin fallback when no instance is healthy
+- Health comes from the shared InstanceHealthRegistry (instance_health.py), kept
+  current by the background HealthMonitor; routing does no network I/O
+- Per-instance metrics (EWMA, p50/p95 over a fixed-size ring buffer) and fallback chains,
+  plus a window per request kind and model for hedging delays (hedging.py)
 - Embedding vs inference instance separation for optimal performance
 """
 
-import asyncio
+import math
+import random
 import time
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from enum import Enum
 from threading import Lock
-from typing import Dict, List, Optional
-
-import httpx
+from typing import Dict, Iterator, List, Optional, Tuple
 
 class RequestType(str, Enum):
     """Types of requests that may benefit from different routing strategies."""
@@ -40,10 +44,50 @@ class RequestType(str, Enum):
     INFERENCE = "inference"
     HYBRID_SEARCH = "hybrid_search"
 
+class LatencyWindow:
+    """Fixed-size ring buffer of response times with O(1) inserts and lazy percentiles."""
+
+    def __init__(self, size: int = 100):
+        self.size = size
+        self._values: List[float] = [0.0] * size
+        self._index = 0
+        self._count = 0
+        self._total = 0.0
+        self._sorted: Optional[List[float]] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, value: float) -> None:
+        if self._count == self.size:
+            self._total -= self._values[self._index]
+        else:
+            self._count += 1
+        self._values[self._index] = value
+        self._total += value
+        self._index = (self._index + 1) % self.size
+        self._sorted = None
+
+    def mean(self) -> float:
+        return self._total / self._count if self._count else 0.0
+
+    def percentile(self, pct: float) -> float:
+        """Nearest-rank percentile of the current window (0 when empty)."""
+        if not self._count:
+            return 0.0
+        if self._sorted is None:
+            self._sorted = sorted(self._values[: self._count])
+        rank = min(self._count, max(1, math.ceil(pct / 100.0 * self._count))) - 1
+        return self._sorted[rank]
+
+
 @dataclass
 class InstanceMetrics:
     """Metrics for tracking Ollama instance performance."""
 
+    # Weight of the newest sample in the exponentially weighted moving average
+    EWMA_ALPHA = 0.2
+
     instance_url: str
     total_requests: int = 0
     successful_requests: int = 0
@@ -53,16 +97,45 @@ class InstanceMetrics:
     is_healthy: bool = True
     health_check_failures: int = 0
     last_error: Optional[str] = None
-    request_times: List[float] = field(default_factory=list)  # Rolling window of last 100 requests
-
-    def update_response_time(self, response_time: float) -> None:
+    request_times: LatencyWindow = field(default_factory=LatencyWindow)  # Ring buffer of last 100 requests
+    ewma_response_time: float = 0.0
+    in_flight: Dict[str, int] = field(default_factory=dict)  # Outstanding requests per model
+    in_flight_total: int = 0
+    # Ring buffers per (request kind, model): embeddings and generations have very different latencies
+    kind_times: Dict[Tuple[str, Optional[str]], LatencyWindow] = field(default_factory=dict)
+
+    def update_response_time(
+        self, response_time: float, kind: Optional[str] = None, model: Optional[str] = None
+    ) -> None:
         """Update metrics with a successful response."""
         self.request_times.append(response_time)
-        if len(self.request_times) > 100:
-            self.request_times.pop(0)
-        self.average_response_time = sum(self.request_times) / len(self.request_times)
+        if kind is not None:
+            self.kind_times.setdefault((kind, model), LatencyWindow()).append(response_time)
+        self.average_response_time = self.request_times.mean()
+        if self.ewma_response_time <= 0:
+            self.ewma_response_time = response_time
+        else:
+            self.ewma_response_time += self.EWMA_ALPHA * (response_time - self.ewma_response_time)
         self.successful_requests += 1
 
+    @property
+    def p50_response_time(self) -> float:
+        return self.request_times.percentile(50)
+
+    @property
+    def p95_response_time(self) -> float:
+        return self.request_times.percentile(95)
+
+    def kind_latency(self, kind: str, model: Optional[str] = None) -> Optional[LatencyWindow]:
+        """Latency window for one request kind and model, if any were recorded."""
+        return self.kind_times.get((kind, model))
+
+    def outstanding(self, model: Optional[str] = None) -> int:
+        """In-flight requests for a model (or across all models)."""
+        if model is None:
+            return self.in_flight_total
+        return self.in_flight.get(model, 0)
+
     def record_failure(self, error: str) -> None:
         """Record a failed request."""
         self.failed_requests += 1
@@ -77,15 +150,24 @@ class InstanceMetrics:
             self.is_healthy = True
             self.health_check_failures = 0
 
-    def get_load_score(self) -> float:
-        """Calculate instance load score (lower = better)."""
+    def get_load_score(self, model: Optional[str] = None, default_latency: float = 1000.0) -> float:
+        """Calculate instance load score (lower = better).
+
+        Expected wait for a new request: EWMA latency times the queue it would join
+        (outstanding requests for the model, plus itself), plus a failure penalty.
+        Other models' requests count at half weight since they still compete for the GPU.
+        """
         if not self.is_healthy:
             return float("inf")
 
-        base_score = self.average_response_time
+        latency = self.ewma_response_time if self.ewma_response_time > 0 else default_latency
+        same_model = self.outstanding(model)
+        other_models = self.in_flight_total - same_model if model is not None else 0
+        queue = 1 + same_model + 0.5 * other_models
         failure_penalty = (self.failed_requests / max(self.total_requests, 1)) * 100
 
-        return base_score + failure_penalty
+        return latency * queue + failure_penalty
+
 
 class OllamaLoadBalancer:
     """Intelligent load balancer for Ollama instances."""
@@ -112,36 +194,40 @@ class OllamaLoadBalancer:
         self._inference_pointer = 0
         self._lock = Lock()
 
-        # Health check parameters
-        self.health_check_interval = 30  # seconds
-        self.last_health_check = 0
-        self.health_check_timeout = 5  # seconds
+        # Optional ModelResidencyTracker; when set, cold instances are penalized
+        self.residency = None
+        self.cold_load_penalty_ms = 10000.0
+
+        # Optional shared InstanceHealthRegistry; when set it is the source of truth
+        # for availability and request outcomes feed its circuit breakers
+        self.registry = None
 
-    async def get_next_instance(self, request_type: RequestType = RequestType.INFERENCE) -> str:
+    async def get_next_instance(
+        self, request_type: RequestType = RequestType.INFERENCE, model: Optional[str] = None, admit: bool = True
+    ) -> str:
         """
         Get the next instance for a request using adaptive routing.
 
         Strategy:
-        - Returns healthy instances sorted by load score
+        - Power-of-two-choices: sample two healthy instances and keep the one with the
+          lower load score (outstanding requests for ``model`` x EWMA latency), which
+          spreads concurrent bursts instead of piling onto the single fastest server
         - Falls back to round-robin if all instances unhealthy
-        - Periodically performs health checks
-        """
-        current_time = time.time()
-
-        # Perform health check if interval elapsed
-        if current_time - self.last_health_check > self.health_check_interval:
-            await self._health_check_all()
-            self.last_health_check = current_time
 
-        # Get healthy instances sorted by load score
-        healthy_instances = [(url, self.metrics[url]) for url in self.instance_urls if self.metrics[url].is_healthy]
-
-        if healthy_instances:
-            # Sort by load score (lower is better)
-            healthy_instances.sort(key=lambda x: x[1].get_load_score())
-            selected_url = healthy_instances[0][0]
+        With ``admit=False`` the pick is not claimed; callers that may not send to it
+        call ``admit`` themselves right before dispatch.
+        """
+        healthy_urls = [url for url in self.instance_urls if self.is_available(url)]
+
+        while healthy_urls:
+            selected_url = self._choose_least_loaded(healthy_urls, model)
+            if admit and not self.admit(selected_url):
+                # Another request took the half-open trial on this instance
+                healthy_urls.remove(selected_url)
+                continue
             logger.debug(
-                f"Selected {selected_url} for {request_type.value} (score: {healthy_instances[0][1].get_load_score():.2f})"
+                f"Selected {selected_url} for {request_type.value} "
+                f"(score: {self._score(selected_url, model, self._default_latency()):.2f})"
             )
             return selected_url
 
@@ -154,15 +240,103 @@ class OllamaLoadBalancer:
                 self._inference_pointer = (self._inference_pointer + 1) % len(self.instance_urls)
                 return self.instance_urls[self._inference_pointer]
 
+    def is_available(self, instance_url: str) -> bool:
+        """Whether the instance may receive traffic (circuit not open)."""
+        if self.registry is not None:
+            return self.registry.is_available(instance_url)
+        return self.metrics[instance_url].is_healthy
+
+    def admit(self, instance_url: str) -> bool:
+        """Claim the instance for one request (the single trial request while its circuit is half-open)."""
+        if self.registry is not None:
+            return self.registry.admit(instance_url)
+        return self.is_available(instance_url)
+
+    def _default_latency(self) -> float:
+        """Latency assumed for instances with no samples yet: the mean EWMA of those that have one."""
+        observed = [m.ewma_response_time for m in self.metrics.values() if m.ewma_response_time > 0]
+        return sum(observed) / len(observed) if observed else 1000.0
+
+    def _score(self, instance_url: str, model: Optional[str], default_latency: float) -> float:
+        """Load score plus the expected cold-load time when the model is known not to be resident."""
+        if not self.is_available(instance_url):
+            return float("inf")
+        score = self.metrics[instance_url].get_load_score(model, default_latency)
+        if model and self.residency is not None and self.residency.is_warm(instance_url, model) is False:
+            score += self.cold_load_penalty_ms
+        return score
+
+    def _choose_least_loaded(self, candidates: List[str], model: Optional[str] = None) -> str:
+        """Power-of-two-choices over the candidate instances.
+
+        When the model is warm on some candidates, sampling is restricted to those
+        unless every warm instance already scores worse than a cold load elsewhere.
+        """
+        if len(candidates) == 1:
+            return candidates[0]
+        default_latency = self._default_latency()
+        pool = candidates
+        if model and self.residency is not None:
+            warm = [url for url in candidates if self.residency.is_warm(url, model)]
+            if warm and len(warm) < len(candidates):
+                best_warm = min(warm, key=lambda url: self._score(url, model, default_latency))
+                cold = [url for url in candidates if url not in warm]
+                best_cold = min(cold, key=lambda url: self._score(url, model, default_latency))
+                if self._score(best_warm, model, default_latency) <= self._score(best_cold, model, default_latency):
+                    pool = warm
+            if len(pool) == 1:
+                return pool[0]
+        first, second = random.sample(pool, 2)
+        first_score = self._score(first, model, default_latency)
+        second_score = self._score(second, model, default_latency)
+        return first if first_score <= second_score else second
+
+    def get_backup_instance(self, primary_url: str, model: Optional[str] = None) -> Optional[str]:
+        """Least-loaded available instance other than ``primary_url`` (for hedged requests).
+
+        Does not claim the instance; the caller ``admit``s it right before sending the hedge.
+        """
+        candidates = [url for url in self.instance_urls if url != primary_url and self.is_available(url)]
+        if not candidates:
+            return None
+        return self._choose_least_loaded(candidates, model)
+
+    @contextmanager
+    def track_in_flight(self, instance_url: str, model: Optional[str] = None) -> Iterator[None]:
+        """Count a request as outstanding on an instance for the duration of the block."""
+        metrics = self.metrics.get(instance_url)
+        key = model or "_"
+        if metrics is not None:
+            with self._lock:
+                metrics.in_flight[key] = metrics.in_flight.get(key, 0) + 1
+                metrics.in_flight_total += 1
+        try:
+            yield
+        finally:
+            if metrics is not None:
+                with self._lock:
+                    remaining = metrics.in_flight.get(key, 1) - 1
+                    if remaining > 0:
+                        metrics.in_flight[key] = remaining
+                    else:
+                        metrics.in_flight.pop(key, None)
+                    metrics.in_flight_total = max(0, metrics.in_flight_total - 1)
+
     async def get_healthy_instances(self, request_type: RequestType = RequestType.INFERENCE) -> List[str]:
         """Get all healthy instances for fallback chains."""
-        healthy = [url for url in self.instance_urls if self.metrics[url].is_healthy]
+        healthy = [url for url in self.instance_urls if self.is_available(url)]
         return healthy if healthy else self.instance_urls
 
     def record_request(
-        self, instance_url: str, response_time: float, success: bool, error: Optional[str] = None
+        self,
+        instance_url: str,
+        response_time: float,
+        success: bool,
+        error: Optional[str] = None,
+        kind: Optional[str] = None,
+        model: Optional[str] = None,
     ) -> None:
-        """Record request metrics for an instance."""
+        """Record request metrics for an instance (``kind``/``model`` also file the latency per request kind)."""
         if instance_url not in self.metrics:
             return
 
@@ -171,42 +345,31 @@ class OllamaLoadBalancer:
         metrics.last_check_time = time.time()
 
         if success:
-            metrics.update_response_time(response_time)
+            metrics.update_response_time(response_time, kind, model)
             metrics.reset_health()
+            if self.registry is not None:
+                self.registry.record_success(instance_url)
         else:
             metrics.record_failure(error or "Unknown error")
-
-    async def _health_check_all(self) -> None:
-        """Perform health checks on all instances concurrently."""
-        tasks = [self._health_check_instance(url) for url in self.instance_urls]
-        await asyncio.gather(*tasks, return_exceptions=True)
-
-    async def _health_check_instance(self, instance_url: str) -> None:
-        """Check health of a single instance."""
-        try:
-            async with httpx.AsyncClient(timeout=self.health_check_timeout) as client:
-                response = await client.get(f"{instance_url}/api/tags")
-                if response.status_code == 200:
-                    self.metrics[instance_url].is_healthy = True
-                    self.metrics[instance_url].health_check_failures = 0
-                    logger.debug(f"Health check OK: {instance_url}")
-                else:
-                    self.metrics[instance_url].record_failure(f"HTTP {response.status_code}")
-                    logger.warning(f"Health check failed: {instance_url} (HTTP {response.status_code})")
-        except Exception as e:
-            self.metrics[instance_url].record_failure(str(e))
-            logger.warning(f"Health check error: {instance_url} ({e})")
+            if self.registry is not None:
+                self.registry.record_failure(instance_url, error or "Unknown error")
 
     def get_metrics_summary(self) -> Dict[str, any]:
         """Get summary metrics for all instances."""
         summary = {}
         for url, metrics in self.metrics.items():
             summary[url] = {
-                "healthy": metrics.is_healthy,
+                "healthy": self.is_available(url),
+                "circuit": self.registry.state(url).value if self.registry is not None else None,
                 "total_requests": metrics.total_requests,
                 "successful_requests": metrics.successful_requests,
                 "failed_requests": metrics.failed_requests,
                 "average_response_time": f"{metrics.average_response_time:.2f}ms",
+                "ewma_response_time": f"{metrics.ewma_response_time:.2f}ms",
+                "p50_response_time": f"{metrics.p50_response_time:.2f}ms",
+                "p95_response_time": f"{metrics.p95_response_time:.2f}ms",
+                "in_flight": metrics.in_flight_total,
+                "in_flight_by_model": dict(metrics.in_flight),
                 "success_rate": f"{(metrics.successful_requests / max(metrics.total_requests, 1)) * 100:.1f}%",
                 "load_score": f"{metrics.get_load_score():.2f}",
             }
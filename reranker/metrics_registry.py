@@ -0,0 +1,42 @@
+"""Helpers for registering Prometheus metrics exposed on the reranker /metrics endpoint.
+
+Reranker modules may be imported more than once (e.g. as ``reranker.x`` and ``x`` when
+/app/reranker is on sys.path, or after a test reload). Registering the same metric twice
+in the default registry raises, so metrics are created through ``get_or_create_metric``,
+which returns the already-registered collector instead.
+"""
+
+from typing import Any, Callable, Optional
+
+try:
+    from prometheus_client import REGISTRY
+
+    PROMETHEUS_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    REGISTRY = None
+    PROMETHEUS_AVAILABLE = False
+
+
+def get_or_create_metric(
+    factory: Callable[..., Any], name: str, documentation: str, *args: Any, **kwargs: Any
+) -> Optional[Any]:
+    """Create a metric in the default registry, reusing an existing one with the same name.
+
+    Args:
+        factory: Metric class (Counter, Gauge, Histogram, ...)
+        name: Metric name
+        documentation: Help text
+
+    Returns:
+        The metric, or None if prometheus_client is unavailable
+    """
+    if not PROMETHEUS_AVAILABLE:
+        return None
+    try:
+        return factory(name, documentation, *args, **kwargs)
+    except ValueError:
+        collectors = getattr(REGISTRY, "_names_to_collectors", {})
+        for candidate in (name, f"{name}_total"):
+            if candidate in collectors:
+                return collectors[candidate]
+        raise
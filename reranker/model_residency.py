@@ -0,0 +1,329 @@
+from datetime import datetime
+from utils.logging_config import setup_logging
+
+# Setup standardized Log4 logging
+logger = setup_logging(
+    program_name='model_residency',
+    log_level='INFO',
+    log_file=f'/app/logs/model_residency_{datetime.now().strftime("%Y%m%d")}.log',
+    console_output=True
+)
+if logger is None:
+    # Tests may stub setup_logging to a noop; fall back to standard logging to avoid None logger
+    import logging
+
+    logger = logging.getLogger("model_residency")
+
+"""
+Ollama Model Residency Tracking
+
+Tracks which models each Ollama instance currently holds in memory, using the
+/api/ps endpoint, so routing can prefer instances where the requested model is
+already loaded (a cold load of a 7-8B model adds 5-30 s to a request).
+
+State sources:
+- a periodic refresh of /api/ps, driven by the background health monitor
+  (instance_health.HealthMonitor)
+- mark_loaded() after each successful request (Ollama keeps the model resident
+  for the keep_alive sent with that request)
+
+keep_alive management: each configured model is pinned on at least
+``model_min_warm_instances`` reachable instances. Requests to a pinned
+(instance, model) pair send the long pinned keep_alive, other requests send the
+short default, and the background pass loads or re-extends pinned models whose
+residency is missing or about to expire.
+"""
+
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Dict, List, Optional, Set
+
+import httpx
+
+from reranker.metrics_registry import PROMETHEUS_AVAILABLE, get_or_create_metric
+from reranker.ollama_scheduler import Priority, get_ollama_scheduler
+from reranker.reranker_config import get_ollama_instance_urls, get_settings
+
+if PROMETHEUS_AVAILABLE:
+    from prometheus_client import Counter, Gauge
+
+    WARM_INSTANCES = get_or_create_metric(
+        Gauge, "ollama_model_warm_instances", "Ollama instances holding the model in memory", ["model"]
+    )
+    MODEL_LOADS = get_or_create_metric(
+        Counter,
+        "ollama_model_preloads_total",
+        "Model loads/keep-alive extensions issued by the residency manager",
+        ["model", "outcome"],
+    )
+
+_DURATION_RE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*([smh]?)\s*$")
+
+
+def parse_keep_alive(value: str) -> Optional[float]:
+    """Convert an Ollama keep_alive value ("10m", "2h", "300", "-1") to seconds.
+
+    Returns:
+        Seconds, or None for a negative value (keep loaded indefinitely)
+    """
+    match = _DURATION_RE.match(str(value))
+    if not match:
+        return 300.0  # Ollama's default keep_alive
+    amount = float(match.group(1))
+    if amount < 0:
+        return None
+    return amount * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+
+
+def normalize_model_name(name: str) -> str:
+    """Ollama reports tagged names; treat "mistral" and "mistral:latest" as the same model."""
+    name = (name or "").strip()
+    return name if ":" in name else f"{name}:latest"
+
+
+def _parse_expires_at(raw: Optional[str]) -> float:
+    """Parse /api/ps expires_at (RFC3339, possibly with nanoseconds) to a timestamp."""
+    if not raw:
+        return float("inf")
+    text = raw.replace("Z", "+00:00")
+    # Python only accepts up to microsecond precision
+    text = re.sub(r"(\.\d{6})\d+", r"\1", text)
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return float("inf")
+
+
+@dataclass
+class InstanceResidency:
+    """Models resident on one Ollama instance."""
+
+    url: str
+    models: Dict[str, float] = field(default_factory=dict)  # model -> expires_at timestamp
+    last_refresh: float = 0.0
+    reachable: bool = True
+
+    def loaded_models(self, now: Optional[float] = None) -> List[str]:
+        now = time.time() if now is None else now
+        return sorted(model for model, expires in self.models.items() if expires > now)
+
+
+class ModelResidencyTracker:
+    """Per-instance view of loaded models with keep_alive management."""
+
+    def __init__(self, instance_urls: List[str], settings=None):
+        self.settings = settings or get_settings()
+        self.instances: Dict[str, InstanceResidency] = {
+            url.rstrip("/"): InstanceResidency(url=url.rstrip("/")) for url in instance_urls
+        }
+        self.resident_models: List[str] = self._configured_models()
+        self.pinned: Dict[str, Set[str]] = {}  # model -> instance urls holding it with the pinned keep_alive
+        self._lock = Lock()
+
+    def _configured_models(self) -> List[str]:
+        raw = self.settings.resident_models
+        if raw:
+            candidates = [m for m in raw.split(",")]
+        else:
+            candidates = [
+                self.settings.chat_model,
+                self.settings.coding_model,
+                self.settings.reasoning_model,
+                self.settings.vision_model,
+                self.settings.embedding_model,
+            ]
+        models: List[str] = []
+        for candidate in candidates:
+            if candidate and candidate.strip() and normalize_model_name(candidate) not in models:
+                models.append(normalize_model_name(candidate))
+        return models
+
+    def is_warm(self, instance_url: str, model: str) -> Optional[bool]:
+        """Whether the model is loaded on the instance; None if residency is unknown."""
+        state = self.instances.get(instance_url.rstrip("/"))
+        if state is None or state.last_refresh == 0:
+            return None
+        expires = state.models.get(normalize_model_name(model))
+        return expires is not None and expires > time.time()
+
+    def warm_instances(self, model: str) -> List[str]:
+        """Instances currently holding the model in memory."""
+        return [url for url in self.instances if self.is_warm(url, model)]
+
+    def loaded_models(self, instance_url: str) -> List[str]:
+        state = self.instances.get(instance_url.rstrip("/"))
+        return state.loaded_models() if state else []
+
+    def keep_alive_for(self, instance_url: str, model: str) -> str:
+        """keep_alive to send with a request: long on pinned instances, short elsewhere."""
+        if instance_url.rstrip("/") in self.pinned.get(normalize_model_name(model), set()):
+            return self.settings.model_pinned_keep_alive
+        return self.settings.model_keep_alive
+
+    def mark_loaded(self, instance_url: str, model: str, keep_alive: Optional[str] = None) -> None:
+        """Record that a request just used (and therefore loaded) the model on the instance."""
+        state = self.instances.get(instance_url.rstrip("/"))
+        if state is None:
+            return
+        keep_alive = keep_alive or self.keep_alive_for(instance_url, model)
+        seconds = parse_keep_alive(keep_alive)
+        with self._lock:
+            state.models[normalize_model_name(model)] = float("inf") if seconds is None else time.time() + seconds
+            if state.last_refresh == 0:
+                state.last_refresh = time.time()
+
+    def apply_ps(self, instance_url: str, payload: Dict) -> None:
+        """Replace an instance's residency with an /api/ps response."""
+        state = self.instances.get(instance_url.rstrip("/"))
+        if state is None:
+            return
+        models = {}
+        for entry in payload.get("models", []) or []:
+            name = entry.get("name") or entry.get("model")
+            if name:
+                models[normalize_model_name(name)] = _parse_expires_at(entry.get("expires_at"))
+        with self._lock:
+            state.models = models
+            state.last_refresh = time.time()
+            state.reachable = True
+
+    async def refresh_instance(self, instance_url: str, client: httpx.AsyncClient) -> bool:
+        """Fetch /api/ps for one instance."""
+        try:
+            response = await client.get(f"{instance_url}/api/ps", timeout=5.0)
+            if response.status_code == 200:
+                self.apply_ps(instance_url, response.json())
+                return True
+            logger.debug(f"/api/ps on {instance_url} returned HTTP {response.status_code}")
+        except Exception as e:
+            logger.debug(f"/api/ps failed on {instance_url}: {e}")
+        self.instances[instance_url].reachable = False
+        return False
+
+    async def refresh_all(self, client: Optional[httpx.AsyncClient] = None, urls: Optional[List[str]] = None) -> None:
+        """Refresh residency for the given (default: all) instances concurrently."""
+        targets = [url.rstrip("/") for url in (urls if urls is not None else list(self.instances))]
+        targets = [url for url in targets if url in self.instances]
+        if client is None:
+            async with httpx.AsyncClient() as own_client:
+                await asyncio.gather(*(self.refresh_instance(url, own_client) for url in targets))
+        else:
+            await asyncio.gather(*(self.refresh_instance(url, client) for url in targets))
+        self._export_metrics()
+
+    def plan_pins(self) -> Dict[str, List[str]]:
+        """Choose, per configured model, the instances that should keep it loaded.
+
+        Already-warm instances are kept first so nothing is reloaded needlessly; the
+        remaining slots go to reachable instances holding the fewest models.
+        """
+        minimum = max(0, self.settings.model_min_warm_instances)
+        reachable = [url for url, state in self.instances.items() if state.reachable]
+        load: Dict[str, int] = {url: len(self.instances[url].loaded_models()) for url in reachable}
+        plan: Dict[str, List[str]] = {}
+        for model in self.resident_models:
+            warm = [url for url in reachable if self.is_warm(url, model)]
+            previous = [url for url in reachable if url in self.pinned.get(model, set())]
+            ordered = sorted(
+                reachable,
+                key=lambda url: (url not in warm, url not in previous, load[url], url),
+            )
+            chosen = ordered[:minimum]
+            for url in chosen:
+                if url not in warm:
+                    load[url] += 1
+            plan[model] = chosen
+        return plan
+
+    async def _preload(self, client: httpx.AsyncClient, instance_url: str, model: str, keep_alive: str) -> bool:
+        """Load a model (or extend its keep_alive) without generating anything."""
+        if model == normalize_model_name(self.settings.embedding_model) or "embed" in model:
+            endpoint, body = "/api/embeddings", {"model": model, "prompt": "", "keep_alive": keep_alive}
+        else:
+            endpoint, body = "/api/generate", {"model": model, "keep_alive": keep_alive}
+        try:
+            # Preloads compete with live traffic for GPU time: lowest scheduling class
+            async with get_ollama_scheduler().slot(instance_url, Priority.BACKGROUND):
+                response = await client.post(f"{instance_url}{endpoint}", json=body, timeout=120.0)
+            ok = response.status_code == 200
+        except Exception as e:
+            logger.warning(f"Preloading {model} on {instance_url} failed: {e}")
+            ok = False
+        if ok:
+            self.mark_loaded(instance_url, model, keep_alive)
+        if PROMETHEUS_AVAILABLE and MODEL_LOADS is not None:
+            MODEL_LOADS.labels(model=model, outcome="ok" if ok else "failed").inc()
+        return ok
+
+    async def ensure_min_residency(self) -> int:
+        """Load or extend pinned models so each stays hot on the minimum number of instances.
+
+        Returns:
+            Number of preload requests issued
+        """
+        plan = self.plan_pins()
+        self.pinned = {model: set(urls) for model, urls in plan.items()}
+
+        horizon = time.time() + 2 * max(1, self.settings.model_residency_refresh_seconds)
+        jobs = []
+        for model, urls in plan.items():
+            for url in urls:
+                expires = self.instances[url].models.get(model)
+                if expires is not None and expires > horizon:
+                    continue
+                jobs.append((url, model))
+
+        if not jobs:
+            return 0
+        # One load per instance at a time so preloads don't starve live traffic
+        by_instance: Dict[str, List[str]] = {}
+        for url, model in jobs:
+            by_instance.setdefault(url, []).append(model)
+
+        async with httpx.AsyncClient() as client:
+
+            async def _run(url: str, models: List[str]) -> None:
+                for model in models:
+                    await self._preload(client, url, model, self.settings.model_pinned_keep_alive)
+
+            await asyncio.gather(*(_run(url, models) for url, models in by_instance.items()))
+        logger.info(f"Model residency: issued {len(jobs)} preload(s) across {len(by_instance)} instance(s)")
+        self._export_metrics()
+        return len(jobs)
+
+    def _export_metrics(self) -> None:
+        if not PROMETHEUS_AVAILABLE or WARM_INSTANCES is None:
+            return
+        for model in self.resident_models:
+            WARM_INSTANCES.labels(model=model).set(len(self.warm_instances(model)))
+
+    def get_status(self) -> Dict[str, object]:
+        return {
+            "resident_models": self.resident_models,
+            "min_warm_instances": self.settings.model_min_warm_instances,
+            "pinned": {model: sorted(urls) for model, urls in self.pinned.items()},
+            "instances": {
+                url: {"reachable": state.reachable, "loaded_models": state.loaded_models()}
+                for url, state in self.instances.items()
+            },
+        }
+
+
+# Global tracker
+_residency: Optional[ModelResidencyTracker] = None
+_residency_lock = Lock()
+
+
+def get_model_residency(instance_urls: Optional[List[str]] = None) -> ModelResidencyTracker:
+    """Get or create the global model residency tracker."""
+    global _residency
+
+    if _residency is None:
+        with _residency_lock:
+            if _residency is None:
+                _residency = ModelResidencyTracker(instance_urls or get_ollama_instance_urls())
+
+    return _residency
@@ -0,0 +1,313 @@
+from datetime import datetime
+from utils.logging_config import setup_logging
+
+# Setup standardized Log4 logging
+logger = setup_logging(
+    program_name='ollama_scheduler',
+    log_level='INFO',
+    log_file=f'/app/logs/ollama_scheduler_{datetime.now().strftime("%Y%m%d")}.log',
+    console_output=True
+)
+if logger is None:
+    # Tests may stub setup_logging to a noop; fall back to standard logging to avoid None logger
+    import logging
+
+    logger = logging.getLogger("ollama_scheduler")
+
+"""
+Priority-Aware Ollama Request Scheduler
+
+Every Ollama call made by the reranker acquires a slot on the target instance
+through this scheduler, so interactive chat is not starved by batch chat,
+decomposition sub-requests, cache warm-ups or model preloads.
+
+- Priority classes: INTERACTIVE < DECOMPOSITION < BATCH < BACKGROUND (lower wins).
+  The class is carried in a context variable set with ``ollama_priority()`` at the
+  origin of the work (batch endpoint, warm-up job, ...); unmarked calls are
+  interactive.
+- Per-instance concurrency slots, handed out strictly by priority (FIFO within a
+  class). BATCH and BACKGROUND work may not take the last
+  ``scheduler_reserved_interactive_slots`` slots, so a bulk job already running
+  never leaves interactive requests queueing behind it.
+- Queue-depth limits per class: a full queue rejects immediately with 429.
+- Deadline-aware shedding: a request whose predicted (queue ahead x observed slot
+  hold time) or actual queue wait exceeds its class deadline is rejected with 503
+  rather than left to time out.
+
+Queue wait time, depth and sheds are exported per priority to Prometheus.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+from threading import Lock
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from reranker.metrics_registry import PROMETHEUS_AVAILABLE, get_or_create_metric
+from reranker.reranker_config import get_settings
+
+if PROMETHEUS_AVAILABLE:
+    from prometheus_client import Counter, Gauge, Histogram
+
+    QUEUE_WAIT = get_or_create_metric(
+        Histogram,
+        "ollama_scheduler_queue_wait_seconds",
+        "Time spent waiting for an Ollama slot",
+        ["priority"],
+        buckets=(0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+    )
+    QUEUE_DEPTH = get_or_create_metric(
+        Gauge, "ollama_scheduler_queue_depth", "Requests waiting for an Ollama slot", ["priority"]
+    )
+    SHED_TOTAL = get_or_create_metric(
+        Counter, "ollama_scheduler_shed_total", "Requests rejected by the Ollama scheduler", ["priority", "reason"]
+    )
+
+
+class Priority(IntEnum):
+    """Scheduling classes (lower value is served first)."""
+
+    INTERACTIVE = 0
+    DECOMPOSITION = 1
+    BATCH = 2
+    BACKGROUND = 3
+
+
+class OllamaOverloaded(HTTPException):
+    """Raised when the scheduler sheds a request (429 queue full, 503 deadline).
+
+    ``reason`` is "queue_full", "predicted_wait" (rejected without waiting, another
+    instance may still have room) or "timeout" (the wait deadline has passed).
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: int, reason: str = "queue_full"):
+        super().__init__(status_code=status_code, detail=detail, headers={"Retry-After": str(max(1, retry_after))})
+        self.reason = reason
+
+
+_priority_var: contextvars.ContextVar[Tuple[Priority, Optional[float]]] = contextvars.ContextVar(
+    "ollama_priority", default=(Priority.INTERACTIVE, None)
+)
+
+
+@contextmanager
+def ollama_priority(priority: Priority, max_wait_seconds: Optional[float] = None) -> Iterator[None]:
+    """Run the enclosed work (and tasks it creates) at the given scheduling priority."""
+    token = _priority_var.set((priority, max_wait_seconds))
+    try:
+        yield
+    finally:
+        _priority_var.reset(token)
+
+
+def current_priority() -> Priority:
+    return _priority_var.get()[0]
+
+
+class _InstanceSlots:
+    """Concurrency slots for one Ollama instance with a priority wait queue."""
+
+    # Weight of the newest sample in the slot hold-time average
+    HOLD_ALPHA = 0.2
+
+    def __init__(self, capacity: int, reserved: int):
+        self.capacity = max(1, capacity)
+        self.reserved = max(0, min(reserved, self.capacity - 1))
+        self.in_use = 0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.avg_hold_seconds = 0.0
+
+    def limit_for(self, priority: Priority) -> int:
+        if priority >= Priority.BATCH:
+            return self.capacity - self.reserved
+        return self.capacity
+
+    def can_take(self, priority: Priority) -> bool:
+        return self.in_use < self.limit_for(priority)
+
+    def waiting_ahead(self, priority: Priority) -> int:
+        return sum(1 for p, _, fut in self.waiters if p <= priority and not fut.done())
+
+    def predicted_wait(self, priority: Priority) -> float:
+        """Rough wait estimate: requests ahead (plus this one) served in waves of the slot limit."""
+        if self.avg_hold_seconds <= 0:
+            return 0.0
+        ahead = self.waiting_ahead(priority)
+        if ahead == 0 and self.can_take(priority):
+            return 0.0
+        return (ahead + 1) / self.limit_for(priority) * self.avg_hold_seconds
+
+    def record_hold(self, seconds: float) -> None:
+        if self.avg_hold_seconds <= 0:
+            self.avg_hold_seconds = seconds
+        else:
+            self.avg_hold_seconds += self.HOLD_ALPHA * (seconds - self.avg_hold_seconds)
+
+    def dispatch(self) -> None:
+        """Hand free slots to the highest-priority waiters."""
+        while self.waiters:
+            priority, _, fut = self.waiters[0]
+            if fut.done():
+                heapq.heappop(self.waiters)
+                continue
+            if not self.can_take(Priority(priority)):
+                break
+            heapq.heappop(self.waiters)
+            self.in_use += 1
+            fut.set_result(True)
+
+
+class OllamaScheduler:
+    """Admission control and per-instance slot scheduling for Ollama calls."""
+
+    def __init__(self, settings=None):
+        self.settings = settings or get_settings()
+        self.enabled = self.settings.scheduler_enabled
+        self.instances: Dict[str, _InstanceSlots] = {}
+        self.max_queue: Dict[Priority, int] = {
+            Priority.INTERACTIVE: self.settings.scheduler_max_queue_depth,
+            Priority.DECOMPOSITION: self.settings.scheduler_max_queue_depth,
+            Priority.BATCH: self.settings.scheduler_max_bulk_queue_depth,
+            Priority.BACKGROUND: self.settings.scheduler_max_bulk_queue_depth,
+        }
+        self.max_wait: Dict[Priority, float] = {
+            Priority.INTERACTIVE: float(self.settings.scheduler_interactive_max_wait_seconds),
+            Priority.DECOMPOSITION: float(self.settings.scheduler_interactive_max_wait_seconds),
+            Priority.BATCH: float(self.settings.scheduler_bulk_max_wait_seconds),
+            Priority.BACKGROUND: float(self.settings.scheduler_bulk_max_wait_seconds),
+        }
+        self.queued: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self._seq = itertools.count()
+
+    def _slots(self, instance_url: str) -> _InstanceSlots:
+        key = instance_url.rstrip("/")
+        slots = self.instances.get(key)
+        if slots is None:
+            slots = _InstanceSlots(
+                self.settings.scheduler_slots_per_instance, self.settings.scheduler_reserved_interactive_slots
+            )
+            self.instances[key] = slots
+        return slots
+
+    def _shed(self, priority: Priority, reason: str, status_code: int, detail: str, retry_after: float) -> None:
+        if PROMETHEUS_AVAILABLE and SHED_TOTAL is not None:
+            SHED_TOTAL.labels(priority=priority.name.lower(), reason=reason).inc()
+        logger.warning(f"Shedding {priority.name.lower()} request: {detail}")
+        raise OllamaOverloaded(status_code, detail, int(retry_after) + 1, reason)
+
+    def check_admission(self, priority: Optional[Priority] = None) -> None:
+        """Reject new work up front when its class queue is already full (429)."""
+        if not self.enabled:
+            return
+        priority = current_priority() if priority is None else priority
+        if self.queued[priority] >= self.max_queue[priority]:
+            self._shed(priority, "queue_full", 429, "Ollama capacity exhausted; please retry shortly", 5)
+
+    @asynccontextmanager
+    async def slot(self, instance_url: str, priority: Optional[Priority] = None) -> AsyncIterator[None]:
+        """Hold a concurrency slot on an instance for the duration of the block."""
+        if not self.enabled:
+            yield
+            return
+
+        ctx_priority, ctx_wait = _priority_var.get()
+        priority = ctx_priority if priority is None else priority
+        max_wait = ctx_wait if ctx_wait is not None else self.max_wait[priority]
+        slots = self._slots(instance_url)
+        label = priority.name.lower()
+        start = time.time()
+
+        if slots.waiting_ahead(priority) == 0 and slots.can_take(priority):
+            slots.in_use += 1
+        else:
+            if self.queued[priority] >= self.max_queue[priority]:
+                self._shed(priority, "queue_full", 429, "Ollama capacity exhausted; please retry shortly", 5)
+            predicted = slots.predicted_wait(priority)
+            if predicted > max_wait:
+                self._shed(
+                    priority,
+                    "predicted_wait",
+                    503,
+                    f"Ollama instance busy (estimated wait {predicted:.1f}s exceeds {max_wait:.0f}s)",
+                    predicted,
+                )
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(slots.waiters, (int(priority), next(self._seq), fut))
+            self.queued[priority] += 1
+            if PROMETHEUS_AVAILABLE and QUEUE_DEPTH is not None:
+                QUEUE_DEPTH.labels(priority=label).set(self.queued[priority])
+            try:
+                done, _ = await asyncio.wait({fut}, timeout=max_wait)
+            except BaseException:
+                self._abandon(slots, fut)
+                raise
+            finally:
+                self.queued[priority] -= 1
+                if PROMETHEUS_AVAILABLE and QUEUE_DEPTH is not None:
+                    QUEUE_DEPTH.labels(priority=label).set(self.queued[priority])
+            if not done:
+                self._abandon(slots, fut)
+                self._shed(
+                    priority, "timeout", 503, f"Timed out after {max_wait:.0f}s waiting for Ollama capacity", max_wait
+                )
+
+        waited = time.time() - start
+        if PROMETHEUS_AVAILABLE and QUEUE_WAIT is not None:
+            QUEUE_WAIT.labels(priority=label).observe(waited)
+
+        acquired_at = time.time()
+        try:
+            yield
+        finally:
+            slots.record_hold(time.time() - acquired_at)
+            slots.in_use = max(0, slots.in_use - 1)
+            slots.dispatch()
+
+    @staticmethod
+    def _abandon(slots: _InstanceSlots, fut: asyncio.Future) -> None:
+        """Withdraw from the queue; if a slot was handed over meanwhile, give it back."""
+        if fut.done() and not fut.cancelled():
+            slots.in_use = max(0, slots.in_use - 1)
+            slots.dispatch()
+        else:
+            fut.cancel()
+            slots.dispatch()
+
+    def get_status(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "queued": {priority.name.lower(): count for priority, count in self.queued.items()},
+            "instances": {
+                url: {
+                    "in_use": slots.in_use,
+                    "capacity": slots.capacity,
+                    "reserved_interactive": slots.reserved,
+                    "waiting": len([w for w in slots.waiters if not w[2].done()]),
+                    "avg_hold_seconds": round(slots.avg_hold_seconds, 3),
+                }
+                for url, slots in self.instances.items()
+            },
+        }
+
+
+# Global scheduler
+_scheduler: Optional[OllamaScheduler] = None
+_scheduler_lock = Lock()
+
+
+def get_ollama_scheduler() -> OllamaScheduler:
+    """Get or create the global Ollama scheduler."""
+    global _scheduler
+
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = OllamaScheduler()
+
+    return _scheduler
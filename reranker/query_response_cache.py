@@ -28,6 +28,7 @@ import redis
 from pydantic import BaseModel
 
 from reranker.reranker_config import get_settings
+from utils.redis_cache import CounterBatch, get_async_redis_client, mark_async_redis_unavailable
 
 class CachedRAGResponse(BaseModel):
     """Cached RAG response with metadata."""
@@ -135,6 +136,102 @@ class QueryResponseCache:
             logger.warning(f"Cache retrieval error: {e}")
             return None
 
+    def contains(self, query: str) -> bool:
+        """Check whether a response is cached without recording a hit or miss."""
+        if not self.enabled or not self.redis_client:
+            return False
+
+        try:
+            cache_key = f"{self.PREFIX_RESPONSE}{self._hash_query(query)}"
+            return bool(self.redis_client.exists(cache_key))
+        except Exception as e:
+            logger.debug(f"Cache lookup error: {e}")
+            return False
+
+    async def aget(self, query: str, counters: Optional[CounterBatch] = None) -> Optional[Dict[str, Any]]:
+        """
+        Async variant of get() using the shared redis.asyncio pool.
+
+        Hit/miss counters are added to ``counters`` (flushed by the caller with the
+        rest of the request's counters) or flushed in the background.
+
+        Args:
+            query: User query string
+            counters: Optional per-request counter batch
+
+        Returns:
+            Cached response dict or None if not found/expired
+        """
+        if not self.enabled:
+            return None
+
+        client = get_async_redis_client(self.redis_url)
+        if client is None:
+            return None
+
+        try:
+            query_hash = self._hash_query(query)
+            cached_json = await client.get(f"{self.PREFIX_RESPONSE}{query_hash}")
+        except Exception as e:
+            logger.warning(f"Cache retrieval error: {e}")
+            mark_async_redis_unavailable(self.redis_url)
+            return None
+
+        batch = counters if counters is not None else CounterBatch(self.redis_url)
+        self._queue_lookup(batch, query_hash, hit=bool(cached_json))
+        if counters is None:
+            batch.flush_in_background()
+
+        if cached_json:
+            logger.debug(f"Cache HIT for query_hash={query_hash}")
+            return json.loads(cached_json)
+        logger.debug(f"Cache MISS for query_hash={query_hash}")
+        return None
+
+    async def aset(self, query: str, response: Dict[str, Any], ttl_seconds: Optional[int] = None) -> bool:
+        """Async variant of set() using the shared redis.asyncio pool."""
+        if not self.enabled:
+            return False
+
+        client = get_async_redis_client(self.redis_url)
+        if client is None:
+            return False
+
+        try:
+            cache_key, ttl_seconds, payload = self._build_entry(query, response, ttl_seconds)
+            await client.setex(cache_key, ttl_seconds, payload)
+            logger.info(f"Cached response: key={cache_key}, ttl={ttl_seconds}s")
+            return True
+        except Exception as e:
+            logger.warning(f"Cache storage error: {e}")
+            mark_async_redis_unavailable(self.redis_url)
+            return False
+
+    def _build_entry(self, query: str, response: Dict[str, Any], ttl_seconds: Optional[int]):
+        """Return (cache_key, ttl_seconds, payload) for a response."""
+        query_hash = self._hash_query(query)
+        if ttl_seconds is None:
+            # Use shorter TTL for web results
+            has_web = response.get("web_sources", []) and len(response.get("web_sources", [])) > 0
+            ttl_seconds = self.WEB_RESULT_TTL_SECONDS if has_web else self.DEFAULT_TTL_SECONDS
+
+        response_with_meta = {
+            **response,
+            "cached_at": datetime.utcnow().isoformat(),
+            "cache_ttl_seconds": ttl_seconds,
+            "query_hash": query_hash,
+        }
+        return f"{self.PREFIX_RESPONSE}{query_hash}", ttl_seconds, json.dumps(response_with_meta)
+
+    def _queue_lookup(self, counters: CounterBatch, query_hash: str, hit: bool) -> None:
+        """Add the hit/miss counter updates for one lookup to a batch."""
+        if hit:
+            counters.incr(f"{self.PREFIX_HIT_COUNT}{query_hash}", ttl=self.DEFAULT_TTL_SECONDS)
+            counters.hincr(self.PREFIX_STATS, "total_hits")
+        else:
+            counters.incr(f"{self.PREFIX_MISS_COUNT}{query_hash}", ttl=self.DEFAULT_TTL_SECONDS)
+            counters.hincr(self.PREFIX_STATS, "total_misses")
+
     def set(self, query: str, response: Dict[str, Any], ttl_seconds: Optional[int] = None) -> bool:
         """
         Cache response for query.
@@ -151,31 +248,12 @@ class QueryResponseCache:
             return False
 
         try:
-            query_hash = self._hash_query(query)
-            cache_key = f"{self.PREFIX_RESPONSE}{query_hash}"
-
-            # Determine TTL based on response type
-            if ttl_seconds is None:
-                # Use shorter TTL for web results
-                has_web = response.get("web_sources", []) and len(response.get("web_sources", [])) > 0
-                ttl_seconds = self.WEB_RESULT_TTL_SECONDS if has_web else self.DEFAULT_TTL_SECONDS
-
-            # Add metadata
-            response_with_meta = {
-                **response,
-                "cached_at": datetime.utcnow().isoformat(),
-                "cache_ttl_seconds": ttl_seconds,
-                "query_hash": query_hash,
-            }
+            cache_key, ttl_seconds, payload = self._build_entry(query, response, ttl_seconds)
 
             # Set in Redis with TTL
-            self.redis_client.setex(
-                cache_key,
-                ttl_seconds,
-                json.dumps(response_with_meta),
-            )
+            self.redis_client.setex(cache_key, ttl_seconds, payload)
 
-            logger.info(f"Cached response: query_hash={query_hash}, ttl={ttl_seconds}s")
+            logger.info(f"Cached response: key={cache_key}, ttl={ttl_seconds}s")
             return True
 
         except Exception as e:
@@ -189,11 +267,12 @@ class QueryResponseCache:
                 return
 
             hit_key = f"{self.PREFIX_HIT_COUNT}{query_hash}"
-            self.redis_client.incr(hit_key)
-            self.redis_client.expire(hit_key, self.DEFAULT_TTL_SECONDS)
-
-            # Update global stats
-            self.redis_client.hincrby(self.PREFIX_STATS, "total_hits", 1)
+            # One round trip for the per-query counter, its TTL and the global stats
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.incr(hit_key)
+            pipe.expire(hit_key, self.DEFAULT_TTL_SECONDS)
+            pipe.hincrby(self.PREFIX_STATS, "total_hits", 1)
+            pipe.execute()
 
         except Exception as e:
             logger.debug(f"Hit recording error: {e}")
@@ -205,11 +284,11 @@ class QueryResponseCache:
                 return
 
             miss_key = f"{self.PREFIX_MISS_COUNT}{query_hash}"
-            self.redis_client.incr(miss_key)
-            self.redis_client.expire(miss_key, self.DEFAULT_TTL_SECONDS)
-
-            # Update global stats
-            self.redis_client.hincrby(self.PREFIX_STATS, "total_misses", 1)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.incr(miss_key)
+            pipe.expire(miss_key, self.DEFAULT_TTL_SECONDS)
+            pipe.hincrby(self.PREFIX_STATS, "total_misses", 1)
+            pipe.execute()
 
         except Exception as e:
             logger.debug(f"Miss recording error: {e}")
@@ -303,6 +382,12 @@ def cache_rag_response(query: str, response: Dict[str, Any]) -> bool:
     cache = get_query_response_cache()
     return cache.set(query, response)
 
+async def acache_rag_response(query: str, response: Dict[str, Any]) -> bool:
+    """Cache a RAG response without blocking the event loop."""
+    cache = get_query_response_cache()
+    return await cache.aset(query, response)
+
+
 def get_cached_rag_response(query: str) -> Optional[Dict[str, Any]]:
     """Get cached RAG response if available."""
     cache = get_query_response_cache()
@@ -0,0 +1,320 @@
+from datetime import datetime, timedelta, timezone
+from utils.logging_config import setup_logging
+
+# Setup standardized Log4 logging
+logger = setup_logging(
+    program_name='question_stats',
+    log_level='INFO',
+    log_file=f'/app/logs/question_stats_{datetime.now().strftime("%Y%m%d")}.log',
+    console_output=True
+)
+if logger is None:
+    # Tests may stub setup_logging to a noop; fall back to standard logging to avoid None logger
+    import logging
+
+    logger = logging.getLogger("question_stats")
+
+"""
+Question Statistics Rollups
+
+The admin question-stats endpoints used to aggregate the raw ``question_usage``
+table on every dashboard refresh, so their cost grew with every question ever
+asked. Usage is now rolled up incrementally, in the same transaction as the
+write-behind batch that inserts the raw rows (``ChatPersistenceStore``):
+
+- ``question_usage_hourly`` / ``question_usage_daily``: per UTC bucket and
+  category, usage count and the sums/counts needed for exact averages.
+- ``question_pattern_stats``: per question pattern totals, feedback counters,
+  first/last use and distinct users (``question_pattern_users`` holds the
+  pairs so a repeat user is not counted twice).
+
+The endpoints read only these tables plus index-bounded "most recent" queries
+on the raw rows. Raw ``question_usage`` is partitioned by month;
+``run_partition_maintenance`` keeps partitions created ahead of time and, when
+``question_usage_retention_months`` is set, drops whole old partitions. The
+rollups keep the history of dropped months.
+
+Rows removed later (e.g. by a conversation delete cascading to its usage) stay
+counted: the rollups describe questions asked, not questions still stored.
+"""
+
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from reranker.db_pool import fetch, fetchrow, fetchval
+from reranker.reranker_config import get_settings
+
+# Months of partitions created ahead of the current one
+PARTITIONS_AHEAD_MONTHS = 3
+
+
+@dataclass
+class UsageTotals:
+    """Additive usage aggregates; averages are ``sum / count`` over non-null values."""
+
+    usage_count: int = 0
+    response_time_sum: int = 0
+    response_time_count: int = 0
+    quality_sum: float = 0.0
+    quality_count: int = 0
+
+    def add(self, usage: Any) -> None:
+        self.usage_count += 1
+        if usage.response_time_ms is not None:
+            self.response_time_sum += int(usage.response_time_ms)
+            self.response_time_count += 1
+        if usage.quality_score is not None:
+            self.quality_sum += float(usage.quality_score)
+            self.quality_count += 1
+
+
+@dataclass
+class PatternTotals(UsageTotals):
+    first_used: Optional[datetime] = None
+    last_used: Optional[datetime] = None
+    new_users: int = 0
+
+    def add(self, usage: Any) -> None:
+        super().add(usage)
+        self.first_used = usage.created_at if self.first_used is None else min(self.first_used, usage.created_at)
+        self.last_used = usage.created_at if self.last_used is None else max(self.last_used, usage.created_at)
+
+
+@dataclass
+class UsageRollups:
+    hourly: Dict[Tuple[datetime, str], UsageTotals]
+    daily: Dict[Tuple[datetime, str], UsageTotals]
+    patterns: Dict[int, PatternTotals]
+
+
+def _bucket(moment: datetime, granularity: str) -> datetime:
+    moment = moment.astimezone(timezone.utc) if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0) if granularity == "day" else moment
+
+
+def build_usage_rollups(
+    usages: Iterable[Any], pattern_ids: Mapping[str, int], new_users: Optional[Mapping[int, int]] = None
+) -> UsageRollups:
+    """Aggregate a batch of ``QuestionUsageRecord`` into rollup increments."""
+    rollups = UsageRollups(hourly={}, daily={}, patterns={})
+    for usage in usages:
+        pattern_id = pattern_ids.get(usage.question_hash)
+        if pattern_id is None:
+            continue
+        category = usage.category or ""
+        rollups.hourly.setdefault((_bucket(usage.created_at, "hour"), category), UsageTotals()).add(usage)
+        rollups.daily.setdefault((_bucket(usage.created_at, "day"), category), UsageTotals()).add(usage)
+        rollups.patterns.setdefault(pattern_id, PatternTotals()).add(usage)
+    for pattern_id, count in (new_users or {}).items():
+        if pattern_id in rollups.patterns:
+            rollups.patterns[pattern_id].new_users = count
+    return rollups
+
+
+_UPSERT_BUCKETS = """
+    INSERT INTO {table} AS r (bucket, category, usage_count, response_time_sum, response_time_count,
+                              quality_sum, quality_count)
+    SELECT * FROM unnest($1::timestamptz[], $2::text[], $3::bigint[], $4::bigint[], $5::bigint[],
+                         $6::float8[], $7::bigint[])
+    ON CONFLICT (bucket, category) DO UPDATE SET
+        usage_count = r.usage_count + EXCLUDED.usage_count,
+        response_time_sum = r.response_time_sum + EXCLUDED.response_time_sum,
+        response_time_count = r.response_time_count + EXCLUDED.response_time_count,
+        quality_sum = r.quality_sum + EXCLUDED.quality_sum,
+        quality_count = r.quality_count + EXCLUDED.quality_count
+"""
+
+_UPSERT_PATTERNS = """
+    INSERT INTO question_pattern_stats AS s (question_pattern_id, usage_count, response_time_sum,
+                                             response_time_count, quality_sum, quality_count,
+                                             unique_users, first_used, last_used)
+    SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::bigint[], $4::bigint[], $5::float8[], $6::bigint[],
+                         $7::bigint[], $8::timestamptz[], $9::timestamptz[])
+    ON CONFLICT (question_pattern_id) DO UPDATE SET
+        usage_count = s.usage_count + EXCLUDED.usage_count,
+        response_time_sum = s.response_time_sum + EXCLUDED.response_time_sum,
+        response_time_count = s.response_time_count + EXCLUDED.response_time_count,
+        quality_sum = s.quality_sum + EXCLUDED.quality_sum,
+        quality_count = s.quality_count + EXCLUDED.quality_count,
+        unique_users = s.unique_users + EXCLUDED.unique_users,
+        first_used = LEAST(s.first_used, EXCLUDED.first_used),
+        last_used = GREATEST(s.last_used, EXCLUDED.last_used)
+"""
+
+
+def _bucket_columns(buckets: Dict[Tuple[datetime, str], UsageTotals]) -> List[List[Any]]:
+    keys = list(buckets)
+    totals = [buckets[key] for key in keys]
+    return [
+        [bucket for bucket, _ in keys],
+        [category for _, category in keys],
+        [t.usage_count for t in totals],
+        [t.response_time_sum for t in totals],
+        [t.response_time_count for t in totals],
+        [t.quality_sum for t in totals],
+        [t.quality_count for t in totals],
+    ]
+
+
+async def apply_usage_rollups(conn: Any, usages: List[Any], pattern_ids: Mapping[str, int]) -> None:
+    """Add a batch of usage records to the rollup tables (call inside the insert's transaction)."""
+    pairs = sorted(
+        {
+            (pattern_ids[u.question_hash], u.user_id)
+            for u in usages
+            if u.question_hash in pattern_ids and u.user_id is not None
+        }
+    )
+    new_users: Counter = Counter()
+    if pairs:
+        rows = await conn.fetch(
+            """INSERT INTO question_pattern_users (question_pattern_id, user_id)
+               SELECT * FROM unnest($1::bigint[], $2::bigint[])
+               ON CONFLICT DO NOTHING
+               RETURNING question_pattern_id""",
+            [pattern_id for pattern_id, _ in pairs],
+            [user_id for _, user_id in pairs],
+        )
+        new_users.update(row["question_pattern_id"] for row in rows)
+
+    rollups = build_usage_rollups(usages, pattern_ids, new_users)
+    for table, buckets in (("question_usage_hourly", rollups.hourly), ("question_usage_daily", rollups.daily)):
+        if buckets:
+            await conn.execute(_UPSERT_BUCKETS.format(table=table), *_bucket_columns(buckets))
+    if rollups.patterns:
+        ids = list(rollups.patterns)
+        totals = [rollups.patterns[pattern_id] for pattern_id in ids]
+        await conn.execute(
+            _UPSERT_PATTERNS,
+            ids,
+            [t.usage_count for t in totals],
+            [t.response_time_sum for t in totals],
+            [t.response_time_count for t in totals],
+            [t.quality_sum for t in totals],
+            [t.quality_count for t in totals],
+            [t.new_users for t in totals],
+            [t.first_used for t in totals],
+            [t.last_used for t in totals],
+        )
+
+
+def _average(total: Any, count: Any) -> float:
+    return float(total) / count if count else 0.0
+
+
+async def load_question_stats(limit: int) -> Dict[str, Any]:
+    """Overall numbers, top categories, the last 24 hours and the most recent questions."""
+    overall = await fetchrow(
+        """SELECT COALESCE(SUM(usage_count), 0) AS total_questions,
+                  COALESCE(SUM(response_time_sum), 0) AS response_time_sum,
+                  COALESCE(SUM(response_time_count), 0) AS response_time_count,
+                  COALESCE(SUM(quality_sum), 0) AS quality_sum,
+                  COALESCE(SUM(quality_count), 0) AS quality_count,
+                  (SELECT COUNT(*) FROM question_pattern_stats) AS unique_questions
+           FROM question_usage_daily"""
+    )
+    categories = await fetch(
+        """SELECT NULLIF(category, '') AS category,
+                  SUM(usage_count) AS usage_count,
+                  SUM(response_time_sum)::float8 / NULLIF(SUM(response_time_count), 0) AS avg_response_time
+           FROM question_usage_daily
+           GROUP BY category
+           ORDER BY usage_count DESC
+           LIMIT $1""",
+        limit,
+    )
+    hourly = await fetch(
+        """SELECT bucket, SUM(usage_count) AS usage_count
+           FROM question_usage_hourly
+           WHERE bucket >= date_trunc('hour', NOW()) - INTERVAL '23 hours'
+           GROUP BY bucket
+           ORDER BY bucket"""
+    )
+    # Newest rows first: a backwards scan of each partition's created_at index, stopped after LIMIT
+    recent = await fetch(
+        """SELECT qp.canonical_question, qp.category, qu.created_at, qu.response_time_ms,
+                  qu.response_quality_score
+           FROM question_usage qu
+           JOIN question_patterns qp ON qu.question_pattern_id = qp.id
+           ORDER BY qu.created_at DESC
+           LIMIT $1""",
+        limit,
+    )
+    return {
+        "total_questions": int(overall["total_questions"]),
+        "unique_questions": int(overall["unique_questions"]),
+        "avg_response_time": _average(overall["response_time_sum"], overall["response_time_count"]),
+        "avg_quality_score": _average(overall["quality_sum"], overall["quality_count"]),
+        "top_categories": [dict(row) for row in categories],
+        "hourly_activity": [dict(row) for row in hourly],
+        "recent_questions": [dict(row) for row in recent],
+    }
+
+
+async def load_question_detail(question_hash: str, limit: int) -> Optional[Dict[str, Any]]:
+    """Rolled-up statistics of one question pattern plus its most recent uses."""
+    stats = await fetchrow(
+        """SELECT qp.id, qp.question_hash, qp.canonical_question, qp.category, s.usage_count,
+                  s.response_time_sum, s.response_time_count, s.quality_sum, s.quality_count,
+                  s.positive_feedback, s.negative_feedback, s.last_used, s.unique_users
+           FROM question_patterns qp
+           JOIN question_pattern_stats s ON s.question_pattern_id = qp.id
+           WHERE qp.question_hash = $1""",
+        question_hash,
+    )
+    if stats is None:
+        return None
+    recent = await fetch(
+        """SELECT qu.question_text, qu.response_time_ms, qu.response_quality_score, qu.user_feedback,
+                  qu.search_method, qu.created_at, u.email AS user_email
+           FROM question_usage qu
+           LEFT JOIN users u ON qu.user_id = u.id
+           WHERE qu.question_pattern_id = $1
+           ORDER BY qu.created_at DESC
+           LIMIT $2""",
+        stats["id"],
+        limit,
+    )
+    return {
+        "question_hash": stats["question_hash"],
+        "canonical_question": stats["canonical_question"],
+        "category": stats["category"],
+        "usage_count": stats["usage_count"],
+        "avg_response_time": _average(stats["response_time_sum"], stats["response_time_count"]),
+        "avg_quality_score": _average(stats["quality_sum"], stats["quality_count"]),
+        "positive_feedback": stats["positive_feedback"],
+        "negative_feedback": stats["negative_feedback"],
+        "last_used": stats["last_used"].isoformat() if stats["last_used"] else None,
+        "unique_users": stats["unique_users"],
+        "recent_usage": [dict(row) for row in recent],
+    }
+
+
+async def run_partition_maintenance(settings=None) -> Dict[str, int]:
+    """Create upcoming monthly ``question_usage`` partitions and drop expired ones."""
+    settings = settings or get_settings()
+    created = await fetchval("SELECT ensure_question_usage_partitions(CURRENT_DATE, $1)", PARTITIONS_AHEAD_MONTHS)
+    retention = getattr(settings, "question_usage_retention_months", 0)
+    dropped = 0
+    if retention > 0:
+        dropped = await fetchval("SELECT drop_question_usage_partitions($1)", retention)
+    if created or dropped:
+        logger.info(f"question_usage partitions: {created} created, {dropped} dropped")
+    return {"created": int(created or 0), "dropped": int(dropped or 0)}
+
+
+async def partition_maintenance_loop(settings=None) -> None:
+    """Run partition maintenance at startup and then periodically, until cancelled."""
+    settings = settings or get_settings()
+    interval = timedelta(hours=max(1, getattr(settings, "question_usage_partition_check_hours", 24))).total_seconds()
+    while True:
+        try:
+            await run_partition_maintenance(settings)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning(f"question_usage partition maintenance failed: {exc}")
+        await asyncio.sleep(interval)
@@ -27,14 +27,24 @@ from reranker.advanced_cache import get_advanced_cache
 # Optional intelligent router import (kept local to avoid circular issues at startup)
 from reranker.intelligent_router import ModelSelectionRequest, QuestionType, intelligent_router
 
+# Token-accurate prompt packing and per-request num_ctx sizing
+from reranker.context_packer import get_context_packer
+
+# Conversation-affine routing and prompt prefix (KV-cache) reuse
+from reranker.conversation_affinity import get_conversation_affinity, record_prefill, stable_history_window
+
 # Advanced load balancing for Ollama instances
+from reranker.hedging import Hedger
+from reranker.instance_health import get_health_registry
 from reranker.load_balancer import RequestType, get_load_balancer
+from reranker.model_residency import get_model_residency
+from reranker.ollama_scheduler import OllamaOverloaded, Priority, get_ollama_scheduler, ollama_priority
 
 # Query optimization for improved retrieval
 from reranker.query_optimizer import optimize_query
 
 # Query-Response caching for 15-20% latency reduction
-from reranker.query_response_cache import cache_rag_response, get_query_response_cache
+from reranker.query_response_cache import acache_rag_response, get_query_response_cache
 from scripts.analysis.hybrid_search import HybridSearch
 try:
     # Prefer local logging helper if available; tests may stub "utils.logging_config" with limited attrs.
@@ -45,7 +55,7 @@ except Exception:
 
     def get_logger(name: str = None):
         return logging.getLogger(name or __name__)
-from utils.redis_cache import track_instance_usage, track_model_usage, track_question_type
+from utils.redis_cache import CounterBatch
 
 from reranker.reranker_config import get_settings
 
@@ -66,6 +76,12 @@ class RAGChatRequest(BaseModel):
     temperature: float = Field(0.2, description="Generation temperature")
     max_tokens: int = Field(500, description="Maximum tokens to generate")
     stream: bool = Field(True, description="Whether to stream the response")
+    conversation_id: Optional[str] = Field(
+        None, description="Conversation identifier; turns of one conversation are routed to the same instance"
+    )
+    history: List[Dict[str, str]] = Field(
+        default_factory=list, description="Prior conversation turns as role/content messages, oldest first"
+    )
 
 
 class RAGChatResponse(BaseModel):
@@ -132,6 +148,21 @@ class RAGChatService:
 
         # Initialize load balancer for intelligent instance routing
         self.load_balancer = get_load_balancer(self.ollama_urls)
+        # Availability comes from the shared registry maintained by the background health monitor
+        self.load_balancer.registry = get_health_registry(self.ollama_urls)
+
+        # Track which models are loaded where so routing prefers warm instances
+        self.model_residency = get_model_residency(self.ollama_urls)
+        self.load_balancer.residency = self.model_residency
+        self.load_balancer.cold_load_penalty_ms = float(settings.model_cold_load_penalty_ms)
+
+        # Priority slots in front of every Ollama call
+        self.scheduler = get_ollama_scheduler()
+
+        # Hedging of short requests to a second instance when the first is slow
+        self.hedger = Hedger(self.load_balancer)
+        self.context_packer = get_context_packer()
+        self.affinity = get_conversation_affinity()
 
         # Initialize advanced caching (embeddings, inference, chunks)
         self.advanced_cache = get_advanced_cache()
@@ -140,6 +171,8 @@ class RAGChatService:
         self.settings = settings
         # Hybrid search instance (lazy)
         self._hybrid_search_instance: Optional[HybridSearch] = None
+        # Fire-and-forget work (e.g. web cache writes) kept referenced until complete
+        self._background_tasks: set = set()
 
         # Load model configurations
         self.chat_model = settings.chat_model
@@ -221,6 +254,11 @@ class RAGChatService:
             # Default context length for fallback
             return self.select_model(query), None, question_type, complexity, 4096
 
+    async def resolve_model(self, query: str) -> str:
+        """The model the router would answer ``query`` with (no instance is claimed)."""
+        selected_model, *_ = await self._determine_model_and_instance(query)
+        return selected_model
+
     async def retrieve_context(self, query: str, max_chunks: int = 5) -> Tuple[List[str], List[Dict[str, Any]]]:
         """Retrieve relevant context chunks using hierarchical search: RAG first, then web search."""
         logger.info(f"Starting context retrieval for query: {query[:50]}...")
@@ -319,41 +357,57 @@ class RAGChatService:
     async def _get_query_embedding(self, query: str) -> List[float]:
         """Generate embedding for the query using Ollama with load balancing and caching."""
         # Check advanced embedding cache first
-        cached_embedding = self.advanced_cache.get_embedding(query)
+        cached_embedding = await self.advanced_cache.aget_embedding(query)
         if cached_embedding:
             logger.info(f"Embedding cache HIT for query: {query[:50]}...")
             return cached_embedding
 
         # Get next healthy embedding instance
-        selected_url = await self.load_balancer.get_next_instance(RequestType.EMBEDDING)
+        selected_url = await self.load_balancer.get_next_instance(RequestType.EMBEDDING, self.embedding_model)
         logger.info(f"Getting embedding for query: {query[:50]}... from Ollama instance: {selected_url}")
 
+        # Hedged: a duplicate goes to a second instance if this one is slower than its p95
+        embedding = await self.hedger.run(
+            lambda url: self._embed_on(url, query), selected_url, model=self.embedding_model, kind="embedding"
+        )
+        # Cache the embedding for future use
+        await self.advanced_cache.acache_embedding(query, embedding)
+        return embedding
+
+    async def _embed_on(self, selected_url: str, query: str) -> List[float]:
+        """Embed the query on one Ollama instance."""
         start_time = time.time()
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{selected_url}/api/embeddings",
-                    json={
-                        "model": self.embedding_model,
-                        "prompt": query,
-                    },
-                    timeout=30.0,
-                )
-                response_time = (time.time() - start_time) * 1000  # Convert to ms
-
-                if response.status_code == 200:
-                    data = response.json()
-                    embedding = data.get("embedding", [])
-                    # Cache the embedding for future use
-                    self.advanced_cache.cache_embedding(query, embedding)
-                    # Record successful embedding request
-                    self.load_balancer.record_request(selected_url, response_time, success=True)
-                    return embedding
-                else:
-                    self.load_balancer.record_request(
-                        selected_url, response_time, success=False, error=f"HTTP {response.status_code}"
-                    )
-                    raise HTTPException(status_code=response.status_code, detail="Embedding generation failed")
+            async with self.scheduler.slot(selected_url):
+                start_time = time.time()  # exclude queue wait from the instance latency
+                with self.load_balancer.track_in_flight(selected_url, self.embedding_model):
+                    async with httpx.AsyncClient() as client:
+                        response = await client.post(
+                            f"{selected_url}/api/embeddings",
+                            json={
+                                "model": self.embedding_model,
+                                "prompt": query,
+                                "keep_alive": self.model_residency.keep_alive_for(selected_url, self.embedding_model),
+                            },
+                            timeout=30.0,
+                        )
+                        response_time = (time.time() - start_time) * 1000  # Convert to ms
+
+                        if response.status_code == 200:
+                            data = response.json()
+                            # Record successful embedding request
+                            self.load_balancer.record_request(
+                                selected_url, response_time, success=True, kind="embedding", model=self.embedding_model
+                            )
+                            self.model_residency.mark_loaded(selected_url, self.embedding_model)
+                            return data.get("embedding", [])
+                        else:
+                            self.load_balancer.record_request(
+                                selected_url, response_time, success=False, error=f"HTTP {response.status_code}"
+                            )
+                            raise HTTPException(status_code=response.status_code, detail="Embedding generation failed")
+        except HTTPException:  # HTTP error already recorded, or shed by the scheduler
+            raise
         except Exception as e:
             response_time = (time.time() - start_time) * 1000
             self.load_balancer.record_request(selected_url, response_time, success=False, error=str(e))
@@ -510,132 +564,178 @@ class RAGChatService:
             logger.error(f"Hybrid search failed: {e}")
             return [], []
 
+    async def rebuild_hybrid_index(self) -> None:
+        """Rebuild the BM25 index after new documents were ingested."""
+        if not self._hybrid_search_instance:
+            return
+        try:
+            await asyncio.to_thread(self._hybrid_search_instance.build_index)
+        except Exception as e:
+            logger.warning(f"Hybrid index rebuild failed: {e}")
+
     async def _web_search(self, query: str, max_results: int = 3) -> List[Dict[str, Any]]:
-        """Perform web search with priority for sensus-training.com."""
-        from cache import get_cached_web_results, store_web_results
+        """Perform web search with priority for sensus-training.com.
+
+        Both SearXNG queries are issued concurrently on one client under a shared
+        deadline, so the fallback costs one round trip instead of two. The broad query
+        is cancelled once sensus-training.com has answered and the results fill
+        ``max_results``; sensus results are always waited for (up to the deadline),
+        since they take priority.
+        """
+        from reranker.cache import aget_cached_web_results, astore_web_results
 
-        # Check cache first
-        cached_results = get_cached_web_results(query)
+        cached_results = await aget_cached_web_results(query)
         if cached_results:
-            logger.info(f"Using cached web results for query: {query[:50]}...")
+            logger.info(f"Web search cache hit for query: {query[:50]}...")
             return [
                 {"title": r.title, "content": r.content, "url": r.url, "score": r.score}
                 for r in cached_results[:max_results]
             ]
 
-        results = []
-
-        # First, try sensus-training.com
-        sensus_results = await self._search_sensus_training(query)
-        results.extend(sensus_results)
-
-        # If we don't have enough results, search broadly
-        if len(results) < max_results:
-            broad_results = await self._search_broad_web(query, max_results - len(results))
-            results.extend(broad_results)
+        deadline = max(0.5, getattr(self.settings, "web_search_deadline_ms", 6000) / 1000.0)
+        loop = asyncio.get_running_loop()
+        stop_at = loop.time() + deadline
+        found: Dict[str, List[Dict[str, Any]]] = {"sensus": [], "broad": []}
 
-        # Cache the results
+        async with httpx.AsyncClient(timeout=deadline) as client:
+            sensus_task = asyncio.create_task(self._search_sensus_training(query, client))
+            tasks = {
+                sensus_task: "sensus",
+                asyncio.create_task(self._search_broad_web(query, max_results, client)): "broad",
+            }
+            pending = set(tasks)
+            try:
+                while pending:
+                    remaining = stop_at - loop.time()
+                    if remaining <= 0:
+                        logger.warning(f"Web search deadline ({deadline:.1f}s) reached for query: {query[:50]}...")
+                        break
+                    done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        found[tasks[task]] = task.result() if not task.exception() else []
+                    if sensus_task not in pending and len(found["sensus"]) + len(found["broad"]) >= max_results:
+                        break
+            finally:
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    await asyncio.gather(*pending, return_exceptions=True)
+
+        # sensus-training.com results keep priority over broad results
+        results = (found["sensus"] + found["broad"])[:max_results]
+
+        # Cache the results off the request path
         if results:
-            store_web_results(
-                query,
-                [{"title": r["title"], "url": r["url"], "content": r["content"], "score": r["score"]} for r in results],
+            self._spawn_background(
+                astore_web_results(
+                    query,
+                    [
+                        {"title": r["title"], "url": r["url"], "content": r["content"], "score": r["score"]}
+                        for r in results
+                    ],
+                )
             )
 
-        return results[:max_results]
+        return results
+
+    def _spawn_background(self, coro) -> None:
+        """Run a non-critical coroutine without awaiting it (kept referenced until done)."""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
 
     async def web_search(self, query: str, max_results: int = 3) -> List[Dict[str, Any]]:
         """Public wrapper for web search to expose in tools."""
 
         return await self._web_search(query, max_results)
 
-    async def _search_sensus_training(self, query: str) -> List[Dict[str, Any]]:
+    async def _search_sensus_training(
+        self, query: str, client: Optional[httpx.AsyncClient] = None
+    ) -> List[Dict[str, Any]]:
         """Search sensus-training.com for relevant content using SearXNG."""
-        try:
-            searxng_url = self.settings.searxng_base_url
-            search_url = f"{searxng_url.rstrip('/')}/search"
-
-            params = {
-                "q": f"site:sensus-training.com {query}",
-                "format": "json",
-                "categories": "general",
-                "engines": "duckduckgo,google",
-                "safesearch": "0",
-                "time_range": "",
-                "lang": "en",
-            }
-
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(search_url, params=params)
-
-                if response.status_code == 200:
-                    data = response.json()
-                    results = []
-
-                    for result in data.get("results", [])[:3]:  # Limit to 3
-                        results.append(
-                            {
-                                "title": result.get("title", ""),
-                                "url": result.get("url", ""),
-                                "content": result.get("content", ""),
-                                "score": 0.8,  # Default score
-                            }
-                        )
-
-                    logger.info(f"SearXNG search returned {len(results)} results from sensus-training.com")
-                    return results
-                else:
-                    logger.warning(f"SearXNG API error: {response.status_code}")
-                    return []
-
-        except Exception as e:
-            logger.warning(f"Sensus-training.com search failed: {e}")
-            return []
-
-    async def _search_broad_web(self, query: str, max_results: int = 3) -> List[Dict[str, Any]]:
+        params = {
+            "q": f"site:sensus-training.com {query}",
+            "format": "json",
+            "categories": "general",
+            "engines": "duckduckgo,google",
+            "safesearch": "0",
+            "time_range": "",
+            "lang": "en",
+        }
+        results = await self._searxng_query(params, limit=3, score=0.8, client=client, label="sensus-training.com")
+        if results is not None:
+            logger.info(f"SearXNG search returned {len(results)} results from sensus-training.com")
+        return results or []
+
+    async def _search_broad_web(
+        self, query: str, max_results: int = 3, client: Optional[httpx.AsyncClient] = None
+    ) -> List[Dict[str, Any]]:
         """Perform broad web search using SearXNG."""
+        params = {
+            "q": query,
+            "format": "json",
+            "categories": "general",
+            "engines": "duckduckgo,google,startpage",
+            "safesearch": "0",
+            "time_range": "",
+            "lang": "en",
+        }
+        results = await self._searxng_query(params, limit=max_results, score=0.7, client=client, label="broad")
+        if results is not None:
+            logger.info(f"SearXNG broad search returned {len(results)} results")
+        return results or []
+
+    async def _searxng_query(
+        self,
+        params: Dict[str, str],
+        limit: int,
+        score: float,
+        client: Optional[httpx.AsyncClient] = None,
+        label: str = "",
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Run one SearXNG query; returns None on failure."""
+        search_url = f"{self.settings.searxng_base_url.rstrip('/')}/search"
         try:
-            searxng_url = self.settings.searxng_base_url
-            search_url = f"{searxng_url.rstrip('/')}/search"
-
-            params = {
-                "q": query,
-                "format": "json",
-                "categories": "general",
-                "engines": "duckduckgo,google,startpage",
-                "safesearch": "0",
-                "time_range": "",
-                "lang": "en",
-            }
-
-            async with httpx.AsyncClient(timeout=10.0) as client:
+            if client is None:
+                async with httpx.AsyncClient(timeout=10.0) as own_client:
+                    response = await own_client.get(search_url, params=params)
+            else:
                 response = await client.get(search_url, params=params)
 
-                if response.status_code == 200:
-                    data = response.json()
-                    results = []
-
-                    for result in data.get("results", [])[:max_results]:
-                        results.append(
-                            {
-                                "title": result.get("title", ""),
-                                "url": result.get("url", ""),
-                                "content": result.get("content", ""),
-                                "score": 0.7,  # Default score
-                            }
-                        )
-
-                    logger.info(f"SearXNG broad search returned {len(results)} results")
-                    return results
-                else:
-                    logger.warning(f"SearXNG API error: {response.status_code}")
-                    return []
+            if response.status_code != 200:
+                logger.warning(f"SearXNG API error ({label}): {response.status_code}")
+                return None
 
+            data = response.json()
+            return [
+                {
+                    "title": result.get("title", ""),
+                    "url": result.get("url", ""),
+                    "content": result.get("content", ""),
+                    "score": score,  # Default score
+                }
+                for result in data.get("results", [])[:limit]
+            ]
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.warning(f"Broad web search failed: {e}")
-            return []
+            logger.warning(f"SearXNG search failed ({label}): {e}")
+            return None
 
-    def build_rag_prompt(self, query: str, context_chunks: List[str], complexity: str = "moderate") -> Dict[str, str]:
-        """Build prompt with retrieved context, returning system and user prompts separately."""
+    def build_rag_prompt(
+        self,
+        query: str,
+        context_chunks: List[str],
+        complexity: str = "moderate",
+        history: Optional[List[Dict[str, str]]] = None,
+    ) -> Dict[str, Any]:
+        """Build prompt with retrieved context, returning system, history and user prompts separately.
+
+        The system prompt and prior turns are identical from one turn to the next so
+        they form a prefix Ollama can reuse from its KV cache; everything volatile
+        (retrieved context, per-question guidelines, the question) goes in the final
+        user message.
+        """
         rni_definition = "The RNI is a Sensus Regional Network Interface - a comprehensive platform for utility AMI (Advanced Metering Infrastructure) systems."
 
         # Adjust prompt based on question complexity
@@ -660,11 +760,12 @@ class RAGChatService:
 
         system_prompt = f"""You are a helpful AI assistant specialized in RNI systems and Sensus products. {rni_definition}
 
-{response_guidelines}"""
+Answer the latest question using the context supplied with it and the earlier conversation."""
+        history_messages = list(history or [])
 
         if not context_chunks:
-            user_prompt = f"Question: {query}\n\nProvide your response in the following format:\nThinking: [step-by-step reasoning]\nAnswer: [clear answer]\nSources: [list sources or 'None']"
-            return {"system": system_prompt, "user": user_prompt}
+            user_prompt = f"Question: {query}\n\n{response_guidelines}\n\nProvide your response in the following format:\nThinking: [step-by-step reasoning]\nAnswer: [clear answer]\nSources: [list sources or 'None']"
+            return {"system": system_prompt, "history": history_messages, "user": user_prompt}
 
         # Check if context contains web search results
         has_web_results = any("Web Result:" in chunk or "Source:" in chunk for chunk in context_chunks)
@@ -676,6 +777,8 @@ class RAGChatService:
 
 Question: {query}
 
+{response_guidelines}
+
 Provide your response in the following format:
 Thinking: [step-by-step reasoning analyzing the sources]
 Answer: [clear answer based on sources]
@@ -687,25 +790,49 @@ Sources: [list all sources cited]"""
 
 Question: {query}
 
+{response_guidelines}
+
 Provide your response in the following format:
 Thinking: [step-by-step reasoning analyzing the context]
 Answer: [clear answer based on documentation]
 Sources: [list documentation sources]"""
 
-        return {"system": system_prompt, "user": user_prompt}
+        return {"system": system_prompt, "history": history_messages, "user": user_prompt}
 
     async def generate_response(
         self,
-        prompt_dict: Dict[str, str],
+        prompt_dict: Dict[str, Any],
         model: str,
         temperature: float,
         max_tokens: int,
         stream: bool = False,
         preferred_instance: Optional[str] = None,
+        counters: Optional[CounterBatch] = None,
+        num_ctx: Optional[int] = None,
+        prompt_tokens: int = 0,
     ) -> Union[str, Response]:
         """Generate response using Ollama chat API with system and user prompts and load balancing."""
-        system_prompt = prompt_dict.get("system", "")
-        user_prompt = prompt_dict.get("user", "")
+        if counters is None:
+            counters = CounterBatch()
+            try:
+                return await self.generate_response(
+                    prompt_dict,
+                    model,
+                    temperature,
+                    max_tokens,
+                    stream,
+                    preferred_instance,
+                    counters,
+                    num_ctx,
+                    prompt_tokens,
+                )
+            finally:
+                counters.flush_in_background()
+
+        # System prompt and prior turns first: the stable prefix an instance can reuse
+        messages = [{"role": "system", "content": prompt_dict.get("system", "")}]
+        messages.extend(prompt_dict.get("history") or [])
+        messages.append({"role": "user", "content": prompt_dict.get("user", "")})
 
         # Get healthy instances for fallback chain
         healthy_instances = await self.load_balancer.get_healthy_instances(RequestType.INFERENCE)
@@ -714,9 +841,10 @@ Sources: [list documentation sources]"""
         instances_to_try = []
         if preferred_instance:
             instances_to_try.append(preferred_instance)
+        shed: Optional[OllamaOverloaded] = None
 
-        # Get load-balanced instance
-        lb_instance = await self.load_balancer.get_next_instance(RequestType.INFERENCE)
+        # Get load-balanced instance; each candidate is admitted only right before it is tried
+        lb_instance = await self.load_balancer.get_next_instance(RequestType.INFERENCE, model, admit=False)
         if lb_instance not in instances_to_try:
             instances_to_try.append(lb_instance)
 
@@ -725,71 +853,140 @@ Sources: [list documentation sources]"""
             if inst not in instances_to_try:
                 instances_to_try.append(inst)
 
+        # Short non-streaming generations are hedged to a second instance past the p95
+        hedge = not stream and max_tokens <= self.settings.hedge_max_tokens
+        # With every circuit open, try the list anyway rather than failing outright
+        gated = any(self.load_balancer.is_available(url) for url in instances_to_try)
+
         for attempt, selected_url in enumerate(instances_to_try):
+            if gated and not self.load_balancer.admit(selected_url):
+                # Open, or half-open with another request holding its trial
+                continue
             logger.debug(
                 f"Attempting Ollama instance {selected_url} for model {model} (attempt {attempt + 1}/{len(instances_to_try)})"
             )
-            track_instance_usage(selected_url)
+            counters.instance_usage(selected_url)
 
-            start_time = time.time()
             try:
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        f"{selected_url}/api/chat",
-                        json={
-                            "model": model,
-                            "messages": [
-                                {"role": "system", "content": system_prompt},
-                                {"role": "user", "content": user_prompt},
-                            ],
-                            "stream": stream,
-                            "options": self._build_generation_options(model, temperature, max_tokens),
-                        },
-                        timeout=float(CHAT_GENERATION_TIMEOUT),
-                    )
-                    response_time = (time.time() - start_time) * 1000  # Convert to ms
-
-                    if response.status_code == 200:
-                        self.load_balancer.record_request(selected_url, response_time, success=True)
-                        if stream:
-                            return response
-                        data = response.json()
-                        message = data.get("message", {})
-                        content = message.get("content", "No response generated")
-                        logger.debug(f"[DEBUG] Ollama response (non-streaming): status={response.status_code}, content_length={len(content)}, content_preview={content[:100]}")
-                        return content
-
-                    logger.warning(
-                        "Generation failure status=%s on %s; trying next instance.",
-                        response.status_code,
+                if hedge:
+                    result = await self.hedger.run(
+                        lambda url: self._generate_on(
+                            url, model, messages, stream, temperature, max_tokens, num_ctx, prompt_tokens
+                        ),
                         selected_url,
+                        model=model,
+                        kind="generation",
                     )
-                    self.load_balancer.record_request(
-                        selected_url, response_time, success=False, error=f"HTTP {response.status_code}"
+                else:
+                    result = await self._generate_on(
+                        selected_url, model, messages, stream, temperature, max_tokens, num_ctx, prompt_tokens
                     )
-
-            except (httpx.ReadTimeout, httpx.TimeoutException) as e:
-                response_time = (time.time() - start_time) * 1000
+                if result is not None:
+                    return result
+                logger.warning("Generation failed on %s; trying next instance.", selected_url)
+
+            except OllamaOverloaded as exc:
+                # Queue full / predicted wait too long here: another instance may have room
+                if exc.reason == "timeout":
+                    raise
+                shed = exc
+                continue
+            except (httpx.ReadTimeout, httpx.TimeoutException):
                 logger.warning("Timeout on %s; retrying with next instance", selected_url)
-                self.load_balancer.record_request(selected_url, response_time, success=False, error=str(e))
             except Exception as exc:
-                response_time = (time.time() - start_time) * 1000
                 logger.error("Generation error on %s: %s", selected_url, exc)
-                self.load_balancer.record_request(selected_url, response_time, success=False, error=str(exc))
                 preferred_instance = None
                 continue
 
+        if shed is not None:
+            raise shed
         raise HTTPException(status_code=408, detail="Generation timeout")
 
-    def _build_generation_options(self, model: str, temperature: float, max_tokens: int) -> Dict[str, Any]:
+    async def _generate_on(
+        self,
+        selected_url: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        stream: bool,
+        temperature: float,
+        max_tokens: int,
+        num_ctx: Optional[int] = None,
+        prompt_tokens: int = 0,
+    ) -> Optional[Union[str, Response]]:
+        """One generation attempt on one Ollama instance; None if it answered with an error status."""
+        async with self.scheduler.slot(selected_url):
+            start_time = time.time()  # exclude queue wait from the instance latency
+            try:
+                with self.load_balancer.track_in_flight(selected_url, model):
+                    async with httpx.AsyncClient() as client:
+                        response = await client.post(
+                            f"{selected_url}/api/chat",
+                            json={
+                                "model": model,
+                                "messages": messages,
+                                "stream": stream,
+                                "options": self._build_generation_options(model, temperature, max_tokens, num_ctx),
+                                "keep_alive": self.model_residency.keep_alive_for(selected_url, model),
+                            },
+                            timeout=float(CHAT_GENERATION_TIMEOUT),
+                        )
+                        response_time = (time.time() - start_time) * 1000  # Convert to ms
+
+                        if response.status_code == 200:
+                            # post() buffers streamed bodies too, so both are timed end to end; streamed
+                            # answers are never hedged and stay out of the generation hedging window
+                            self.load_balancer.record_request(
+                                selected_url,
+                                response_time,
+                                success=True,
+                                kind=None if stream else "generation",
+                                model=model,
+                            )
+                            self.model_residency.mark_loaded(selected_url, model)
+                            if stream:
+                                return response
+                            data = response.json()
+                            record_prefill(model, prompt_tokens, data)
+                            message = data.get("message", {})
+                            content = message.get("content", "No response generated")
+                            logger.debug(f"[DEBUG] Ollama response (non-streaming): status={response.status_code}, content_length={len(content)}, content_preview={content[:100]}")
+                            return content
+
+                        logger.warning(
+                            "Generation failure status=%s on %s",
+                            response.status_code,
+                            selected_url,
+                        )
+                        self.load_balancer.record_request(
+                            selected_url, response_time, success=False, error=f"HTTP {response.status_code}"
+                        )
+                        return None
+            except Exception as exc:
+                response_time = (time.time() - start_time) * 1000
+                self.load_balancer.record_request(selected_url, response_time, success=False, error=str(exc))
+                raise
+
+    def _build_generation_options(
+        self, model: str, temperature: float, max_tokens: int, num_ctx: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Ollama options; ``num_ctx`` is the packed request's bucket, else the model's configured size."""
         options: Dict[str, Any] = {"temperature": temperature, "num_predict": max_tokens}
-        num_ctx = get_model_num_ctx(model)
+        num_ctx = num_ctx or get_model_num_ctx(model)
         if num_ctx:
             options["num_ctx"] = num_ctx
         return options
 
     async def chat(self, request: RAGChatRequest) -> Union[RAGChatResponse, Response]:
         """Process RAG-enhanced chat request with hierarchical search."""
+        # All Redis counter updates for this request go out in one pipelined round trip,
+        # scheduled after the response is produced so Redis latency stays off the chat path.
+        counters = CounterBatch()
+        try:
+            return await self._chat(request, counters)
+        finally:
+            counters.flush_in_background()
+
+    async def _chat(self, request: RAGChatRequest, counters: CounterBatch) -> Union[RAGChatResponse, Response]:
         logger.info(
             f"Processing chat request: query='{request.query[:50]}...', use_context={request.use_context}, stream={request.stream}"
         )
@@ -798,11 +995,13 @@ Sources: [list documentation sources]"""
         context_metadata = []
         web_sources = []
         cache_hit = False
+        # Follow-up turns depend on the conversation so far; only standalone queries are cached
+        cacheable = request.use_context and not request.history
 
         # Check cache first for all requests
-        if request.use_context:
+        if cacheable:
             cache = get_query_response_cache()
-            cached_response = cache.get(request.query)
+            cached_response = await cache.aget(request.query, counters)
             if cached_response:
                 logger.info(f"Cache HIT for query: {request.query[:50]}...")
                 cache_hit = True
@@ -857,20 +1056,42 @@ Sources: [list documentation sources]"""
             model_profile = intelligent_router.model_profiles.get(selected_model)
             context_length = model_profile.context_length if model_profile else 4096
 
-        # Calculate dynamic max chunks based on model context length
-        # Estimate ~1000 tokens per chunk, reserve ~2000 tokens for system prompt and response
-        estimated_tokens_per_chunk = 1000
-        reserved_tokens = 2000
-        max_chunks_based_on_context = max(1, (context_length - reserved_tokens) // estimated_tokens_per_chunk)
-        effective_max_chunks = min(request.max_context_chunks, max_chunks_based_on_context)
+        # The window we may fill: the model's capability, capped by its configured num_ctx
+        max_ctx = min(context_length, get_model_num_ctx(selected_model) or context_length)
 
+        if request.use_context:
+            context_chunks, context_metadata = await self.retrieve_context(request.query, request.max_context_chunks)
+            logger.info(f"Retrieved {len(context_chunks)} chunks and {len(context_metadata)} metadata items")
+
+        # Successive turns go to the conversation's instance, which holds their prompt prefix
+        affine_instance = self.affinity.instance_for(request.conversation_id)
+        if affine_instance:
+            preferred_instance = affine_instance
+        history = stable_history_window(request.history, self.settings.conversation_history_turns)
+
+        # Count real tokens and drop the lowest-ranked chunks that do not fit the window
+        packed = self.context_packer.pack(
+            lambda chunks, turns: self.build_rag_prompt(request.query, chunks, complexity, turns),
+            context_chunks,
+            context_metadata,
+            selected_model,
+            request.max_tokens,
+            max_ctx,
+            history=history,
+        )
+        context_chunks, context_metadata = packed.chunks, packed.metadata
+        prompt_dict = packed.prompt
+        # Measured context this request occupies: packed prompt plus the answer budget
+        context_length = packed.prompt_tokens + request.max_tokens
         logger.info(
-            f"Model {selected_model} has {context_length} token context, allowing max {effective_max_chunks} chunks"
+            f"Packed {len(context_chunks)} chunks for {selected_model}: {packed.prompt_tokens} prompt tokens "
+            f"({packed.method}), num_ctx={packed.num_ctx}, dropped={packed.dropped}, "
+            f"history_dropped={packed.history_dropped}"
         )
+        # Prefix-reuse metrics subtract Ollama's evaluated count, so they need an exact prompt size
+        prefill_tokens = packed.prompt_tokens if packed.method == "exact" else 0
 
         if request.use_context:
-            context_chunks, context_metadata = await self.retrieve_context(request.query, effective_max_chunks)
-            logger.info(f"Retrieved {len(context_chunks)} chunks and {len(context_metadata)} metadata items")
 
             # Extract web sources for citations
             for chunk in context_chunks:
@@ -886,7 +1107,6 @@ Sources: [list documentation sources]"""
 
             logger.info(f"Retrieved {len(context_chunks)} context chunks ({len(web_sources)} from web) for query")
 
-        prompt_dict = self.build_rag_prompt(request.query, context_chunks, complexity)
         user_prompt = prompt_dict.get("user", "")
 
         logger.info(
@@ -898,21 +1118,11 @@ Sources: [list documentation sources]"""
             context_length,
         )
 
-        track_model_usage(selected_model)
+        counters.model_usage(selected_model)
         if question_type:
-            track_question_type(question_type.value)
+            counters.question_type(question_type.value)
 
         if request.stream:
-            # For streaming, context was retrieved with default limits, but log what it should have been
-            estimated_tokens_per_chunk = 1000
-            reserved_tokens = 2000
-            optimal_max_chunks = max(1, (context_length - reserved_tokens) // estimated_tokens_per_chunk)
-            if len(context_chunks) > optimal_max_chunks:
-                logger.warning(
-                    f"Streaming request retrieved {len(context_chunks)} chunks but model {selected_model} "
-                    f"({context_length} tokens) should only use {optimal_max_chunks} chunks"
-                )
-
             # Create streaming response with metadata
             response = cast(
                 Response,
@@ -923,6 +1133,9 @@ Sources: [list documentation sources]"""
                     request.max_tokens,
                     True,
                     preferred_instance,
+                    counters,
+                    packed.num_ctx,
+                    prefill_tokens,
                 ),
             )  # type: ignore
 
@@ -962,12 +1175,13 @@ Sources: [list documentation sources]"""
                         yield f"data: {json.dumps({'type': 'token', 'token': token})}\n\n"
 
                     if data.get("done") or data.get("final") or data.get("status") == "completed":
+                        record_prefill(selected_model, prefill_tokens, data)
                         yield f"data: {json.dumps({'type': 'done'})}\n\n"
 
                 # Cache the response after streaming completes
-                if not cache_hit and request.use_context:
+                if not cache_hit and cacheable:
                     try:
-                        cache_rag_response(
+                        await acache_rag_response(
                             request.query,
                             {
                                 "response": full_response,
@@ -997,6 +1211,9 @@ Sources: [list documentation sources]"""
                     request.max_tokens,
                     False,
                     preferred_instance,
+                    counters,
+                    packed.num_ctx,
+                    prefill_tokens,
                 ),
             )  # type: ignore
             logger.debug(f"[DEBUG] Non-streaming response_text: length={len(response_text)}, preview={response_text[:100] if response_text else 'EMPTY'}")
@@ -1022,7 +1239,7 @@ Sources: [list documentation sources]"""
 
                     try:
                         logger.info(f"Trying fallback model: {fallback_model} on {fallback_url}")
-                        async with httpx.AsyncClient(timeout=60.0) as client:
+                        async with self.scheduler.slot(fallback_url), httpx.AsyncClient(timeout=60.0) as client:
                             fallback_response = await client.post(
                                 f"{fallback_url}/api/generate",
                                 json={
@@ -1074,9 +1291,9 @@ Sources: [list documentation sources]"""
             )
 
             # Cache response for future queries (unless from cache already)
-            if not cache_hit and request.use_context:
+            if not cache_hit and cacheable:
                 try:
-                    cache_rag_response(
+                    await acache_rag_response(
                         request.query,
                         {
                             "response": response_text,
@@ -1110,7 +1327,9 @@ Sources: [list documentation sources]"""
                     max_tokens=request.max_tokens,
                     stream=False,  # Batch doesn't support streaming
                 )
-                return await self.chat(single_request)
+                # Batch work yields Ollama capacity to interactive chat
+                with ollama_priority(Priority.BATCH):
+                    return await self.chat(single_request)
 
         # Process all queries concurrently with semaphore limiting
         tasks = [process_single_query(query) for query in request.queries]
@@ -1157,6 +1376,7 @@ def add_rag_endpoints(app: FastAPI):
     @app.post("/api/rag-chat")
     async def rag_chat(request: RAGChatRequest):
         """RAG-enhanced chat endpoint combining retrieval and generation."""
+        rag_service.scheduler.check_admission()
         if request.stream:
             # For streaming, return StreamingResponse
             response = await rag_service.chat(request)
@@ -14,13 +14,94 @@ Advanced knowledge synthesis capabilities for cross-document reasoning,
 pattern recognition, and multi-perspective analysis.
 """
 
+import asyncio
+import hashlib
 import json
+import re
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from llm_client import async_client, call_client
 
 from config import get_model_num_ctx
 
 
+# Contradiction verdicts kept per synthesizer (pair of content hashes + query)
+CONTRADICTION_CACHE_SIZE = 4096
+# Characters of each text shown to the LLM (and hashed for the verdict cache)
+COMPARISON_TEXT_CHARS = 500
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha1(text[:COMPARISON_TEXT_CHARS].encode("utf-8")).hexdigest()
+
+
+def _pair_key(text1: str, text2: str) -> Tuple[str, str]:
+    """Order-independent content key for a pair of texts."""
+    hash1, hash2 = sorted((_content_hash(text1), _content_hash(text2)))
+    return hash1, hash2
+
+
+def _term_matrix(texts: List[str]) -> np.ndarray:
+    """Bag-of-words count vectors, one row per text (fallback when no embeddings exist)."""
+    tokenized = [_WORD_RE.findall(text.lower()) for text in texts]
+    vocabulary: Dict[str, int] = {}
+    for words in tokenized:
+        for word in words:
+            vocabulary.setdefault(word, len(vocabulary))
+    matrix = np.zeros((len(texts), max(1, len(vocabulary))))
+    for row, words in enumerate(tokenized):
+        for word in words:
+            matrix[row, vocabulary[word]] += 1.0
+    return matrix
+
+
+def similarity_matrix(vectors: np.ndarray) -> np.ndarray:
+    """Pairwise cosine similarity of the rows of ``vectors`` in one matrix product."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms == 0, 1.0, norms)
+    return unit @ unit.T
+
+
+def agglomerative_clusters(similarities: np.ndarray, threshold: float) -> List[List[int]]:
+    """Average-linkage agglomerative clustering of a pairwise similarity matrix.
+
+    Repeatedly merges the two most similar clusters until no pair of clusters has
+    an average similarity of at least ``threshold``. Returns sorted index groups,
+    singletons included.
+    """
+    n = len(similarities)
+    if n < 2:
+        return [[i] for i in range(n)]
+
+    linkage = np.array(similarities, dtype=float)
+    np.fill_diagonal(linkage, -np.inf)
+    members = [[i] for i in range(n)]
+    active = np.ones(n, dtype=bool)
+
+    while True:
+        candidates = np.where(active[:, None] & active[None, :], linkage, -np.inf)
+        a, b = divmod(int(np.argmax(candidates)), n)
+        if candidates[a, b] < threshold:
+            break
+        # Lance-Williams update: average linkage of the merged cluster to every other cluster
+        size_a, size_b = len(members[a]), len(members[b])
+        merged = (size_a * linkage[a] + size_b * linkage[b]) / (size_a + size_b)
+        linkage[a, :] = merged
+        linkage[:, a] = merged
+        linkage[a, a] = -np.inf
+        members[a].extend(members[b])
+        members[b] = []
+        active[b] = False
+
+    return [sorted(group) for group in members if group]
+
+
 @dataclass
 class KnowledgeCluster:
     """Represents a cluster of related knowledge pieces."""
@@ -74,14 +155,28 @@ class KnowledgeSynthesizer:
         """Initialize knowledge synthesizer with required clients."""
         self.search_client = search_client
         self.llm_client = llm_client
+        self._async_client = async_client(llm_client)
         self.settings = settings
 
         # Synthesis configuration
         self.min_cluster_size = 2
         self.max_clusters = 10
         self.similarity_threshold = 0.7
+        self.lexical_similarity_threshold = 0.3
         self.contradiction_threshold = 0.3
 
+        # Contradiction checks: only pairs about the same topic (similarity at least the
+        # minimum) that are not near-duplicates go to the LLM, most similar first, within
+        # a per-request budget of pairs, concurrent calls and time
+        self.embedding_model = getattr(settings, "embedding_model", None)
+        self.contradiction_min_similarity = 0.5
+        self.contradiction_min_lexical_similarity = 0.3
+        self.contradiction_duplicate_similarity = 0.97
+        self.max_contradiction_checks = 20
+        self.max_concurrent_comparisons = 4
+        self.contradiction_timeout = 60.0
+        self._contradiction_cache: "OrderedDict[Tuple[str, str, str], Optional[Dict[str, Any]]]" = OrderedDict()
+
         logger.info("Knowledge synthesizer initialized")
 
     async def synthesize_knowledge(
@@ -112,14 +207,18 @@ class KnowledgeSynthesizer:
             )
 
         try:
+            # One embedding batch serves both clustering and the contradiction pre-filter
+            texts = [doc.get("text", "") for doc in source_documents]
+            vectors = await self._document_vectors(source_documents, texts) if len(source_documents) > 1 else None
+
             # Step 1: Semantic clustering of information
-            clusters = await self._cluster_related_information(source_documents, query)
+            clusters = await self._cluster_related_information(source_documents, query, vectors)
 
             # Step 2: Cross-document pattern recognition
             patterns = await self._identify_cross_patterns(source_documents, query)
 
             # Step 3: Contradiction detection
-            conflicts = await self._detect_contradictions(source_documents, query)
+            conflicts = await self._detect_contradictions(source_documents, query, vectors)
 
             # Step 4: Multi-perspective analysis
             perspectives = await self._analyze_perspectives(source_documents, query)
@@ -154,61 +253,56 @@ class KnowledgeSynthesizer:
                 sources_analyzed=[],
             )
 
-    async def _cluster_related_information(self, documents: List[Dict[str, Any]], query: str) -> List[KnowledgeCluster]:
-        """Group related information into thematic clusters."""
+    async def _cluster_related_information(
+        self, documents: List[Dict[str, Any]], query: str, vectors: Optional[Tuple[np.ndarray, bool]] = None
+    ) -> List[KnowledgeCluster]:
+        """Group related information into thematic clusters.
+
+        Documents are grouped by agglomerative clustering over their embedding (or
+        word-count) similarities; themes, concepts and syntheses are generated only
+        for the clusters returned, concurrently. ``vectors`` is the result of
+        ``_document_vectors`` when the caller already has it.
+        """
         logger.info("Clustering related information...")
 
-        # Extract key concepts from each document
-        concept_extractions = []
-        for doc in documents:
-            concepts = await self._extract_key_concepts(doc.get("text", ""), query)
-            concept_extractions.append({"document": doc, "concepts": concepts, "text": doc.get("text", "")})
-
-        # Group documents by concept similarity
-        clusters = []
-        processed_docs = set()
-
-        for i, doc_info in enumerate(concept_extractions):
-            if i in processed_docs:
-                continue
-
-            # Start new cluster
-            cluster_docs = [doc_info]
-            cluster_concepts = set(doc_info["concepts"])
-            processed_docs.add(i)
-
-            # Find similar documents
-            for j, other_doc in enumerate(concept_extractions[i + 1 :], i + 1):
-                if j in processed_docs:
-                    continue
-
-                # Calculate concept overlap
-                other_concepts = set(other_doc["concepts"])
-                overlap = len(cluster_concepts.intersection(other_concepts))
-                total = len(cluster_concepts.union(other_concepts))
-
-                if total > 0 and overlap / total >= self.similarity_threshold:
-                    cluster_docs.append(other_doc)
-                    cluster_concepts.update(other_concepts)
-                    processed_docs.add(j)
-
-            if len(cluster_docs) >= self.min_cluster_size:
-                # Generate cluster synthesis
-                cluster_theme = await self._generate_cluster_theme(cluster_docs, query)
-                cluster_synthesis = await self._synthesize_cluster(cluster_docs, cluster_theme, query)
-
-                cluster = KnowledgeCluster(
-                    theme=cluster_theme,
-                    confidence=min(0.9, 0.5 + len(cluster_docs) * 0.1),
-                    source_documents=[doc["document"].get("source", "unknown") for doc in cluster_docs],
-                    key_concepts=list(cluster_concepts)[:10],  # Limit to top concepts
-                    supporting_evidence=[doc["text"][:200] + "..." for doc in cluster_docs],
-                    contradictions=[],  # Will be filled in contradiction detection
-                    synthesis=cluster_synthesis,
-                )
-                clusters.append(cluster)
-
-        return clusters[: self.max_clusters]
+        if len(documents) < self.min_cluster_size:
+            return []
+
+        texts = [doc.get("text", "") for doc in documents]
+        vectors, semantic = vectors or await self._document_vectors(documents, texts)
+        threshold = self.similarity_threshold if semantic else self.lexical_similarity_threshold
+        groups = [
+            group
+            for group in agglomerative_clusters(similarity_matrix(vectors), threshold)
+            if len(group) >= self.min_cluster_size
+        ]
+        # Largest clusters first; ties keep document order
+        groups.sort(key=lambda group: (-len(group), group[0]))
+        groups = groups[: self.max_clusters]
+        logger.info(f"Formed {len(groups)} clusters from {len(documents)} documents")
+
+        cluster_docs = [
+            [{"text": texts[i], "source": documents[i].get("source", "unknown")} for i in group] for group in groups
+        ]
+        return list(await asyncio.gather(*(self._build_cluster(docs, query) for docs in cluster_docs)))
+
+    async def _build_cluster(self, cluster_docs: List[Dict[str, Any]], query: str) -> KnowledgeCluster:
+        """Label and synthesize one cluster; theme and concepts are requested together."""
+        combined_text = "\n\n".join(doc["text"] for doc in cluster_docs)
+        cluster_theme, cluster_concepts = await asyncio.gather(
+            self._generate_cluster_theme(cluster_docs, query), self._extract_key_concepts(combined_text, query)
+        )
+        cluster_synthesis = await self._synthesize_cluster(cluster_docs, cluster_theme, query)
+
+        return KnowledgeCluster(
+            theme=cluster_theme,
+            confidence=min(0.9, 0.5 + len(cluster_docs) * 0.1),
+            source_documents=[doc["source"] for doc in cluster_docs],
+            key_concepts=cluster_concepts[:10],  # Limit to top concepts
+            supporting_evidence=[doc["text"][:200] + "..." for doc in cluster_docs],
+            contradictions=[],  # Will be filled in contradiction detection
+            synthesis=cluster_synthesis,
+        )
 
     async def _identify_cross_patterns(
         self, documents: List[Dict[str, Any]], query: str
@@ -258,38 +352,117 @@ class KnowledgeSynthesizer:
 
         return patterns
 
-    async def _detect_contradictions(self, documents: List[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
-        """Detect conflicting information across documents."""
+    async def _detect_contradictions(
+        self, documents: List[Dict[str, Any]], query: str, vectors: Optional[Tuple[np.ndarray, bool]] = None
+    ) -> List[Dict[str, Any]]:
+        """Detect conflicting information across documents.
+
+        All pairwise similarities come from one matrix product over the document
+        embeddings (or word counts, see ``_document_vectors``), and only topically
+        overlapping, non-identical pairs are compared by the LLM, concurrently and
+        within the budget.
+        """
         logger.info("Detecting contradictions...")
 
         contradictions = []
 
         try:
-            # Compare documents pairwise for contradictions
-            for i, doc1 in enumerate(documents):
-                for j, doc2 in enumerate(documents[i + 1 :], i + 1):
-                    contradiction = await self._compare_for_contradictions(
-                        doc1.get("text", ""), doc2.get("text", ""), query
+            texts = [doc.get("text", "") for doc in documents]
+            pairs = await self._candidate_contradiction_pairs(documents, texts, vectors)
+            verdicts = await self._compare_pairs(texts, pairs, query)
+
+            for (i, j), contradiction in zip(pairs, verdicts):
+                if contradiction:
+                    doc1, doc2 = documents[i], documents[j]
+                    contradictions.append(
+                        {
+                            "document_1": doc1.get("source", f"doc_{i}"),
+                            "document_2": doc2.get("source", f"doc_{j}"),
+                            "contradiction_type": contradiction.get("type", "factual"),
+                            "description": contradiction.get("description", ""),
+                            "severity": contradiction.get("severity", "medium"),
+                            "evidence_1": texts[i][:200],
+                            "evidence_2": texts[j][:200],
+                        }
                     )
 
-                    if contradiction:
-                        contradictions.append(
-                            {
-                                "document_1": doc1.get("source", f"doc_{i}"),
-                                "document_2": doc2.get("source", f"doc_{j}"),
-                                "contradiction_type": contradiction.get("type", "factual"),
-                                "description": contradiction.get("description", ""),
-                                "severity": contradiction.get("severity", "medium"),
-                                "evidence_1": doc1.get("text", "")[:200],
-                                "evidence_2": doc2.get("text", "")[:200],
-                            }
-                        )
-
         except Exception as e:
             logger.error(f"Contradiction detection failed: {e}")
 
         return contradictions
 
+    async def _document_vectors(self, documents: List[Dict[str, Any]], texts: List[str]) -> Tuple[np.ndarray, bool]:
+        """Embedding matrix for the documents and whether it is semantic.
+
+        Uses embeddings carried by the documents, else one batched ``embed`` call,
+        else word-count vectors.
+        """
+        embeddings = [doc.get("embedding") for doc in documents]
+        if not all(embeddings) and self.embedding_model and hasattr(self.llm_client, "embed"):
+            try:
+                response = await self._call_client("embed", model=self.embedding_model, input=texts)
+                embeddings = list(response["embeddings"])
+            except Exception as e:
+                logger.warning(f"Batch embedding of the source documents failed: {e}")
+        if all(embeddings) and len({len(vector) for vector in embeddings}) == 1:
+            return np.asarray(embeddings, dtype=float), True
+        return _term_matrix(texts), False
+
+    async def _candidate_contradiction_pairs(
+        self, documents: List[Dict[str, Any]], texts: List[str], vectors: Optional[Tuple[np.ndarray, bool]] = None
+    ) -> List[Tuple[int, int]]:
+        """Index pairs worth an LLM comparison, most similar first, at most ``max_contradiction_checks``."""
+        if len(documents) < 2:
+            return []
+        vectors, semantic = vectors or await self._document_vectors(documents, texts)
+        similarities = similarity_matrix(vectors)
+        minimum = self.contradiction_min_similarity if semantic else self.contradiction_min_lexical_similarity
+        hashes = [_content_hash(text) for text in texts]
+
+        rows, cols = np.triu_indices(len(documents), k=1)
+        scores = similarities[rows, cols]
+        keep = (scores >= minimum) & (scores < self.contradiction_duplicate_similarity)
+        order = np.argsort(-scores[keep], kind="stable")
+        candidates = [
+            (int(i), int(j))
+            for i, j in zip(rows[keep][order], cols[keep][order])
+            if texts[i].strip() and texts[j].strip() and hashes[i] != hashes[j]
+        ]
+        total_pairs = len(rows)
+        if len(candidates) > self.max_contradiction_checks:
+            logger.info(f"Contradiction checks capped at {self.max_contradiction_checks} of {len(candidates)} pairs")
+        logger.info(f"Contradiction pre-filter kept {len(candidates)} of {total_pairs} document pairs")
+        return candidates[: self.max_contradiction_checks]
+
+    async def _compare_pairs(
+        self, texts: List[str], pairs: List[Tuple[int, int]], query: str
+    ) -> List[Optional[Dict[str, Any]]]:
+        """LLM verdicts for the pairs, run concurrently; pairs unfinished at the deadline count as none."""
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrent_comparisons))
+
+        async def compare(i: int, j: int) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self._compare_for_contradictions(texts[i], texts[j], query)
+
+        # Pairs with the same content (repeated chunks) share one comparison
+        tasks: Dict[Tuple[str, str], "asyncio.Task[Optional[Dict[str, Any]]]"] = {}
+        pair_keys = []
+        for i, j in pairs:
+            key = _pair_key(texts[i], texts[j])
+            if key not in tasks:
+                tasks[key] = asyncio.create_task(compare(i, j))
+            pair_keys.append(key)
+        if not tasks:
+            return []
+        done, pending = await asyncio.wait(tasks.values(), timeout=self.contradiction_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"Contradiction detection deadline reached; {len(pending)} comparisons skipped")
+            await asyncio.gather(*pending, return_exceptions=True)
+        results = {key: task.result() if task in done and not task.exception() else None for key, task in tasks.items()}
+        return [results[key] for key in pair_keys]
+
     async def _analyze_perspectives(self, documents: List[Dict[str, Any]], query: str) -> List[Dict[str, Any]]:
         """Analyze different perspectives present in the documents."""
         logger.info("Analyzing multiple perspectives...")
@@ -439,13 +612,18 @@ class KnowledgeSynthesizer:
             return f"Synthesis failed for theme: {theme}"
 
     async def _compare_for_contradictions(self, text1: str, text2: str, query: str) -> Optional[Dict[str, Any]]:
-        """Compare two texts for contradictory information."""
+        """Compare two texts for contradictory information (verdicts cached by content hash)."""
+        key = (*_pair_key(text1, text2), query)
+        if key in self._contradiction_cache:
+            self._contradiction_cache.move_to_end(key)
+            return self._contradiction_cache[key]
+
         try:
             comparison_prompt = f"""
             Compare these two texts for contradictory information regarding: {query}
 
-            Text 1: {text1[:500]}
-            Text 2: {text2[:500]}
+            Text 1: {text1[:COMPARISON_TEXT_CHARS]}
+            Text 2: {text2[:COMPARISON_TEXT_CHARS]}
 
             If contradictions exist, return JSON with:
             {{"type": "factual/methodological/interpretive", "description": "brief description", "severity": "low/medium/high"}}
@@ -453,18 +631,23 @@ class KnowledgeSynthesizer:
             If no contradictions, return: null
             """
 
-            response = await self._call_llm(comparison_prompt, temperature=0.2, query=query)
-
-            try:
-                result = json.loads(response.strip())
-                return result if result and isinstance(result, dict) else None
-            except json.JSONDecodeError:
-                return None
+            response = await self._chat(comparison_prompt, temperature=0.2, query=query)
 
         except Exception as e:
             logger.error(f"Contradiction comparison failed: {e}")
             return None
 
+        try:
+            result = json.loads(response.strip())
+            verdict = result if result and isinstance(result, dict) else None
+        except json.JSONDecodeError:
+            verdict = None
+
+        self._contradiction_cache[key] = verdict
+        while len(self._contradiction_cache) > CONTRADICTION_CACHE_SIZE:
+            self._contradiction_cache.popitem(last=False)
+        return verdict
+
     def _calculate_synthesis_confidence(
         self, clusters: List[KnowledgeCluster], patterns: List[CrossReferencePattern], conflicts: List[Dict[str, Any]]
     ) -> float:
@@ -503,19 +686,27 @@ class KnowledgeSynthesizer:
             return getattr(self.settings, "reasoning_model", default_model)
         return getattr(self.settings, "chat_model", default_model)
 
+    async def _call_client(self, method: str, **kwargs) -> Any:
+        """Call the LLM client without blocking the event loop (see llm_client.py)."""
+        return await call_client(self._async_client, method, **kwargs)
+
+    async def _chat(self, prompt: str, temperature: float = 0.7, query: Optional[str] = None) -> str:
+        """One chat completion; raises on failure."""
+        model_name = self._select_model_for_query(query)
+        options = {"temperature": temperature}
+        num_ctx = get_model_num_ctx(model_name)
+        if num_ctx:
+            options["num_ctx"] = num_ctx
+
+        response = await self._call_client(
+            "chat", model=model_name, messages=[{"role": "user", "content": prompt}], options=options
+        )
+        return response["message"]["content"]
+
     async def _call_llm(self, prompt: str, temperature: float = 0.7, query: Optional[str] = None) -> str:
         """Make LLM call with error handling."""
         try:
-            model_name = self._select_model_for_query(query)
-            options = {"temperature": temperature}
-            num_ctx = get_model_num_ctx(model_name)
-            if num_ctx:
-                options["num_ctx"] = num_ctx
-
-            response = self.llm_client.chat(
-                model=model_name, messages=[{"role": "user", "content": prompt}], options=options
-            )
-            return response["message"]["content"]
+            return await self._chat(prompt, temperature=temperature, query=query)
 
         except Exception as e:
             logger.error(f"LLM call failed: {e}")
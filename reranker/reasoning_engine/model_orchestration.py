@@ -14,14 +14,54 @@ Sophisticated model orchestration capabilities including reasoning-aware model s
 multi-model consensus building, specialized model routing, and performance optimization.
 """
 
+import asyncio
+import math
+import re
 import statistics
 import time
-from collections import defaultdict, deque
+from collections import Counter, defaultdict, deque
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from llm_client import async_client, call_client
 
 from config import get_model_num_ctx
 
+# Cosine similarity at or above which two answers count as agreeing
+EMBEDDING_AGREEMENT_THRESHOLD = 0.85
+# Same for the bag-of-words fallback, which scores paraphrases lower
+LEXICAL_AGREEMENT_THRESHOLD = 0.6
+# Overall deadline for one consensus round, in seconds
+DEFAULT_CONSENSUS_TIMEOUT = 60.0
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _cosine(a: Any, b: Any) -> float:
+    """Cosine similarity of two dense vectors or two ``Counter`` bags of words."""
+    if isinstance(a, Counter):
+        dot = sum(count * b.get(word, 0) for word, count in a.items())
+        norm_a = math.sqrt(sum(count * count for count in a.values()))
+        norm_b = math.sqrt(sum(count * count for count in b.values()))
+    else:
+        dot = sum(x * y for x, y in zip(a, b))
+        norm_a = math.sqrt(sum(x * x for x in a))
+        norm_b = math.sqrt(sum(y * y for y in b))
+    return dot / (norm_a * norm_b) if norm_a and norm_b else 0.0
+
+
+def answer_similarity(answer_a: str, answer_b: str, embedding_a=None, embedding_b=None) -> Tuple[float, float]:
+    """Semantic similarity of two answers and the agreement threshold that applies to it.
+
+    Uses the answers' embeddings when both are available, otherwise cosine
+    similarity of their word counts.
+    """
+    if embedding_a and embedding_b and len(embedding_a) == len(embedding_b):
+        return _cosine(embedding_a, embedding_b), EMBEDDING_AGREEMENT_THRESHOLD
+    words_a = Counter(_WORD_RE.findall(answer_a.lower()))
+    words_b = Counter(_WORD_RE.findall(answer_b.lower()))
+    return _cosine(words_a, words_b), LEXICAL_AGREEMENT_THRESHOLD
+
 
 @dataclass
 class ModelPerformanceMetrics:
@@ -75,6 +115,7 @@ class ConsensusResult:
     consensus_strategy_used: str
     models_participated: List[str]
     processing_time_ms: int
+    models_cancelled: List[str] = field(default_factory=list)
 
 
 class EnhancedModelOrchestrator:
@@ -91,9 +132,18 @@ class EnhancedModelOrchestrator:
     - Performance monitoring and adaptation
     """
 
-    def __init__(self, ollama_client, available_models: Optional[List[str]] = None):
-        """Initialize enhanced model orchestrator."""
+    def __init__(
+        self, ollama_client, available_models: Optional[List[str]] = None, embedding_model: Optional[str] = None
+    ):
+        """Initialize enhanced model orchestrator.
+
+        ``embedding_model`` enables embedding-based answer similarity for consensus;
+        without it answers are compared by their word counts.
+        """
         self.ollama_client = ollama_client
+        # Calls go through an async client so cancelling a superseded generation closes its request
+        self._async_client = async_client(ollama_client)
+        self.embedding_model = embedding_model
 
         # Model capabilities and performance tracking
         self.model_metrics: Dict[str, ModelPerformanceMetrics] = {}
@@ -107,6 +157,7 @@ class EnhancedModelOrchestrator:
         self.routing_strategy = "performance_based"
         self.enable_consensus = True
         self.consensus_threshold = 0.7
+        self.consensus_timeout = DEFAULT_CONSENSUS_TIMEOUT
 
         # Initialize model capabilities
         self._initialize_model_capabilities(available_models or ["llama2", "mistral:7b", "codellama", "llama2:13b"])
@@ -170,44 +221,75 @@ class EnhancedModelOrchestrator:
         selected_models: List[str],
         consensus_strategy: str = "weighted_voting",
         max_models: int = 3,
+        timeout: Optional[float] = None,
     ) -> ConsensusResult:
         """
         Execute reasoning with multi-model consensus.
 
+        The models run concurrently. As soon as a majority of them have returned
+        answers that agree (see ``answer_similarity``), the calls still running are
+        cancelled; calls still running at the deadline are cancelled as well.
+
         Args:
             query: The reasoning query
             reasoning_type: Type of reasoning
             selected_models: Models to use for consensus
             consensus_strategy: Strategy for reaching consensus
             max_models: Maximum number of models to use
+            timeout: Deadline for the whole round in seconds (default ``consensus_timeout``)
 
         Returns:
             Consensus result with final answer and agreement metrics
         """
-        logger.info(f"Executing consensus reasoning with {len(selected_models[:max_models])} models")
+        models = list(dict.fromkeys(selected_models[:max_models]))
+        logger.info(f"Executing consensus reasoning with {len(models)} models")
 
         start_time = time.time()
-        model_responses = {}
+        deadline = start_time + (timeout if timeout is not None else self.consensus_timeout)
+        quorum = len(models) // 2 + 1
+        model_responses: Dict[str, Dict[str, Any]] = {}
+        embeddings: Dict[str, Optional[List[float]]] = {}
+        cancelled: List[str] = []
 
         try:
-            # Execute reasoning with each selected model
-            tasks = []
-            for model in selected_models[:max_models]:
-                task = self._execute_single_model_reasoning(query, reasoning_type, model)
-                tasks.append((model, task))
-
-            # Gather responses
-            for model, task in tasks:
-                try:
-                    response = await task
-                    model_responses[model] = response
-                except Exception as e:
-                    logger.error(f"Model {model} failed: {e}")
-                    model_responses[model] = {"success": False, "error": str(e), "answer": "", "confidence": 0.0}
+            tasks = {
+                asyncio.create_task(self._reason_and_embed(query, reasoning_type, model)): model for model in models
+            }
+            pending = set(tasks)
+            try:
+                while pending:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        logger.warning(f"Consensus deadline reached with {len(pending)} model(s) still running")
+                        break
+                    done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        model = tasks[task]
+                        try:
+                            model_responses[model], embeddings[model] = task.result()
+                        except Exception as e:
+                            logger.error(f"Model {model} failed: {e}")
+                            model_responses[model] = {
+                                "success": False,
+                                "error": str(e),
+                                "answer": "",
+                                "confidence": 0.0,
+                            }
+                    if pending and len(models) > 1 and self._has_agreeing_quorum(model_responses, embeddings, quorum):
+                        logger.info(
+                            f"{quorum} of {len(models)} models agree; cancelling {len(pending)} remaining call(s)"
+                        )
+                        break
+            finally:
+                for task in pending:
+                    task.cancel()
+                    cancelled.append(tasks[task])
+                if pending:
+                    await asyncio.gather(*pending, return_exceptions=True)
 
             # Apply consensus strategy
             consensus_result = await self._apply_consensus_strategy(
-                query=query, model_responses=model_responses, strategy=consensus_strategy
+                query=query, model_responses=model_responses, strategy=consensus_strategy, embeddings=embeddings
             )
 
             processing_time = int((time.time() - start_time) * 1000)
@@ -220,6 +302,7 @@ class EnhancedModelOrchestrator:
                 consensus_strategy_used=consensus_strategy,
                 models_participated=list(model_responses.keys()),
                 processing_time_ms=processing_time,
+                models_cancelled=cancelled,
             )
 
             # Update performance metrics
@@ -238,8 +321,68 @@ class EnhancedModelOrchestrator:
                 consensus_strategy_used=consensus_strategy,
                 models_participated=list(model_responses.keys()),
                 processing_time_ms=int((time.time() - start_time) * 1000),
+                models_cancelled=cancelled,
             )
 
+    async def _reason_and_embed(
+        self, query: str, reasoning_type: str, model: str
+    ) -> Tuple[Dict[str, Any], Optional[List[float]]]:
+        """Run one model and embed its answer, so similarity checks need no further calls."""
+        response = await self._execute_single_model_reasoning(query, reasoning_type, model)
+        embedding = None
+        if response.get("success") and response.get("answer", "").strip():
+            embedding = await self._embed_answer(response["answer"])
+        return response, embedding
+
+    async def _embed_answer(self, answer: str) -> Optional[List[float]]:
+        """Embedding of an answer, or None without an embedding model or on failure."""
+        if not self.embedding_model:
+            return None
+        try:
+            response = await self._call_client("embeddings", model=self.embedding_model, prompt=answer)
+            return list(response.get("embedding") or []) or None
+        except Exception as e:
+            logger.debug(f"Answer embedding failed, using lexical similarity: {e}")
+            return None
+
+    async def _call_client(self, method: str, **kwargs) -> Any:
+        """Call the Ollama client without blocking the event loop."""
+        return await call_client(self._async_client, method, **kwargs)
+
+    def _agreement_counts(
+        self, answers: Dict[str, str], embeddings: Dict[str, Optional[List[float]]]
+    ) -> Dict[str, Tuple[int, float]]:
+        """Per model: how many other answers agree with its answer, and its mean similarity to them."""
+        counts = {}
+        for model, answer in answers.items():
+            agreeing, total = 0, 0.0
+            for other, other_answer in answers.items():
+                if other == model:
+                    continue
+                similarity, threshold = answer_similarity(
+                    answer, other_answer, embeddings.get(model), embeddings.get(other)
+                )
+                total += similarity
+                agreeing += similarity >= threshold
+            counts[model] = (agreeing, total / max(len(answers) - 1, 1))
+        return counts
+
+    def _has_agreeing_quorum(
+        self,
+        model_responses: Dict[str, Dict[str, Any]],
+        embeddings: Dict[str, Optional[List[float]]],
+        quorum: int,
+    ) -> bool:
+        """Whether ``quorum`` successful answers agree with one of them."""
+        answers = {
+            model: resp["answer"]
+            for model, resp in model_responses.items()
+            if resp.get("success", False) and resp.get("answer", "").strip()
+        }
+        if len(answers) < quorum:
+            return False
+        return any(agreeing + 1 >= quorum for agreeing, _ in self._agreement_counts(answers, embeddings).values())
+
     async def optimize_model_routing(self, reasoning_type: str, performance_window: int = 100) -> Dict[str, Any]:
         """
         Optimize model routing based on recent performance.
@@ -419,7 +562,7 @@ class EnhancedModelOrchestrator:
             if num_ctx:
                 options["num_ctx"] = num_ctx
 
-            response = self.ollama_client.generate(model=model, prompt=prompt, options=options)
+            response = await self._call_client("generate", model=model, prompt=prompt, options=options)
 
             answer = response.get("response", "").strip()
 
@@ -456,7 +599,11 @@ class EnhancedModelOrchestrator:
             }
 
     async def _apply_consensus_strategy(
-        self, query: str, model_responses: Dict[str, Dict[str, Any]], strategy: str
+        self,
+        query: str,
+        model_responses: Dict[str, Dict[str, Any]],
+        strategy: str,
+        embeddings: Optional[Dict[str, Optional[List[float]]]] = None,
     ) -> Dict[str, Any]:
         """Apply consensus strategy to model responses."""
 
@@ -478,7 +625,7 @@ class EnhancedModelOrchestrator:
         elif strategy == "highest_confidence":
             return await self._highest_confidence_consensus(successful_responses)
         elif strategy == "majority_similarity":
-            return await self._majority_similarity_consensus(successful_responses)
+            return await self._majority_similarity_consensus(successful_responses, embeddings)
         else:
             # Default to weighted voting
             return await self._weighted_voting_consensus(successful_responses)
@@ -519,11 +666,13 @@ class EnhancedModelOrchestrator:
             "agreement_level": agreement_level,
         }
 
-    async def _majority_similarity_consensus(self, responses: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
-        """Find consensus based on response similarity."""
+    async def _majority_similarity_consensus(
+        self, responses: Dict[str, Dict[str, Any]], embeddings: Optional[Dict[str, Optional[List[float]]]] = None
+    ) -> Dict[str, Any]:
+        """Pick the answer the most other answers agree with (ties: highest mean similarity).
 
-        # Simplified: use response lengths as similarity proxy
-        # In practice, would use semantic similarity
+        Agreement level is the share of answers that agree with the chosen one.
+        """
         response_items = list(responses.items())
 
         if len(response_items) == 1:
@@ -534,14 +683,19 @@ class EnhancedModelOrchestrator:
                 "agreement_level": 1.0,
             }
 
-        # For now, return the median-length response
-        sorted_responses = sorted(response_items, key=lambda x: len(x[1].get("answer", "")))
-        median_resp = sorted_responses[len(sorted_responses) // 2][1]
+        if embeddings is None:
+            vectors = await asyncio.gather(*(self._embed_answer(resp.get("answer", "")) for _, resp in response_items))
+            embeddings = {model: vector for (model, _), vector in zip(response_items, vectors)}
+
+        answers = {model: resp.get("answer", "") for model, resp in response_items}
+        counts = self._agreement_counts(answers, embeddings)
+        best_model = max(counts, key=lambda model: (counts[model], responses[model].get("confidence", 0)))
+        best_resp = responses[best_model]
 
         return {
-            "final_answer": median_resp.get("answer", ""),
-            "confidence_score": median_resp.get("confidence", 0),
-            "agreement_level": 0.7,  # Placeholder
+            "final_answer": best_resp.get("answer", ""),
+            "confidence_score": best_resp.get("confidence", 0),
+            "agreement_level": (counts[best_model][0] + 1) / len(response_items),
         }
 
     def _initialize_model_capabilities(self, available_models: List[str]):
@@ -14,6 +14,7 @@ Main orchestrator for the reasoning engine that coordinates between
 chain-of-thought reasoning, knowledge synthesis, and model selection.
 """
 
+import asyncio
 import json
 import time
 from typing import Any, Dict, List
@@ -53,7 +54,9 @@ class ReasoningOrchestrator:
             max_context_tokens=getattr(settings, "max_context_tokens", 4000),
         )
         self.model_orchestrator = EnhancedModelOrchestrator(
-            ollama_client=ollama_client, available_models=getattr(settings, "available_models", None)
+            ollama_client=ollama_client,
+            available_models=getattr(settings, "available_models", None),
+            embedding_model=getattr(settings, "embedding_model", None),
         )
 
         # Reasoning cache for performance
@@ -595,11 +598,9 @@ class ReasoningOrchestrator:
         logger.info(f"Starting cross-document synthesis for {len(topics)} topics")
 
         try:
-            # Step 1: Gather information for each topic
-            topic_information = {}
-            for topic in topics:
-                info = await self._gather_topic_information(topic)
-                topic_information[topic] = info
+            # Step 1: Gather information for all topics concurrently
+            gathered = await asyncio.gather(*(self._gather_topic_information(topic) for topic in topics))
+            topic_information = dict(zip(topics, gathered))
 
             # Step 2: Identify relationships
             relationships = await self._identify_topic_relationships(topics, topic_information)
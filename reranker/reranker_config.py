@@ -137,10 +137,88 @@ class Settings:
     web_cache_enabled: bool
     web_cache_max_rows: int
     enable_feedback: bool
+    web_search_deadline_ms: int
+
+    # Async DB pool
+    db_pool_min_size: int
+    db_pool_max_size: int
 
     # Timeouts
     embedding_timeout_seconds: int
 
+    # Cache warm-up
+    cache_warmup_enabled: bool
+    cache_warmup_top_n: int
+    cache_warmup_concurrency: int
+    cache_warmup_generate: bool
+    cache_warmup_delay_ms: int
+    cache_warmup_startup_delay_seconds: int
+    cache_warmup_poll_seconds: int
+    cache_warmup_max_latency_ms: int
+
+    # Model residency (Ollama /api/ps)
+    model_residency_enabled: bool
+    model_residency_refresh_seconds: int
+    model_min_warm_instances: int
+    model_keep_alive: str
+    model_pinned_keep_alive: str
+    model_cold_load_penalty_ms: int
+    resident_models: str | None
+
+    # Background health monitor / circuit breaker
+    health_monitor_interval_seconds: int
+    health_monitor_jitter_pct: int
+    health_probe_timeout_seconds: int
+    circuit_failure_threshold: int
+    circuit_open_seconds: int
+
+    # Ollama request scheduler (priority admission control)
+    scheduler_enabled: bool
+    scheduler_slots_per_instance: int
+    scheduler_reserved_interactive_slots: int
+    scheduler_max_queue_depth: int
+    scheduler_max_bulk_queue_depth: int
+    scheduler_interactive_max_wait_seconds: int
+    scheduler_bulk_max_wait_seconds: int
+
+    # Hedged requests
+    hedge_enabled: bool
+    hedge_budget_pct: int
+    hedge_max_tokens: int
+    hedge_min_samples: int
+    hedge_min_delay_ms: int
+
+    # Context packing
+    context_packing_enabled: bool
+    context_tokenizer_dir: str
+    context_num_ctx_buckets: str
+    context_safety_margin_tokens: int
+
+    # Conversation affinity / prompt prefix reuse
+    conversation_affinity_enabled: bool
+    conversation_affinity_vnodes: int
+    conversation_affinity_load_factor_pct: int
+    conversation_history_turns: int
+
+    # Batch jobs
+    batch_jobs_enabled: bool
+    batch_job_max_items: int
+    batch_job_lease_seconds: int
+    batch_job_progress_poll_seconds: int
+
+    # Question decomposition
+    decomposition_max_parallel: int
+
+    # Chat write-behind persistence
+    chat_write_behind_batch_size: int
+    chat_write_behind_flush_ms: int
+    chat_write_behind_max_pending: int
+    chat_write_behind_shutdown_timeout_seconds: int
+
+    # Question usage partitions
+    question_usage_retention_months: int
+    question_usage_partition_check_hours: int
+
     # Phase 2B Query Expansion Controls
     enable_semantic_expansion_filter: bool
     expansion_max_terms_base: int
@@ -266,11 +344,90 @@ def get_settings() -> Settings:
     # Timeouts
     s.embedding_timeout_seconds = _get_int("EMBEDDING_TIMEOUT_SECONDS", 60)
 
+    # Cache warm-up (replays frequent questions after deploys / ingestion)
+    s.cache_warmup_enabled = _get_bool("CACHE_WARMUP_ENABLED", True)
+    s.cache_warmup_top_n = _get_int("CACHE_WARMUP_TOP_N", 200)
+    s.cache_warmup_concurrency = _get_int("CACHE_WARMUP_CONCURRENCY", 2)
+    s.cache_warmup_generate = _get_bool("CACHE_WARMUP_GENERATE", False)
+    s.cache_warmup_delay_ms = _get_int("CACHE_WARMUP_DELAY_MS", 250)
+    s.cache_warmup_startup_delay_seconds = _get_int("CACHE_WARMUP_STARTUP_DELAY_SECONDS", 30)
+    s.cache_warmup_poll_seconds = _get_int("CACHE_WARMUP_POLL_SECONDS", 120)
+    s.cache_warmup_max_latency_ms = _get_int("CACHE_WARMUP_MAX_LATENCY_MS", 5000)
+
+    # Model residency: prefer instances with the model loaded, keep configured models hot
+    s.model_residency_enabled = _get_bool("MODEL_RESIDENCY_ENABLED", True)
+    s.model_residency_refresh_seconds = _get_int("MODEL_RESIDENCY_REFRESH_SECONDS", 30)
+    s.model_min_warm_instances = _get_int("MODEL_MIN_WARM_INSTANCES", 2)
+    s.model_keep_alive = os.getenv("MODEL_KEEP_ALIVE", "10m")
+    s.model_pinned_keep_alive = os.getenv("MODEL_PINNED_KEEP_ALIVE", "2h")
+    s.model_cold_load_penalty_ms = _get_int("MODEL_COLD_LOAD_PENALTY_MS", 10000)
+    s.resident_models = os.getenv("RESIDENT_MODELS")
+
+    # Background health monitor (the only component probing Ollama instances)
+    s.health_monitor_interval_seconds = _get_int("HEALTH_MONITOR_INTERVAL_SECONDS", 30)
+    s.health_monitor_jitter_pct = _get_int("HEALTH_MONITOR_JITTER_PCT", 20)
+    s.health_probe_timeout_seconds = _get_int("HEALTH_PROBE_TIMEOUT_SECONDS", 5)
+    s.circuit_failure_threshold = _get_int("CIRCUIT_FAILURE_THRESHOLD", 3)
+    s.circuit_open_seconds = _get_int("CIRCUIT_OPEN_SECONDS", 30)
+
+    # Ollama request scheduler: per-instance slots, priority queues, load shedding
+    s.scheduler_enabled = _get_bool("SCHEDULER_ENABLED", True)
+    s.scheduler_slots_per_instance = _get_int("SCHEDULER_SLOTS_PER_INSTANCE", 4)
+    s.scheduler_reserved_interactive_slots = _get_int("SCHEDULER_RESERVED_INTERACTIVE_SLOTS", 1)
+    s.scheduler_max_queue_depth = _get_int("SCHEDULER_MAX_QUEUE_DEPTH", 64)
+    s.scheduler_max_bulk_queue_depth = _get_int("SCHEDULER_MAX_BULK_QUEUE_DEPTH", 32)
+    s.scheduler_interactive_max_wait_seconds = _get_int("SCHEDULER_INTERACTIVE_MAX_WAIT_SECONDS", 15)
+    s.scheduler_bulk_max_wait_seconds = _get_int("SCHEDULER_BULK_MAX_WAIT_SECONDS", 120)
+
+    # Hedged requests: duplicate slow embeddings / short generations to a second instance
+    s.hedge_enabled = _get_bool("HEDGE_ENABLED", True)
+    s.hedge_budget_pct = _get_int("HEDGE_BUDGET_PCT", 10)
+    s.hedge_max_tokens = _get_int("HEDGE_MAX_TOKENS", 256)
+    s.hedge_min_samples = _get_int("HEDGE_MIN_SAMPLES", 20)
+    s.hedge_min_delay_ms = _get_int("HEDGE_MIN_DELAY_MS", 25)
+
+    # Context packing: count prompt tokens per model family and size num_ctx per request
+    s.context_packing_enabled = _get_bool("CONTEXT_PACKING_ENABLED", True)
+    s.context_tokenizer_dir = os.getenv("CONTEXT_TOKENIZER_DIR", "/app/tokenizers")
+    s.context_num_ctx_buckets = os.getenv("CONTEXT_NUM_CTX_BUCKETS", "4096,8192,16384,32768")
+    s.context_safety_margin_tokens = _get_int("CONTEXT_SAFETY_MARGIN_TOKENS", 64)
+
+    # Conversation affinity: consistent-hash conversations to instances so their prompt prefix stays cached
+    s.conversation_affinity_enabled = _get_bool("CONVERSATION_AFFINITY_ENABLED", True)
+    s.conversation_affinity_vnodes = _get_int("CONVERSATION_AFFINITY_VNODES", 64)
+    s.conversation_affinity_load_factor_pct = _get_int("CONVERSATION_AFFINITY_LOAD_FACTOR_PCT", 125)
+    s.conversation_history_turns = _get_int("CONVERSATION_HISTORY_TURNS", 4)
+
+    # Asynchronous bulk Q&A jobs persisted to Postgres
+    s.batch_jobs_enabled = _get_bool("BATCH_JOBS_ENABLED", True)
+    s.batch_job_max_items = _get_int("BATCH_JOB_MAX_ITEMS", 5000)
+    s.batch_job_lease_seconds = _get_int("BATCH_JOB_LEASE_SECONDS", 60)
+    s.batch_job_progress_poll_seconds = _get_int("BATCH_JOB_PROGRESS_POLL_SECONDS", 2)
+
+    # Question decomposition: sub-requests answered concurrently, at most this many at once
+    s.decomposition_max_parallel = _get_int("DECOMPOSITION_MAX_PARALLEL", 4)
+
+    # Chat messages and question analytics are queued in process and written in batches
+    s.chat_write_behind_batch_size = _get_int("CHAT_WRITE_BEHIND_BATCH_SIZE", 200)
+    s.chat_write_behind_flush_ms = _get_int("CHAT_WRITE_BEHIND_FLUSH_MS", 250)
+    s.chat_write_behind_max_pending = _get_int("CHAT_WRITE_BEHIND_MAX_PENDING", 10000)
+    s.chat_write_behind_shutdown_timeout_seconds = _get_int("CHAT_WRITE_BEHIND_SHUTDOWN_TIMEOUT_SECONDS", 10)
+
+    # Raw question_usage is partitioned by month; 0 keeps every month (statistics come from rollups)
+    s.question_usage_retention_months = _get_int("QUESTION_USAGE_RETENTION_MONTHS", 0)
+    s.question_usage_partition_check_hours = _get_int("QUESTION_USAGE_PARTITION_CHECK_HOURS", 24)
+
     # Web cache
     s.web_cache_ttl_seconds = _get_int("WEB_CACHE_TTL_SECONDS", 900)
     s.web_cache_enabled = _get_bool("WEB_CACHE_ENABLED", True)
     s.web_cache_max_rows = _get_int("WEB_CACHE_MAX_ROWS", 5000)
     s.enable_feedback = _get_bool("ENABLE_FEEDBACK", True)
+    # Shared deadline for the concurrent SearXNG queries
+    s.web_search_deadline_ms = _get_int("WEB_SEARCH_DEADLINE_MS", 6000)
+
+    # Async DB pool (asyncpg)
+    s.db_pool_min_size = _get_int("DB_POOL_MIN_SIZE", 1)
+    s.db_pool_max_size = _get_int("DB_POOL_MAX_SIZE", 10)
 
     # Phase 2B Query Expansion Controls
     s.enable_semantic_expansion_filter = _get_bool("ENABLE_SEMANTIC_EXPANSION_FILTER", False)
@@ -329,6 +486,14 @@ def get_settings() -> Settings:
     return s
 
 
+def get_ollama_instance_urls() -> list[str]:
+    """Ollama instance URLs from OLLAMA_INSTANCES, defaulting to the eight compose services."""
+    instances_str = get_settings().ollama_instances
+    if instances_str:
+        return [url.strip() for url in instances_str.split(",") if url.strip()]
+    return [f"http://ollama-server-{i}:11434" for i in range(1, 9)]
+
+
 if __name__ == "__main__":
     # Simple debug output
     # configure_root_logging()
@@ -18,17 +18,21 @@ relevance scores comparing the original user question to sub-responses, rerank
 sub-responses, and produce an enhanced combined response structure that includes
 relevance metadata.
 
-This is intentionally lightweight and deterministic: it uses string similarity
-and token-overlap heuristics so it can run without external models. It is
-meant to be integrated into the chat synthesis step after sub-requests are
-processed (and/or retrieved from Redis).
+This is intentionally lightweight and deterministic: it uses token-set
+heuristics (overlap and set cosine, linear in text length) so it can run
+without external models. It is meant to be integrated into the chat synthesis
+step after sub-requests are processed: ``rethink_in_memory`` works on results
+the caller already holds without any I/O, and ``persist_in_background`` writes
+the synthesized result to Redis off the response path.
 """
 
+import asyncio
 import re
-from difflib import SequenceMatcher
-from typing import List, Optional, Tuple
+from typing import Iterable, List, Optional, Set, Tuple
 
-from utils.redis_cache import get_decomposed_response, get_sub_request_result
+import numpy as np
+
+from utils.redis_cache import cache_decomposed_response, get_decomposed_response, get_sub_request_result
 
 def _normalize_text(text: str) -> str:
     """Basic normalization: lowercasing, collapse whitespace, remove punctuation."""
@@ -52,29 +56,43 @@ def _token_overlap(a: str, b: str) -> float:
     overlap = atoks.intersection(btoks)
     return len(overlap) / max(1, len(atoks))
 
-def _sequence_similarity(a: str, b: str) -> float:
-    """Return a 0.0-1.0 similarity score using difflib.SequenceMatcher."""
-    if not a or not b:
-        return 0.0
-    return SequenceMatcher(None, a, b).ratio()
+
+def _token_set(text: str) -> Set[str]:
+    return set(_normalize_text(text).split())
+
+
+def score_relevance_batch(original_query: str, texts: Iterable[str]) -> List[float]:
+    """Score many texts against the question in one vectorized pass.
+
+    Each score is 0.6 x token overlap (share of question terms present) plus
+    0.4 x set cosine (|Q and R| / sqrt(|Q| |R|)). Texts become rows of a
+    text x question-term incidence matrix, so hits, overlap and cosine for the
+    whole batch are array operations. Both terms are linear in text length,
+    unlike the difflib sequence ratio this replaces, which was quadratic.
+    """
+    query_terms = sorted(_token_set(original_query))
+    token_sets = [_token_set(text) if text else set() for text in texts]
+    if not query_terms or not token_sets:
+        return [0.0] * len(token_sets)
+
+    incidence = np.array([[term in tokens for term in query_terms] for tokens in token_sets], dtype=np.float64)
+    sizes = np.array([len(tokens) for tokens in token_sets], dtype=np.float64)
+    hits = incidence.sum(axis=1)
+    overlap = hits / len(query_terms)
+    cosine = np.divide(hits, np.sqrt(len(query_terms) * sizes), out=np.zeros_like(hits), where=sizes > 0)
+    # Weighting: give slightly more weight to overlap (exact terms matter)
+    scores = np.clip(0.6 * overlap + 0.4 * cosine, 0.0, 1.0)
+    return [float(score) for score in scores]
 
 def score_subresponse_relevance(original_query: str, subresponse_text: str) -> float:
     """Compute a combined relevance score between original question and a subresponse.
 
-    The score is a weighted combination of token overlap and sequence similarity.
+    The score is a weighted combination of token overlap and token-set cosine.
     """
     if not subresponse_text:
         return 0.0
+    return score_relevance_batch(original_query, [subresponse_text])[0]
 
-    norm_q = _normalize_text(original_query)
-    norm_r = _normalize_text(subresponse_text)
-
-    overlap = _token_overlap(norm_q, norm_r)
-    seq = _sequence_similarity(norm_q, norm_r)
-
-    # Weighting: give slightly more weight to overlap (exact terms matter)
-    score = (0.6 * overlap) + (0.4 * seq)
-    return float(max(0.0, min(1.0, score)))
 
 def aggregate_cached_subresponses(query_hash: str, user_id: int) -> Tuple[Optional[dict], List[dict]]:
     """Retrieve decomposition metadata and cached sub-responses from Redis.
@@ -131,10 +149,9 @@ def rerank_subresponses(original_query: str, subresponses: List[dict]) -> List[d
     descending by relevance. Also computes an aggregate relevance score.
     """
     scored: List[dict] = []
-    for sr in subresponses:
-        resp_text = sr.get("response", "")
-        # If a subresponse has no response yet, keep low score
-        relevance = score_subresponse_relevance(original_query, resp_text) if resp_text else 0.0
+    # Subresponses without a response yet score 0.0
+    relevances = score_relevance_batch(original_query, [sr.get("response", "") for sr in subresponses])
+    for sr, relevance in zip(subresponses, relevances):
         # Combine with model confidence if present
         conf = float(sr.get("confidence", 1.0) or 1.0)
         combined = 0.8 * relevance + 0.2 * conf
@@ -185,16 +202,9 @@ def evaluate_response_relevance(original_query: str, final_text: str) -> float:
         return 0.0
     return score_subresponse_relevance(original_query, final_text)
 
-# Convenience helper: full pipeline given query_hash and user_id
-def rethink_pipeline(query_hash: str, user_id: int, original_query: Optional[str] = None) -> dict:
-    """Retrieve cached components, rerank, synthesize, and evaluate relevance.
-
-    Returns dict with decomposition, reranked components, synthesized text and relevance.
-    """
-    decomposition, subs = aggregate_cached_subresponses(query_hash, user_id)
-    if decomposition is None:
-        return {"error": "No decomposition metadata found", "query_hash": query_hash}
-
+def rethink_in_memory(original_query: str, decomposition: dict, sub_results: List[dict]) -> dict:
+    """Rerank, synthesize and evaluate sub-results the caller already holds (no I/O)."""
+    subs = [dict(sr, cached=sr.get("cached", False)) for sr in sub_results]
     orig = original_query or decomposition.get("original_query", "")
     reranked = rerank_subresponses(orig, subs)
     synthesized = synthesize_reranked_response(orig, reranked)
@@ -206,3 +216,47 @@ def rethink_pipeline(query_hash: str, user_id: int, original_query: Optional[str
         "synthesized": synthesized,
         "final_relevance": float(final_relevance),
     }
+
+
+# Redis writes scheduled by persist_in_background (held so they are not garbage collected)
+_background_writes: Set[asyncio.Task] = set()
+
+
+def persist_in_background(query_hash: str, user_id: int, result: dict) -> None:
+    """Cache a decomposition or synthesized result without blocking the caller.
+
+    Inside an event loop the Redis write runs in a worker thread; without one it
+    is written synchronously.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        cache_decomposed_response(query_hash, user_id, result)
+        return
+    task = loop.create_task(asyncio.to_thread(cache_decomposed_response, query_hash, user_id, result))
+    _background_writes.add(task)
+    task.add_done_callback(_background_writes.discard)
+
+
+# Convenience helper: full pipeline given query_hash and user_id
+def rethink_pipeline(
+    query_hash: str,
+    user_id: int,
+    original_query: Optional[str] = None,
+    decomposition: Optional[dict] = None,
+    sub_results: Optional[List[dict]] = None,
+) -> dict:
+    """Retrieve cached components, rerank, synthesize, and evaluate relevance.
+
+    When the caller already holds the decomposition and sub-results (the chat
+    endpoint just computed them), pass them in to skip the Redis re-read.
+
+    Returns dict with decomposition, reranked components, synthesized text and relevance.
+    """
+    if decomposition is not None and sub_results is not None:
+        return rethink_in_memory(original_query or "", decomposition, sub_results)
+
+    decomposition, subs = aggregate_cached_subresponses(query_hash, user_id)
+    if decomposition is None:
+        return {"error": "No decomposition metadata found", "query_hash": query_hash}
+    return rethink_in_memory(original_query or "", decomposition, subs)
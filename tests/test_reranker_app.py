@@ -16,6 +16,7 @@ from typing import Optional
 from unittest.mock import MagicMock, patch
 
 import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 
 # Simple stub modules to satisfy imports without pulling heavy dependencies
@@ -74,6 +75,7 @@ with patch.dict(
 
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+    import reranker.app as reranker_app_module
     from reranker.app import UserResponse, _deterministic_user_id, app
     from reranker.jwt_auth import JWTAuthenticator
 
@@ -513,14 +515,59 @@ class TestConversationAuthorization:
             response = client.get("/api/conversations", headers=auth_header)
 
         assert response.status_code == 200
-        assert len(cursor.executed) == 2  # count query + list query
+        assert len(cursor.executed) == 1  # list query only; the total is opt-in
 
-        count_params = cursor.executed[0][1]
-        assert count_params == [expected_user_id]
-
-        list_params = cursor.executed[1][1]
+        list_params = cursor.executed[0][1]
         assert list_params[0] == expected_user_id
 
+    def test_list_conversations_keyset_pagination(self):
+        """Pages continue from nextCursor and the optional total is counted."""
+        from reranker.app import list_conversations
+
+        user = make_test_user(email="user@example.com", role_id=2, user_id=_deterministic_user_id("user@example.com"))
+        timestamp = datetime.now(timezone.utc)
+        rows = [
+            {
+                "id": 10 - i,
+                "title": f"c{i}",
+                "created_at": timestamp,
+                "updated_at": timestamp,
+                "last_activity": timestamp,
+            }
+            for i in range(3)
+        ]
+        cursor = StubCursor(fetchone_results=[{"total": 7}], fetchall_result=rows)
+
+        # Called directly: the user lookup is patched, so no real token is needed
+        with patch("reranker.app._user_from_authorization", return_value=user), patch(
+            "reranker.app.get_db_connection", return_value=StubConnection(cursor)
+        ):
+            first = list_conversations(limit=2, offset=0, cursor=None, include_total=True, authorization="Bearer t")
+            list_conversations(
+                limit=2, offset=0, cursor=first.nextCursor, include_total=False, authorization="Bearer t"
+            )
+
+        assert [c.id for c in first.conversations] == [10, 9]
+        assert first.hasMore is True
+        assert first.total == 7 and first.totalIsApproximate is False
+        assert cursor.executed[0][1][-2:] == [3, 0]  # limit + 1 probes for another page
+
+        keyset_query, keyset_params = cursor.executed[2]
+        assert "(last_activity, id) < (%s, %s)" in keyset_query
+        assert keyset_params[2:4] == [timestamp, 9]
+
+    def test_list_conversations_rejects_bad_cursor(self):
+        from reranker.app import list_conversations
+
+        user = make_test_user(email="user@example.com", role_id=2, user_id=1)
+        with patch("reranker.app._user_from_authorization", return_value=user):
+            with pytest.raises(HTTPException) as exc_info:
+                list_conversations(
+                    limit=2, offset=0, cursor="not-a-cursor", include_total=False, authorization="Bearer t"
+                )
+
+        assert exc_info.value.status_code == 400
+
     def test_get_conversation_rejects_unowned_id(self, client):
         """Fetching conversation fails when user does not own it."""
         expected_user_id = _deterministic_user_id("user@example.com")
@@ -557,6 +604,193 @@ class TestConversationAuthorization:
         assert conn.commit_count == 1
 
 
+class TestDocumentList:
+    """Document browser queries read stored chunk counts and page by keyset."""
+
+    @staticmethod
+    def _row(document_id, timestamp):
+        return {
+            "id": document_id,
+            "file_name": f"doc{document_id}.pdf",
+            "title": None,
+            "document_type": "manual",
+            "product_name": None,
+            "product_version": None,
+            "privacy_level": None,
+            "file_size": 10,
+            "processed_at": timestamp,
+            "created_at": timestamp,
+            "chunk_count": 4,
+            "sort_value": timestamp,
+        }
+
+    def test_list_documents_keyset(self):
+        import asyncio
+
+        from reranker.app import DocumentListRequest, list_documents
+
+        timestamp = datetime.now(timezone.utc)
+        queries = []
+
+        async def fake_fetch(query, *args):
+            queries.append((query, args))
+            return [self._row(i, timestamp) for i in (5, 4, 3)]
+
+        async def fake_fetchval(query, *args):
+            queries.append((query, args))
+            return 12
+
+        request = DocumentListRequest(limit=2, search_term="meter", sort_by="processed_at")
+        with patch("reranker.db_pool.fetch", fake_fetch), patch("reranker.db_pool.fetchval", fake_fetchval):
+            first = asyncio.run(list_documents(request))
+            request = DocumentListRequest(
+                limit=2, search_term="meter", sort_by="processed_at", cursor=first.next_cursor, include_total=False
+            )
+            asyncio.run(list_documents(request))
+
+        assert [d.id for d in first.documents] == [5, 4]
+        assert first.total_count == 12 and first.has_more is True
+        assert first.documents[0].chunk_count == 4
+        assert "document_chunks" not in queries[1][0]
+        assert queries[1][1] == ("%meter%", 3, 0)
+
+        keyset_query, keyset_args = queries[2]
+        assert "(COALESCE(d.processed_at, d.created_at), d.id) < ($2, $3)" in keyset_query
+        assert keyset_args == ("%meter%", timestamp, 4, 3, 0)
+
+    def test_list_documents_rejects_cursor_of_other_sort(self):
+        import asyncio
+
+        from reranker.app import DocumentListRequest, _encode_page_cursor, list_documents
+
+        cursor = _encode_page_cursor("file_name", "ASC", "a.pdf", 1)
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(list_documents(DocumentListRequest(cursor=cursor)))
+        assert exc_info.value.status_code == 400
+
+
+class TestDocumentDownload:
+    """Archive downloads: stored path, validators and byte ranges."""
+
+    @pytest.fixture
+    def archived(self, tmp_path, monkeypatch):
+        (tmp_path / "manuals").mkdir()
+        (tmp_path / "manuals" / "meter.pdf").write_bytes(b"%PDF-" + b"x" * 95)
+        monkeypatch.setattr(reranker_app_module, "_ARCHIVE_ROOT", str(tmp_path))
+
+        async def fake_fetchrow(query, *args):
+            if args[0] != 7:
+                return None
+            return {
+                "file_name": "meter.pdf",
+                "archive_path": "manuals/meter.pdf",
+                "mime_type": "application/pdf",
+                "privacy_level": "public",
+            }
+
+        with patch("reranker.db_pool.fetchrow", fake_fetchrow):
+            yield TestClient(app)
+
+    def test_download_serves_stored_archive_path(self, archived):
+        response = archived.get("/api/documents/download/7")
+
+        assert response.status_code == 200
+        assert len(response.content) == 100
+        assert response.headers["content-type"] == "application/pdf"
+        assert response.headers["etag"] and response.headers["last-modified"]
+        assert response.headers["accept-ranges"] == "bytes"
+
+    def test_download_revalidates_with_etag(self, archived):
+        etag = archived.get("/api/documents/download/7").headers["etag"]
+
+        response = archived.get("/api/documents/7/download", headers={"If-None-Match": f'W/{etag}, "other"'})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+        assert archived.get("/api/documents/download/7", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+    def test_download_serves_byte_ranges(self, archived):
+        response = archived.get("/api/documents/download/7", headers={"Range": "bytes=0-4"})
+
+        assert response.status_code == 206
+        assert response.content == b"%PDF-"
+        assert response.headers["content-range"] == "bytes 0-4/100"
+
+    def test_download_missing_document_or_file(self, archived, tmp_path):
+        assert archived.get("/api/documents/download/8").status_code == 404
+
+        (tmp_path / "manuals" / "meter.pdf").unlink()
+        assert archived.get("/api/documents/download/7").status_code == 404
+
+
+class TestChatHistory:
+    """Chat turns load a bounded history window and persist streamed answers."""
+
+    @pytest.fixture
+    def chat(self, monkeypatch):
+        import asyncio
+
+        user = make_test_user(email="user@example.com", role_id=2, user_id=5)
+        t0 = datetime(2026, 10, 18, tzinfo=timezone.utc)
+        # Newest first, as the LIMITed query returns them; the conversation holds 10 messages
+        rows = [("assistant" if i % 2 else "user", f"m{i}", t0.replace(minute=i), 10) for i in range(9, 5, -1)]
+        cursor = StubCursor(fetchall_result=rows)
+        saved, requests = [], []
+
+        class FakeRagService:
+            async def chat(self, rag_request):
+                requests.append(rag_request)
+
+                async def events():
+                    yield 'data: {"type": "sources", "sources": [{"file_name": "manual.pdf", "content": "c"}]}\n\n'
+                    yield 'data: {"type": "token", "token": "Hold reset "}\n\n'
+                    yield 'data: {"type": "token", "token": "for ten seconds."}\n\n'
+                    yield 'data: {"type": "done"}\n\n'
+
+                return reranker_app_module.StreamingResponse(events())
+
+        persistence = types.SimpleNamespace(
+            pending_messages=lambda conversation_id: [],
+            add_message=lambda conversation_id, role, content, citations=None: saved.append((role, content, citations)),
+        )
+        monkeypatch.setattr(reranker_app_module, "_user_from_authorization", lambda authorization: user)
+        monkeypatch.setattr(reranker_app_module, "get_db_connection", lambda: StubConnection(cursor))
+        monkeypatch.setattr(
+            reranker_app_module, "get_ollama_scheduler", lambda: types.SimpleNamespace(check_admission=_noop)
+        )
+        monkeypatch.setattr(reranker_app_module, "chat_persistence", persistence)
+        monkeypatch.setattr(reranker_app_module, "rag_service", FakeRagService())
+        monkeypatch.setattr(reranker_app_module, "app_settings", types.SimpleNamespace(conversation_history_turns=2))
+
+        async def run():
+            request = reranker_app_module.ChatRequest(conversationId=3, message="How do I reset it?")
+            response = await reranker_app_module.chat_endpoint(request, authorization="Bearer t")
+            return [line async for line in response.body_iterator]
+
+        return lambda: asyncio.run(run()), cursor, saved, requests
+
+    def test_history_query_is_limited_and_oldest_first(self, chat):
+        run, cursor, _, requests = chat
+        run()
+
+        query, params = cursor.executed[0]
+        assert "LIMIT %s" in query and params == [3, 5, 4]
+        # 10 messages with a 4-message window: blocks of 2 start the window at m6
+        assert [m["content"] for m in requests[0].history] == ["m6", "m7", "m8", "m9"]
+
+    def test_streamed_answer_is_persisted(self, chat):
+        run, _, saved, _ = chat
+        lines = run()
+
+        assert len(lines) == 4
+        assert [(role, content) for role, content, _ in saved] == [
+            ("user", "How do I reset it?"),
+            ("assistant", "Hold reset for ten seconds."),
+        ]
+        assert saved[1][2][0]["title"] == "manual.pdf"
+
+
 class TestAuthenticationAndSecurity:
     """Test authentication and security features."""
 
@@ -0,0 +1,26 @@
+"""Shared fixtures for the unit tests."""
+
+from types import SimpleNamespace
+
+import pytest
+
+# Cache warm-up settings small enough for fast tests
+CACHE_WARMER_SETTINGS = dict(
+    cache_warmup_top_n=10,
+    cache_warmup_concurrency=4,
+    cache_warmup_generate=False,
+    cache_warmup_delay_ms=0,
+    cache_warmup_startup_delay_seconds=0,
+    cache_warmup_poll_seconds=60,
+    cache_warmup_max_latency_ms=1000,
+)
+
+
+@pytest.fixture
+def warmer_settings():
+    """Factory for stub cache-warmer settings: ``CACHE_WARMER_SETTINGS`` with per-test overrides."""
+
+    def make(**overrides):
+        return SimpleNamespace(**{**CACHE_WARMER_SETTINGS, **overrides})
+
+    return make
@@ -0,0 +1,199 @@
+"""Unit tests for the batched audit-log writer."""
+
+from __future__ import annotations
+
+import asyncio
+
+import psycopg2
+import pytest
+
+from utils import audit_writer as audit_writer_module
+from utils.audit_writer import AuditLogWriter, _inet, audit_event, security_event
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    """Collects the rows of each multi-row INSERT; rejects rows whose action is ``bad``."""
+
+    def __init__(self):
+        self.inserts = []
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    conn = FakeConnection()
+    state = {"down": False, "connects": 0}
+
+    def connect():
+        state["connects"] += 1
+        if state["down"]:
+            raise psycopg2.OperationalError("database down")
+        return conn
+
+    def execute_values(cursor, sql, rows, page_size=100):
+        if any(row[1] == "bad" for row in rows if "audit_logs" in sql):
+            raise psycopg2.IntegrityError("foreign key violation")
+        cursor.conn.inserts.append((sql.split()[2], list(rows)))
+
+    monkeypatch.setattr(audit_writer_module, "execute_values", execute_values)
+    return conn, connect, state
+
+
+def _writer(connect, **overrides):
+    values = dict(batch_size=3, flush_interval=60, max_queue=100)
+    values.update(overrides)
+    writer = AuditLogWriter(connect=connect, **values)
+    # Drive flushes from the test instead of the background thread
+    writer._ensure_started = lambda: None
+    return writer
+
+
+def test_inet_sanitizes_unparsable_addresses():
+    assert _inet("unknown") is None
+    assert _inet("") is None
+    assert _inet(" 10.0.0.1 ") == "10.0.0.1"
+
+
+def test_flush_writes_multi_row_batches_per_table(fake_db):
+    conn, connect, state = fake_db
+    writer = _writer(connect)
+    for i in range(4):
+        writer.submit(audit_event(f"action{i}", "api_endpoint", user_id=1))
+    writer.submit(security_event("login_failed", "medium", ip_address="unknown"))
+
+    assert writer.flush() is True
+    assert [(table, len(rows)) for table, rows in conn.inserts] == [
+        ("audit_logs", 3),
+        ("audit_logs", 1),
+        ("security_events", 1),
+    ]
+    assert conn.inserts[2][1][0][3] is None
+    assert writer.stats["written"] == 5
+    assert state["connects"] == 1
+
+
+def test_drop_oldest_keeps_newest_events(fake_db):
+    conn, connect, _ = fake_db
+    writer = _writer(connect, batch_size=1, max_queue=2)
+    for i in range(3):
+        writer.submit(audit_event(f"action{i}", "api_endpoint"))
+
+    writer.flush()
+    assert [rows[0][1] for _, rows in conn.inserts] == ["action1", "action2"]
+    assert writer.stats["dropped"] == 1
+
+
+def test_drop_newest_rejects_incoming_event(fake_db):
+    conn, connect, _ = fake_db
+    writer = _writer(connect, batch_size=1, max_queue=2, overflow_policy="drop_newest")
+    results = [writer.submit(audit_event(f"action{i}", "api_endpoint")) for i in range(3)]
+
+    writer.flush()
+    assert results == [True, True, False]
+    assert [rows[0][1] for _, rows in conn.inserts] == ["action0", "action1"]
+    assert writer.stats["dropped"] == 1
+
+
+def test_rejected_rows_are_isolated(fake_db):
+    conn, connect, _ = fake_db
+    writer = _writer(connect, batch_size=10)
+    for action in ("a", "bad", "b", "c"):
+        writer.submit(audit_event(action, "api_endpoint"))
+
+    assert writer.flush() is True
+    written = [row[1] for _, rows in conn.inserts for row in rows]
+    assert written == ["a", "b", "c"]
+    assert writer.stats["rejected"] == 1
+
+
+def test_unavailable_database_keeps_events(fake_db):
+    conn, connect, state = fake_db
+    state["down"] = True
+    writer = _writer(connect)
+    writer.submit(audit_event("a", "api_endpoint"))
+    writer.submit(audit_event("b", "api_endpoint"))
+
+    assert writer.flush() is False
+    assert writer.get_status()["queue_depth"] == 2
+
+    state["down"] = False
+    assert writer.flush() is True
+    assert [row[1] for _, rows in conn.inserts for row in rows] == ["a", "b"]
+
+
+def test_connection_loss_mid_bisection_requeues_only_uncommitted_events(fake_db, monkeypatch):
+    conn, connect, state = fake_db
+    state["lost"] = True
+
+    def execute_values(cursor, sql, rows, page_size=100):
+        actions = [row[1] for row in rows]
+        if "bad" in actions:
+            raise psycopg2.IntegrityError("foreign key violation")
+        if "late" in actions and state["lost"]:
+            state["lost"] = False
+            raise psycopg2.OperationalError("server closed the connection")
+        cursor.conn.inserts.append((sql.split()[2], list(rows)))
+
+    monkeypatch.setattr(audit_writer_module, "execute_values", execute_values)
+    writer = _writer(connect, batch_size=10)
+    for action in ("a", "bad", "late", "c"):
+        writer.submit(audit_event(action, "api_endpoint"))
+
+    # "a" commits and "bad" is rejected before the connection drops on the second half
+    assert writer.flush() is False
+    assert writer.get_status()["queue_depth"] == 2
+
+    assert writer.flush() is True
+    assert [row[1] for _, rows in conn.inserts for row in rows] == ["a", "late", "c"]
+    assert writer.stats["written"] == 3 and writer.stats["rejected"] == 1
+
+
+def test_background_thread_flushes_on_close(fake_db):
+    conn, connect, _ = fake_db
+    writer = AuditLogWriter(connect=connect, batch_size=50, flush_interval=60)
+    writer.submit(audit_event("a", "api_endpoint"))
+    writer.close(timeout=5)
+
+    assert [row[1] for _, rows in conn.inserts for row in rows] == ["a"]
+    assert conn.closed is True
+
+
+def test_rbac_manager_enqueues_instead_of_writing(monkeypatch):
+    from utils.rbac_middleware import RBACManager
+
+    submitted = []
+    writer = _writer(lambda: pytest.fail("log_audit_event must not connect"))
+    monkeypatch.setattr(writer, "submit", submitted.append)
+    monkeypatch.setattr("utils.rbac_middleware.get_audit_writer", lambda dsn: writer)
+
+    manager = RBACManager("postgresql://example/db")
+    asyncio.run(
+        manager.log_audit_event(action="GET /api/x", resource_type="api_endpoint", user_id=1, ip_address="unknown")
+    )
+    asyncio.run(manager.log_security_event(event_type="access_denied", severity="low", user_id=1))
+
+    assert [event.table for event in submitted] == ["audit_logs", "security_events"]
+    assert submitted[0].row[4] is None
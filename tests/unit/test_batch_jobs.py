@@ -0,0 +1,229 @@
+"""Unit tests for the asynchronous batch job runner."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from reranker.batch_jobs import BatchJobManager, PlannedQuery, plan_batch
+from reranker.ollama_scheduler import OllamaOverloaded, Priority, current_priority
+
+
+def _settings(**overrides):
+    values = dict(batch_job_max_items=100, batch_job_lease_seconds=60, batch_job_progress_poll_seconds=0)
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+class MemoryStore:
+    """In-memory stand-in for the Postgres job tables."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.items = {}
+
+    async def create_job(self, job_id, user_id, params, queries):
+        self.jobs[job_id] = dict(
+            id=job_id,
+            user_id=user_id,
+            status="queued",
+            params=params,
+            total_items=len(queries),
+            completed_items=0,
+            failed_items=0,
+            owner=None,
+        )
+        self.items[job_id] = [
+            dict(item_index=i, query=q, status="pending", result=None, error=None, completed_at=None)
+            for i, q in enumerate(queries)
+        ]
+
+    async def claim(self, job_id, owner, lease_seconds):
+        job = self.jobs[job_id]
+        if job["status"] not in ("queued", "running"):
+            return None
+        job.update(status="running", owner=owner)
+        return {"id": job_id, "params": job["params"]}
+
+    async def renew(self, job_id, owner, lease_seconds):
+        return self.jobs[job_id]["status"]
+
+    async def pending_items(self, job_id):
+        return [(i["item_index"], i["query"]) for i in self.items[job_id] if i["status"] == "pending"]
+
+    async def complete_items(self, job_id, indexes, result, error=None):
+        for item in self.items[job_id]:
+            if item["item_index"] in indexes and item["status"] == "pending":
+                item.update(
+                    status="failed" if error else "completed",
+                    result=result,
+                    error=error,
+                    completed_at=datetime.now(timezone.utc),
+                )
+                self.jobs[job_id]["failed_items" if error else "completed_items"] += 1
+
+    async def finish(self, job_id, status, error=None):
+        self.jobs[job_id]["status"] = status
+
+    async def get_job(self, job_id, user_id=None):
+        return dict(self.jobs[job_id])
+
+    async def get_items(self, job_id, offset=0, limit=100, completed_after=None):
+        done = [i for i in self.items[job_id] if i["status"] != "pending"]
+        if completed_after is not None:
+            done = [i for i in done if i["completed_at"] > completed_after]
+        return [dict(i) for i in done][offset : offset + limit]
+
+
+class FakeRagService:
+    def __init__(self, fail_on=()):
+        self.calls = []
+        self.fail_on = set(fail_on)
+
+    async def resolve_model(self, query):
+        await asyncio.sleep(0.01)
+        return "codellama:7b" if "code" in query else "mistral:7b"
+
+    async def chat(self, request):
+        self.calls.append((request.query, request.model, current_priority()))
+        if request.query in self.fail_on:
+            raise RuntimeError("boom")
+        return SimpleNamespace(model_dump=lambda: {"response": f"answer: {request.query}", "model": request.model})
+
+
+def _request(queries, model="auto"):
+    return SimpleNamespace(
+        queries=queries, model=model, temperature=0.2, max_tokens=100, max_context_chunks=3, max_concurrent=2
+    )
+
+
+def test_plan_deduplicates_and_groups_by_model():
+    items = [(0, "What is RNI?"), (1, "show code sample"), (2, "what is  rni?"), (3, "Reset a meter")]
+    models = {"what is rni?": "mistral:7b", "show code sample": "codellama:7b", "reset a meter": "mistral:7b"}
+
+    plan = plan_batch(items, models)
+
+    assert [model for model, _ in plan] == ["mistral:7b", "codellama:7b"]
+    assert plan[0][1] == [
+        PlannedQuery("What is RNI?", "mistral:7b", [0, 2]),
+        PlannedQuery("Reset a meter", "mistral:7b", [3]),
+    ]
+
+
+def test_models_are_resolved_once_per_distinct_query_concurrently():
+    rag = FakeRagService()
+    resolved = []
+    original = rag.resolve_model
+
+    async def resolve_model(query):
+        resolved.append(query)
+        return await original(query)
+
+    rag.resolve_model = resolve_model
+    manager = BatchJobManager(rag, store=MemoryStore(), settings=_settings())
+    queries = [f"question {i}" for i in range(40)] + ["Question 0", "show code"]
+
+    start = time.monotonic()
+    models = asyncio.run(manager._resolve_models(queries, "auto"))
+
+    assert time.monotonic() - start < 0.2
+    assert len(resolved) == 41
+    assert models["question 0"] == "mistral:7b" and models["show code"] == "codellama:7b"
+    assert asyncio.run(manager._resolve_models(queries, "llama3.2:3b")) == {key: "llama3.2:3b" for key in models}
+    assert len(resolved) == 41
+
+
+def test_job_runs_at_batch_priority_and_persists_every_item():
+    store, rag = MemoryStore(), FakeRagService()
+    manager = BatchJobManager(rag, store=store, settings=_settings())
+
+    async def scenario():
+        job_id = await manager.submit(7, _request(["What is RNI?", "show code", "what is rni?"]))
+        await manager._tasks[job_id]
+        return job_id
+
+    job_id = asyncio.run(scenario())
+
+    assert store.jobs[job_id]["status"] == "completed"
+    assert store.jobs[job_id]["completed_items"] == 3
+    assert [i["result"]["response"] for i in store.items[job_id]] == [
+        "answer: What is RNI?",
+        "answer: show code",
+        "answer: What is RNI?",
+    ]
+    assert len(rag.calls) == 2
+    assert {priority for _, _, priority in rag.calls} == {Priority.BATCH}
+    assert {(q, m) for q, m, _ in rag.calls} == {("What is RNI?", "mistral:7b"), ("show code", "codellama:7b")}
+
+
+def test_interrupted_job_resumes_from_pending_items():
+    store, rag = MemoryStore(), FakeRagService()
+    manager = BatchJobManager(rag, store=store, settings=_settings())
+
+    async def scenario():
+        await store.create_job("job", 1, _request([]).__dict__, ["q1", "q2", "q3"])
+        # A previous worker finished q1 and died with the job still marked running
+        await store.complete_items("job", [0], {"response": "earlier"})
+        store.jobs["job"]["status"] = "running"
+        return await manager.run_job("job")
+
+    assert asyncio.run(scenario()) == "completed"
+    assert [q for q, _, _ in rag.calls] == ["q2", "q3"]
+    assert store.items["job"][0]["result"] == {"response": "earlier"}
+
+
+def test_failed_item_is_recorded_without_failing_job():
+    store, rag = MemoryStore(), FakeRagService(fail_on={"bad"})
+    manager = BatchJobManager(rag, store=store, settings=_settings())
+
+    async def scenario():
+        await store.create_job("job", 1, _request([], model="mistral:7b").__dict__, ["good", "bad"])
+        return await manager.run_job("job")
+
+    assert asyncio.run(scenario()) == "completed"
+    assert store.jobs["job"]["failed_items"] == 1
+    assert store.items["job"][1]["error"] == "boom"
+
+
+def test_shed_item_is_retried(monkeypatch):
+    store, rag = MemoryStore(), FakeRagService()
+    attempts = []
+
+    async def flaky_chat(request):
+        attempts.append(request.query)
+        if len(attempts) == 1:
+            raise OllamaOverloaded(503, "busy", retry_after=0, reason="timeout")
+        return SimpleNamespace(model_dump=lambda: {"response": "ok"})
+
+    rag.chat = flaky_chat
+    manager = BatchJobManager(rag, store=store, settings=_settings())
+    real_sleep = asyncio.sleep
+
+    async def no_wait(seconds):
+        await real_sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", no_wait)
+
+    async def scenario():
+        await store.create_job("job", 1, _request([], model="mistral:7b").__dict__, ["q"])
+        return await manager.run_job("job")
+
+    assert asyncio.run(scenario()) == "completed"
+    assert attempts == ["q", "q"]
+    assert store.items["job"][0]["result"] == {"response": "ok"}
+
+
+def test_progress_events_stream_items_then_final_status():
+    store, rag = MemoryStore(), FakeRagService()
+    manager = BatchJobManager(rag, store=store, settings=_settings())
+
+    async def scenario():
+        await store.create_job("job", 1, _request([], model="mistral:7b").__dict__, ["a", "b"])
+        await manager.run_job("job")
+        return [event async for event in manager.progress_events("job", 1)]
+
+    events = asyncio.run(scenario())
+    assert [e["type"] for e in events] == ["item", "item", "progress"]
+    assert events[-1]["status"] == "completed"
@@ -0,0 +1,75 @@
+"""Unit tests for the cache warm-up job (no Redis/DB/Ollama required)."""
+
+from __future__ import annotations
+
+import asyncio
+
+from reranker.cache_warmer import CacheWarmer, WarmupQuestion, hit_rate
+from reranker.load_balancer import OllamaLoadBalancer
+
+
+class _FakeRagService:
+    def __init__(self, urls):
+        self.load_balancer = OllamaLoadBalancer(urls)
+        self.embedded = []
+
+    async def _get_query_embedding(self, query):
+        self.embedded.append(query)
+        return [0.0]
+
+    async def rebuild_hybrid_index(self):
+        return None
+
+
+def test_hit_rate_handles_empty_window():
+    assert hit_rate(0, 0) is None
+    assert hit_rate(3, 1) == 0.75
+
+
+def test_capacity_requires_half_healthy_and_low_latency(warmer_settings):
+    service = _FakeRagService(["http://a", "http://b", "http://c", "http://d"])
+    warmer = CacheWarmer(service, settings=warmer_settings())
+    assert warmer.capacity_available()
+
+    service.load_balancer.metrics["http://a"].average_response_time = 5000
+    assert not warmer.capacity_available()
+
+    service.load_balancer.metrics["http://a"].average_response_time = 0
+    for url in ("http://a", "http://b", "http://c"):
+        service.load_balancer.metrics[url].is_healthy = False
+    assert not warmer.capacity_available()
+
+
+def test_run_replays_cold_questions_and_reports_progress(monkeypatch, warmer_settings):
+    service = _FakeRagService(["http://a", "http://b"])
+    warmer = CacheWarmer(service, settings=warmer_settings())
+    questions = [
+        WarmupQuestion(question_hash="h1", canonical_question="what is flexnet", usage_count=9),
+        WarmupQuestion(question_hash="h2", canonical_question="reset a meter", usage_count=4),
+        WarmupQuestion(question_hash="h3", canonical_question="lte range", usage_count=2),
+    ]
+    monkeypatch.setattr(warmer, "fetch_top_questions", lambda limit=None: questions)
+    monkeypatch.setattr(warmer, "_is_already_warm", lambda query: query == "reset a meter")
+    snapshots = [
+        {"response_hits": 10, "response_misses": 30, "embedding_hits": 0, "embedding_misses": 0},
+        {"response_hits": 10, "response_misses": 33, "embedding_hits": 0, "embedding_misses": 0},
+    ]
+    monkeypatch.setattr(warmer, "_snapshot_counters", lambda: snapshots.pop(0) if len(snapshots) > 1 else snapshots[0])
+
+    status = asyncio.run(warmer.run("deploy"))
+
+    assert sorted(service.embedded) == ["lte range", "what is flexnet"]
+    assert status["total"] == 3
+    assert status["completed"] == 3
+    assert status["warmed"] == 2
+    assert status["already_warm"] == 1
+    assert status["progress"] == 1.0
+    assert not status["running"]
+
+    uplift = warmer.hit_rate_uplift(
+        {"response_hits": 30, "response_misses": 43, "embedding_hits": 0, "embedding_misses": 0}
+    )
+    assert uplift["response"]["before"] == 0.25
+    assert uplift["response"]["after"] == 0.6667
+    assert uplift["response"]["uplift"] == round(20 / 30 - 0.25, 4)
+    assert uplift["embedding"]["uplift"] is None
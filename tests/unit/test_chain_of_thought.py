@@ -0,0 +1,78 @@
+"""Unit tests for concurrent evidence gathering in the chain-of-thought reasoner."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# The reasoning_engine modules use flat imports (``from reasoning_types import ...``); load by path
+# and drop the flat reasoning_types module again so other tests see the import state they expect
+_ENGINE_DIR = Path(__file__).resolve().parents[2] / "reranker" / "reasoning_engine"
+_HAD_REASONING_TYPES = "reasoning_types" in sys.modules
+sys.path.insert(0, str(_ENGINE_DIR))
+try:
+    _SPEC = importlib.util.spec_from_file_location("reranker_chain_of_thought", _ENGINE_DIR / "chain_of_thought.py")
+    chain_of_thought = importlib.util.module_from_spec(_SPEC)
+    _SPEC.loader.exec_module(chain_of_thought)
+finally:
+    sys.path.remove(str(_ENGINE_DIR))
+    if not _HAD_REASONING_TYPES:
+        sys.modules.pop("reasoning_types", None)
+
+
+def _chunk(chunk_id, text, similarity=0.8):
+    metadata = {"chunk_id": chunk_id, "document_name": "manual.pdf"}
+    return SimpleNamespace(text=text, similarity=similarity, metadata=metadata)
+
+
+class FakeSearch:
+    def __init__(self, results, delay=0.2, fail=()):
+        self.results = results
+        self.delay = delay
+        self.fail = set(fail)
+        self.calls = []
+
+    async def search(self, query, top_k):
+        self.calls.append((query, top_k))
+        await asyncio.sleep(self.delay)
+        if query in self.fail:
+            raise ConnectionError("search down")
+        return self.results[query]
+
+
+def _reasoner(search):
+    return chain_of_thought.ChainOfThoughtReasoner(search, ollama_client=None, settings=None)
+
+
+def test_sub_queries_are_searched_concurrently():
+    search = FakeSearch({q: [_chunk(q, f"text {q}")] for q in ("a", "b", "c")})
+    start = time.monotonic()
+    evidence = asyncio.run(_reasoner(search)._gather_evidence_batch(["a", "b", "c"], min_sources=2))
+
+    assert time.monotonic() - start < 0.4
+    assert [e["chunks"] for e in evidence] == [["text a"], ["text b"], ["text c"]]
+    assert {top_k for _, top_k in search.calls} == {4}
+
+
+def test_chunks_are_not_repeated_across_steps():
+    shared = _chunk(1, "shared")
+    search = FakeSearch(
+        {"a": [shared, _chunk(2, "only a")], "b": [shared, _chunk(3, "next best for b"), _chunk(4, "spare")]},
+        delay=0,
+    )
+    evidence = asyncio.run(_reasoner(search)._gather_evidence_batch(["a", "b"], min_sources=2))
+
+    assert evidence[0]["chunks"] == ["shared", "only a"]
+    assert evidence[1]["chunks"] == ["next best for b", "spare"]
+
+
+def test_failed_search_only_affects_its_step():
+    search = FakeSearch({"a": [_chunk(1, "ok")]}, delay=0, fail={"b"})
+    evidence = asyncio.run(_reasoner(search)._gather_evidence_batch(["a", "b"], min_sources=1))
+
+    assert evidence[0]["chunks"] == ["ok"]
+    assert evidence[1]["confidence"] == 0.1 and evidence[1]["sources"] == []
@@ -0,0 +1,169 @@
+"""Unit tests for write-behind chat persistence."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from reranker.chat_persistence import ChatPersistence, MessageRecord, QuestionUsageRecord
+
+
+def _settings(**overrides):
+    values = dict(chat_write_behind_batch_size=3, chat_write_behind_flush_ms=10, chat_write_behind_max_pending=100)
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+class MemoryStore:
+    """Records each batch; rejects messages for conversations listed in ``deleted``."""
+
+    record_errors = (ValueError,)
+
+    def __init__(self, deleted=(), fail=False):
+        self.batches = []
+        self.deleted = set(deleted)
+        self.fail = fail
+
+    async def write_batch(self, messages, usages):
+        if self.fail:
+            raise ConnectionError("database down")
+        if any(m.conversation_id in self.deleted for m in messages):
+            raise ValueError("foreign key violation")
+        self.batches.append((list(messages), list(usages)))
+
+    @property
+    def messages(self):
+        return [m for batch, _ in self.batches for m in batch]
+
+
+def _usage(conversation_id=1):
+    return QuestionUsageRecord(
+        question_hash="h",
+        category="general",
+        question_text="q",
+        user_id=1,
+        conversation_id=conversation_id,
+        response_time_ms=10,
+        quality_score=0.5,
+        search_method="rag",
+        citations_count=0,
+        context_length=0,
+    )
+
+
+def test_enqueue_does_not_write_until_flush():
+    store = MemoryStore()
+    persistence = ChatPersistence(store=store, settings=_settings())
+    persistence.add_message(1, "user", "hello")
+    persistence.enqueue(_usage())
+
+    assert store.batches == []
+    assert persistence.pending == 2
+
+    assert asyncio.run(persistence.flush()) == 2
+    messages, usages = store.batches[0]
+    assert [m.content for m in messages] == ["hello"]
+    assert len(usages) == 1
+    assert persistence.pending == 0
+
+
+def test_flush_writes_in_batches_preserving_order():
+    store = MemoryStore()
+    persistence = ChatPersistence(store=store, settings=_settings())
+    for i in range(7):
+        persistence.add_message(1, "user", str(i))
+
+    asyncio.run(persistence.flush())
+
+    assert [len(batch) for batch, _ in store.batches] == [3, 3, 1]
+    assert [m.content for m in store.messages] == [str(i) for i in range(7)]
+
+
+def test_rejected_records_are_isolated():
+    store = MemoryStore(deleted={2})
+    persistence = ChatPersistence(store=store, settings=_settings(chat_write_behind_batch_size=10))
+    persistence.add_message(1, "user", "a")
+    persistence.add_message(2, "user", "gone")
+    persistence.add_message(1, "assistant", "b")
+
+    assert asyncio.run(persistence.flush()) == 2
+    assert [m.content for m in store.messages] == ["a", "b"]
+    assert persistence.stats["rejected"] == 1
+
+
+def test_unavailable_database_keeps_records():
+    store = MemoryStore(fail=True)
+    persistence = ChatPersistence(store=store, settings=_settings())
+    persistence.add_message(1, "user", "a")
+    persistence.add_message(1, "assistant", "b")
+
+    assert asyncio.run(persistence.flush()) == 0
+    assert [m.content for m in persistence.pending_messages(1)] == ["a", "b"]
+
+    store.fail = False
+    assert asyncio.run(persistence.flush()) == 2
+    assert [m.content for m in store.messages] == ["a", "b"]
+
+
+def test_connection_loss_mid_bisection_requeues_only_unwritten_records():
+    class ScriptedStore(MemoryStore):
+        """Rejects the full batch, commits its first half, then loses the connection once."""
+
+        def __init__(self):
+            super().__init__()
+            self.outcomes = [ValueError("check violation"), None, ConnectionError("connection lost")]
+
+        async def write_batch(self, messages, usages):
+            outcome = self.outcomes.pop(0) if self.outcomes else None
+            if outcome is not None:
+                raise outcome
+            await super().write_batch(messages, usages)
+
+    store = ScriptedStore()
+    persistence = ChatPersistence(store=store, settings=_settings(chat_write_behind_batch_size=4))
+    for i in range(4):
+        persistence.add_message(1, "user", f"m{i}")
+
+    assert asyncio.run(persistence.flush()) == 2
+    assert [m.content for m in persistence.pending_messages(1)] == ["m2", "m3"]
+    assert asyncio.run(persistence.flush()) == 2
+    assert [m.content for m in store.messages] == ["m0", "m1", "m2", "m3"]
+    assert persistence.stats["written"] == 4
+
+
+def test_pending_messages_filters_by_conversation():
+    persistence = ChatPersistence(store=MemoryStore(), settings=_settings())
+    persistence.add_message(1, "user", "a")
+    persistence.add_message(2, "user", "b")
+    persistence.enqueue(_usage(1))
+
+    pending = persistence.pending_messages(1)
+    assert [m.content for m in pending] == ["a"]
+    assert all(isinstance(m, MessageRecord) for m in pending)
+
+
+def test_full_queue_drops_oldest():
+    persistence = ChatPersistence(store=MemoryStore(), settings=_settings(chat_write_behind_max_pending=3))
+    for i in range(4):
+        persistence.add_message(1, "user", str(i))
+
+    assert [m.content for m in persistence.pending_messages(1)] == ["1", "2", "3"]
+    assert persistence.stats["dropped"] == 1
+
+
+def test_background_flush_and_close():
+    store = MemoryStore()
+    persistence = ChatPersistence(store=store, settings=_settings())
+
+    async def scenario():
+        persistence.start()
+        persistence.add_message(1, "user", "a")
+        await asyncio.sleep(0.05)
+        assert [m.content for m in store.messages] == ["a"]
+        # Queued right before shutdown: close() must still persist it
+        persistence.add_message(1, "assistant", "b")
+        await persistence.close(timeout=1)
+
+    asyncio.run(scenario())
+    assert [m.content for m in store.messages] == ["a", "b"]
+    assert persistence.pending == 0
@@ -0,0 +1,145 @@
+"""Unit tests for token-accurate context packing and num_ctx bucketing."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from reranker.context_packer import ContextPacker, TokenCounter, choose_num_ctx, model_family, parse_buckets
+
+
+class WordCounter(TokenCounter):
+    """Deterministic counter: one token per whitespace-separated word."""
+
+    def count(self, text, model=None):
+        return len(text.split())
+
+    def method(self, model):
+        return "words"
+
+
+def _settings(**overrides):
+    values = dict(
+        context_packing_enabled=True,
+        context_tokenizer_dir="",
+        context_num_ctx_buckets="4096,2048,8192",
+        context_safety_margin_tokens=0,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def _build(chunks):
+    return {"system": "be helpful", "user": "\n".join(f"Context {i + 1}: {c}" for i, c in enumerate(chunks)) + "\nQ"}
+
+
+def test_model_family_mapping():
+    assert model_family("mistral:7b") == "mistral"
+    assert model_family("codellama:7b") == "llama2"
+    assert model_family("llama3.2:3b") == "llama3"
+    assert model_family("unknown-model") == "default"
+
+
+def test_buckets_and_num_ctx_choice():
+    buckets = parse_buckets("4096, 2048,8192,junk")
+    assert buckets == [2048, 4096, 8192]
+    assert choose_num_ctx(1500, buckets, 8192) == 2048
+    assert choose_num_ctx(2049, buckets, 8192) == 4096
+    assert choose_num_ctx(9000, buckets, 8192) == 8192
+    assert choose_num_ctx(3000, buckets, 2048) == 2048
+
+
+def test_lowest_ranked_chunks_are_dropped_to_fit_budget():
+    packer = ContextPacker(settings=_settings(), counter=WordCounter())
+    chunks = ["word " * 400, "word " * 400, "word " * 400]
+    metadata = [{"rank": 1}, {"rank": 2}, {"rank": 3}]
+
+    packed = packer.pack(_build, chunks, metadata, "mistral:7b", max_tokens=200, max_ctx=1100)
+
+    assert packed.chunks == chunks[:2]
+    assert packed.metadata == metadata[:2]
+    assert packed.dropped == 1
+    assert packed.prompt_tokens <= 1100 - 200
+    assert packed.prompt == _build(chunks[:2])
+
+
+def test_num_ctx_is_smallest_bucket_for_prompt_plus_answer():
+    packer = ContextPacker(settings=_settings(), counter=WordCounter())
+
+    small = packer.pack(_build, ["short chunk"], [{}], "mistral:7b", max_tokens=512, max_ctx=32768)
+    assert small.num_ctx == 2048
+
+    large = packer.pack(_build, ["word " * 3000], [{}], "mistral:7b", max_tokens=512, max_ctx=32768)
+    assert large.num_ctx == 4096
+    assert large.chunks
+
+
+def test_disabled_packer_keeps_everything_at_model_maximum():
+    packer = ContextPacker(settings=_settings(context_packing_enabled=False), counter=WordCounter())
+    chunks = ["word " * 5000]
+    packed = packer.pack(_build, chunks, [{}], "mistral:7b", max_tokens=200, max_ctx=4096)
+    assert packed.chunks == chunks
+    assert packed.num_ctx == 4096
+
+
+def test_heuristic_counter_without_tokenizers(monkeypatch):
+    import reranker.context_packer as module
+
+    monkeypatch.setattr(module, "TIKTOKEN_AVAILABLE", False)
+    counter = TokenCounter(tokenizer_dir=None)
+    assert counter.method("mistral:7b") == "heuristic"
+    assert counter.count("a" * 32, "mistral:7b") == 10
+    assert counter.count_messages({"system": "", "user": "a" * 32}, "mistral:7b") == 10 + module.MESSAGE_OVERHEAD_TOKENS
+
+
+def _build_with_history(chunks, history):
+    prompt = _build(chunks)
+    prompt["history"] = history
+    return prompt
+
+
+def test_oldest_history_turns_are_dropped_to_make_room_for_context():
+    packer = ContextPacker(settings=_settings(), counter=WordCounter())
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "content": "word " * 200} for i in range(6)]
+    chunks = ["word " * 300, "word " * 300]
+
+    packed = packer.pack(
+        _build_with_history, chunks, [{}, {}], "mistral:7b", max_tokens=200, max_ctx=1200, history=history
+    )
+
+    assert packed.history_dropped == 4
+    assert packed.prompt["history"] == history[4:]
+    assert packed.chunks == chunks[:1]
+    assert packed.prompt_tokens <= 1200 - 200
+
+
+def test_history_that_fits_is_kept_whole():
+    packer = ContextPacker(settings=_settings(), counter=WordCounter())
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+
+    packed = packer.pack(_build_with_history, ["short chunk"], [{}], "mistral:7b", 200, 4096, history=history)
+
+    assert packed.history_dropped == 0
+    assert packed.prompt["history"] == history
+
+
+def test_load_reads_encodings_once_and_lookups_do_not_wait_for_it(monkeypatch):
+    import reranker.context_packer as module
+
+    calls = []
+    encoding = SimpleNamespace(encode=lambda text, disallowed_special=(): text.split())
+    fake_tiktoken = SimpleNamespace(get_encoding=lambda name: calls.append(name) or encoding)
+    monkeypatch.setattr(module, "TIKTOKEN_AVAILABLE", True)
+    monkeypatch.setattr(module, "tiktoken", fake_tiktoken)
+    counter = TokenCounter(tokenizer_dir=None)
+
+    # A load in progress (in its worker thread): requests use the heuristic instead of fetching
+    counter._loading = True
+    assert counter.method("mistral:7b") == "heuristic"
+    assert calls == []
+
+    counter._loading = False
+    methods = counter.load()
+    assert set(methods.values()) == {"cl100k"} and "mistral" in methods
+    assert counter.method("mistral:7b") == "cl100k"
+    counter.count("one two three", "mistral:7b")
+    assert calls == ["cl100k_base"]
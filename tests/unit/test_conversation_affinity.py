@@ -0,0 +1,104 @@
+"""Unit tests for conversation-affine routing and prompt prefix reuse."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from reranker.conversation_affinity import (
+    ConsistentHashRing,
+    ConversationAffinity,
+    prefill_summary,
+    record_prefill,
+    stable_history_window,
+)
+from reranker.instance_health import InstanceHealthRegistry
+from reranker.load_balancer import OllamaLoadBalancer
+
+URLS = [f"http://ollama-{i}:11434" for i in range(1, 5)]
+
+
+def _settings(**overrides):
+    values = dict(
+        conversation_affinity_enabled=True,
+        conversation_affinity_vnodes=64,
+        conversation_affinity_load_factor_pct=125,
+        scheduler_slots_per_instance=2,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def _affinity(**overrides):
+    lb = OllamaLoadBalancer(URLS)
+    lb.registry = InstanceHealthRegistry(URLS, failure_threshold=1)
+    return ConversationAffinity(lb, settings=_settings(**overrides)), lb
+
+
+def test_ring_is_stable_and_only_remaps_removed_instance():
+    ring = ConsistentHashRing(URLS)
+    owners = {str(cid): ring.candidates(str(cid))[0] for cid in range(200)}
+    assert owners == {str(cid): ConsistentHashRing(URLS).candidates(str(cid))[0] for cid in range(200)}
+    assert len(set(owners.values())) == len(URLS)
+
+    smaller = ConsistentHashRing(URLS[:-1])
+    for cid, owner in owners.items():
+        if owner != URLS[-1]:
+            assert smaller.candidates(cid)[0] == owner
+
+
+def test_conversation_sticks_to_owner_and_fails_over_when_unavailable():
+    affinity, lb = _affinity()
+    owner, second = affinity.ring.candidates("42")[:2]
+
+    assert {affinity.instance_for("42") for _ in range(5)} == {owner}
+
+    lb.registry.record_failure(owner, "timeout")
+    assert affinity.instance_for("42") == second
+    assert affinity.stats["failover"] == 1
+
+
+def test_overloaded_owner_is_skipped():
+    affinity, lb = _affinity()
+    owner, second = affinity.ring.candidates("7")[:2]
+    lb.metrics[owner].in_flight_total = 6
+
+    assert affinity.instance_for("7") == second
+
+
+def test_no_conversation_or_disabled_uses_regular_routing():
+    affinity, _ = _affinity()
+    assert affinity.instance_for(None) is None
+    disabled, _ = _affinity(conversation_affinity_enabled=False)
+    assert disabled.instance_for("42") is None
+
+
+def test_history_window_moves_in_blocks():
+    turns = []
+    for i in range(7):
+        turns.append({"role": "user", "content": f"q{i}"})
+        turns.append({"role": "assistant", "content": f"a{i}"})
+
+    first = stable_history_window(turns[:10], max_turns=4)
+    second = stable_history_window(turns[:12], max_turns=4)
+    assert first[0]["content"] == second[0]["content"] == "q2"
+    assert second[: len(first)] == first
+    assert len(stable_history_window(turns[:6], max_turns=4)) == 6
+    assert stable_history_window(turns, max_turns=0) == []
+
+
+def test_history_window_of_recent_messages_keeps_block_alignment():
+    turns = [{"role": "user" if i % 2 == 0 else "assistant", "content": str(i)} for i in range(14)]
+
+    # Only the latest 8 messages were loaded; the window matches the one over the full history
+    assert stable_history_window(turns[-8:], max_turns=4, total_messages=14) == stable_history_window(turns, 4)
+    assert stable_history_window(turns[-8:], max_turns=4, total_messages=14)[0]["content"] == "8"
+
+
+def test_record_prefill_counts_cached_prefix():
+    before = prefill_summary()["requests"]
+    cached = record_prefill("mistral:7b", 1000, {"prompt_eval_count": 150, "prompt_eval_duration": 40_000_000})
+    assert cached == 850
+    assert record_prefill("mistral:7b", 1000, {}) is None
+    # Prompt size not counted exactly: nothing is recorded
+    assert record_prefill("mistral:7b", 0, {"prompt_eval_count": 150}) is None
+    assert prefill_summary()["requests"] == before + 1
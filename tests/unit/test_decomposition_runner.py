@@ -0,0 +1,89 @@
+"""Unit tests for concurrent execution of decomposed sub-requests."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from reranker.decomposition_runner import run_sub_requests
+from reranker.ollama_scheduler import Priority, current_priority
+from reranker.question_decomposer import ComplexityLevel, SubRequest
+from reranker.rethink_reranker import rethink_pipeline
+
+
+class FakeDecomposer:
+    def select_model_for_complexity(self, complexity):
+        return {ComplexityLevel.SIMPLE: "llama3.2:3b", ComplexityLevel.COMPLEX: "mistral:7b"}[complexity]
+
+
+class FakeRagService:
+    def __init__(self, delays):
+        self.delays = delays
+        self.active = 0
+        self.peak = 0
+        self.calls = []
+
+    async def chat(self, request):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        self.calls.append((request.query, request.model, current_priority()))
+        try:
+            await asyncio.sleep(self.delays[request.query])
+            if request.query == "broken":
+                raise RuntimeError("generation failed")
+            return SimpleNamespace(response=f"answer to {request.query}", model=request.model)
+        finally:
+            self.active -= 1
+
+
+def _collect(rag, sub_requests, max_parallel):
+    async def scenario():
+        return [item async for item in run_sub_requests(rag, FakeDecomposer(), sub_requests, max_parallel)]
+
+    return asyncio.run(scenario())
+
+
+def test_sub_requests_run_concurrently_and_yield_in_completion_order():
+    subs = [
+        SubRequest(sub_query="slow part", complexity=ComplexityLevel.COMPLEX),
+        SubRequest(sub_query="fast part", complexity=ComplexityLevel.SIMPLE),
+    ]
+    rag = FakeRagService({"slow part": 0.05, "fast part": 0.0})
+
+    results = _collect(rag, subs, max_parallel=4)
+
+    assert [index for index, _ in results] == [1, 0]
+    assert rag.peak == 2
+    assert {(q, m) for q, m, _ in rag.calls} == {("slow part", "mistral:7b"), ("fast part", "llama3.2:3b")}
+    assert {p for _, _, p in rag.calls} == {Priority.DECOMPOSITION}
+
+
+def test_parallelism_is_bounded():
+    subs = [SubRequest(sub_query=f"part {i}", complexity=ComplexityLevel.SIMPLE) for i in range(5)]
+    rag = FakeRagService({f"part {i}": 0.01 for i in range(5)})
+
+    results = _collect(rag, subs, max_parallel=2)
+
+    assert len(results) == 5
+    assert rag.peak == 2
+
+
+def test_failed_sub_request_yields_empty_answer():
+    subs = [SubRequest(sub_query="broken", complexity=ComplexityLevel.SIMPLE)]
+    rag = FakeRagService({"broken": 0.0})
+
+    [(index, result)] = _collect(rag, subs, max_parallel=1)
+
+    assert index == 0
+    assert result["response"] == ""
+    assert result["confidence"] == 0.0
+
+
+def test_rethink_pipeline_uses_in_memory_results():
+    decomposition = {"original_query": "q", "sub_requests": [{"id": "not-in-redis", "sub_query": "a"}]}
+    subs = [{"id": "not-in-redis", "sub_query": "a", "response": "in memory answer", "model": "m", "confidence": 1.0}]
+
+    final = rethink_pipeline("no-such-hash", 1, "q", decomposition=decomposition, sub_results=subs)
+
+    assert final["synthesized"]["synthesized_text"] == "in memory answer"
+    assert final["reranked_components"][0]["cached"] is False
@@ -0,0 +1,112 @@
+"""Unit tests for hedged Ollama requests."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from reranker.hedging import HedgeBudget, Hedger
+from reranker.instance_health import InstanceHealthRegistry
+from reranker.load_balancer import OllamaLoadBalancer
+
+
+def _settings(**overrides):
+    values = dict(hedge_enabled=True, hedge_budget_pct=100, hedge_min_samples=5, hedge_min_delay_ms=1)
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def _balancer(p95_ms=20.0, kind="embedding", model=None):
+    lb = OllamaLoadBalancer(["http://slow", "http://fast"])
+    for url in lb.instance_urls:
+        for _ in range(10):
+            lb.metrics[url].update_response_time(p95_ms, kind, model)
+    return lb
+
+
+def test_budget_caps_hedge_rate():
+    budget = HedgeBudget(0.1, burst=1.0)
+    spent = 0
+    for _ in range(100):
+        budget.earn()
+        if budget.try_spend():
+            spent += 1
+    assert spent <= 11
+
+
+def test_no_hedge_without_enough_samples():
+    lb = OllamaLoadBalancer(["http://slow", "http://fast"])
+    hedger = Hedger(lb, settings=_settings())
+    assert hedger.hedge_delay("http://slow") is None
+
+
+def test_delay_uses_the_window_of_the_hedged_kind_and_model():
+    lb = _balancer(p95_ms=4000.0, kind="generation", model="mistral:7b")
+    for _ in range(10):
+        lb.record_request("http://slow", 40.0, success=True, kind="embedding", model="nomic-embed-text")
+    hedger = Hedger(lb, settings=_settings())
+
+    assert hedger.hedge_delay("http://slow", "embedding", "nomic-embed-text") == 0.04
+    assert hedger.hedge_delay("http://slow", "generation", "mistral:7b") == 4.0
+    assert hedger.hedge_delay("http://slow", "generation", "llama3.2:3b") is None
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    hedger = Hedger(_balancer(), settings=_settings())
+    calls, cancelled = [], []
+
+    async def attempt(url):
+        calls.append(url)
+        try:
+            await asyncio.sleep(1.0 if url == "http://slow" else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+        return url
+
+    result = asyncio.run(hedger.run(attempt, "http://slow", kind="embedding"))
+
+    assert result == "http://fast"
+    assert calls == ["http://slow", "http://fast"]
+    assert cancelled == ["http://slow"]
+
+
+def test_fast_primary_is_not_duplicated():
+    hedger = Hedger(_balancer(p95_ms=200.0), settings=_settings())
+    calls = []
+
+    async def attempt(url):
+        calls.append(url)
+        return [0.1, 0.2]
+
+    assert asyncio.run(hedger.run(attempt, "http://slow")) == [0.1, 0.2]
+    assert calls == ["http://slow"]
+
+
+def test_exhausted_budget_waits_for_primary():
+    hedger = Hedger(_balancer(), settings=_settings(hedge_budget_pct=0))
+    calls = []
+
+    async def attempt(url):
+        calls.append(url)
+        await asyncio.sleep(0.05)
+        return url
+
+    assert asyncio.run(hedger.run(attempt, "http://slow")) == "http://slow"
+    assert calls == ["http://slow"]
+
+
+def test_exhausted_budget_leaves_a_half_open_backup_trial_unclaimed():
+    lb = _balancer()
+    lb.registry = InstanceHealthRegistry(lb.instance_urls, failure_threshold=1, open_seconds=30)
+    lb.registry.record_failure("http://fast", "timeout")
+    lb.registry.get("http://fast").opened_at = time.time() - 31
+    hedger = Hedger(lb, settings=_settings(hedge_budget_pct=0))
+
+    async def attempt(url):
+        await asyncio.sleep(0.05)
+        return url
+
+    assert asyncio.run(hedger.run(attempt, "http://slow")) == "http://slow"
+    assert lb.registry.admit("http://fast")
@@ -0,0 +1,147 @@
+"""Unit tests for the shared instance health registry and background monitor."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+
+from reranker.instance_health import CircuitState, HealthMonitor, InstanceHealthRegistry
+from reranker.load_balancer import OllamaLoadBalancer, RequestType
+from reranker.rag_chat import RAGChatService
+
+
+def _settings(**overrides):
+    values = dict(
+        health_monitor_interval_seconds=30,
+        health_monitor_jitter_pct=20,
+        health_probe_timeout_seconds=5,
+        model_residency_refresh_seconds=30,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_circuit_opens_after_threshold_and_half_opens_after_cooldown():
+    registry = InstanceHealthRegistry(["http://a"], failure_threshold=2, open_seconds=30)
+
+    registry.record_failure("http://a", "timeout")
+    assert registry.state("http://a") == CircuitState.CLOSED
+    registry.record_failure("http://a", "timeout")
+    assert registry.state("http://a") == CircuitState.OPEN
+    assert not registry.is_available("http://a")
+
+    registry.get("http://a").opened_at = time.time() - 31
+    assert registry.state("http://a") == CircuitState.HALF_OPEN
+    assert registry.is_available("http://a")
+
+    # A single failed trial re-opens the circuit; a success closes it
+    registry.record_failure("http://a", "timeout")
+    assert registry.state("http://a") == CircuitState.OPEN
+    registry.get("http://a").opened_at = time.time() - 31
+    registry.record_success("http://a", latency_ms=12.0)
+    assert registry.state("http://a") == CircuitState.CLOSED
+    assert registry.get("http://a").consecutive_failures == 0
+
+
+def test_half_open_circuit_admits_a_single_trial_request():
+    registry = InstanceHealthRegistry(["http://a"], failure_threshold=1, open_seconds=30)
+    registry.record_failure("http://a", "timeout")
+    registry.get("http://a").opened_at = time.time() - 31
+
+    assert registry.is_available("http://a")
+    assert registry.admit("http://a")
+    assert not registry.admit("http://a")
+    assert not registry.is_available("http://a")
+
+    # The trial's outcome settles the circuit; a trial that never reports expires
+    registry.record_success("http://a")
+    assert registry.admit("http://a") and registry.admit("http://a")
+    registry.record_failure("http://a", "timeout")
+    registry.get("http://a").opened_at = time.time() - 31
+    assert registry.admit("http://a")
+    registry.get("http://a").trial_started_at = time.time() - 31
+    assert registry.admit("http://a")
+
+
+def test_balancer_sends_one_request_to_a_half_open_instance():
+    registry = InstanceHealthRegistry(["http://a", "http://b"], failure_threshold=1, open_seconds=30)
+    lb = OllamaLoadBalancer(["http://a", "http://b"])
+    lb.registry = registry
+    registry.record_failure("http://a", "timeout")
+    registry.get("http://a").opened_at = time.time() - 31
+
+    picks = [asyncio.run(lb.get_next_instance(RequestType.INFERENCE, "mistral:7b")) for _ in range(20)]
+    assert picks.count("http://a") == 1
+    assert lb.get_backup_instance("http://b") is None
+
+
+def test_generation_claims_a_half_open_trial_only_when_it_dispatches_there():
+    registry = InstanceHealthRegistry(["http://a", "http://b"], failure_threshold=1, open_seconds=30)
+    lb = OllamaLoadBalancer(["http://a", "http://b"])
+    lb.registry = registry
+    registry.record_failure("http://a", "timeout")
+    registry.get("http://a").opened_at = time.time() - 31
+
+    service = RAGChatService.__new__(RAGChatService)
+    service.load_balancer = lb
+    service.settings = SimpleNamespace(hedge_max_tokens=0)
+    sent = []
+
+    async def generate_on(url, *args):
+        sent.append(url)
+        return "answer"
+
+    service._generate_on = generate_on
+    counters = SimpleNamespace(instance_usage=lambda url: None)
+    prompt = {"system": "s", "user": "q"}
+
+    # The preferred instance answers, so the half-open one is never tried and keeps its trial
+    result = asyncio.run(
+        service.generate_response(prompt, "m", 0.1, 64, preferred_instance="http://b", counters=counters)
+    )
+    assert result == "answer" and sent == ["http://b"]
+    assert registry.admit("http://a")
+    assert not registry.admit("http://a")
+
+
+def test_monitor_probes_and_records_inventory():
+    def handler(request):
+        if request.url.host == "down":
+            return httpx.Response(503)
+        return httpx.Response(200, json={"models": [{"name": "mistral:7b"}, {"name": "llama3.2:3b"}]})
+
+    registry = InstanceHealthRegistry(["http://up", "http://down"], failure_threshold=1)
+    monitor = HealthMonitor(registry, settings=_settings())
+
+    async def probe():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await asyncio.gather(*(monitor.probe_instance(client, url) for url in registry.instances))
+
+    asyncio.run(probe())
+
+    assert registry.get("http://up").available_models == ["mistral:7b", "llama3.2:3b"]
+    assert registry.state("http://down") == CircuitState.OPEN
+    assert registry.available_urls() == ["http://up"]
+
+
+def test_jittered_interval_stays_in_bounds():
+    monitor = HealthMonitor(InstanceHealthRegistry([]), settings=_settings())
+    intervals = [monitor.next_interval() for _ in range(50)]
+    assert all(24 <= value <= 36 for value in intervals)
+
+
+def test_balancer_reads_registry_and_feeds_it_request_outcomes():
+    registry = InstanceHealthRegistry(["http://a", "http://b"], failure_threshold=2)
+    lb = OllamaLoadBalancer(["http://a", "http://b"])
+    lb.registry = registry
+
+    lb.record_request("http://a", 50.0, success=False, error="HTTP 500")
+    lb.record_request("http://a", 50.0, success=False, error="HTTP 500")
+
+    assert not lb.is_available("http://a")
+    picks = {asyncio.run(lb.get_next_instance(RequestType.INFERENCE, "mistral:7b")) for _ in range(10)}
+    assert picks == {"http://b"}
+    assert asyncio.run(lb.get_healthy_instances()) == ["http://b"]
@@ -0,0 +1,199 @@
+"""Unit tests for the pre-filtered, concurrent contradiction detection."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import json
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+# The reasoning_engine modules use flat imports (``from llm_client import ...``); load by path
+# and drop the flat modules again so other tests see the import state they expect
+_ENGINE_DIR = Path(__file__).resolve().parents[2] / "reranker" / "reasoning_engine"
+_HAD_LLM_CLIENT = "llm_client" in sys.modules
+sys.path.insert(0, str(_ENGINE_DIR))
+try:
+    _SPEC = importlib.util.spec_from_file_location(
+        "reranker_knowledge_synthesis", _ENGINE_DIR / "knowledge_synthesis.py"
+    )
+    knowledge_synthesis = importlib.util.module_from_spec(_SPEC)
+    _SPEC.loader.exec_module(knowledge_synthesis)
+finally:
+    sys.path.remove(str(_ENGINE_DIR))
+    if not _HAD_LLM_CLIENT:
+        sys.modules.pop("llm_client", None)
+
+VERDICT = {"type": "factual", "description": "different reset intervals", "severity": "high"}
+
+
+class SyncChatClient:
+    """Blocking client (as ``ollama.Client``) that reports a contradiction for every pair."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.prompts = []
+
+    def chat(self, model, messages, options):
+        self.prompts.append(messages[0]["content"])
+        time.sleep(self.delay)
+        return {"message": {"content": json.dumps(VERDICT)}}
+
+
+class SlowAsyncClient:
+    async def chat(self, model, messages, options):
+        await asyncio.sleep(5)
+        return {"message": {"content": "null"}}
+
+
+def _synthesizer(client, **overrides):
+    synthesizer = knowledge_synthesis.KnowledgeSynthesizer(None, client, SimpleNamespace(chat_model="test-model"))
+    for name, value in overrides.items():
+        setattr(synthesizer, name, value)
+    return synthesizer
+
+
+def _doc(source, text, embedding):
+    return {"source": source, "text": text, "embedding": embedding}
+
+
+def test_similarity_matrix_is_pairwise_cosine():
+    matrix = knowledge_synthesis.similarity_matrix(np.array([[1.0, 0.0], [1.0, 1.0], [0.0, 0.0]]))
+    assert matrix[0, 1] == pytest.approx(2**-0.5)
+    assert matrix[2, 0] == 0.0
+
+
+def test_only_overlapping_non_identical_pairs_reach_the_llm():
+    client = SyncChatClient()
+    documents = [
+        _doc("a", "Reset the meter every 30 days.", [1.0, 0.0, 0.0]),
+        _doc("b", "Reset the meter every 90 days.", [0.8, 0.6, 0.0]),
+        _doc("c", "Reset the meter every 30 days.", [1.0, 0.0, 0.0]),
+        _doc("d", "Billing cycles close on the first.", [0.0, 0.0, 1.0]),
+    ]
+    conflicts = asyncio.run(_synthesizer(client)._detect_contradictions(documents, "meter reset"))
+
+    # a/c are identical, d is off-topic; b/c repeats the a/b content and is served from the cache
+    assert [(c["document_1"], c["document_2"]) for c in conflicts] == [("a", "b"), ("b", "c")]
+    assert len(client.prompts) == 1
+    assert conflicts[0]["severity"] == "high"
+
+
+def test_comparisons_run_concurrently_within_budget():
+    client = SyncChatClient(delay=0.2)
+    documents = [_doc(str(i), f"Meter firmware note {i}", [1.0, 0.1 * i]) for i in range(8)]
+    synthesizer = _synthesizer(client, max_contradiction_checks=4, max_concurrent_comparisons=4)
+
+    start = time.monotonic()
+    conflicts = asyncio.run(synthesizer._detect_contradictions(documents, "firmware"))
+
+    assert time.monotonic() - start < 0.6
+    assert len(client.prompts) == 4
+    assert len(conflicts) == 4
+
+
+def test_deadline_bounds_detection_time():
+    documents = [_doc("a", "Reset every 30 days.", [1.0, 0.0]), _doc("b", "Reset every 90 days.", [0.9, 0.1])]
+    synthesizer = _synthesizer(SlowAsyncClient(), contradiction_timeout=0.1)
+
+    start = time.monotonic()
+    assert asyncio.run(synthesizer._detect_contradictions(documents, "reset")) == []
+    assert time.monotonic() - start < 1.0
+    assert synthesizer._contradiction_cache == {}
+
+
+def test_word_counts_are_used_without_embeddings():
+    client = SyncChatClient()
+    documents = [
+        {"source": "a", "text": "Reset the meter by holding the button for ten seconds."},
+        {"source": "b", "text": "Reset the meter by holding the button for five seconds."},
+        {"source": "c", "text": "Quarterly invoices are emailed to the account owner."},
+    ]
+    conflicts = asyncio.run(_synthesizer(client)._detect_contradictions(documents, "reset"))
+
+    assert [(c["document_1"], c["document_2"]) for c in conflicts] == [("a", "b")]
+
+
+def test_agglomerative_clusters_groups_by_average_similarity():
+    vectors = np.array([[1.0, 0.0], [0.95, 0.3], [0.0, 1.0], [0.1, 0.99], [0.7, 0.7]])
+    groups = knowledge_synthesis.agglomerative_clusters(knowledge_synthesis.similarity_matrix(vectors), 0.9)
+
+    assert sorted(groups) == [[0, 1], [2, 3], [4]]
+    assert knowledge_synthesis.agglomerative_clusters(np.ones((1, 1)), 0.5) == [[0]]
+
+
+class LabelClient:
+    """Async client that answers every prompt after a short delay and records them."""
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.prompts = []
+
+    async def chat(self, model, messages, options):
+        prompt = messages[0]["content"]
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        answer = "meter, reset" if "key concepts" in prompt else "Meter resets"
+        return {"message": {"content": answer}}
+
+
+def test_clusters_use_embeddings_and_label_only_returned_clusters():
+    client = LabelClient()
+    documents = [
+        _doc("a", "Reset the meter.", [1.0, 0.0, 0.0]),
+        _doc("b", "Hold reset for ten seconds.", [0.95, 0.3, 0.0]),
+        _doc("c", "Firmware 2.1 notes.", [0.0, 1.0, 0.0]),
+        _doc("d", "Firmware upgrade steps.", [0.0, 0.95, 0.3]),
+        _doc("e", "Billing cycle dates.", [0.0, 0.0, 1.0]),
+    ]
+    synthesizer = _synthesizer(client, max_clusters=1)
+
+    start = time.monotonic()
+    clusters = asyncio.run(synthesizer._cluster_related_information(documents, "reset"))
+
+    # Theme and concepts run together, then the synthesis: two rounds, not one call per document
+    assert time.monotonic() - start < 0.35
+    assert [c.source_documents for c in clusters] == [["a", "b"]]
+    assert clusters[0].key_concepts == ["meter", "reset"]
+    assert len(client.prompts) == 3
+
+
+def test_clusters_are_labelled_concurrently():
+    client = LabelClient(delay=0.2)
+    documents = [_doc(str(i), f"Section {i}", [1.0 if i < 2 else 0.0, 1.0 if i >= 2 else 0.0]) for i in range(4)]
+
+    start = time.monotonic()
+    clusters = asyncio.run(_synthesizer(client)._cluster_related_information(documents, "sections"))
+
+    assert time.monotonic() - start < 0.7
+    assert [c.source_documents for c in clusters] == [["0", "1"], ["2", "3"]]
+
+
+class EmbeddingClient(LabelClient):
+    """Label client that also embeds, counting the batch calls."""
+
+    def __init__(self):
+        super().__init__(delay=0.0)
+        self.embed_calls = 0
+
+    async def embed(self, model, input):
+        self.embed_calls += 1
+        return {"embeddings": [[1.0, 0.1 * i] for i in range(len(input))]}
+
+
+def test_synthesis_embeds_the_documents_once():
+    client = EmbeddingClient()
+    synthesizer = knowledge_synthesis.KnowledgeSynthesizer(
+        None, client, SimpleNamespace(chat_model="test-model", embedding_model="embed-model")
+    )
+    documents = [{"source": str(i), "text": f"Meter reset note {i}"} for i in range(3)]
+
+    result = asyncio.run(synthesizer.synthesize_knowledge("meter reset", documents))
+
+    assert client.embed_calls == 1
+    assert [c.source_documents for c in result.knowledge_clusters] == [["0", "1", "2"]]
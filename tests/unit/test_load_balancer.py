@@ -0,0 +1,68 @@
+"""Unit tests for least-outstanding-requests routing in the Ollama load balancer."""
+
+from __future__ import annotations
+
+import asyncio
+
+from reranker.load_balancer import InstanceMetrics, LatencyWindow, OllamaLoadBalancer, RequestType
+
+
+def test_latency_window_is_bounded_and_tracks_percentiles():
+    window = LatencyWindow(size=10)
+    for value in range(1, 26):
+        window.append(float(value))
+
+    assert len(window) == 10
+    assert window.mean() == sum(range(16, 26)) / 10
+    assert window.percentile(50) == 20.0
+    assert window.percentile(95) == 25.0
+
+
+def test_ewma_follows_recent_latency():
+    metrics = InstanceMetrics(instance_url="http://a")
+    metrics.update_response_time(100.0)
+    assert metrics.ewma_response_time == 100.0
+    metrics.update_response_time(200.0)
+    assert metrics.ewma_response_time == 120.0
+    assert metrics.p95_response_time == 200.0
+
+
+def test_in_flight_tracking_is_per_model_and_released_on_error():
+    lb = OllamaLoadBalancer(["http://a", "http://b"])
+
+    with lb.track_in_flight("http://a", "mistral:7b"):
+        assert lb.metrics["http://a"].outstanding("mistral:7b") == 1
+        assert lb.metrics["http://a"].outstanding("llama3.2:3b") == 0
+        assert lb.metrics["http://a"].outstanding() == 1
+
+    try:
+        with lb.track_in_flight("http://a", "mistral:7b"):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+
+    assert lb.metrics["http://a"].outstanding() == 0
+    assert lb.metrics["http://a"].in_flight == {}
+
+
+def test_busy_instance_is_avoided_even_if_faster():
+    lb = OllamaLoadBalancer(["http://fast", "http://slow"])
+    lb.metrics["http://fast"].ewma_response_time = 100.0
+    lb.metrics["http://slow"].ewma_response_time = 250.0
+
+    # Idle: the faster instance wins
+    assert asyncio.run(lb.get_next_instance(RequestType.INFERENCE, "mistral:7b")) == "http://fast"
+
+    # Four queued requests on the fast one make the slow one the shorter wait
+    lb.metrics["http://fast"].in_flight["mistral:7b"] = 4
+    lb.metrics["http://fast"].in_flight_total = 4
+    assert asyncio.run(lb.get_next_instance(RequestType.INFERENCE, "mistral:7b")) == "http://slow"
+
+
+def test_unhealthy_instances_are_never_sampled():
+    lb = OllamaLoadBalancer(["http://a", "http://b", "http://c"])
+    lb.metrics["http://a"].is_healthy = False
+    lb.metrics["http://b"].is_healthy = False
+
+    picks = {asyncio.run(lb.get_next_instance(RequestType.EMBEDDING)) for _ in range(20)}
+    assert picks == {"http://c"}
@@ -0,0 +1,163 @@
+"""Unit tests for concurrent multi-model consensus."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# The reasoning_engine modules use flat imports (``from llm_client import ...``); load by path
+# and drop the flat modules again so other tests see the import state they expect
+_ENGINE_DIR = Path(__file__).resolve().parents[2] / "reranker" / "reasoning_engine"
+_HAD_LLM_CLIENT = "llm_client" in sys.modules
+sys.path.insert(0, str(_ENGINE_DIR))
+try:
+    _SPEC = importlib.util.spec_from_file_location(
+        "reranker_model_orchestration", _ENGINE_DIR / "model_orchestration.py"
+    )
+    orchestration = importlib.util.module_from_spec(_SPEC)
+    _SPEC.loader.exec_module(orchestration)
+    llm_client = sys.modules["llm_client"]
+finally:
+    sys.path.remove(str(_ENGINE_DIR))
+    if not _HAD_LLM_CLIENT:
+        sys.modules.pop("llm_client", None)
+
+AGREED = "Reset the meter by holding the button for ten seconds until the display clears."
+OUTLIER = "Contact the utility billing department to request a replacement radio module."
+
+
+class FakeClient:
+    """Async Ollama client whose models answer after a fixed delay."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.finished = []
+
+    async def generate(self, model, prompt, options):
+        delay, answer = self.answers[model]
+        await asyncio.sleep(delay)
+        self.finished.append(model)
+        return {"response": answer}
+
+
+class SyncClient:
+    """Blocking client, as ``ollama.Client`` is."""
+
+    def generate(self, model, prompt, options):
+        time.sleep(0.2)
+        return {"response": AGREED}
+
+
+def _orchestrator(client):
+    return orchestration.EnhancedModelOrchestrator(client, available_models=["a", "b", "c"])
+
+
+def test_models_run_concurrently():
+    client = FakeClient({"a": (0.2, AGREED), "b": (0.2, OUTLIER), "c": (0.2, "Something else entirely.")})
+    start = time.monotonic()
+    result = asyncio.run(_orchestrator(client).execute_with_consensus("q", "factual", ["a", "b", "c"]))
+
+    assert time.monotonic() - start < 0.5
+    assert sorted(result.models_participated) == ["a", "b", "c"]
+    assert result.models_cancelled == []
+
+
+def test_sync_client_does_not_block_event_loop():
+    start = time.monotonic()
+    result = asyncio.run(_orchestrator(SyncClient()).execute_with_consensus("q", "factual", ["a", "b", "c"]))
+
+    assert time.monotonic() - start < 0.5
+    assert result.final_answer == AGREED
+
+
+def test_agreeing_majority_cancels_remaining_calls():
+    client = FakeClient({"a": (0.05, AGREED), "b": (0.1, AGREED.replace("ten", "10")), "c": (5.0, OUTLIER)})
+    start = time.monotonic()
+    result = asyncio.run(
+        _orchestrator(client).execute_with_consensus("q", "factual", ["a", "b", "c"], "majority_similarity")
+    )
+
+    assert time.monotonic() - start < 1.0
+    assert result.models_cancelled == ["c"]
+    assert "c" not in client.finished
+    assert result.final_answer in (AGREED, AGREED.replace("ten", "10"))
+    assert result.agreement_level == 1.0
+
+
+def test_deadline_cancels_slow_models():
+    client = FakeClient({"a": (0.05, AGREED), "b": (5.0, AGREED), "c": (5.0, AGREED)})
+    result = asyncio.run(_orchestrator(client).execute_with_consensus("q", "factual", ["a", "b", "c"], timeout=0.2))
+
+    assert sorted(result.models_cancelled) == ["b", "c"]
+    assert result.final_answer == AGREED
+
+
+def test_majority_similarity_prefers_agreeing_answers():
+    orchestrator = _orchestrator(FakeClient({}))
+    responses = {
+        "a": {"answer": OUTLIER, "confidence": 0.9},
+        "b": {"answer": AGREED, "confidence": 0.6},
+        "c": {"answer": AGREED + " Then power cycle it.", "confidence": 0.5},
+    }
+    result = asyncio.run(orchestrator._majority_similarity_consensus(responses))
+
+    assert result["final_answer"] == AGREED
+    assert result["agreement_level"] == pytest.approx(2 / 3)
+
+
+def test_embeddings_are_used_when_available():
+    similarity, threshold = orchestration.answer_similarity("x", "y", [1.0, 0.0], [1.0, 0.0])
+    assert similarity == pytest.approx(1.0)
+    assert threshold == orchestration.EMBEDDING_AGREEMENT_THRESHOLD
+
+    similarity, threshold = orchestration.answer_similarity(AGREED, OUTLIER)
+    assert similarity < orchestration.LEXICAL_AGREEMENT_THRESHOLD
+
+
+def test_sync_ollama_client_is_paired_with_an_async_client(monkeypatch):
+    class Client:
+        def __init__(self, host):
+            self._client = SimpleNamespace(base_url=host, timeout=30, headers={"X-Key": "k"})
+
+        def generate(self, **kwargs):
+            raise AssertionError("blocking client must not be used")
+
+    class AsyncClient:
+        def __init__(self, host, timeout, headers):
+            self.host, self.timeout, self.headers = host, timeout, headers
+            self.cancelled = []
+
+        async def generate(self, model, prompt, options):
+            try:
+                await asyncio.sleep(0.05 if model != "c" else 5)
+            except asyncio.CancelledError:
+                self.cancelled.append(model)
+                raise
+            return {"response": AGREED}
+
+    monkeypatch.setattr(llm_client, "ollama", SimpleNamespace(Client=Client, AsyncClient=AsyncClient))
+    orchestrator = orchestration.EnhancedModelOrchestrator(
+        Client("http://ollama-server-1:11434"), available_models=["a", "b", "c"]
+    )
+    paired = orchestrator._async_client
+    assert isinstance(paired, AsyncClient)
+    assert (paired.host, paired.timeout, paired.headers) == ("http://ollama-server-1:11434", 30, {"X-Key": "k"})
+
+    result = asyncio.run(orchestrator.execute_with_consensus("q", "factual", ["a", "b", "c"], "majority_similarity"))
+
+    # The superseded generation's request is cancelled, not left running in a thread
+    assert result.models_cancelled == ["c"]
+    assert paired.cancelled == ["c"]
+
+
+def test_other_clients_are_used_as_given():
+    client = SyncClient()
+    assert llm_client.async_client(client) is client
+    fake = FakeClient({})
+    assert llm_client.async_client(fake) is fake
@@ -0,0 +1,101 @@
+"""Unit tests for Ollama model residency tracking and warm-instance preference."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from reranker.load_balancer import OllamaLoadBalancer, RequestType
+from reranker.model_residency import ModelResidencyTracker, normalize_model_name, parse_keep_alive
+
+
+def _settings(**overrides):
+    values = dict(
+        resident_models="mistral:7b,llama3.2:3b",
+        chat_model="mistral:7b",
+        coding_model="mistral:7b",
+        reasoning_model="mistral:7b",
+        vision_model="mistral:7b",
+        embedding_model="llama3.2:3b",
+        model_min_warm_instances=2,
+        model_keep_alive="10m",
+        model_pinned_keep_alive="2h",
+        model_residency_refresh_seconds=30,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_parse_keep_alive_and_names():
+    assert parse_keep_alive("10m") == 600
+    assert parse_keep_alive("2h") == 7200
+    assert parse_keep_alive("45") == 45
+    assert parse_keep_alive("-1") is None
+    assert normalize_model_name("mistral") == "mistral:latest"
+    assert normalize_model_name("mistral:7b") == "mistral:7b"
+
+
+def test_apply_ps_tracks_loaded_models():
+    tracker = ModelResidencyTracker(["http://a:11434", "http://b:11434"], settings=_settings())
+    assert tracker.is_warm("http://a:11434", "mistral:7b") is None  # unknown until refreshed
+
+    tracker.apply_ps(
+        "http://a:11434",
+        {"models": [{"name": "mistral:7b", "expires_at": "2999-01-01T00:00:00.123456789Z"}]},
+    )
+    tracker.apply_ps("http://b:11434", {"models": []})
+
+    assert tracker.is_warm("http://a:11434", "mistral:7b") is True
+    assert tracker.is_warm("http://b:11434", "mistral:7b") is False
+    assert tracker.warm_instances("mistral:7b") == ["http://a:11434"]
+
+    tracker.mark_loaded("http://b:11434", "mistral:7b")
+    assert tracker.is_warm("http://b:11434", "mistral:7b") is True
+
+
+def test_plan_pins_keeps_warm_instances_and_spreads_the_rest():
+    tracker = ModelResidencyTracker(["http://a", "http://b", "http://c"], settings=_settings())
+    tracker.apply_ps("http://a", {"models": [{"name": "mistral:7b"}]})
+    tracker.apply_ps("http://b", {"models": []})
+    tracker.apply_ps("http://c", {"models": []})
+
+    plan = tracker.plan_pins()
+
+    assert plan["mistral:7b"] == ["http://a", "http://b"]
+    # The least-occupied instance is chosen first for the next model
+    assert plan["llama3.2:3b"] == ["http://c", "http://a"]
+
+
+def test_ensure_min_residency_preloads_with_pinned_keep_alive(monkeypatch):
+    tracker = ModelResidencyTracker(["http://a", "http://b"], settings=_settings(resident_models="mistral:7b"))
+    tracker.apply_ps("http://a", {"models": [{"name": "mistral:7b"}]})
+    tracker.apply_ps("http://b", {"models": []})
+    preloads = []
+
+    async def fake_preload(client, url, model, keep_alive):
+        preloads.append((url, model, keep_alive))
+        tracker.mark_loaded(url, model, keep_alive)
+        return True
+
+    monkeypatch.setattr(tracker, "_preload", fake_preload)
+
+    assert asyncio.run(tracker.ensure_min_residency()) == 1
+    assert preloads == [("http://b", "mistral:7b", "2h")]
+    assert tracker.keep_alive_for("http://b", "mistral:7b") == "2h"
+    assert tracker.keep_alive_for("http://b", "llama3.2:3b") == "10m"
+    assert asyncio.run(tracker.ensure_min_residency()) == 0
+
+
+def test_load_balancer_prefers_warm_instance():
+    tracker = ModelResidencyTracker(["http://a", "http://b"], settings=_settings())
+    tracker.apply_ps("http://a", {"models": []})
+    tracker.apply_ps("http://b", {"models": [{"name": "mistral:7b"}]})
+
+    lb = OllamaLoadBalancer(["http://a", "http://b"])
+    lb.residency = tracker
+    lb.metrics["http://a"].ewma_response_time = 100.0
+    lb.metrics["http://b"].ewma_response_time = 400.0
+
+    assert asyncio.run(lb.get_next_instance(RequestType.INFERENCE, "mistral:7b")) == "http://b"
+    # Without a model there is nothing to keep warm; the faster instance wins
+    assert asyncio.run(lb.get_next_instance(RequestType.INFERENCE)) == "http://a"
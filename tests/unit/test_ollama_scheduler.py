@@ -0,0 +1,133 @@
+"""Unit tests for the priority-aware Ollama request scheduler."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from reranker.ollama_scheduler import OllamaOverloaded, OllamaScheduler, Priority, current_priority, ollama_priority
+
+
+def _settings(**overrides):
+    values = dict(
+        scheduler_enabled=True,
+        scheduler_slots_per_instance=2,
+        scheduler_reserved_interactive_slots=1,
+        scheduler_max_queue_depth=8,
+        scheduler_max_bulk_queue_depth=2,
+        scheduler_interactive_max_wait_seconds=5,
+        scheduler_bulk_max_wait_seconds=5,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_priority_context_defaults_to_interactive():
+    assert current_priority() == Priority.INTERACTIVE
+    with ollama_priority(Priority.BATCH):
+        assert current_priority() == Priority.BATCH
+    assert current_priority() == Priority.INTERACTIVE
+
+
+def test_bulk_work_cannot_take_reserved_interactive_slot():
+    scheduler = OllamaScheduler(settings=_settings())
+
+    async def scenario():
+        order = []
+        release_batch = asyncio.Event()
+
+        async def batch_job(name):
+            async with scheduler.slot("http://a", Priority.BATCH):
+                order.append(name)
+                await release_batch.wait()
+
+        first = asyncio.create_task(batch_job("batch-1"))
+        second = asyncio.create_task(batch_job("batch-2"))
+        await asyncio.sleep(0.01)
+
+        # One slot is busy with batch-1, batch-2 waits; the reserved slot still admits chat
+        async with scheduler.slot("http://a", Priority.INTERACTIVE):
+            order.append("interactive")
+
+        release_batch.set()
+        await asyncio.gather(first, second)
+        return order
+
+    assert asyncio.run(scenario()) == ["batch-1", "interactive", "batch-2"]
+
+
+def test_waiters_are_served_by_priority():
+    scheduler = OllamaScheduler(
+        settings=_settings(scheduler_slots_per_instance=1, scheduler_reserved_interactive_slots=0)
+    )
+
+    async def scenario():
+        order = []
+        gate = asyncio.Event()
+
+        async def job(name, priority, hold=None):
+            async with scheduler.slot("http://a", priority):
+                order.append(name)
+                if hold is not None:
+                    await hold.wait()
+
+        holder = asyncio.create_task(job("holder", Priority.INTERACTIVE, gate))
+        await asyncio.sleep(0.01)
+        background = asyncio.create_task(job("background", Priority.BACKGROUND))
+        batch = asyncio.create_task(job("batch", Priority.BATCH))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(job("interactive", Priority.INTERACTIVE))
+        await asyncio.sleep(0.01)
+
+        gate.set()
+        await asyncio.gather(holder, background, batch, interactive)
+        return order
+
+    assert asyncio.run(scenario()) == ["holder", "interactive", "batch", "background"]
+
+
+def test_full_queue_is_rejected_with_429():
+    scheduler = OllamaScheduler(
+        settings=_settings(scheduler_slots_per_instance=1, scheduler_reserved_interactive_slots=0)
+    )
+    scheduler.queued[Priority.BATCH] = 2
+
+    with pytest.raises(OllamaOverloaded) as excinfo:
+        scheduler.check_admission(Priority.BATCH)
+
+    assert excinfo.value.status_code == 429
+    assert "Retry-After" in excinfo.value.headers
+    scheduler.check_admission(Priority.INTERACTIVE)
+
+
+def test_predicted_wait_beyond_deadline_is_shed_with_503():
+    scheduler = OllamaScheduler(
+        settings=_settings(scheduler_slots_per_instance=1, scheduler_reserved_interactive_slots=0)
+    )
+
+    async def scenario():
+        gate = asyncio.Event()
+        slots = scheduler._slots("http://a")
+        slots.avg_hold_seconds = 30.0  # each request holds the slot ~30s
+
+        async def holder():
+            async with scheduler.slot("http://a"):
+                await gate.wait()
+
+        task = asyncio.create_task(holder())
+        await asyncio.sleep(0.01)
+        try:
+            with pytest.raises(OllamaOverloaded) as excinfo:
+                async with scheduler.slot("http://a"):
+                    pass
+            return excinfo.value
+        finally:
+            gate.set()
+            await task
+
+    error = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.reason == "predicted_wait"
+    assert scheduler.queued[Priority.INTERACTIVE] == 0
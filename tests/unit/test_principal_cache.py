@@ -0,0 +1,107 @@
+"""Unit tests for the authenticated principal cache."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+from utils import principal_cache as principal_cache_module
+from utils.principal_cache import PrincipalCache, _apply_invalidation, token_key
+
+
+def test_token_key_prefers_jti():
+    assert token_key("a.b.c", {"jti": "abc123"}) == "abc123"
+    assert token_key("a.b.c", {}) == token_key("a.b.c")
+    assert token_key("a.b.c") != token_key("a.b.d")
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(principal_cache_module.time, "monotonic", lambda: now[0])
+    cache = PrincipalCache(ttl_seconds=30)
+    cache.set(1, "t", "rbac_user", "alice")
+
+    assert cache.get(1, "t", "rbac_user") == "alice"
+    now[0] += 31
+    assert cache.get(1, "t", "rbac_user") is None
+
+
+def test_kinds_and_tokens_are_separate():
+    cache = PrincipalCache()
+    cache.set(1, "t1", "rbac_user", "model")
+    assert cache.get(1, "t1", "user_response") is None
+    assert cache.get(1, "t2", "rbac_user") is None
+
+
+def test_invalidate_drops_every_entry_of_user():
+    cache = PrincipalCache()
+    cache.set(1, "t1", "rbac_user", "a")
+    cache.set(1, "t2", "user_response", "b")
+    cache.set(2, "t3", "rbac_user", "c")
+
+    assert cache.invalidate(1) == 2
+    assert cache.get(1, "t1", "rbac_user") is None
+    assert cache.get(2, "t3", "rbac_user") == "c"
+
+
+def test_lru_bound():
+    cache = PrincipalCache(max_entries=2)
+    cache.set(1, "t", "k", "a")
+    cache.set(2, "t", "k", "b")
+    cache.get(1, "t", "k")
+    cache.set(3, "t", "k", "c")
+
+    assert cache.get(2, "t", "k") is None
+    assert cache.get(1, "t", "k") == "a"
+
+
+def test_disabled_cache_never_hits():
+    cache = PrincipalCache(enabled=False)
+    cache.set(1, "t", "k", "a")
+    assert cache.get(1, "t", "k") is None
+
+
+def test_pubsub_messages_invalidate():
+    cache = PrincipalCache()
+    cache.set(1, "t", "k", "a")
+    cache.set(2, "t", "k", "b")
+
+    _apply_invalidation(cache, b"1")
+    assert cache.get(1, "t", "k") is None
+    assert cache.get(2, "t", "k") == "b"
+
+    _apply_invalidation(cache, "*")
+    assert cache.get(2, "t", "k") is None
+
+
+def test_get_or_load_loads_once():
+    cache = PrincipalCache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return "alice"
+
+    async def scenario():
+        first = await cache.get_or_load(1, "t", "k", loader)
+        second = await cache.get_or_load(1, "t", "k", loader)
+        return first, second
+
+    assert asyncio.run(scenario()) == ("alice", "alice")
+    assert calls == [1]
+
+
+def test_get_current_user_reuses_middleware_principal():
+    from utils.auth_system import get_current_user
+
+    class NoLookupAuth:
+        def decode_token(self, token):
+            raise AssertionError("token should not be decoded again")
+
+    user = SimpleNamespace(id=1, is_active=True)
+    request = SimpleNamespace(state=SimpleNamespace(principal=user, principal_token="tok"))
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="tok")
+
+    assert asyncio.run(get_current_user(request, credentials, NoLookupAuth())) is user
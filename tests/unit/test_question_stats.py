@@ -0,0 +1,112 @@
+"""Unit tests for the incremental question statistics rollups."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from reranker import question_stats
+from reranker.chat_persistence import QuestionUsageRecord
+from reranker.question_stats import apply_usage_rollups, build_usage_rollups
+
+T0 = datetime(2026, 10, 18, 9, 15, tzinfo=timezone.utc)
+
+
+def _usage(question_hash="h1", user_id=1, created_at=T0, response_time_ms=100, quality_score=0.5, category="setup"):
+    return QuestionUsageRecord(
+        question_hash=question_hash,
+        category=category,
+        question_text="How do I configure the meter?",
+        user_id=user_id,
+        conversation_id=1,
+        response_time_ms=response_time_ms,
+        quality_score=quality_score,
+        search_method="hybrid",
+        citations_count=2,
+        context_length=3,
+        created_at=created_at,
+    )
+
+
+class FakeConnection:
+    """Records executed statements; reports the listed (pattern, user) pairs as already known."""
+
+    def __init__(self, known_users=()):
+        self.known_users = set(known_users)
+        self.executed = []
+
+    async def fetch(self, sql, pattern_ids, user_ids):
+        new = [(p, u) for p, u in zip(pattern_ids, user_ids) if (p, u) not in self.known_users]
+        self.known_users.update(new)
+        return [{"question_pattern_id": p} for p, _ in new]
+
+    async def execute(self, sql, *args):
+        self.executed.append((sql, args))
+
+
+def test_build_usage_rollups_buckets_by_utc_hour_and_day():
+    local = timezone(timedelta(hours=-5))
+    usages = [
+        _usage(created_at=T0),
+        _usage(created_at=T0 + timedelta(minutes=30), response_time_ms=None, quality_score=None),
+        _usage(created_at=datetime(2026, 10, 18, 21, 5, tzinfo=local), category=None),
+    ]
+
+    rollups = build_usage_rollups(usages, {"h1": 7})
+
+    hour = T0.replace(minute=0)
+    assert rollups.hourly[(hour, "setup")].usage_count == 2
+    assert rollups.hourly[(hour, "setup")].response_time_count == 1
+    # 21:05 at UTC-5 is 02:05 UTC on the next day
+    assert (datetime(2026, 10, 19, 2, tzinfo=timezone.utc), "") in rollups.hourly
+    assert set(rollups.daily) == {
+        (datetime(2026, 10, 18, tzinfo=timezone.utc), "setup"),
+        (datetime(2026, 10, 19, tzinfo=timezone.utc), ""),
+    }
+
+    pattern = rollups.patterns[7]
+    assert pattern.usage_count == 3
+    assert pattern.quality_sum == 1.0 and pattern.quality_count == 2
+    assert pattern.first_used == T0
+    assert pattern.last_used == datetime(2026, 10, 18, 21, 5, tzinfo=local)
+
+
+def test_build_usage_rollups_skips_unknown_patterns():
+    rollups = build_usage_rollups([_usage(question_hash="missing")], {"h1": 7})
+    assert rollups.hourly == {} and rollups.daily == {} and rollups.patterns == {}
+
+
+def test_apply_usage_rollups_counts_only_new_users():
+    conn = FakeConnection(known_users={(7, 1)})
+    usages = [_usage(user_id=1), _usage(user_id=2), _usage(user_id=2), _usage(question_hash="h2", user_id=1)]
+
+    asyncio.run(apply_usage_rollups(conn, usages, {"h1": 7, "h2": 8}))
+
+    tables = [sql.split()[2] for sql, _ in conn.executed]
+    assert tables == ["question_usage_hourly", "question_usage_daily", "question_pattern_stats"]
+    _, pattern_args = conn.executed[2]
+    ids, usage_counts, unique_users = pattern_args[0], pattern_args[1], pattern_args[6]
+    assert dict(zip(ids, usage_counts)) == {7: 3, 8: 1}
+    assert dict(zip(ids, unique_users)) == {7: 1, 8: 1}
+
+    hourly_args = conn.executed[0][1]
+    assert hourly_args[1] == ["setup"] and hourly_args[2] == [4]
+
+
+def test_partition_maintenance_only_drops_with_retention(monkeypatch):
+    calls = []
+
+    async def fetchval(sql, *args):
+        calls.append((sql.split("(")[0].split()[-1], args))
+        return 1
+
+    monkeypatch.setattr(question_stats, "fetchval", fetchval)
+
+    result = asyncio.run(question_stats.run_partition_maintenance(SimpleNamespace(question_usage_retention_months=0)))
+    assert calls == [("ensure_question_usage_partitions", (question_stats.PARTITIONS_AHEAD_MONTHS,))]
+    assert result == {"created": 1, "dropped": 0}
+
+    calls.clear()
+    asyncio.run(question_stats.run_partition_maintenance(SimpleNamespace(question_usage_retention_months=12)))
+    assert calls[1] == ("drop_question_usage_partitions", (12,))
@@ -0,0 +1,96 @@
+"""Unit tests for the shared GCRA rate limiter."""
+
+from __future__ import annotations
+
+import asyncio
+
+from utils import rate_limiter as rate_limiter_module
+from utils.rate_limiter import GcraRateLimiter, LocalGcraStore, gcra
+
+SECOND = 1_000_000
+
+
+def test_gcra_allows_burst_then_one_per_interval():
+    tat, now = None, 0
+    results = []
+    for _ in range(4):
+        allowed, tat, remaining, retry_after, _ = gcra(tat, now, limit=3, period=60 * SECOND)
+        results.append((allowed, remaining))
+    assert results == [(True, 2), (True, 1), (True, 0), (False, 0)]
+
+    # Denied with the exact wait for the next slot (60s / 3)
+    assert gcra(tat, now, 3, 60 * SECOND)[3] == 20 * SECOND
+    allowed, _, remaining, _, _ = gcra(tat, 20 * SECOND, 3, 60 * SECOND)
+    assert allowed and remaining == 0
+
+
+def test_gcra_peek_does_not_consume():
+    _, tat, _, _, _ = gcra(None, 0, 2, 60 * SECOND)
+    allowed, peek_tat, remaining, _, reset_after = gcra(tat, 0, 2, 60 * SECOND, cost=0)
+    assert allowed and peek_tat == tat
+    assert remaining == 1
+    assert reset_after == 30 * SECOND
+
+
+def test_local_store_memory_is_bounded():
+    store = LocalGcraStore(max_keys=2)
+    for i in range(5):
+        store.update(f"ip{i}", limit=10, period=60 * SECOND, cost=1, now=0)
+    assert list(store.entries) == ["ip3", "ip4"]
+
+    # Entries whose TAT has passed are dropped instead of kept around
+    store.update("ip4", limit=10, period=60 * SECOND, cost=0, now=120 * SECOND)
+    assert "ip4" not in store.entries
+
+
+def test_limiter_falls_back_when_redis_fails(monkeypatch):
+    class BrokenRedis:
+        def register_script(self, script):
+            def run(keys, args, client=None):
+                raise ConnectionError("redis down")
+
+            return run
+
+    limiter = GcraRateLimiter(prefix="test", max_local_keys=10)
+    results = [limiter.check("user", limit=2, period=60, client=BrokenRedis()) for _ in range(3)]
+    assert [r.allowed for r in results] == [True, True, False]
+    assert results[-1].as_dict()["retry_after"] == 30
+    assert results[-1].current == 2
+
+
+def test_limiter_uses_redis_script_results(monkeypatch):
+    calls = []
+
+    class ScriptRedis:
+        def register_script(self, script):
+            assert "TIME" in script
+
+            async def run(keys, args, client=None):
+                calls.append((keys, args))
+                return [0, 0, 5 * SECOND, 60 * SECOND]
+
+            return run
+
+    marked = []
+    monkeypatch.setattr(rate_limiter_module, "mark_async_redis_unavailable", marked.append)
+    limiter = GcraRateLimiter(prefix="rl", max_local_keys=10)
+    result = asyncio.run(limiter.acheck("user", limit=10, period=60, client=ScriptRedis()))
+
+    assert calls == [(["rl:user"], [60 * SECOND, 10, 1])]
+    assert not result.allowed and result.retry_after == 5
+    assert result.as_dict()["remaining"] == 0
+    assert marked == []
+
+
+def test_rbac_endpoint_limiters_do_not_share_state(monkeypatch):
+    from utils import rbac_middleware
+    from utils.rbac_middleware import RateLimiter
+
+    monkeypatch.setattr(rbac_middleware, "get_redis_client", lambda: None)
+    login = RateLimiter(max_requests=1, window_seconds=300, name="login")
+    register = RateLimiter(max_requests=1, window_seconds=3600, name="register")
+
+    assert login.is_allowed("10.0.0.1")
+    assert not login.is_allowed("10.0.0.1")
+    assert register.is_allowed("10.0.0.1")
+    assert register.get_remaining_requests("10.0.0.1") == 0
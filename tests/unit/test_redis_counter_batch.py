@@ -0,0 +1,85 @@
+"""Unit tests for pipelined Redis counters and the rate limiter fallback."""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+
+import utils.redis_cache as redis_cache
+from utils.rate_limiter import GcraRateLimiter
+from utils.redis_cache import CounterBatch
+
+
+class _FakePipeline:
+    def __init__(self, log):
+        self.log = log
+        self.commands = []
+
+    def incrby(self, key, amount):
+        self.commands.append(("incrby", key, amount))
+
+    def expire(self, key, ttl):
+        self.commands.append(("expire", key, ttl))
+
+    def hincrby(self, key, field, amount):
+        self.commands.append(("hincrby", key, field, amount))
+
+    async def execute(self):
+        self.log.append(list(self.commands))
+        return [1] * len(self.commands)
+
+
+class _FakeAsyncRedis:
+    def __init__(self):
+        self.executed = []
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self.executed)
+
+
+def test_counter_batch_flushes_in_one_round_trip(monkeypatch):
+    client = _FakeAsyncRedis()
+    monkeypatch.setattr(redis_cache, "get_async_redis_client", lambda url=None: client)
+
+    counters = CounterBatch()
+    counters.model_usage("mistral:7b")
+    counters.model_usage("mistral:7b")
+    counters.question_type("technical")
+    counters.instance_usage("http://ollama-server-1:11434")
+    counters.incr("rag:hits:abc", ttl=60)
+
+    assert asyncio.run(counters.flush())
+    assert len(client.executed) == 1
+    commands = client.executed[0]
+    assert ("hincrby", "tsa:chat:model_usage", "mistral:7b", 2) in commands
+    assert ("hincrby", "tsa:chat:instance_usage", "ollama-server-1:11434", 1) in commands
+    assert ("expire", "rag:hits:abc", 60) in commands
+    assert len(counters) == 0
+
+
+def test_counter_batch_without_redis_is_noop(monkeypatch):
+    monkeypatch.setattr(redis_cache, "get_async_redis_client", lambda url=None: None)
+    counters = CounterBatch()
+    counters.model_usage("llama3.2:3b")
+    assert asyncio.run(counters.flush()) is False
+
+
+def test_rate_limiter_peek_does_not_consume(monkeypatch):
+    # import_module resolves through sys.modules; ``from reranker import jwt_auth`` can return a
+    # stale copy left on the package by suites that import it under stubbed modules
+    jwt_auth = importlib.import_module("reranker.jwt_auth")
+
+    monkeypatch.setattr(jwt_auth, "get_redis_client", lambda: None)
+    monkeypatch.setattr(jwt_auth, "get_async_redis_client", lambda url=None: None)
+    # A fresh limiter, so earlier tests' buckets cannot leak in
+    monkeypatch.setattr(jwt_auth, "_rate_limiter", GcraRateLimiter(prefix="rate_limit:test", max_local_keys=16))
+
+    allowed, status = asyncio.run(jwt_auth.RateLimiter.acheck_rate_limit("peek-user", "viewer", limit=2))
+    assert allowed and status["remaining"] == 1
+
+    _, peek = jwt_auth.RateLimiter.check_rate_limit("peek-user", "viewer", limit=2, consume=False)
+    assert peek["current"] == 1
+
+    jwt_auth.RateLimiter.check_rate_limit("peek-user", "viewer", limit=2)
+    allowed, status = jwt_auth.RateLimiter.check_rate_limit("peek-user", "viewer", limit=2)
+    assert not allowed and status["remaining"] == 0
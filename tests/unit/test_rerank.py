@@ -2,11 +2,17 @@
 
 from __future__ import annotations
 
+import asyncio
+
 import pytest
 
+from reranker import rethink_reranker
 from reranker.rethink_reranker import (
     _normalize_text,
+    persist_in_background,
     rerank_subresponses,
+    rethink_in_memory,
+    score_relevance_batch,
     score_subresponse_relevance,
     synthesize_reranked_response,
 )
@@ -51,5 +57,54 @@ def test_synthesize_reranked_response_basic():
     assert synthesized["synthesized_text"] in {"A", "A\n\nB"}
 
 
+def test_score_relevance_batch_matches_single_scores():
+    q = "How do I reset the FlexNet base station?"
+    texts = ["Reset the FlexNet base station from the RNI console.", "", "Unrelated text about cooking."]
+    batch = score_relevance_batch(q, texts)
+    assert batch == [score_subresponse_relevance(q, t) for t in texts]
+    assert batch[0] > batch[2] >= 0.0
+    assert batch[1] == 0.0
+
+
+def test_score_relevance_batch_identical_text_scores_one():
+    assert score_relevance_batch("FlexNet mesh", ["flexnet mesh"]) == [1.0]
+
+
+def test_rethink_in_memory_does_no_io(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("rethink_in_memory must not touch Redis")
+
+    monkeypatch.setattr(rethink_reranker, "get_sub_request_result", fail)
+    monkeypatch.setattr(rethink_reranker, "get_decomposed_response", fail)
+    monkeypatch.setattr(rethink_reranker, "cache_decomposed_response", fail)
+
+    subs = [{"id": "a", "response": "FlexNet is a mesh network.", "confidence": 1.0}]
+    final = rethink_in_memory("What is FlexNet?", {"original_query": "What is FlexNet?"}, subs)
+    assert final["synthesized"]["synthesized_text"] == "FlexNet is a mesh network."
+    assert final["reranked_components"][0]["cached"] is False
+    assert 0.0 < final["final_relevance"] <= 1.0
+
+
+def test_persist_in_background_does_not_block(monkeypatch):
+    writes = []
+
+    def slow_write(query_hash, user_id, result):
+        import time
+
+        time.sleep(0.05)
+        writes.append((query_hash, user_id))
+
+    monkeypatch.setattr(rethink_reranker, "cache_decomposed_response", slow_write)
+
+    async def scenario():
+        persist_in_background("h", 7, {"synthesized": {}})
+        assert writes == []  # returned before the write ran
+        await asyncio.gather(*rethink_reranker._background_writes)
+
+    asyncio.run(scenario())
+    assert writes == [("h", 7)]
+    assert not rethink_reranker._background_writes
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,139 @@
+"""Unit tests for the concurrent SearXNG fan-out and in-process web cache tier."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import reranker.cache as web_cache
+from reranker.rag_chat import RAGChatService
+
+
+def _service():
+    service = RAGChatService.__new__(RAGChatService)
+    service.settings = SimpleNamespace(web_search_deadline_ms=500, searxng_base_url="http://searxng:8080/")
+    service._background_tasks = set()
+    return service
+
+
+def _result(title, score):
+    return {"title": title, "url": f"https://example.com/{title}", "content": title, "score": score}
+
+
+def test_web_search_runs_providers_concurrently_and_cuts_off(monkeypatch):
+    service = _service()
+    stored = []
+    cancelled = []
+
+    async def no_cache(query):
+        return None
+
+    async def store(query, results):
+        stored.append(results)
+
+    async def sensus(query, client=None):
+        await asyncio.sleep(0.05)
+        return [_result("sensus-a", 0.8), _result("sensus-b", 0.8), _result("sensus-c", 0.8)]
+
+    async def broad(query, max_results=3, client=None):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return [_result("broad", 0.7)]
+
+    monkeypatch.setattr(web_cache, "aget_cached_web_results", no_cache)
+    monkeypatch.setattr(web_cache, "astore_web_results", store)
+    monkeypatch.setattr(service, "_search_sensus_training", sensus)
+    monkeypatch.setattr(service, "_search_broad_web", broad)
+
+    async def run():
+        started = time.monotonic()
+        results = await service._web_search("meter reset", max_results=3)
+        await asyncio.sleep(0)
+        return results, time.monotonic() - started
+
+    results, elapsed = asyncio.run(run())
+    assert [r["title"] for r in results] == ["sensus-a", "sensus-b", "sensus-c"]
+    assert elapsed < 1.0
+    assert cancelled == [True]
+    assert stored and len(stored[0]) == 3
+
+
+def test_web_search_respects_shared_deadline_and_priority(monkeypatch):
+    service = _service()
+
+    async def no_cache(query):
+        return None
+
+    async def store(query, results):
+        return None
+
+    async def sensus(query, client=None):
+        await asyncio.sleep(0.02)
+        return [_result("sensus", 0.8)]
+
+    async def broad(query, max_results=3, client=None):
+        await asyncio.sleep(0.01)
+        return [_result("broad", 0.7)]
+
+    async def slow(query, max_results=3, client=None):
+        await asyncio.sleep(5)
+        return []
+
+    monkeypatch.setattr(web_cache, "aget_cached_web_results", no_cache)
+    monkeypatch.setattr(web_cache, "astore_web_results", store)
+    monkeypatch.setattr(service, "_search_sensus_training", sensus)
+    monkeypatch.setattr(service, "_search_broad_web", broad)
+
+    results = asyncio.run(service._web_search("flexnet", max_results=3))
+    assert [r["title"] for r in results] == ["sensus", "broad"]
+
+    monkeypatch.setattr(service, "_search_broad_web", slow)
+    started = time.monotonic()
+    results = asyncio.run(service._web_search("flexnet", max_results=3))
+    assert [r["title"] for r in results] == ["sensus"]
+    assert time.monotonic() - started < 1.5
+
+
+def test_web_search_waits_for_sensus_when_broad_fills_first(monkeypatch):
+    service = _service()
+
+    async def no_cache(query):
+        return None
+
+    async def store(query, results):
+        return None
+
+    async def sensus(query, client=None):
+        await asyncio.sleep(0.05)
+        return [_result("sensus", 0.8)]
+
+    async def broad(query, max_results=3, client=None):
+        return [_result(f"broad-{i}", 0.7) for i in range(3)]
+
+    monkeypatch.setattr(web_cache, "aget_cached_web_results", no_cache)
+    monkeypatch.setattr(web_cache, "astore_web_results", store)
+    monkeypatch.setattr(service, "_search_sensus_training", sensus)
+    monkeypatch.setattr(service, "_search_broad_web", broad)
+
+    results = asyncio.run(service._web_search("flexnet", max_results=3))
+    assert [r["title"] for r in results] == ["sensus", "broad-0", "broad-1"]
+
+
+def test_memory_tier_serves_recent_results(monkeypatch):
+    monkeypatch.setattr(web_cache.settings, "web_cache_enabled", True, raising=False)
+    monkeypatch.setattr(web_cache.settings, "web_cache_memory_ttl_seconds", 60, raising=False)
+    monkeypatch.setattr(web_cache.settings, "web_cache_memory_max_entries", 2, raising=False)
+    web_cache._memory_tier.clear()
+
+    qh = web_cache._hash_query(web_cache._normalize_query("  What is RNI "))
+    web_cache._memory_put(qh, [web_cache.CachedWebResult(**_result("rni", 0.8))])
+    cached = asyncio.run(web_cache.aget_cached_web_results("what is rni"))
+    assert cached and cached[0].title == "rni"
+
+    web_cache._memory_put("b", [])
+    web_cache._memory_put("c", [])
+    assert qh not in web_cache._memory_tier
@@ -0,0 +1,325 @@
+"""Batched background writer for audit and security events.
+
+``RBACMiddleware.log_request`` used to insert one ``audit_logs`` row per
+protected request on a freshly opened psycopg2 connection before the response
+was returned. Events are now appended to a bounded in-memory queue and a
+daemon thread writes them with multi-row ``INSERT ... VALUES`` statements
+(``psycopg2.extras.execute_values``) over one long-lived connection, whenever
+``audit_log_batch_size`` events are waiting or every ``audit_log_flush_ms``.
+
+- Overflow: when the queue holds ``audit_log_queue_max`` events, the
+  ``audit_log_overflow_policy`` decides whether the oldest queued event
+  (``drop_oldest``, default) or the incoming one (``drop_newest``) is dropped.
+  Drops are counted in ``audit_log_events_dropped_total``.
+- Rows the database rejects (e.g. a user deleted meanwhile) are isolated by
+  bisecting the batch; connection failures keep the batch queued and retry.
+- ``close()`` (also registered with ``atexit``) flushes what is left.
+"""
+
+from __future__ import annotations
+
+import atexit
+import ipaddress
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from config import get_settings
+from reranker.metrics_registry import PROMETHEUS_AVAILABLE, get_or_create_metric
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest")
+# Back-off after a failed connection before the writer retries
+RETRY_DELAY_SECONDS = 2.0
+
+if PROMETHEUS_AVAILABLE:
+    from prometheus_client import Counter, Gauge
+
+    AUDIT_EVENTS_WRITTEN = get_or_create_metric(
+        Counter, "audit_log_events_written_total", "Audit/security events written to Postgres", ["table"]
+    )
+    AUDIT_EVENTS_DROPPED = get_or_create_metric(
+        Counter, "audit_log_events_dropped_total", "Audit/security events dropped", ["table", "reason"]
+    )
+    AUDIT_QUEUE_DEPTH = get_or_create_metric(
+        Gauge, "audit_log_queue_depth", "Audit/security events waiting to be written"
+    )
+
+AUDIT_COLUMNS = (
+    "user_id",
+    "action",
+    "resource_type",
+    "resource_id",
+    "ip_address",
+    "user_agent",
+    "details",
+    "success",
+    "error_message",
+    "created_at",
+)
+SECURITY_COLUMNS = ("event_type", "severity", "user_id", "ip_address", "details", "created_at")
+
+
+def _inet(value: Optional[str]) -> Optional[str]:
+    """Client address for an INET column; anything unparsable (e.g. "unknown") becomes NULL."""
+    if not value:
+        return None
+    try:
+        return str(ipaddress.ip_address(value.strip()))
+    except ValueError:
+        return None
+
+
+@dataclass
+class AuditEvent:
+    """One queued row for ``audit_logs`` or ``security_events``."""
+
+    table: str
+    row: Tuple[Any, ...]
+
+
+def audit_event(
+    action: str,
+    resource_type: str,
+    user_id: Optional[int] = None,
+    resource_id: Optional[str] = None,
+    ip_address: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    details: Optional[Dict[str, Any]] = None,
+    success: bool = True,
+    error_message: Optional[str] = None,
+) -> AuditEvent:
+    return AuditEvent(
+        "audit_logs",
+        (
+            user_id,
+            action,
+            resource_type,
+            resource_id,
+            _inet(ip_address),
+            user_agent,
+            json.dumps(details) if details else None,
+            success,
+            error_message,
+            datetime.utcnow(),
+        ),
+    )
+
+
+def security_event(
+    event_type: str,
+    severity: str,
+    user_id: Optional[int] = None,
+    ip_address: Optional[str] = None,
+    details: Optional[Dict[str, Any]] = None,
+) -> AuditEvent:
+    return AuditEvent(
+        "security_events",
+        (event_type, severity, user_id, _inet(ip_address), json.dumps(details) if details else None, datetime.utcnow()),
+    )
+
+
+class AuditLogWriter:
+    """Bounded queue of audit/security events drained by a background thread."""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+        overflow_policy: str = "drop_oldest",
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            logger.warning(f"Unknown audit overflow policy {overflow_policy!r}; using drop_oldest")
+            overflow_policy = "drop_oldest"
+        self.connect = connect
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.01, flush_interval)
+        self.max_queue = max(self.batch_size, max_queue)
+        self.overflow_policy = overflow_policy
+        self._queue: Deque[AuditEvent] = deque()
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._conn = None
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+        self.stats: Dict[str, int] = {"queued": 0, "written": 0, "dropped": 0, "rejected": 0}
+
+    def _drop(self, event: AuditEvent, reason: str) -> None:
+        self.stats["dropped" if reason == "overflow" else "rejected"] += 1
+        if PROMETHEUS_AVAILABLE and AUDIT_EVENTS_DROPPED is not None:
+            AUDIT_EVENTS_DROPPED.labels(table=event.table, reason=reason).inc()
+
+    def submit(self, event: AuditEvent) -> bool:
+        """Queue an event without blocking; returns False if it was dropped."""
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                if self.overflow_policy == "drop_newest":
+                    self._drop(event, "overflow")
+                    return False
+                self._drop(self._queue.popleft(), "overflow")
+            self._queue.append(event)
+            self.stats["queued"] += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+        self._update_gauge()
+        self._ensure_started()
+        return True
+
+    def _update_gauge(self) -> None:
+        if PROMETHEUS_AVAILABLE and AUDIT_QUEUE_DEPTH is not None:
+            AUDIT_QUEUE_DEPTH.set(len(self._queue))
+
+    def _ensure_started(self) -> None:
+        if self._thread is None and not self._closing:
+            with self._cond:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._closing and len(self._queue) < self.batch_size:
+                    self._cond.wait(timeout=self.flush_interval)
+                closing = self._closing
+            if not self.flush():
+                time.sleep(RETRY_DELAY_SECONDS)
+            if closing:
+                return
+
+    def _connection(self):
+        if self._conn is None or getattr(self._conn, "closed", False):
+            self._conn = self.connect()
+        return self._conn
+
+    def _insert(self, table: str, rows: List[Tuple[Any, ...]]) -> None:
+        columns = AUDIT_COLUMNS if table == "audit_logs" else SECURITY_COLUMNS
+        conn = self._connection()
+        try:
+            with conn.cursor() as cursor:
+                execute_values(
+                    cursor, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s", rows, page_size=len(rows)
+                )
+            conn.commit()
+        except (psycopg2.IntegrityError, psycopg2.DataError):
+            conn.rollback()
+            raise
+        except Exception:
+            # Connection is suspect; reopen on the next attempt
+            try:
+                conn.close()
+            finally:
+                self._conn = None
+            raise
+
+    def _write(self, table: str, events: List[AuditEvent], done: List[AuditEvent]) -> None:
+        """Insert events of one table; bisect to isolate rows the database rejects.
+
+        Events that are committed (or dropped as rejected) are appended to ``done``,
+        so when a later insert fails only the remaining events are retried.
+        """
+        try:
+            self._insert(table, [event.row for event in events])
+        except (psycopg2.IntegrityError, psycopg2.DataError) as exc:
+            if len(events) == 1:
+                self._drop(events[0], "rejected")
+                done.append(events[0])
+                logger.error(f"Dropped {table} event rejected by the database: {exc}")
+                return
+            middle = len(events) // 2
+            self._write(table, events[:middle], done)
+            self._write(table, events[middle:], done)
+            return
+        done.extend(events)
+        self.stats["written"] += len(events)
+        if PROMETHEUS_AVAILABLE and AUDIT_EVENTS_WRITTEN is not None:
+            AUDIT_EVENTS_WRITTEN.labels(table=table).inc(len(events))
+
+    def flush(self) -> bool:
+        """Write everything queued so far; returns False if the database was unavailable."""
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                if not batch:
+                    return True
+                by_table: Dict[str, List[AuditEvent]] = {}
+                for event in batch:
+                    by_table.setdefault(event.table, []).append(event)
+                done: List[AuditEvent] = []
+                try:
+                    for table, events in by_table.items():
+                        self._write(table, events, done)
+                except Exception as exc:
+                    # Keep the events not yet committed (oldest first) for the next attempt, within the bound
+                    handled = {id(event) for event in done}
+                    pending = [event for event in batch if id(event) not in handled]
+                    with self._cond:
+                        self._queue.extendleft(reversed(pending))
+                        while len(self._queue) > self.max_queue:
+                            self._drop(self._queue.pop(), "overflow")
+                    logger.warning(f"Audit log flush failed ({len(pending)} events kept): {exc}")
+                    return False
+                finally:
+                    self._update_gauge()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the writer thread after a final flush."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        else:
+            self.flush()
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def get_status(self) -> Dict[str, Any]:
+        return {"queue_depth": len(self._queue), "overflow_policy": self.overflow_policy, **self.stats}
+
+
+# One writer per database (RBACManager instances are created per request)
+_writers: Dict[str, AuditLogWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_audit_writer(db_connection_string: str) -> AuditLogWriter:
+    """Get or create the shared audit writer for a database."""
+    writer = _writers.get(db_connection_string)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(db_connection_string)
+            if writer is None:
+                settings = get_settings()
+                writer = AuditLogWriter(
+                    connect=lambda: psycopg2.connect(db_connection_string),
+                    batch_size=settings.audit_log_batch_size,
+                    flush_interval=settings.audit_log_flush_ms / 1000.0,
+                    max_queue=settings.audit_log_queue_max,
+                    overflow_policy=settings.audit_log_overflow_policy,
+                )
+                _writers[db_connection_string] = writer
+    return writer
+
+
+@atexit.register
+def close_audit_writers() -> None:
+    """Flush and stop every audit writer (graceful shutdown)."""
+    for writer in list(_writers.values()):
+        writer.close()
@@ -35,13 +35,14 @@ from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
 import bcrypt
 import jwt
 import psycopg2
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from psycopg2.extras import Json, RealDictCursor
 
 from config import get_settings
 from utils.exceptions import AccountLockedError, AuthenticationError, RateLimitError, ValidationError
 from utils.logging_config import setup_logging
+from utils.principal_cache import get_principal_cache, invalidate_principal, token_key
 from utils.rbac_models import (
     CreateUserRequest,
     LoginRequest,
@@ -96,6 +97,9 @@ class AuthManager:
         self.rate_limit_window = timedelta(minutes=5)
         self.max_attempts_per_window = 10
 
+        # Short-TTL cache of users resolved from bearer tokens
+        self.principal_cache = get_principal_cache()
+
     def _open_connection(self):
         """Create a new psycopg2 connection."""
         override = self.__dict__.get("get_db_connection")
@@ -179,6 +183,16 @@ class AuthManager:
             # Catch all PyJWT validation issues (signature, decode errors)
             raise AuthenticationError(f"Invalid token: {str(e)}")
 
+    async def resolve_principal(self, token: str) -> Optional[User]:
+        """Decode a bearer token and return its user, served from the principal cache when fresh."""
+        payload = self.decode_token(token)
+        user_id = payload.get("user_id")
+        if not user_id:
+            raise AuthenticationError("Invalid token payload")
+        return await self.principal_cache.get_or_load(
+            user_id, token_key(token, payload), "rbac_user", lambda: self.get_user_by_id(user_id)
+        )
+
     # Health Check
     async def health_check(self) -> Dict[str, Any]:
         """Perform a lightweight health check of auth subsystem.
@@ -637,6 +651,7 @@ class AuthManager:
     async def increment_login_attempts(self, user_id: int):
         """Increment failed login attempts and lock if necessary."""
         await self._run_in_thread(self._increment_login_attempts_sync, user_id)
+        await invalidate_principal(user_id)
 
     def _increment_login_attempts_sync(self, user_id: int):
         conn = self._open_connection()
@@ -667,6 +682,7 @@ class AuthManager:
     async def reset_login_attempts(self, user_id: int):
         """Reset login attempts on successful login."""
         await self._run_in_thread(self._reset_login_attempts_sync, user_id)
+        await invalidate_principal(user_id)
 
     def _reset_login_attempts_sync(self, user_id: int):
         conn = self._open_connection()
@@ -709,6 +725,7 @@ class AuthManager:
     async def set_password_change_required(self, user_id: int, required: bool):
         """Toggle password change requirement flag."""
         await self._run_in_thread(self._set_password_change_required_sync, user_id, required)
+        await invalidate_principal(user_id)
 
     def _set_password_change_required_sync(self, user_id: int, required: bool):
         conn = self._open_connection()
@@ -753,6 +770,7 @@ class AuthManager:
             new_hash,
             False,
         )
+        await invalidate_principal(user_id)
 
         await self.log_audit_event(
             user_id=user_id,
@@ -800,6 +818,7 @@ class AuthManager:
         except Exception as e:
             logger.error(f"Force password change failed: {str(e)}")
             return False
+        await invalidate_principal(user_id)
 
         await self.log_audit_event(
             user_id=user_id,
@@ -832,6 +851,7 @@ class AuthManager:
         except Exception as e:
             logger.error(f"Admin reset password failed: {e}")
             return False
+        await invalidate_principal(user_id)
 
         await self.log_audit_event(
             user_id=user_id,
@@ -1016,6 +1036,7 @@ class AuthManager:
 
         if not user_id:
             return False
+        await invalidate_principal(user_id)
 
         await self.log_audit_event(
             user_id=user_id,
@@ -1493,19 +1514,30 @@ async def get_auth_manager() -> AuthManager:
 
 
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security), auth_manager: AuthManager = Depends(get_auth_manager)
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    auth_manager: AuthManager = Depends(get_auth_manager),
 ) -> User:
-    """Get current authenticated user from JWT token."""
+    """Get current authenticated user from JWT token.
+
+    Reuses the principal ``RBACMiddleware`` already resolved for this request,
+    otherwise goes through the auth manager's principal cache.
+    """
     try:
-        # Decode token
-        payload = auth_manager.decode_token(credentials.credentials)
-        user_id = payload.get("user_id")
+        token = credentials.credentials
+        if getattr(request.state, "principal_token", None) == token:
+            user = request.state.principal
+        elif callable(getattr(auth_manager, "resolve_principal", None)):
+            user = await auth_manager.resolve_principal(token)
+        else:
+            payload = auth_manager.decode_token(token)
+            user_id = payload.get("user_id")
 
-        if not user_id:
-            raise AuthenticationError("Invalid token payload")
+            if not user_id:
+                raise AuthenticationError("Invalid token payload")
 
-        # Get user from database
-        user = await auth_manager.get_user_by_id(user_id)
+            # Get user from database
+            user = await auth_manager.get_user_by_id(user_id)
         if not user:
             raise AuthenticationError("User not found")
 
@@ -0,0 +1,191 @@
+"""Short-TTL cache of authenticated principals for bearer-token requests.
+
+Every authenticated call used to load its user row from Postgres, and requests
+passing through ``RBACMiddleware`` did it twice (the middleware's
+password-change check and the handler's auth dependency). Resolved principals
+are now cached per ``(user id, token id, kind)`` for a few seconds:
+
+- the token id is the JWT ``jti`` claim, or a hash of the token when absent, so
+  a new login never reuses an older token's entry;
+- ``kind`` separates the different principal shapes callers build (the RBAC
+  ``User`` model vs. the chat API's ``UserResponse``);
+- ``invalidate_principal(user_id)`` drops a user's entries locally and publishes
+  the id on a Redis channel so every worker drops them too. The admin
+  update/delete endpoints and the lock, unlock and password paths of
+  ``AuthManager`` call it, so the TTL only bounds staleness for changes made
+  outside the application.
+
+Workers subscribe with ``listen_for_invalidations`` (started from the FastAPI
+lifespan). Without Redis the cache still works per process.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from config import get_settings
+from utils.redis_cache import get_async_redis_client, mark_async_redis_unavailable
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "tsa:auth:principal-invalidate"
+# Wildcard published to drop every cached principal (e.g. after a bulk role change)
+INVALIDATE_ALL = "*"
+LISTENER_RETRY_SECONDS = 5.0
+
+CacheKey = Tuple[int, str, str]
+
+
+def token_key(token: str, payload: Optional[Dict[str, Any]] = None) -> str:
+    """Stable id for a bearer token: its ``jti`` claim, else a SHA-256 prefix."""
+    jti = (payload or {}).get("jti")
+    if jti:
+        return str(jti)
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:32]
+
+
+class PrincipalCache:
+    """In-process LRU of resolved principals with a per-entry TTL."""
+
+    def __init__(self, ttl_seconds: float = 30, max_entries: int = 10000, enabled: bool = True):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.enabled = enabled and ttl_seconds > 0
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._lock = Lock()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, user_id: int, token_id: str, kind: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        key = (int(user_id), token_id, kind)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def set(self, user_id: int, token_id: str, kind: str, principal: Any) -> None:
+        if not self.enabled or principal is None:
+            return
+        key = (int(user_id), token_id, kind)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, principal)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_or_load(
+        self, user_id: int, token_id: str, kind: str, loader: Callable[[], Awaitable[Any]]
+    ) -> Optional[Any]:
+        """Cached principal, or ``await loader()`` and cache a non-None result."""
+        principal = self.get(user_id, token_id, kind)
+        if principal is None:
+            principal = await loader()
+            self.set(user_id, token_id, kind, principal)
+        return principal
+
+    def invalidate(self, user_id: Optional[Hashable] = None) -> int:
+        """Drop every entry of a user (all entries when ``user_id`` is None); returns the count."""
+        with self._lock:
+            if user_id is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                stale = [key for key in self._entries if key[0] == int(user_id)]
+                for key in stale:
+                    del self._entries[key]
+                dropped = len(stale)
+            self.stats["invalidations"] += 1
+        return dropped
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+            stats = dict(self.stats)
+        return {"enabled": self.enabled, "ttl_seconds": self.ttl_seconds, "entries": size, **stats}
+
+
+_principal_cache: Optional[PrincipalCache] = None
+_principal_cache_lock = Lock()
+
+
+def get_principal_cache() -> PrincipalCache:
+    """Get or create the process-wide principal cache."""
+    global _principal_cache
+
+    if _principal_cache is None:
+        with _principal_cache_lock:
+            if _principal_cache is None:
+                settings = get_settings()
+                _principal_cache = PrincipalCache(
+                    ttl_seconds=settings.principal_cache_ttl_seconds,
+                    max_entries=settings.principal_cache_max_entries,
+                    enabled=settings.principal_cache_enabled,
+                )
+    return _principal_cache
+
+
+async def invalidate_principal(user_id: Optional[int] = None) -> None:
+    """Drop a user's cached principals here and, via Redis pub/sub, in every worker."""
+    get_principal_cache().invalidate(user_id)
+    client = get_async_redis_client()
+    if client is None:
+        return
+    try:
+        await client.publish(INVALIDATION_CHANNEL, INVALIDATE_ALL if user_id is None else str(user_id))
+    except Exception as exc:  # pragma: no cover - network dependent
+        mark_async_redis_unavailable()
+        logger.warning("Failed to publish principal invalidation for user %s: %s", user_id, exc)
+
+
+def _apply_invalidation(cache: PrincipalCache, data: Any) -> None:
+    value = data.decode("utf-8") if isinstance(data, bytes) else str(data)
+    if value == INVALIDATE_ALL:
+        cache.invalidate()
+    elif value.isdigit():
+        cache.invalidate(int(value))
+    else:
+        logger.warning("Ignoring malformed principal invalidation message: %r", value)
+
+
+async def listen_for_invalidations(cache: Optional[PrincipalCache] = None) -> None:
+    """Apply invalidations published by other workers until cancelled."""
+    cache = cache or get_principal_cache()
+    if not getattr(get_settings(), "redis_url", None):
+        return
+    while True:
+        client = get_async_redis_client()
+        if client is None:
+            await asyncio.sleep(LISTENER_RETRY_SECONDS)
+            continue
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Entries cached while unsubscribed may have missed an invalidation
+            cache.invalidate()
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _apply_invalidation(cache, message.get("data"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # pragma: no cover - network dependent
+            mark_async_redis_unavailable()
+            logger.warning("Principal invalidation listener lost Redis: %s", exc)
+            await asyncio.sleep(LISTENER_RETRY_SECONDS)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
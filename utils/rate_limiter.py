@@ -0,0 +1,202 @@
+"""Shared GCRA rate limiter backed by Redis with a bounded per-process fallback.
+
+The generic cell rate algorithm keeps a single value per key, the theoretical
+arrival time (TAT) of the next request, so every check is O(1) in time and
+memory regardless of the limit. A limit of ``limit`` requests per ``period``
+seconds admits bursts of up to ``limit`` requests and then one request every
+``period / limit`` seconds.
+
+- With Redis the TAT lives under ``<prefix>:<key>`` and is read and updated by
+  one Lua script using the server clock, so the limit holds across every worker
+  and replica without clock skew between them.
+- Without Redis (or when a call fails) the TAT is kept in an LRU dict of at most
+  ``rate_limit_local_max_keys`` entries per limiter. Evicting a key only forgets
+  its debt, so memory stays fixed under many distinct clients.
+
+``check``/``acheck`` return a ``RateLimitResult`` with exact ``remaining``,
+``retry_after`` and ``reset_at`` (when the full burst is available again).
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple
+
+from config import get_settings
+from utils.redis_cache import mark_async_redis_unavailable
+
+logger = logging.getLogger(__name__)
+
+MICROSECONDS = 1_000_000
+DEFAULT_LOCAL_MAX_KEYS = 10000
+
+# KEYS[1] = TAT key; ARGV = period (us), limit, cost (0 only reports the current state).
+# Returns {allowed, remaining, retry_after_us, reset_after_us}.
+GCRA_SCRIPT = """
+if redis.replicate_commands then
+    redis.replicate_commands()
+end
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000000 + tonumber(clock[2])
+local limit = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local interval = math.max(1, math.floor(tonumber(ARGV[1]) / limit))
+local capacity = interval * limit
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval * cost
+local allow_at = new_tat - capacity
+local allowed = 0
+local retry_after = 0
+if allow_at <= now then
+    allowed = 1
+    if cost > 0 then
+        redis.call('SET', KEYS[1], string.format('%.0f', new_tat), 'PX', math.ceil((new_tat - now) / 1000))
+    end
+    tat = new_tat
+else
+    retry_after = allow_at - now
+end
+local remaining = math.floor((now - tat + capacity) / interval)
+return {allowed, remaining, retry_after, tat - now}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    """Outcome of one rate-limit check."""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float
+    reset_at: float
+
+    @property
+    def current(self) -> int:
+        """Requests counted against the limit right now."""
+        return self.limit - self.remaining
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "allowed": self.allowed,
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset_at": int(math.ceil(self.reset_at)),
+            "retry_after": int(math.ceil(self.retry_after)),
+            "current": self.current,
+        }
+
+
+def gcra(tat: Optional[int], now: int, limit: int, period: int, cost: int = 1) -> Tuple[bool, int, int, int, int]:
+    """One GCRA step in microseconds, mirroring ``GCRA_SCRIPT``.
+
+    Returns:
+        Tuple of (allowed, new TAT, remaining, retry_after, reset_after)
+    """
+    interval = max(1, period // limit)
+    capacity = interval * limit
+    tat = now if tat is None or tat < now else tat
+    new_tat = tat + interval * cost
+    allow_at = new_tat - capacity
+    if allow_at <= now:
+        tat = new_tat
+        retry_after = 0
+        allowed = True
+    else:
+        retry_after = allow_at - now
+        allowed = False
+    remaining = (now - tat + capacity) // interval
+    return allowed, tat, remaining, retry_after, tat - now
+
+
+class LocalGcraStore:
+    """Per-process TATs in an LRU dict of fixed size."""
+
+    def __init__(self, max_keys: int = DEFAULT_LOCAL_MAX_KEYS):
+        self.max_keys = max(1, max_keys)
+        self.entries: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = Lock()
+
+    def update(self, key: str, limit: int, period: int, cost: int, now: int) -> Tuple[bool, int, int, int]:
+        with self._lock:
+            allowed, tat, remaining, retry_after, reset_after = gcra(self.entries.get(key), now, limit, period, cost)
+            if reset_after <= 0:
+                # A TAT in the past is the same as no entry
+                self.entries.pop(key, None)
+            elif allowed and cost > 0:
+                self.entries[key] = tat
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_keys:
+                    self.entries.popitem(last=False)
+        return allowed, remaining, retry_after, reset_after
+
+
+class GcraRateLimiter:
+    """GCRA limiter shared by every worker through Redis.
+
+    Callers pass the Redis client to use (sync for ``check``, ``redis.asyncio``
+    for ``acheck``); with no client, or when the script fails, the local store
+    answers instead.
+    """
+
+    def __init__(self, prefix: str, redis_url: Optional[str] = None, max_local_keys: Optional[int] = None):
+        if max_local_keys is None:
+            max_local_keys = getattr(get_settings(), "rate_limit_local_max_keys", DEFAULT_LOCAL_MAX_KEYS)
+        self.prefix = prefix
+        self.redis_url = redis_url
+        self.local = LocalGcraStore(max_local_keys)
+        self._script = None
+        self._async_script = None
+
+    def _result(self, limit: int, allowed: Any, remaining: Any, retry_after: Any, reset_after: Any) -> RateLimitResult:
+        now = time.time()
+        return RateLimitResult(
+            allowed=bool(allowed),
+            limit=limit,
+            remaining=max(0, int(remaining)),
+            retry_after=int(retry_after) / MICROSECONDS,
+            reset_at=now + max(0, int(reset_after)) / MICROSECONDS,
+        )
+
+    def _check_local(self, key: str, limit: int, period: int, cost: int) -> RateLimitResult:
+        now = int(time.time() * MICROSECONDS)
+        return self._result(limit, *self.local.update(key, limit, period, cost, now))
+
+    def check(self, key: str, limit: int, period: float, cost: int = 1, client: Any = None) -> RateLimitResult:
+        """Count ``cost`` requests for ``key`` (``cost=0`` only reports the current state)."""
+        limit = max(1, int(limit))
+        period_us = int(period * MICROSECONDS)
+        if client is not None:
+            try:
+                if self._script is None:
+                    self._script = client.register_script(GCRA_SCRIPT)
+                values = self._script(keys=[f"{self.prefix}:{key}"], args=[period_us, limit, cost], client=client)
+                return self._result(limit, *values)
+            except Exception as exc:
+                logger.warning(f"Redis rate limit check failed, using in-memory fallback: {exc}")
+        return self._check_local(key, limit, period_us, cost)
+
+    async def acheck(self, key: str, limit: int, period: float, cost: int = 1, client: Any = None) -> RateLimitResult:
+        """Async variant of ``check`` for a ``redis.asyncio`` client."""
+        limit = max(1, int(limit))
+        period_us = int(period * MICROSECONDS)
+        if client is not None:
+            try:
+                if self._async_script is None:
+                    self._async_script = client.register_script(GCRA_SCRIPT)
+                values = await self._async_script(
+                    keys=[f"{self.prefix}:{key}"], args=[period_us, limit, cost], client=client
+                )
+                return self._result(limit, *values)
+            except Exception as exc:
+                logger.warning(f"Redis rate limit check failed, using in-memory fallback: {exc}")
+                mark_async_redis_unavailable(self.redis_url)
+        return self._check_local(key, limit, period_us, cost)
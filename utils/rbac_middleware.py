@@ -26,7 +26,6 @@ Usage:
 """
 
 import inspect
-import json
 import logging
 import time
 from datetime import datetime, timedelta
@@ -40,8 +39,11 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
 
 from config import get_settings
+from utils.audit_writer import audit_event, get_audit_writer, security_event
 from utils.auth_system import get_current_user
+from utils.rate_limiter import GcraRateLimiter, RateLimitResult
 from utils.rbac_models import PermissionCheckResponse, PermissionLevel, User
+from utils.redis_cache import get_async_redis_client, get_redis_client
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -80,42 +82,33 @@ class PermissionCache:
 
 
 class RateLimiter:
-    """Rate limiting for API endpoints."""
+    """Rate limiting for API endpoints on the shared GCRA limiter (Redis, or in-memory fallback)."""
 
-    def __init__(self, max_requests: int = 100, window_seconds: int = 60):
+    def __init__(self, max_requests: int = 100, window_seconds: int = 60, name: str = "api"):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests: Dict[str, List[datetime]] = {}
+        # Limiters with different limits must not share keys in Redis
+        self.limiter = GcraRateLimiter(prefix=f"rbac_rate_limit:{name}")
 
     def is_allowed(self, identifier: str) -> bool:
-        """Check if request is within rate limits."""
-        now = datetime.utcnow()
-
-        if identifier not in self.requests:
-            self.requests[identifier] = []
-
-        # Clean old requests
-        window_start = now - timedelta(seconds=self.window_seconds)
-        self.requests[identifier] = [req_time for req_time in self.requests[identifier] if req_time > window_start]
-
-        # Check if over limit
-        if len(self.requests[identifier]) >= self.max_requests:
-            return False
-
-        # Record this request
-        self.requests[identifier].append(now)
-        return True
+        """Check if request is within rate limits (counts the request when allowed)."""
+        return self.limiter.check(identifier, self.max_requests, self.window_seconds, client=get_redis_client()).allowed
+
+    async def check(self, identifier: str, consume: bool = True) -> RateLimitResult:
+        """Async check with remaining/retry-after details."""
+        return await self.limiter.acheck(
+            identifier,
+            self.max_requests,
+            self.window_seconds,
+            cost=1 if consume else 0,
+            client=get_async_redis_client(),
+        )
 
     def get_remaining_requests(self, identifier: str) -> int:
-        """Get remaining requests in current window."""
-        if identifier not in self.requests:
-            return self.max_requests
-
-        now = datetime.utcnow()
-        window_start = now - timedelta(seconds=self.window_seconds)
-        current_requests = [req_time for req_time in self.requests[identifier] if req_time > window_start]
-
-        return max(0, self.max_requests - len(current_requests))
+        """Get remaining requests without counting one."""
+        return self.limiter.check(
+            identifier, self.max_requests, self.window_seconds, cost=0, client=get_redis_client()
+        ).remaining
 
 
 class RBACManager:
@@ -126,6 +119,8 @@ class RBACManager:
         self.permission_cache = PermissionCache()
         self.rate_limiter = RateLimiter()
         self.settings = get_settings()
+        # Shared per database: RBACManager instances are created per request
+        self.audit_writer = get_audit_writer(db_connection_string)
 
         # Security monitoring
         self.failed_permission_checks = {}
@@ -330,42 +325,20 @@ class RBACManager:
         success: bool = True,
         error_message: Optional[str] = None,
     ):
-        """Log audit event."""
-        try:
-            conn = await self.get_db_connection()
-            cursor = conn.cursor()
-        except Exception as e:
-            logger.error(f"Failed to acquire DB connection for audit event: {e}")
-            return
-
-        try:
-            cursor.execute(
-                """
-                INSERT INTO audit_logs
-                (user_id, action, resource_type, resource_id, ip_address,
-                 user_agent, details, success, error_message, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-                (
-                    user_id,
-                    action,
-                    resource_type,
-                    resource_id,
-                    ip_address,
-                    user_agent,
-                    json.dumps(details) if details else None,
-                    success,
-                    error_message,
-                    datetime.utcnow(),
-                ),
+        """Queue an audit event for the batched background writer (never blocks on the database)."""
+        self.audit_writer.submit(
+            audit_event(
+                action=action,
+                resource_type=resource_type,
+                user_id=user_id,
+                resource_id=resource_id,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                details=details,
+                success=success,
+                error_message=error_message,
             )
-            conn.commit()
-
-        except Exception as e:
-            logger.error(f"Failed to log audit event: {str(e)}")
-        finally:
-            cursor.close()
-            conn.close()
+        )
 
     async def log_security_event(
         self,
@@ -375,37 +348,12 @@ class RBACManager:
         ip_address: Optional[str] = None,
         details: Optional[Dict[str, Any]] = None,
     ):
-        """Log security event."""
-        try:
-            conn = await self.get_db_connection()
-            cursor = conn.cursor()
-        except Exception as e:
-            logger.error(f"Failed to acquire DB connection for security event: {e}")
-            return
-
-        try:
-            cursor.execute(
-                """
-                INSERT INTO security_events
-                (event_type, severity, user_id, ip_address, details, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """,
-                (
-                    event_type,
-                    severity,
-                    user_id,
-                    ip_address,
-                    json.dumps(details) if details else None,
-                    datetime.utcnow(),
-                ),
+        """Queue a security event for the batched background writer (never blocks on the database)."""
+        self.audit_writer.submit(
+            security_event(
+                event_type=event_type, severity=severity, user_id=user_id, ip_address=ip_address, details=details
             )
-            conn.commit()
-
-        except Exception as e:
-            logger.error(f"Failed to log security event: {str(e)}")
-        finally:
-            cursor.close()
-            conn.close()
+        )
 
 
 class RBACMiddleware(BaseHTTPMiddleware):
@@ -435,9 +383,9 @@ class RBACMiddleware(BaseHTTPMiddleware):
 
         # Endpoints with special rate limiting
         self.rate_limited_endpoints = {
-            "/api/auth/login": RateLimiter(max_requests=5, window_seconds=300),  # 5 per 5 minutes
-            "/api/auth/register": RateLimiter(max_requests=3, window_seconds=3600),  # 3 per hour
-            "/api/auth/reset-password": RateLimiter(max_requests=3, window_seconds=3600),
+            "/api/auth/login": RateLimiter(max_requests=5, window_seconds=300, name="login"),  # 5 per 5 minutes
+            "/api/auth/register": RateLimiter(max_requests=3, window_seconds=3600, name="register"),  # 3 per hour
+            "/api/auth/reset-password": RateLimiter(max_requests=3, window_seconds=3600, name="reset-password"),
         }
 
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
@@ -451,16 +399,11 @@ class RBACMiddleware(BaseHTTPMiddleware):
         method = request.method
 
         try:
-            # Skip middleware for public endpoints
-            if self.is_public_endpoint(path):
-                response = await call_next(request)
-                await self.log_request(request, response, start_time, None, client_ip, user_agent)
-                return response
-
-            # Check rate limiting for specific endpoints
+            # Check rate limiting for specific endpoints (these are public, so before the skip below)
             if path in self.rate_limited_endpoints:
-                rate_limiter = self.rate_limited_endpoints[path]
-                if not rate_limiter.is_allowed(client_ip):
+                rate_limit = await self.rate_limited_endpoints[path].check(client_ip)
+                if not rate_limit.allowed:
+                    retry_after = rate_limit.as_dict()["retry_after"]
                     await self.rbac_manager.log_security_event(
                         event_type="rate_limit_exceeded",
                         severity="medium",
@@ -474,10 +417,17 @@ class RBACMiddleware(BaseHTTPMiddleware):
                             "success": False,
                             "message": "Rate limit exceeded",
                             "error_code": "RATE_LIMIT_EXCEEDED",
-                            "details": {"retry_after": self.rate_limited_endpoints[path].window_seconds},
+                            "details": {"retry_after": retry_after},
                         },
+                        headers={"Retry-After": str(retry_after)},
                     )
 
+            # Skip middleware for public endpoints
+            if self.is_public_endpoint(path):
+                response = await call_next(request)
+                await self.log_request(request, response, start_time, None, client_ip, user_agent)
+                return response
+
             # Process request
             # Enforce password change requirement for authenticated users
             # We perform a lightweight token decode using AuthManager dependency if Authorization header present
@@ -493,14 +443,21 @@ class RBACMiddleware(BaseHTTPMiddleware):
                     auth_manager = (
                         await manager_candidate if inspect.iscoroutine(manager_candidate) else manager_candidate
                     )
-                    payload = auth_manager.decode_token(token)
-                    if inspect.isawaitable(payload):
-                        payload = await payload
-                    user_id = payload.get("user_id")
-                    if user_id:
-                        user = await auth_manager.get_user_by_id(user_id)
+                    if callable(getattr(auth_manager, "resolve_principal", None)):
+                        user = await auth_manager.resolve_principal(token)
+                    else:
+                        payload = auth_manager.decode_token(token)
+                        if inspect.isawaitable(payload):
+                            payload = await payload
+                        user_id = payload.get("user_id")
+                        if user_id:
+                            user = await auth_manager.get_user_by_id(user_id)
                 except Exception:
                     user = None  # ignore token errors; normal auth layer will handle
+                if user is not None:
+                    # Handlers' get_current_user reuses this instead of resolving the token again
+                    request.state.principal = user
+                    request.state.principal_token = token
             if user and getattr(user, "password_change_required", False):
                 allowed_paths_pw = {
                     "/api/auth/login",
@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Optional
+import os
+from typing import Dict, Optional, Set, Tuple
 
 try:
     import redis
@@ -12,6 +14,11 @@ except Exception:  # pragma: no cover - optional dependency guard
     redis = None  # type: ignore
     RedisError = Exception  # type: ignore
 
+try:
+    import redis.asyncio as aioredis
+except Exception:  # pragma: no cover - optional dependency guard
+    aioredis = None  # type: ignore
+
 from config import get_settings
 
 logger = logging.getLogger(__name__)
@@ -68,6 +75,141 @@ def get_redis_client() -> Optional["redis.Redis"]:
     return _redis_client
 
 
+# Shared asyncio connection pools (one per Redis URL) used from async request handlers.
+REDIS_POOL_MAX_CONNECTIONS = int(os.getenv("REDIS_POOL_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT_SECONDS = float(os.getenv("REDIS_SOCKET_TIMEOUT_SECONDS", "2"))
+# After a connection failure, skip Redis for this long instead of paying the timeout per request.
+REDIS_RETRY_AFTER_SECONDS = 30.0
+
+_async_pools: Dict[str, "aioredis.ConnectionPool"] = {}
+_async_unavailable_until: Dict[str, float] = {}
+
+
+def get_async_redis_client(redis_url: Optional[str] = None) -> Optional["aioredis.Redis"]:
+    """Return a ``redis.asyncio`` client backed by a shared connection pool.
+
+    Args:
+        redis_url: Redis URL; defaults to the configured ``REDIS_URL``
+
+    Returns:
+        Async Redis client, or None when Redis is not configured or recently unreachable
+    """
+    url = redis_url or getattr(get_settings(), "redis_url", None)
+    if not url or aioredis is None:
+        return None
+
+    if _async_unavailable_until.get(url, 0.0) > time.time():
+        return None
+
+    pool = _async_pools.get(url)
+    if pool is None:
+        pool = aioredis.ConnectionPool.from_url(
+            url,
+            decode_responses=True,
+            max_connections=REDIS_POOL_MAX_CONNECTIONS,
+            socket_connect_timeout=REDIS_SOCKET_TIMEOUT_SECONDS,
+            socket_timeout=REDIS_SOCKET_TIMEOUT_SECONDS,
+        )
+        _async_pools[url] = pool
+    return aioredis.Redis(connection_pool=pool)
+
+
+def mark_async_redis_unavailable(redis_url: Optional[str] = None) -> None:
+    """Back off from a Redis URL after a connection error."""
+    url = redis_url or getattr(get_settings(), "redis_url", None)
+    if url:
+        _async_unavailable_until[url] = time.time() + REDIS_RETRY_AFTER_SECONDS
+
+
+async def close_async_redis_pools() -> None:
+    """Disconnect all shared asyncio pools (called on application shutdown)."""
+    pools = list(_async_pools.values())
+    _async_pools.clear()
+    for pool in pools:
+        try:
+            await pool.disconnect()
+        except Exception as exc:  # pragma: no cover - network dependent
+            logger.debug("Error closing Redis pool: %s", exc)
+
+
+# Keep strong references to fire-and-forget flushes so they are not garbage collected mid-flight
+_background_flushes: Set["asyncio.Task"] = set()
+
+
+class CounterBatch:
+    """Collects counter updates for one request and writes them in a single pipelined round trip.
+
+    Usage:
+        counters = CounterBatch()
+        counters.model_usage("mistral:7b")
+        counters.question_type("technical")
+        counters.flush_in_background()
+    """
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis_url = redis_url
+        self._incr: Dict[str, int] = {}
+        self._hincr: Dict[Tuple[str, str], int] = {}
+        self._expire: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._incr) + len(self._hincr)
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[int] = None) -> None:
+        self._incr[key] = self._incr.get(key, 0) + amount
+        if ttl:
+            self._expire[key] = ttl
+
+    def hincr(self, key: str, field: str, amount: int = 1) -> None:
+        self._hincr[(key, field)] = self._hincr.get((key, field), 0) + amount
+
+    def model_usage(self, model: str) -> None:
+        self.hincr(MODEL_USAGE_KEY, model)
+
+    def question_type(self, question_type: str) -> None:
+        self.hincr(QUESTION_TYPE_KEY, question_type)
+
+    def instance_usage(self, instance_url: str) -> None:
+        self.hincr(INSTANCE_USAGE_KEY, _instance_field(instance_url))
+
+    async def flush(self) -> bool:
+        """Write all pending updates in one pipeline."""
+        if not len(self):
+            return True
+        incr, hincr, expire = self._incr, self._hincr, self._expire
+        self._incr, self._hincr, self._expire = {}, {}, {}
+
+        client = get_async_redis_client(self.redis_url)
+        if client is None:
+            return False
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, amount in incr.items():
+                pipe.incrby(key, amount)
+            for key, ttl in expire.items():
+                pipe.expire(key, ttl)
+            for (key, field), amount in hincr.items():
+                pipe.hincrby(key, field, amount)
+            await pipe.execute()
+            return True
+        except (RedisError, OSError) as exc:  # pragma: no cover - network dependent
+            logger.warning("Redis counter flush failed: %s", exc)
+            mark_async_redis_unavailable(self.redis_url)
+            return False
+
+    def flush_in_background(self) -> None:
+        """Schedule ``flush`` without awaiting it so Redis latency stays off the request path."""
+        if not len(self):
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self.flush())
+        except RuntimeError:
+            # No running loop (sync caller); nothing to schedule on
+            return
+        _background_flushes.add(task)
+        task.add_done_callback(_background_flushes.discard)
+
+
 def _with_client(func):
     def wrapper(*args, **kwargs):
         client = get_redis_client()
@@ -94,17 +236,25 @@ def hincr_field(client, key: str, field: str, amount: int = 1) -> bool:
     return True
 
 
+MODEL_USAGE_KEY = "tsa:chat:model_usage"
+QUESTION_TYPE_KEY = "tsa:chat:question_type"
+INSTANCE_USAGE_KEY = "tsa:chat:instance_usage"
+
+
+def _instance_field(instance_url: str) -> str:
+    return instance_url.replace("http://", "").replace("https://", "")
+
+
 def track_model_usage(model: str) -> bool:
-    return hincr_field("tsa:chat:model_usage", model)
+    return hincr_field(MODEL_USAGE_KEY, model)
 
 
 def track_question_type(question_type: str) -> bool:
-    return hincr_field("tsa:chat:question_type", question_type)
+    return hincr_field(QUESTION_TYPE_KEY, question_type)
 
 
 def track_instance_usage(instance_url: str) -> bool:
-    instance = instance_url.replace("http://", "").replace("https://", "")
-    return hincr_field("tsa:chat:instance_usage", instance)
+    return hincr_field(INSTANCE_USAGE_KEY, _instance_field(instance_url))
 
 
 # Short-term memory (decomposed requests) caching functions